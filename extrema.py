@@ -1,12 +1,24 @@
 #! /usr/bin/env python3
 
+# Extrema of the sRGB gamut in CIE LAB and LCH
+#
+# Converts all 256³ 8-bit RGB values to Lab and LCH and all 101×257×257
+# integer Lab values to RGB with the batch functions of librgb2lab, one plane
+# at a time, sharded across processes which accumulate their running extrema
+# directly in shared memory
+#
 # Copyright (C) 2015, Shriramana Sharma, samjnaa-at-gmail-dot-com
 #
 # Use, modification and distribution are permitted subject to the
 # "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
 
+import argparse, os
+from array import array
+from ctypes import Structure, c_char, sizeof
+from multiprocessing import Pool
+from multiprocessing.sharedctypes import RawArray
+from time import perf_counter
 from rgb2lab import *
-from time import process_time
 
 otherFormats = ["{:10.4f}, ", "{:10.4f}; ", "{: 4d}, ", "{: 4d}, ", "{: 4d}\n"];
 def mywrite(firstLabel, firstValue, otherLabels, otherValues):
@@ -14,52 +26,135 @@ def mywrite(firstLabel, firstValue, otherLabels, otherValues):
     for l, f, v in zip(otherLabels, otherFormats, otherValues):
         print(l, " = ", f.format(v), sep = "", end = "")
 
-labFromRgbMap = []
-startTime = process_time()
-for r in range(256):
-    plane = []
-    for g in range(256):
-        row = []
-        for b in range(256):
-            row.append(labFromRgb(*(v / 255.0 for v in (r, g, b))))
-        plane.append(row)
-    labFromRgbMap.append(plane)
-endTime = process_time()
-print("Completed {} calls to labFromRgb in {:.3f} seconds".format(256 ** 3, endTime - startTime))
-
-maxL = maxA = maxB = float("-inf") # all values will be above this
-minL = minA = minB = float("+inf") # all values will be below this
-startTime = process_time()
-for r in range(256):
-    for g in range(256):
-        for b in range(256):
-            LAB = labFromRgbMap[r][g][b]
-            L = LAB[0] ; A = LAB[1] ; B = LAB[2]
-            if L > maxL: maxL = L ; abRgbForMaxL = [A, B, r, g, b]
-            if L < minL: minL = L ; abRgbForMinL = [A, B, r, g, b]
-            if A > maxA: maxA = A ; lbRgbForMaxA = [L, B, r, g, b]
-            if A < minA: minA = A ; lbRgbForMinA = [L, B, r, g, b]
-            if B > maxB: maxB = B ; laRgbForMaxB = [L, A, r, g, b]
-            if B < minB: minB = B ; laRgbForMinB = [L, A, r, g, b]
-endTime = process_time()
-print("Completed {} loops searching for Lab extrema in {:.3f} seconds".format(256 ** 3, endTime - startTime))
-
-mywrite("maxL", maxL, "ABrgb", abRgbForMaxL)
-mywrite("minL", minL, "ABrgb", abRgbForMinL)
-mywrite("maxA", maxA, "LBrgb", lbRgbForMaxA)
-mywrite("minA", minA, "LBrgb", lbRgbForMinA)
-mywrite("maxB", maxB, "LArgb", laRgbForMaxB)
-mywrite("minB", minB, "LArgb", laRgbForMinB)
-
-rgbFromLabMap = []
-startTime = process_time()
-for l in range(101):
-    plane = []
-    for a in range(-128, 129):
-        row = []
-        for b in range(-128, 129):
-            row.append(tuple(v * 255 for v in rgbFromLab(l, a, b)))
-        plane.append(row)
-    rgbFromLabMap.append(plane)
-endTime = process_time()
-print("Completed {} calls to rgbFromLab in {:.3f} seconds".format(101 * 257 * 257, endTime - startTime))
+class RgbCubeResult(Structure):
+    _fields_ = (("lab", TripletExtrema), ("lch", TripletExtrema), ("maxChroma", MaxChroma))
+    def reset(self):
+        self.lab.reset(); self.lch.reset(); self.maxChroma.reset()
+
+class LabGridResult(Structure):
+    _fields_ = (("rgb", TripletExtrema), )
+    def reset(self):
+        self.rgb.reset()
+
+def rgbFromIndex(i): return (i >> 16, (i >> 8) & 255, i & 255)
+
+labGridPlane = 257 * 257
+def labFromIndex(i): return (i // labGridPlane, (i // 257) % 257 - 128, i % 257 - 128)
+
+def rgbCubePlanes(result, start, stop):
+    planeIn = array("d", (v / 255.0 for g in range(256) for b in range(256) for v in (0, g, b)))
+    lab = array("d", bytes(8 * len(planeIn)))
+    lch = array("d", bytes(8 * len(planeIn)))
+    for r in range(start, stop):
+        planeIn[0::3] = array("d", [r / 255.0]) * (256 * 256)
+        labFromRgbArray(planeIn, lab)
+        lchFromRgbArray(planeIn, lch) # not from lab which may be marginally out of its nominal range
+        updateTripletExtrema(result.lab, lab, r * 256 * 256)
+        updateTripletExtrema(result.lch, lch, r * 256 * 256)
+        updateMaxChroma(result.maxChroma, lch, r * 256 * 256)
+
+def labGridPlanes(result, start, stop):
+    planeIn = array("d", (v for a in range(-128, 129) for b in range(-128, 129) for v in (0, a, b)))
+    rgb = array("d", bytes(8 * len(planeIn)))
+    for l in range(start, stop):
+        planeIn[0::3] = array("d", [l]) * labGridPlane
+        rgbFromLabArray(planeIn, rgb)
+        updateTripletExtrema(result.rgb, rgb, l * labGridPlane)
+
+shardFns = {"rgbCube": (RgbCubeResult, rgbCubePlanes), "labGrid": (LabGridResult, labGridPlanes)}
+
+sharedResults = {} # kind: RawArray holding one result per shard; set in each worker by initWorker
+
+def initWorker(results):
+    sharedResults.update(results)
+
+def runShard(job):
+    kind, shard, start, stop = job
+    Result, planesFn = shardFns[kind]
+    result = Result.from_buffer(sharedResults[kind], shard * sizeof(Result))
+    result.reset()
+    planesFn(result, start, stop)
+
+def runSharded(pool, kind, planes, shardCount):
+    '''Processes `planes` planes in contiguous shards and returns the per-shard results in plane order'''
+    Result, _ = shardFns[kind]
+    bounds = [planes * i // shardCount for i in range(shardCount + 1)]
+    pool.map(runShard, [(kind, i, bounds[i], bounds[i + 1]) for i in range(shardCount)])
+    return [Result.from_buffer_copy(sharedResults[kind], i * sizeof(Result)) for i in range(shardCount)]
+
+def mergeExtrema(extremas):
+    '''Merges extrema of consecutive shards keeping the earliest index for equal values'''
+    merged = TripletExtrema()
+    for e in extremas:
+        for i in range(3):
+            if e.min[i] < merged.min[i]: merged.min[i], merged.minIndex[i] = e.min[i], e.minIndex[i]
+            if e.max[i] > merged.max[i]: merged.max[i], merged.maxIndex[i] = e.max[i], e.maxIndex[i]
+    return merged
+
+def mergeMaxChroma(maxChromas):
+    merged = MaxChroma()
+    for m in maxChromas:
+        for i in range(360):
+            if m.forH[i] > merged.forH[i]: merged.forH[i], merged.indexForH[i] = m.forH[i], m.indexForH[i]
+        for i in range(101):
+            if m.forL[i] > merged.forL[i]: merged.forL[i], merged.indexForL[i] = m.forL[i], m.indexForL[i]
+    return merged
+
+def main():
+    p = argparse.ArgumentParser(description = "Report the extrema of the sRGB gamut in CIE LAB and LCH")
+    p.add_argument("-j", "--jobs", type = int, default = os.cpu_count(), help = "worker processes")
+    p.add_argument("--no-chroma-tables", action = "store_true", help = "omit maximum chroma per hue and per lightness")
+    args = p.parse_args()
+    shardCount = args.jobs * 4 # several shards per process to balance load
+    labGridShardCount = min(shardCount, 101)
+
+    sharedResults["rgbCube"] = RawArray(c_char, sizeof(RgbCubeResult) * shardCount)
+    sharedResults["labGrid"] = RawArray(c_char, sizeof(LabGridResult) * labGridShardCount)
+    with Pool(args.jobs, initWorker, (sharedResults, )) as pool:
+        startTime = perf_counter()
+        shards = runSharded(pool, "rgbCube", 256, shardCount)
+        endTime = perf_counter()
+        print("Completed {} calls to labFromRgb and searched Lab and LCH extrema in {:.3f} seconds".format(256 ** 3, endTime - startTime))
+
+        labExtrema = mergeExtrema(s.lab for s in shards)
+        def rgbLab(i):
+            rgb = rgbFromIndex(i)
+            return rgb, labFromRgb(tuple(v / 255.0 for v in rgb))
+        for n, (name, labels) in enumerate((("L", "AB"), ("A", "LB"), ("B", "LA"))):
+            others = [m for m in range(3) if m != n]
+            for kind in "max", "min":
+                rgb, lab = rgbLab(getattr(labExtrema, kind + "Index")[n])
+                mywrite(kind + name, getattr(labExtrema, kind)[n], labels + "rgb", [lab[m] for m in others] + list(rgb))
+
+        lchExtrema = mergeExtrema(s.lch for s in shards)
+        def rgbLch(i):
+            rgb = rgbFromIndex(i)
+            return rgb, lchFromRgb(tuple(v / 255.0 for v in rgb))
+        for kind in "max", "min":
+            rgb, lch = rgbLch(getattr(lchExtrema, kind + "Index")[1])
+            mywrite(kind + "C", getattr(lchExtrema, kind)[1], "LHrgb", [lch[0], lch[2]] + list(rgb))
+
+        if not args.no_chroma_tables:
+            maxChroma = mergeMaxChroma(s.maxChroma for s in shards)
+            for h in range(360):
+                rgb, lch = rgbLch(maxChroma.indexForH[h])
+                mywrite("maxC for H = {:3d}".format(h), maxChroma.forH[h], "LHrgb", [lch[0], lch[2]] + list(rgb))
+            for l in range(101):
+                rgb, lch = rgbLch(maxChroma.indexForL[l])
+                mywrite("maxC for L = {:3d}".format(l), maxChroma.forL[l], "LHrgb", [lch[0], lch[2]] + list(rgb))
+
+        startTime = perf_counter()
+        shards = runSharded(pool, "labGrid", 101, labGridShardCount)
+        endTime = perf_counter()
+        print("Completed {} calls to rgbFromLab in {:.3f} seconds".format(101 * 257 * 257, endTime - startTime))
+
+        rgbExtrema = mergeExtrema(s.rgb for s in shards)
+        for n, (name, labels) in enumerate((("R", "GB"), ("G", "RB"), ("B", "RG"))):
+            others = [m for m in range(3) if m != n]
+            for kind in "max", "min":
+                lab = labFromIndex(getattr(rgbExtrema, kind + "Index")[n])
+                rgb = rgbFromLab(lab)
+                mywrite(kind + name, getattr(rgbExtrema, kind)[n] * 255, labels + "Lab", [rgb[m] * 255 for m in others] + list(lab))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# GUI tracing
+# ===========
+#
+# Opt-in timing spans of the GUI redraw pipeline with a summary for an
+# overlay and export as a Chrome trace (chrome://tracing, Perfetto)
+#
+# Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
+#
+# Use, modification and distribution are permitted subject to the
+# "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
+
+import functools, json, os, threading
+from collections import deque
+from contextlib import contextmanager
+from time import perf_counter_ns
+
+class Tracer:
+
+    '''
+    Records spans (name, start, duration, thread) while enabled, keeping the
+    last `maxSpans` for export and running totals per name for the summary
+    '''
+
+    def __init__(self, maxSpans = 100000):
+        self.enabled = bool(os.environ.get("RGB2LAB_TRACE"))
+        self.spans = deque(maxlen = maxSpans)
+        self.totals = {}  # name: [count, total ns, max ns]
+        self.lock = threading.Lock()  # spans are also recorded in pool threads
+        self.origin = perf_counter_ns()
+
+    @contextmanager
+    def span(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(name, start, perf_counter_ns() - start)
+
+    def record(self, name, start, duration):
+        with self.lock:
+            self.spans.append((name, start, duration, threading.get_ident()))
+            t = self.totals.setdefault(name, [0, 0, 0])
+            t[0] += 1
+            t[1] += duration
+            t[2] = max(t[2], duration)
+
+    def clear(self):
+        with self.lock:
+            self.spans.clear()
+            self.totals.clear()
+
+    def summary(self):
+        '''Returns lines of count, mean and max per span name, slowest total first'''
+        with self.lock:
+            totals = sorted(self.totals.items(), key = lambda item: -item[1][1])
+        return ["{:24} {:6d} × {:8.2f} ms mean {:8.2f} ms max".format(name, count, total / count / 1e6, maximum / 1e6)
+                for name, (count, total, maximum) in totals]
+
+    def writeChromeTrace(self, path):
+        with self.lock:
+            spans = list(self.spans)
+        threadIds = {}
+        events = [{"name": name, "ph": "X", "pid": os.getpid(),
+                   "tid": threadIds.setdefault(thread, len(threadIds)),  # small numbers for readability
+                   "ts": (start - self.origin) / 1000, "dur": duration / 1000}
+                  for name, start, duration, thread in spans]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+tracer = Tracer()
+
+def traced(name):
+    '''Decorator recording each call of the function as a span `name`'''
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
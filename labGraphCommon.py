@@ -1,5 +1,5 @@
-# GraphLabel widget and HueOffsetInterface
-# ========================================
+# GraphLabel widget, HueOffsetInterface and BackgroundFillInterface
+# =================================================================
 #
 # Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
 #
@@ -9,6 +9,8 @@
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
+from rgb2lab_common import Rgb2LabError
+from guiTrace import tracer
 
 class GraphLabel(QLabel):
 
@@ -27,7 +29,7 @@ class GraphLabel(QLabel):
             fname = QFileDialog.getSaveFileName(self, "RGB2LAB GUI: Save “{}” graph".format(self.graphParent.graphName), self.graphParent.mainWindow.lastImageSaveDir, "PNG images (*.png)")[0]
             if fname == "":
                 return
-            if not self.graphParent.image.save(fname, "PNG"):
+            if not self.graphParent.hueRotatedImage().save(fname, "PNG"):
                 QMessageBox.critical(self, "RGB2LAB GUI: Error", "Could not save the image to the chosen path. Perhaps the path is not writable. Please try again.")
             self.graphParent.mainWindow.lastImageSaveDir = fname[ : fname.rindex(QDir.separator())]
 
@@ -40,3 +42,83 @@ class HueOffsetInterface:
 
     def applyHueOffset(self, x, direction):
         return (x + direction * self.getHueOffset()) % 360 if self.xIsH else x
+
+    def hueRotatedImage(self):
+        # self.image is drawn unrotated so that changing the hue offset needs only this blit of two pieces
+        shift = self.applyHueOffset(0, self.DISPLAY_FROM_DATA)  # display x of data x 0
+        if shift == 0:
+            return self.image
+        image = QImage(self.image.size(), self.image.format())
+        for key in self.image.textKeys():
+            image.setText(key, self.image.text(key))
+        width = self.image.width()
+        painter = QPainter(image)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        painter.drawImage(shift, 0, self.image, 0, 0, width - shift, -1)
+        painter.drawImage(0, 0, self.image, width - shift, 0, shift, -1)
+        painter.end()
+        return image
+
+class GraphFillSignals(QObject):
+
+    done = pyqtSignal(int, object)  # generation, (image, inGamutCount, fixed values) or None on error
+
+class GraphFillTask(QRunnable):
+
+    # Fills a new image on a pool thread; the fill functions release the GIL
+
+    def __init__(self, signals, generation, graphName, size, fillFn, extraArgs, fixed):
+        QRunnable.__init__(self)
+        self.signals, self.generation, self.graphName = signals, generation, graphName
+        self.size, self.fillFn, self.extraArgs, self.fixed = size, fillFn, extraArgs, fixed
+
+    def run(self):
+        image = QImage(self.size, QImage.Format_ARGB32_Premultiplied)
+        bits = image.bits()
+        bits.setsize(image.byteCount())
+        try:
+            with tracer.span("fill " + self.graphName):
+                inGamutCount = self.fillFn(bits, image.bytesPerLine(), *self.extraArgs, *self.fixed)
+        except (ValueError, Rgb2LabError):  # an exception escaping run() would abort
+            self.signals.done.emit(self.generation, None)
+        else:
+            self.signals.done.emit(self.generation, (image, inGamutCount, self.fixed))
+
+class BackgroundFillInterface:
+
+    # Graph images are filled on the global QThreadPool so that the GUI stays
+    # responsive. Each request gets a generation number and results of
+    # superseded requests are dropped; only one fill per graph is in flight and
+    # requests made meanwhile are coalesced into one made when it's done.
+
+    def initBackgroundFill(self):
+        self.fillGeneration = 0  # of the latest request
+        self.fillInFlight = False
+        self.inGamutCount = None  # until the first fill is done
+        self.fillSignals = GraphFillSignals()
+        self.fillSignals.done.connect(self.fillDone)
+
+    def requestFill(self):
+        self.fillGeneration += 1
+        if not self.fillInFlight:
+            self.startFill()
+
+    def startFill(self):
+        self.fillInFlight = True
+        fixed = tuple(self.values[n] for n in self.fixedNames)
+        QThreadPool.globalInstance().start(GraphFillTask(self.fillSignals, self.fillGeneration, self.graphName, self.image.size(),
+                                                         self.fillArgb32Fn, self.fillExtraArgs, fixed))
+
+    def fillDone(self, generation, result):
+        self.fillInFlight = False
+        if generation != self.fillGeneration:  # superseded: fill for the latest values
+            self.startFill()
+            return
+        if result is None:
+            return
+        image, self.inGamutCount, self.filledFixed = result
+        for key in self.image.textKeys():
+            image.setText(key, self.image.text(key))
+        self.image = image
+        self.updateTexts()
+        self.redrawPixmap()
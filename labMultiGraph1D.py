@@ -13,13 +13,14 @@ from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
 from labGraphCommon import *
+from guiTrace import traced
 from rgb2lab_int import *
 
 heightOfGraph1D = 30
 
-class LabGraph1D(QWidget, HueOffsetInterface):
+class LabGraph1D(QWidget, HueOffsetInterface, BackgroundFillInterface):
 
-    def __init__(self, mainWindow, colorNotation, makeTableFn, fixed1Name, fixed2Name, varName, varMin, varMax):
+    def __init__(self, mainWindow, colorNotation, fillArgb32Fn, fixed1Name, fixed2Name, varName, varMin, varMax):
 
         assert varMax > varMin
 
@@ -27,7 +28,9 @@ class LabGraph1D(QWidget, HueOffsetInterface):
 
         self.mainWindow = mainWindow
         self.colorNotation = colorNotation
-        self.makeTableFn = makeTableFn
+        self.fillArgb32Fn = fillArgb32Fn
+        self.fillExtraArgs = (heightOfGraph1D, )
+        self.fixedNames = (fixed1Name, fixed2Name)
         self.fixed1Name = fixed1Name
         self.fixed2Name = fixed2Name
         self.varName = varName
@@ -38,9 +41,11 @@ class LabGraph1D(QWidget, HueOffsetInterface):
         self.xSpan = varMax - varMin + 1
         self.xIsH = varName == "H"
 
-        i = self.image = QImage(self.xSpan, heightOfGraph1D, QImage.Format_ARGB32)
+        i = self.image = QImage(self.xSpan, heightOfGraph1D, QImage.Format_ARGB32_Premultiplied)
         i.setText("Software", "RGB2LAB GUI, © 2019, Shriramana Sharma; GPLv3; using Qt 5 via PyQt 5")
         i.setText("Disclaimer", "Although every effort is made to ensure accuracy, as per the terms of the GPLv3, no guarantee is provided.")
+        i.fill(Qt.transparent)  # until the first fill is done
+        self.initBackgroundFill()
 
         t = self.redrawImageTimer = QTimer()
         t.setInterval(100)  # msecs
@@ -75,14 +80,17 @@ class LabGraph1D(QWidget, HueOffsetInterface):
                prevFixed2 == self.values[self.fixed2Name]:
                 self.redrawPixmap()  # no redrawImage
             else:
+                self.redrawPixmap()  # marker moves on the previous image until the new one is filled
                 self.redrawImageTimer.start()
 
+    @traced("redrawImage")
     def redrawImage(self):
         self.redrawImageTimer.stop()
-        fixed1 = self.values[self.fixed1Name]
-        fixed2 = self.values[self.fixed2Name]
-        table = self.makeTableFn(fixed1, fixed2)
-        coverage = round(100 * table.inGamutCount / self.xSpan, 2)
+        self.requestFill()  # updateTexts and redrawPixmap follow when done
+
+    def updateTexts(self):
+        fixed1, fixed2 = self.filledFixed
+        coverage = round(100 * self.inGamutCount / self.xSpan, 2)
         axisText = "X: {} [{} to {}]".format(self.varName,
                                              self.applyHueOffset(self.varMin, self.DATA_FROM_DISPLAY),
                                              self.applyHueOffset(self.varMax, self.DATA_FROM_DISPLAY))
@@ -95,16 +103,10 @@ class LabGraph1D(QWidget, HueOffsetInterface):
         st("Title", titleText)
         st("Description", titleText + "; Axis: {}; Coverage: {}% of graph in gamut; Parameters: D65 illuminant, 2 deg. observer".format(axisText, coverage))
         st("Creation Time", QDateTime.currentDateTime().toString(Qt.ISODate))
-        for x in range(self.xSpan):
-            rgb = table[x]
-            pix = qRgb(rgb.r, rgb.g, rgb.b) if rgb.valid else Qt.transparent
-            xForDisplay = self.applyHueOffset(x, self.DISPLAY_FROM_DATA)
-            for y in range(heightOfGraph1D):
-                self.image.setPixel(xForDisplay, y, pix)
-        self.redrawPixmap()
 
+    @traced("redrawPixmap")
     def redrawPixmap(self):
-        pixmap = QPixmap.fromImage(self.image)
+        pixmap = QPixmap.fromImage(self.hueRotatedImage())
         painter = QPainter(pixmap)
         painter.setRenderHint(QPainter.Antialiasing)
         target = QPoint(self.applyHueOffset(self.values[self.varName] - self.varMin, self.DISPLAY_FROM_DATA), heightOfGraph1D // 2)
@@ -125,12 +127,12 @@ class LabMultiGraph1D(QWidget):
 
         QWidget.__init__(self)
 
-        self.graph_LforAB = LabGraph1D(mainWindow, "LAB", makeTable_LforAB, "A", "B", "L",    0,  100)
-        self.graph_AforBL = LabGraph1D(mainWindow, "LAB", makeTable_AforBL, "B", "L", "A", -128, +128)
-        self.graph_BforAL = LabGraph1D(mainWindow, "LAB", makeTable_BforAL, "A", "L", "B", -128, +128)
-        self.graph_LforHC = LabGraph1D(mainWindow, "LCH", makeTable_LforHC, "H", "C", "L",    0,  100)
-        self.graph_CforHL = LabGraph1D(mainWindow, "LCH", makeTable_CforHL, "H", "L", "C",    0,  180)
-        self.graph_HforCL = LabGraph1D(mainWindow, "LCH", makeTable_HforCL, "C", "L", "H",    0,  359)
+        self.graph_LforAB = LabGraph1D(mainWindow, "LAB", fillArgb32_LforAB, "A", "B", "L",    0,  100)
+        self.graph_AforBL = LabGraph1D(mainWindow, "LAB", fillArgb32_AforBL, "B", "L", "A", -128, +128)
+        self.graph_BforAL = LabGraph1D(mainWindow, "LAB", fillArgb32_BforAL, "A", "L", "B", -128, +128)
+        self.graph_LforHC = LabGraph1D(mainWindow, "LCH", fillArgb32_LforHC, "H", "C", "L",    0,  100)
+        self.graph_CforHL = LabGraph1D(mainWindow, "LCH", fillArgb32_CforHL, "H", "L", "C",    0,  180)
+        self.graph_HforCL = LabGraph1D(mainWindow, "LCH", fillArgb32_HforCL, "C", "L", "H",    0,  359)
 
         self.graphs = (self.graph_LforAB, self.graph_AforBL, self.graph_BforAL, self.graph_LforHC, self.graph_CforHL, self.graph_HforCL)
 
@@ -140,7 +142,7 @@ class LabMultiGraph1D(QWidget):
         self.setLayout(l)
 
         t = self.rotateHueImageTimer = QTimer()
-        t.setInterval(100)  # msecs
+        t.setInterval(0)  # only coalesces slider moves pending in the event loop as rotating is just a blit
         t.timeout.connect(self.rotateHueImages)
 
     def updateGraphs(self):
@@ -149,4 +151,7 @@ class LabMultiGraph1D(QWidget):
 
     def rotateHueImages(self):
         self.rotateHueImageTimer.stop()
-        self.graph_HforCL.redrawImage()  # slightly inefficient as recalculates data but easiest
+        g = self.graph_HforCL
+        if g.inGamutCount is not None:
+            g.updateTexts()
+            g.redrawPixmap()
@@ -13,11 +13,12 @@ from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
 from labGraphCommon import *
+from guiTrace import traced
 from rgb2lab_int import *
 
-class LabGraph2D(QWidget, HueOffsetInterface):
+class LabGraph2D(QWidget, HueOffsetInterface, BackgroundFillInterface):
 
-    def __init__(self, mainWindow, colorNotation, makeTableFn, fixedValName, var1Name, var1Min, var1Max, var2Name, var2Min, var2Max):
+    def __init__(self, mainWindow, colorNotation, fillArgb32Fn, fixedValName, var1Name, var1Min, var1Max, var2Name, var2Min, var2Max):
 
         assert var1Max > var1Min
         assert var2Max > var2Min
@@ -26,7 +27,9 @@ class LabGraph2D(QWidget, HueOffsetInterface):
 
         self.mainWindow = mainWindow
         self.colorNotation = colorNotation
-        self.makeTableFn = makeTableFn
+        self.fillArgb32Fn = fillArgb32Fn
+        self.fillExtraArgs = ()
+        self.fixedNames = (fixedValName, )
         self.fixedValName = fixedValName
         self.var1Name = var1Name
         self.var1Min = var1Min
@@ -41,9 +44,11 @@ class LabGraph2D(QWidget, HueOffsetInterface):
         self.totalPoints = self.xSpan * self.ySpan
         self.xIsH = var1Name == "H"
 
-        i = self.image = QImage(self.xSpan, self.ySpan, QImage.Format_ARGB32)
+        i = self.image = QImage(self.xSpan, self.ySpan, QImage.Format_ARGB32_Premultiplied)
         i.setText("Software", "RGB2LAB GUI, © 2019, Shriramana Sharma; GPLv3; using Qt 5 via PyQt 5")
         i.setText("Disclaimer", "Although every effort is made to ensure accuracy, as per the terms of the GPLv3, no guarantee is provided.")
+        i.fill(Qt.transparent)  # until the first fill is done
+        self.initBackgroundFill()
 
         t = self.redrawImageTimer = QTimer()
         t.setInterval(100)  # msecs
@@ -77,13 +82,17 @@ class LabGraph2D(QWidget, HueOffsetInterface):
             if prevFixedVal == self.values[self.fixedValName]:
                 self.redrawPixmap()  # no redrawImage
             else:
+                self.redrawPixmap()  # marker moves on the previous image until the new one is filled
                 self.redrawImageTimer.start()
 
+    @traced("redrawImage")
     def redrawImage(self):
         self.redrawImageTimer.stop()
-        fixedVal = self.values[self.fixedValName]
-        table = self.makeTableFn(fixedVal)
-        coverage = round(100 * table.inGamutCount / self.totalPoints, 2)
+        self.requestFill()  # updateTexts and redrawPixmap follow when done
+
+    def updateTexts(self):
+        fixedVal, = self.filledFixed
+        coverage = round(100 * self.inGamutCount / self.totalPoints, 2)
         axesText = "X: {} [{} to {}], Y: {} [{} to {}]".format(self.var1Name,
                                                                self.applyHueOffset(self.var1Min, self.DATA_FROM_DISPLAY),
                                                                self.applyHueOffset(self.var1Max, self.DATA_FROM_DISPLAY),
@@ -97,16 +106,10 @@ class LabGraph2D(QWidget, HueOffsetInterface):
         st("Title", titleText)
         st("Description", titleText + "; Axes: {}; Coverage: {}% of graph in gamut; Parameters: D65 illuminant, 2 deg. observer".format(axesText, coverage))
         st("Creation Time", QDateTime.currentDateTime().toString(Qt.ISODate))
-        for x in range(self.xSpan):
-            xForDisplay = self.applyHueOffset(x, self.DISPLAY_FROM_DATA)
-            for y in range(self.ySpan):
-                rgb = table[x][y]
-                self.image.setPixel(xForDisplay, self.ySpan - 1 - y, qRgb(rgb.r, rgb.g, rgb.b) if rgb.valid else Qt.transparent)
-                # ySpan - 1 - y needed since we want y to increase upwards but in QImage it increases downwards
-        self.redrawPixmap()
 
+    @traced("redrawPixmap")
     def redrawPixmap(self):
-        pixmap = QPixmap.fromImage(self.image)
+        pixmap = QPixmap.fromImage(self.hueRotatedImage())
         painter = QPainter(pixmap)
         painter.setRenderHint(QPainter.Antialiasing)
         target = QPoint(self.applyHueOffset(self.values[self.var1Name] - self.var1Min, self.DISPLAY_FROM_DATA), self.var2Max - self.values[self.var2Name])
@@ -129,12 +132,12 @@ class LabMultiGraph2D(QWidget):
 
         QWidget.__init__(self)
 
-        self.graph_ABforL = LabGraph2D(mainWindow, "LAB", makeTable_ABforL, "L", "A", -128, +128, "B", -128, +128)
-        self.graph_BLforA = LabGraph2D(mainWindow, "LAB", makeTable_BLforA, "A", "B", -128, +128, "L",    0,  100)
-        self.graph_ALforB = LabGraph2D(mainWindow, "LAB", makeTable_ALforB, "B", "A", -128, +128, "L",    0,  100)
-        self.graph_HCforL = LabGraph2D(mainWindow, "LCH", makeTable_HCforL, "L", "H",    0,  359, "C",    0,  180)
-        self.graph_HLforC = LabGraph2D(mainWindow, "LCH", makeTable_HLforC, "C", "H",    0,  359, "L",    0,  100)
-        self.graph_CLforH = LabGraph2D(mainWindow, "LCH", makeTable_CLforH, "H", "C",    0,  180, "L",    0,  100)
+        self.graph_ABforL = LabGraph2D(mainWindow, "LAB", fillArgb32_ABforL, "L", "A", -128, +128, "B", -128, +128)
+        self.graph_BLforA = LabGraph2D(mainWindow, "LAB", fillArgb32_BLforA, "A", "B", -128, +128, "L",    0,  100)
+        self.graph_ALforB = LabGraph2D(mainWindow, "LAB", fillArgb32_ALforB, "B", "A", -128, +128, "L",    0,  100)
+        self.graph_HCforL = LabGraph2D(mainWindow, "LCH", fillArgb32_HCforL, "L", "H",    0,  359, "C",    0,  180)
+        self.graph_HLforC = LabGraph2D(mainWindow, "LCH", fillArgb32_HLforC, "C", "H",    0,  359, "L",    0,  100)
+        self.graph_CLforH = LabGraph2D(mainWindow, "LCH", fillArgb32_CLforH, "H", "C",    0,  180, "L",    0,  100)
 
         self.graphs = (self.graph_ABforL, self.graph_BLforA, self.graph_ALforB, self.graph_HCforL, self.graph_HLforC, self.graph_CLforH)
 
@@ -144,7 +147,7 @@ class LabMultiGraph2D(QWidget):
         self.setLayout(l)
 
         t = self.rotateHueImageTimer = QTimer()
-        t.setInterval(100)  # msecs
+        t.setInterval(0)  # only coalesces slider moves pending in the event loop as rotating is just a blit
         t.timeout.connect(self.rotateHueImages)
 
     def updateGraphs(self):
@@ -154,4 +157,6 @@ class LabMultiGraph2D(QWidget):
     def rotateHueImages(self):
         self.rotateHueImageTimer.stop()
         for g in self.graph_HCforL, self.graph_HLforC:
-            g.redrawImage()  # slightly inefficient as recalculates data but easiest
+            if g.inGamutCount is not None:
+                g.updateTexts()
+                g.redrawPixmap()
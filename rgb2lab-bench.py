@@ -0,0 +1,218 @@
+#! /usr/bin/env python3
+
+# RGB2LAB benchmarks
+# ==================
+#
+# Measure throughput and latency percentiles of the public entry points of
+# rgb2lab and rgb2lab_int and compare results against a stored baseline:
+#
+#     rgb2lab-bench.py run [-o results.json] [--quick] [--filter SUBSTRING]
+#     rgb2lab-bench.py compare baseline.json results.json [--threshold PERCENT]
+#     rgb2lab-bench.py scale [--job rgbCube|labGrid|KIND] [-p 1,2,4,...] [-o scaling.json]
+#
+# `compare` exits with status 1 if any benchmark's throughput regressed by
+# more than the threshold so that it can gate library upgrades. `scale` times
+# a whole-domain job of rgb2lab_engine for each process count.
+#
+# Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
+#
+# Use, modification and distribution are permitted subject to the
+# "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
+
+import argparse, json, platform, random, sys
+from array import array
+from datetime import datetime, timezone
+from itertools import cycle
+from time import perf_counter
+
+def randomRgb01(r): return (r.random(), r.random(), r.random())
+def randomLab(r): return (r.uniform(0, 100), r.uniform(-128, 128), r.uniform(-128, 128))
+def randomLch(r): return (r.uniform(0, 100), r.uniform(0, 180), r.uniform(0, 359.99))
+def randomRgb256(r): return (r.randrange(256), r.randrange(256), r.randrange(256))
+def randomLabInt(r): return (r.randrange(101), r.randrange(-128, 129), r.randrange(-128, 129))
+def randomLchInt(r): return (r.randrange(101), r.randrange(181), r.randrange(360))
+
+floatFns = (("labFromRgb", randomRgb01), ("rgbFromLab", randomLab), ("lchFromRgb", randomRgb01),
+            ("rgbFromLch", randomLch), ("lchFromLab", randomLab), ("labFromLch", randomLch))
+intFns = (("labFromRgbInt", randomRgb256), ("rgbFromLabInt", randomLabInt), ("lchFromRgbInt", randomRgb256),
+          ("rgbFromLchInt", randomLchInt), ("lchFromLabInt", randomLabInt), ("labFromLchInt", randomLchInt),
+          ("labLchFromRgbInt", randomRgb256), ("rgbLchFromLabInt", randomLabInt), ("rgbLabFromLchInt", randomLchInt))
+tableFns = (("LforAB", 101, (10, -20)), ("AforBL", 257, (30, 50)), ("BforAL", 257, (-40, 50)),
+            ("LforHC", 101, (120, 40)), ("CforHL", 181, (200, 60)), ("HforCL", 360, (50, 60)),
+            ("ABforL", 257 * 257, (50, )), ("BLforA", 257 * 101, (20, )), ("ALforB", 257 * 101, (-20, )),
+            ("HCforL", 360 * 181, (50, )), ("HLforC", 360 * 101, (40, )), ("CLforH", 181 * 101, (200, )))
+
+def measure(fn, itemsPerCall, samples, minSampleTime):
+    '''Times `fn()` and returns a dict of throughput in items/s and per-call latency percentiles in µs'''
+    inner = 1
+    while True: # calibrate calls per sample
+        startTime = perf_counter()
+        for _ in range(inner): fn()
+        elapsed = perf_counter() - startTime
+        if elapsed >= minSampleTime: break
+        inner *= 2 if elapsed == 0 else max(2, min(100, int(minSampleTime / elapsed * 1.2)))
+    latencies = []
+    for _ in range(samples):
+        startTime = perf_counter()
+        for _ in range(inner): fn()
+        latencies.append((perf_counter() - startTime) / inner)
+    latencies.sort()
+    def percentile(p): return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1e6
+    return {"items_per_call": itemsPerCall,
+            "calls": inner * samples,
+            "throughput": itemsPerCall * inner * samples / sum(latencies) / inner,
+            "p50_us": percentile(50), "p90_us": percentile(90), "p99_us": percentile(99)}
+
+def benchmarks(quick):
+    '''Yields (name, function to time, items per call)'''
+    import rgb2lab, rgb2lab_int, rgb2lab_planar
+    r = random.Random(2019)
+    batchSizes = (1, 64, 4096) if quick else (1, 64, 4096, 262144)
+
+    for name, gen in floatFns:
+        fn, inputs = getattr(rgb2lab, name), [gen(r) for _ in range(1024)]
+        it = cycle(inputs)
+        yield "scalar/" + name, lambda fn = fn, it = it: fn(next(it)), 1
+    for name, gen in intFns:
+        fn, inputs = getattr(rgb2lab_int, name), [gen(r) for _ in range(1024)]
+        it = cycle(inputs)
+        yield "scalar/" + name, lambda fn = fn, it = it: fn(next(it)), 1
+
+    for name, gen in floatFns:
+        fn = getattr(rgb2lab, name + "Array")
+        for n in batchSizes:
+            src = array("d", (v for _ in range(n) for v in gen(r)))
+            out = array("d", bytes(len(src) * 8))
+            yield "batch/{}Array/{}".format(name, n), lambda fn = fn, src = src, out = out: fn(src, out), n
+    for name, gen in floatFns if rgb2lab.nativeAvailable() else ():
+        fn = getattr(rgb2lab_planar, name + "Planar")
+        for n in batchSizes:
+            values = [gen(r) for _ in range(n)]
+            src = array("f", (t[j] for j in range(3) for t in values))
+            out = array("f", bytes(len(src) * 4))
+            yield "planar/{}Planar/{}".format(name, n), lambda fn = fn, src = src, out = out: fn(src, out), n
+    for name in "labFromRgb8Array", "lchFromRgb8Array", "labLchFromRgb8Array":
+        fn = getattr(rgb2lab_int, name)
+        for n in batchSizes:
+            src = bytes(r.randrange(256) for _ in range(3 * n))
+            yield "batch/{}/{}".format(name, n), lambda fn = fn, src = src: fn(src), n
+
+    for name, cells, fixed in tableFns:
+        fn = getattr(rgb2lab_int, "makeTable_" + name)
+        yield "table/makeTable_" + name, lambda fn = fn, fixed = fixed: fn(*fixed), cells
+
+def run(args):
+    import rgb2lab, rgb2lab_int # only here so that compare works without the library
+    # measure the computations themselves rather than cached or precomputed results
+    rgb2lab_int.setTableCacheBudget(0)
+    rgb2lab_int.unloadGamutVolumes()
+    rgb2lab_int.unloadRgb8Table()
+    rgb2lab.setBackend(args.backend)
+    native = rgb2lab.nativeAvailable()
+    if native:
+        rgb2lab.setThreadCount(args.threads)
+    samples, minSampleTime = (10, 0.002) if args.quick else (50, 0.01)
+    results = {}
+    for name, fn, items in benchmarks(args.quick):
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = m = measure(fn, items, samples, minSampleTime)
+        print("{:40} {:14,.0f} items/s   p50 {:10.2f} µs   p99 {:10.2f} µs".format(name, m["throughput"], m["p50_us"], m["p99_us"]))
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec = "seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "threads": rgb2lab.threadCount() if native else None,
+            "fastMath": rgb2lab.fastMath() if native else None,
+            "backend": rgb2lab.backend(),
+            "nativeExtension": rgb2lab._rgb2lab is not None,
+            "quick": args.quick,
+            },
+        "results": results,
+        }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent = 2)
+        print("Wrote results to", args.output)
+
+def compare(args):
+    with open(args.baseline) as f: baseline = json.load(f)["results"]
+    with open(args.results) as f: results = json.load(f)["results"]
+    regressions = 0
+    for name in sorted(baseline.keys() & results.keys()):
+        old, new = baseline[name]["throughput"], results[name]["throughput"]
+        change = (new / old - 1) * 100
+        flag = ""
+        if change < -args.threshold:
+            flag = "REGRESSION"
+            regressions += 1
+        elif change > args.threshold:
+            flag = "improved"
+        print("{:40} {:14,.0f} → {:14,.0f} items/s {:+7.1f}% {}".format(name, old, new, change, flag))
+    missing = sorted(baseline.keys() - results.keys())
+    for name in missing:
+        print("{:40} missing from results".format(name))
+    failures = []
+    if regressions:
+        failures.append("{} benchmarks regressed by more than {}%".format(regressions, args.threshold))
+    if missing and not args.allow_missing:
+        failures.append("{} benchmarks are missing from the results".format(len(missing)))
+    if failures:
+        sys.exit("; ".join(failures))
+
+def scale(args):
+    import os, rgb2lab, rgb2lab_engine
+    rgb2lab.setBackend(args.backend)
+    counts = [int(n) for n in args.processes.split(",")] if args.processes else \
+             sorted({1 << i for i in range(os.cpu_count().bit_length())} | {os.cpu_count()})
+    submit = {"rgbCube": lambda engine: engine.rgbCube(precision = "int"),
+              "labGrid": lambda engine: engine.labGrid()}.get(args.job, lambda engine: engine.tableSlices(args.job))
+    results = {}
+    for processes in counts:
+        with rgb2lab_engine.Engine(processes) as engine:
+            times = []
+            for _ in range(args.repeat):
+                startTime = perf_counter()
+                job = submit(engine)
+                job.wait().close()
+                times.append(perf_counter() - startTime)
+        seconds = min(times)
+        results[processes] = m = {"seconds": seconds, "throughput": job.total / seconds,
+                                  "speedup": results[counts[0]]["seconds"] / seconds * counts[0] if results else float(counts[0])}
+        m["efficiency"] = m["speedup"] / processes
+        print("{:4} processes {:10.3f} s {:14,.0f} units/s   speedup {:6.2f}   efficiency {:5.1%}".format(
+            processes, seconds, m["throughput"], m["speedup"], m["efficiency"]))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"meta": {"job": args.job, "cpus": os.cpu_count(), "backend": rgb2lab.backend(),
+                                "python": platform.python_version(), "platform": platform.platform()},
+                       "results": results}, f, indent = 2)
+        print("Wrote results to", args.output)
+
+def main():
+    p = argparse.ArgumentParser(description = "Benchmark librgb2lab entry points")
+    sub = p.add_subparsers(dest = "command", required = True)
+    r = sub.add_parser("run", help = "run the benchmarks")
+    r.add_argument("-o", "--output", help = "write JSON results to this file")
+    r.add_argument("--quick", action = "store_true", help = "fewer samples and smaller batches")
+    r.add_argument("--filter", help = "only run benchmarks whose name contains this")
+    r.add_argument("-t", "--threads", type = int, default = 1, help = "library threads; 0 = one per CPU")
+    r.add_argument("-b", "--backend", choices = ("native", "numpy"), help = "backend of the conversions and tables (default as picked on first use)")
+    c = sub.add_parser("compare", help = "compare results against a baseline")
+    c.add_argument("baseline")
+    c.add_argument("results")
+    c.add_argument("--threshold", type = float, default = 10, help = "allowed throughput drop in percent")
+    c.add_argument("--allow-missing", action = "store_true",
+                   help = "don't fail for baseline benchmarks missing from the results, as after run --filter")
+    s = sub.add_parser("scale", help = "time a whole-domain engine job for several process counts")
+    s.add_argument("--job", default = "rgbCube", help = "rgbCube (int), labGrid or a table kind such as ABforL (default rgbCube)")
+    s.add_argument("-p", "--processes", help = "comma-separated process counts (default powers of 2 up to the CPUs)")
+    s.add_argument("-r", "--repeat", type = int, default = 3, help = "runs per count, the fastest being reported")
+    s.add_argument("-o", "--output", help = "write JSON results to this file")
+    s.add_argument("-b", "--backend", choices = ("native", "numpy"), help = "backend of the workers")
+    args = p.parse_args()
+    {"run": run, "compare": compare, "scale": scale}[args.command](args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+#! /usr/bin/env python3
+
+# RGB2LAB image file converter
+# ============================
+#
+# Convert image files from sRGB to CIELAB or back, streaming them through the
+# batch functions of librgb2lab in fixed-size row chunks so that memory use
+# stays flat regardless of image size
+#
+# Inputs:  PPM (P6), PAM (P7, RGB or RGB_ALPHA), PFM (PF) or raw interleaved data
+# Outputs: raw interleaved Lab floats, PFM or, for Lab to RGB, PPM
+#
+# Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
+#
+# Use, modification and distribution are permitted subject to the
+# "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
+
+import argparse, glob, mmap, os, sys
+from array import array
+from multiprocessing import Pool
+from time import perf_counter
+from rgb2lab import *
+from rgb2lab_int import labFromRgb8Array
+
+try:
+    import numpy # optional: scales and quantises whole chunks at once instead of per sample
+except ImportError:
+    numpy = None
+
+littleEndian = sys.byteorder == "little"
+imageExtensions = (".ppm", ".pam", ".pfm", ".rgb", ".lab")
+
+class ConversionError(RuntimeError): pass # separate class for identification
+
+class ImageInput:
+
+    '''
+    Memory-mapped input image providing rows, top to bottom, as doubles in the
+    nominal range of the input color space with 3 values per pixel
+    '''
+
+    def __init__(self, path, args):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        self.topDown = True
+        magic = self.map[:2]
+        if magic == b"P6":
+            self.parsePnm(3)
+        elif magic == b"P7":
+            self.parsePam()
+        elif magic == b"PF":
+            self.parsePfm()
+        else: # raw
+            if args.size is None:
+                raise ConversionError("{}: unknown format; for raw data please give --size".format(path))
+            self.width, self.height = args.size
+            self.depth, self.dataOffset = 3, 0
+            if args.direction == "rgb2lab":
+                self.sampleType, self.maxval, self.bigEndian = "B", 255, False
+            else:
+                self.sampleType, self.maxval, self.bigEndian = args.lab_format, 1, False
+        self.rowBytes = self.width * self.depth * array(self.sampleType).itemsize
+        if len(self.map) < self.dataOffset + self.rowBytes * self.height:
+            raise ConversionError("{}: file is too short for a {}×{} image".format(path, self.width, self.height))
+        self.dtype = (">" if self.bigEndian else "<") + self.sampleType # for NumPy
+        if self.sampleType == "B":
+            self.scale = [v / self.maxval for v in range(256)]
+
+    def headerTokens(self, count):
+        '''Returns the first `count` whitespace-separated header tokens skipping comments and sets dataOffset'''
+        tokens, pos = [], 0
+        while len(tokens) < count:
+            if pos >= len(self.map):
+                raise ConversionError("truncated header")
+            while self.map[pos : pos + 1].isspace(): pos += 1
+            if self.map[pos : pos + 1] == b"#":
+                pos = self.map.find(b"\n", pos) + 1 or len(self.map)
+                continue
+            start = pos
+            while pos < len(self.map) and not self.map[pos : pos + 1].isspace(): pos += 1
+            tokens.append(self.map[start : pos].decode("ascii"))
+        self.dataOffset = pos + 1 # single whitespace character after last token
+        return tokens
+
+    def setSampleType(self, maxval):
+        if not 0 < maxval < 65536:
+            raise ConversionError("unsupported maxval {}".format(maxval))
+        self.maxval = maxval
+        self.sampleType, self.bigEndian = ("B", False) if maxval < 256 else ("H", True)
+
+    def parsePnm(self, depth):
+        _, width, height, maxval = self.headerTokens(4)
+        self.width, self.height, self.depth = int(width), int(height), depth
+        self.setSampleType(int(maxval))
+
+    def parsePam(self):
+        fields, pos = {}, 0
+        while True:
+            end = self.map.find(b"\n", pos)
+            if end == -1:
+                raise ConversionError("truncated header")
+            line = self.map[pos : end].decode("ascii").strip()
+            pos = end + 1
+            if line == "ENDHDR":
+                break
+            if line and not line.startswith("#"):
+                key, _, value = line.partition(" ")
+                fields[key] = value.strip()
+        self.dataOffset = pos
+        missing = [key for key in ("WIDTH", "HEIGHT", "DEPTH", "MAXVAL") if key not in fields]
+        if missing:
+            raise ConversionError("PAM header lacks {}".format(", ".join(missing)))
+        self.width, self.height, self.depth = int(fields["WIDTH"]), int(fields["HEIGHT"]), int(fields["DEPTH"])
+        if self.depth not in (3, 4) or fields.get("TUPLTYPE", "RGB") not in ("RGB", "RGB_ALPHA"):
+            raise ConversionError("only RGB and RGB_ALPHA PAM images are supported")
+        self.setSampleType(int(fields["MAXVAL"]))
+
+    def parsePfm(self):
+        kind, width, height, scale = self.headerTokens(4)
+        if kind != "PF":
+            raise ConversionError("only color PFM images are supported")
+        self.width, self.height, self.depth = int(width), int(height), 3
+        self.sampleType, self.maxval, self.bigEndian = "f", 1, float(scale) > 0
+        self.topDown = False # PFM rows are stored bottom to top
+
+    def rawRows(self, start, stop):
+        '''Returns rows [start, stop) as stored, top to bottom'''
+        if self.topDown:
+            return self.map[self.dataOffset + start * self.rowBytes : self.dataOffset + stop * self.rowBytes]
+        offsets = (self.dataOffset + (self.height - 1 - r) * self.rowBytes for r in range(start, stop))
+        return b"".join(self.map[o : o + self.rowBytes] for o in offsets)
+
+    def rows(self, start, stop):
+        '''Returns rows [start, stop) as a buffer of doubles'''
+        raw = self.rawRows(start, stop)
+        if numpy is not None:
+            samples = numpy.frombuffer(raw, self.dtype).reshape(-1, self.depth)[:, : 3] # dropping alpha
+            return numpy.divide(samples, self.maxval, dtype = numpy.float64).reshape(-1)
+        if self.sampleType == "B":
+            values = array("d", map(self.scale.__getitem__, raw))
+        else:
+            samples = array(self.sampleType, raw)
+            if self.bigEndian == littleEndian:
+                samples.byteswap()
+            values = array("d", samples) if self.maxval == 1 else array("d", map(float(self.maxval).__rtruediv__, samples))
+        if self.depth == 4: # drop alpha
+            rgb = array("d", bytes(8 * 3 * (len(values) // 4)))
+            for c in range(3):
+                rgb[c::3] = values[c::4]
+            values = rgb
+        return values
+
+    def close(self):
+        self.map.close()
+
+class ImageOutput:
+
+    '''Output image file preallocated to its full size and written chunk by chunk'''
+
+    def __init__(self, path, outputFormat, labFormat, width, height):
+        self.format, self.width, self.height = outputFormat, width, height
+        if outputFormat == "ppm":
+            header, self.sampleType = "P6\n{} {}\n255\n".format(width, height).encode("ascii"), "B"
+        elif outputFormat == "pfm":
+            header, self.sampleType = "PF\n{} {}\n{}\n".format(width, height, -1.0 if littleEndian else 1.0).encode("ascii"), "f"
+        else: # raw little endian
+            header, self.sampleType = b"", labFormat
+        self.rowBytes = width * 3 * array(self.sampleType).itemsize
+        self.file = open(path, "wb")
+        self.file.write(header)
+        self.dataOffset = len(header)
+        self.file.truncate(self.dataOffset + self.rowBytes * height)
+
+    def writeRows(self, start, values):
+        '''Writes rows from `start` onwards given as doubles in the nominal range of the output color space'''
+        if numpy is not None:
+            if self.sampleType == "B": # as to8Bit
+                data = numpy.clip(numpy.asarray(values, numpy.float64) * 255 + 0.5, 0, 255).astype(numpy.uint8).tobytes()
+            else: # PFM is written in native order, raw as little endian
+                data = numpy.asarray(values, self.sampleType if self.format == "pfm" else "<" + self.sampleType).tobytes()
+        elif self.sampleType == "B":
+            data = bytes(map(to8Bit, values))
+        else:
+            samples = array(self.sampleType, values)
+            if self.format == "raw" and not littleEndian: # PFM is written in native order
+                samples.byteswap()
+            data = samples.tobytes()
+        fd = self.file.fileno()
+        if self.format == "pfm": # rows are stored bottom to top
+            rows = len(data) // self.rowBytes
+            data = b"".join(data[(rows - 1 - i) * self.rowBytes : (rows - i) * self.rowBytes] for i in range(rows))
+            os.pwrite(fd, data, self.dataOffset + (self.height - start - rows) * self.rowBytes)
+        else:
+            os.pwrite(fd, data, self.dataOffset + start * self.rowBytes)
+
+    def close(self):
+        self.file.close()
+
+def to8Bit(v):
+    '''Rounds a [0, 1] value to 8 bits, clipping out-of-gamut values'''
+    v = int(v * 255 + 0.5)
+    return 0 if v < 0 else 255 if v > 255 else v
+
+def convertFile(inputPath, outputPath, args):
+    '''Converts one file and returns the number of pixels converted'''
+    image = ImageInput(inputPath, args)
+    try:
+        output = ImageOutput(outputPath, args.output_format, args.lab_format, image.width, image.height)
+        try:
+            convertFn = labFromRgbArray if args.direction == "rgb2lab" else rgbFromLabArray
+            chunkRows = max(1, args.chunk_pixels // image.width)
+            if args.precision == "int":
+                if image.sampleType != "B":
+                    raise ConversionError("integer precision needs 8-bit input")
+                layout = "RGB" if image.depth == 3 else "RGBA"
+                outBuffer = bytearray(3 * image.width * chunkRows)
+            else:
+                outBuffer = array("d", bytes(8 * 3 * image.width * chunkRows)) # reused for all chunks
+            for start in range(0, image.height, chunkRows):
+                stop = min(start + chunkRows, image.height)
+                if args.precision == "int": # int8 Lab straight from the 8-bit pixels
+                    out = memoryview(outBuffer)[ : 3 * image.width * (stop - start)]
+                    labFromRgb8Array(image.rawRows(start, stop), out, layout)
+                    out = out.cast("b")
+                else:
+                    values = image.rows(start, stop)
+                    out = memoryview(outBuffer)[ : len(values)]
+                    convertFn(values, out)
+                output.writeRows(start, out)
+        finally:
+            output.close()
+    finally:
+        image.close()
+    return image.width * image.height
+
+def convertFileJob(job):
+    inputPath, outputPath, args = job
+    startTime = perf_counter()
+    try:
+        pixels = convertFile(inputPath, outputPath, args)
+    except (OSError, ValueError, KeyError, ConversionError, Rgb2LabError) as e:
+        return inputPath, 0, perf_counter() - startTime, str(e)
+    return inputPath, pixels, perf_counter() - startTime, None
+
+def expandInputs(patterns):
+    paths = []
+    for p in patterns:
+        if os.path.isdir(p):
+            paths.extend(sorted(os.path.join(p, f) for f in os.listdir(p) if f.lower().endswith(imageExtensions)))
+        else:
+            matches = sorted(glob.glob(p))
+            paths.extend(matches if matches else [p])
+    return paths
+
+def parseSize(text):
+    w, _, h = text.partition("x")
+    return int(w), int(h)
+
+def main():
+    p = argparse.ArgumentParser(description = "Convert image files between sRGB and CIELAB (D65, 2° observer)")
+    p.add_argument("inputs", nargs = "+", help = "input files, directories or glob patterns")
+    p.add_argument("-o", "--output", required = True,
+                   help = "output file, or directory (existing or ending with a separator) when converting several files")
+    p.add_argument("-d", "--direction", choices = ("rgb2lab", "lab2rgb"), default = "rgb2lab")
+    p.add_argument("-f", "--output-format", choices = ("raw", "pfm", "ppm"),
+                   help = "default: raw for rgb2lab, ppm for lab2rgb")
+    p.add_argument("--lab-format", choices = ("f", "d"), default = "f", help = "raw Lab samples: f = float32, d = float64")
+    p.add_argument("--size", type = parseSize, help = "WxH of raw inputs")
+    p.add_argument("-p", "--precision", choices = ("float", "int"), default = "float",
+                   help = "int: Lab rounded to integers by labFromRgb8Array, fastest with a lookup table (see rgb2lab-lut.py); "
+                          "rgb2lab of 8-bit inputs only")
+    p.add_argument("--chunk-pixels", type = int, default = 65536, help = "pixels converted per library call")
+    p.add_argument("-j", "--jobs", type = int, default = os.cpu_count(), help = "worker processes for several files")
+    p.add_argument("-t", "--threads", type = int, default = 1, help = "library threads per worker; 0 = one per CPU")
+    args = p.parse_args()
+    if args.output_format is None:
+        args.output_format = "raw" if args.direction == "rgb2lab" else "ppm"
+    if args.output_format == "ppm" and args.direction == "rgb2lab":
+        p.error("PPM output is only possible for lab2rgb")
+    if args.output_format == "raw" and args.direction == "lab2rgb":
+        p.error("raw output is only possible for rgb2lab")
+    if args.precision == "int" and args.direction == "lab2rgb":
+        p.error("integer precision is only possible for rgb2lab")
+    setThreadCount(args.threads)
+
+    inputs = expandInputs(args.inputs)
+    extension = {"raw": ".lab", "pfm": ".pfm", "ppm": ".ppm"}[args.output_format]
+    if len(inputs) == 1 and not os.path.isdir(args.output) and not args.output.endswith(os.sep):
+        jobs = [(inputs[0], args.output, args)]
+    else:
+        os.makedirs(args.output, exist_ok = True)
+        jobs = [(i, os.path.join(args.output, os.path.splitext(os.path.basename(i))[0] + extension), args) for i in inputs]
+
+    startTime = perf_counter()
+    totalPixels = failures = 0
+    with Pool(min(args.jobs, len(jobs))) as pool:
+        for inputPath, pixels, seconds, error in pool.imap_unordered(convertFileJob, jobs):
+            if error:
+                failures += 1
+                print("{}: FAILED: {}".format(inputPath, error), file = sys.stderr)
+            else:
+                totalPixels += pixels
+                print("{}: {} pixels in {:.3f} seconds ({:.0f} pixels/s)".format(inputPath, pixels, seconds, pixels / seconds))
+    elapsed = perf_counter() - startTime
+    print("Converted {} pixels in {} files in {:.3f} seconds: {:.0f} pixels/s".format(
+        totalPixels, len(jobs) - failures, elapsed, totalPixels / elapsed))
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+#! /usr/bin/env python3
+
+# RGB2LAB 3D LUT export
+# =====================
+#
+# Sample the Lab (or LCH) → sRGB conversion into a 3D LUT, write it as a
+# .cube file for other tools and report its largest interpolation error:
+#
+#     rgb2lab-cube.py [--size 33] [--input lab|lch] [--no-clip] output.cube
+#
+# Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
+#
+# Use, modification and distribution are permitted subject to the
+# "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
+
+import argparse
+from time import perf_counter
+import rgb2lab_lut3d
+
+def main():
+    p = argparse.ArgumentParser(description = "Write a Lab/LCH → sRGB 3D LUT as a .cube file")
+    p.add_argument("output", help = "path of the .cube file")
+    p.add_argument("-s", "--size", type = int, default = 33, help = "samples per axis, 2 to 256 (default 33)")
+    p.add_argument("-i", "--input", choices = tuple(rgb2lab_lut3d.lut3DInputs), default = "lab")
+    p.add_argument("--title", help = "TITLE line of the file")
+    p.add_argument("--no-clip", dest = "clip", action = "store_false", help = "keep out-of-gamut RGB values outside [0, 1]")
+    p.add_argument("--error-samples", type = int, help = "inputs per axis for the error check (default 2 per LUT cell)")
+    args = p.parse_args()
+
+    try:
+        startTime = perf_counter()
+        lut = rgb2lab_lut3d.Lut3D(args.size, args.input)
+        lut.writeCube(args.output, args.title if args.title is not None else
+                      "sRGB from CIE {} {}^3".format(args.input.upper(), args.size), args.clip)
+        print("Wrote {}³ {} → sRGB LUT to {} in {:.3f} seconds".format(args.size, args.input.upper(), args.output, perf_counter() - startTime))
+    except (OSError, rgb2lab_lut3d.Rgb2LabError) as e:
+        p.exit(1, "Could not write the LUT: {}\n".format(e))
+
+    clipping = "clipped" if args.clip else "unclipped" # as written
+    for inGamutOnly, description in (True, "in-gamut inputs"), (False, "all inputs"):
+        error, worst, mean = lut.maxError(args.error_samples, inGamutOnly, args.clip)
+        print("Interpolation error of the {} LUT over {}: max {:.6f} ({:.2f} 8-bit steps) at {} {}, mean {:.6f}".format(
+            clipping, description, error, error * 255, args.input.upper(), tuple(round(v, 3) for v in worst), mean))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#! /usr/bin/env python3
+
+# RGB2LAB fast math error report
+# ==============================
+#
+# Compare the fast math mode of librgb2lab against the exact path over the
+# whole 8-bit RGB cube (labFromRgb) and the integer Lab grid (rgbFromLab)
+#
+# Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
+#
+# Use, modification and distribution are permitted subject to the
+# "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
+
+from rgb2lab import *
+from rgb2lab_int import labLchFromRgb8Array, unloadRgb8Table
+from array import array
+from math import dist, floor
+from time import perf_counter
+
+unloadRgb8Table() # compare computed results only
+
+def bothModes(fn):
+    '''Returns the results of `fn()` in exact and fast modes and the time taken by each'''
+    results = []
+    for mode in False, True:
+        setFastMath(mode)
+        startTime = perf_counter()
+        results.append(fn())
+        results.append(perf_counter() - startTime)
+    setFastMath(False)
+    return results
+
+def triplets(seq):
+    return zip(*[iter(seq)] * 3)
+
+def cRound(v):
+    return floor(v + 0.5) if v >= 0 else -floor(-v + 0.5) # like C round()
+
+def rgb255(v):
+    v = cRound(v * 255)
+    return v if 0 <= v <= 255 else -1 # like _roundAndFixRgb
+
+def zeroed(n):
+    return array("d", bytes(n * 8))
+
+# 8-bit RGB cube → Lab
+
+rgbPlane = array("d")
+for g in range(256):
+    for b in range(256):
+        rgbPlane.extend((0, g / 255, b / 255))
+rgb8Plane = bytearray(256 * 256 * 3)
+rgb8Plane[1::3] = bytes(g for g in range(256) for b in range(256))
+rgb8Plane[2::3] = bytes(range(256)) * 256
+
+maxDeltaE = 0; maxDeltaERgb = None; intMismatches = 0
+exactTime = fastTime = 0
+for r in range(256):
+    rgbPlane[0::3] = array("d", [r / 255]) * (256 * 256)
+    exact, t1, fast, t2 = bothModes(lambda: labFromRgbArray(rgbPlane, zeroed(len(rgbPlane))))
+    exactTime += t1; fastTime += t2
+    deltaE = max(map(dist, triplets(exact), triplets(fast)))
+    if deltaE > maxDeltaE:
+        i = list(map(dist, triplets(exact), triplets(fast))).index(deltaE)
+        maxDeltaE = deltaE; maxDeltaERgb = (r, i // 256, i % 256)
+    rgb8Plane[0::3] = bytes([r]) * (256 * 256)
+    exact, _, fast, _ = bothModes(lambda: labLchFromRgb8Array(rgb8Plane))
+    for e, f in zip(exact, fast):
+        if e.tobytes() != f.tobytes():
+            intMismatches += sum(x != y for x, y in zip(triplets(e.tolist()), triplets(f.tolist())))
+
+print("labFromRgb over {} 8-bit RGB inputs:".format(256 ** 3))
+print("    max ΔE76 = {:.3g} at RGB {}".format(maxDeltaE, maxDeltaERgb))
+print("    integer Lab/LCH disagreements = {}".format(intMismatches))
+print("    exact {:.3f} s, fast {:.3f} s".format(exactTime, fastTime))
+
+# integer Lab grid → RGB
+
+labPlane = array("d")
+for a in range(-128, 129):
+    for b in range(-128, 129):
+        labPlane.extend((0, a, b))
+
+maxDeltaRgb = 0; maxDeltaRgbLab = None; intMismatches = 0
+exactTime = fastTime = 0
+for l in range(101):
+    labPlane[0::3] = array("d", [l]) * (257 * 257)
+    exact, t1, fast, t2 = bothModes(lambda: rgbFromLabArray(labPlane, zeroed(len(labPlane))))
+    exactTime += t1; fastTime += t2
+    deltaRgb = max(map(abs, map(float.__sub__, exact, fast))) * 255
+    if deltaRgb > maxDeltaRgb:
+        i = list(map(abs, map(float.__sub__, exact, fast))).index(deltaRgb / 255) // 3
+        maxDeltaRgb = deltaRgb; maxDeltaRgbLab = (l, i // 257 - 128, i % 257 - 128)
+    intMismatches += sum(rgb255(e) != rgb255(f) for e, f in zip(exact, fast) if e != f)
+
+print("rgbFromLab over {} integer Lab inputs:".format(101 * 257 * 257))
+print("    max |ΔRGB| × 255 = {:.3g} at Lab {}".format(maxDeltaRgb, maxDeltaRgbLab))
+print("    integer RGB component disagreements = {}".format(intMismatches))
+print("    exact {:.3f} s, fast {:.3f} s".format(exactTime, fastTime))
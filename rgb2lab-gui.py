@@ -6,12 +6,15 @@
 # - convert color values from RGB to/from CIELAB color space
 #   for sRGB gamut, D65 illuminant, 2° observer
 # - Visualize the color space in cartesian and cylindrical representations
+# - F12 shows an overlay of redraw timings (and of the library's with
+#   `make lib STATS=1`); Shift+F12 exports them as a Chrome trace
 #
 # Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
 #
 # Use, modification and distribution are permitted subject to the
 # "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
 
+import os
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
@@ -19,6 +22,7 @@ from rgb2lab_int import *
 from colorDisplay import *
 from labMultiGraph1D import *
 from labMultiGraph2D import *
+from guiTrace import tracer, traced
 
 class InvalidInputError(RuntimeError):
     pass  # separate class for identification
@@ -122,8 +126,52 @@ class MainWindow(QWidget):
             self.hueOffsetSlider.valueChanged.connect(multiGraph.rotateHueImageTimer.start)
 
         self.lastImageSaveDir = QDir.homePath()
+
+        # profiling overlay: F12 toggles it and tracing, Shift+F12 exports the trace
+        w = self.traceOverlay = QLabel(self)
+        w.setStyleSheet("background: rgba(0, 0, 0, 180); color: white; font-family: monospace; padding: 4px")
+        w.setAttribute(Qt.WA_TransparentForMouseEvents)
+        w.hide()
+        t = self.traceOverlayTimer = QTimer()
+        t.setInterval(500)  # msecs
+        t.timeout.connect(self.updateTraceOverlay)
+        QShortcut(QKeySequence(Qt.Key_F12), self, self.toggleTraceOverlay)
+        QShortcut(QKeySequence(Qt.SHIFT + Qt.Key_F12), self, self.exportTrace)
+
         self.rgbHexInput.setText("45aa45")
 
+    def toggleTraceOverlay(self):
+        show = not self.traceOverlay.isVisible()
+        tracer.enabled = show or bool(os.environ.get("RGB2LAB_TRACE"))
+        self.traceOverlay.setVisible(show)
+        if show:
+            self.updateTraceOverlay()
+            self.traceOverlayTimer.start()
+        else:
+            self.traceOverlayTimer.stop()
+
+    def updateTraceOverlay(self):
+        lines = ["GUI spans:"] + (tracer.summary() or ["none yet"])
+        if statsCompiledIn():
+            lines.append("Library fills:")
+            for name, s in sorted(readStats().items()):
+                if s.nanosecondsPerCall is not None:
+                    ratio = "" if s.inGamutRatio is None else "; {:5.1f}% in gamut".format(100 * s.inGamutRatio)
+                    lines.append("{:24} {:6d} × {:8.2f} ms mean{}".format(name, s.calls, s.nanosecondsPerCall / 1e6, ratio))
+        w = self.traceOverlay
+        w.setText("\n".join(lines))
+        w.adjustSize()
+        w.raise_()
+
+    def exportTrace(self):
+        fname = QFileDialog.getSaveFileName(self, "RGB2LAB GUI: Export trace", self.lastImageSaveDir, "Chrome trace files (*.json)")[0]
+        if fname == "":
+            return
+        try:
+            tracer.writeChromeTrace(fname)
+        except OSError as e:
+            QMessageBox.critical(self, "RGB2LAB GUI: Error", "Could not write the trace: {}".format(e))
+
     def makeColorConnections(self):
         self.rgbHexInput.textChanged.connect(self.updateFromRgb)
         for i, box in enumerate(self.spinBoxes):
@@ -169,6 +217,7 @@ class MainWindow(QWidget):
                 self.changeLabelColor(start, "green")
         return x, y, z
 
+    @traced("updateLabchGraphs")
     def updateLabchGraphs(self, lab, lch):
         self.labchValues = dict(zip("LABLCH", lab + lch))  # doesn't matter that L will be overwritten once
         self.labMultiGraph1D.updateGraphs()
@@ -230,6 +279,8 @@ class MainWindow(QWidget):
     def updateColor(self):
         self.colorDisplay.setColor(QColor(Qt.transparent) if self.rgbHexInput.text() == "" else QColor.fromRgb(*self.readSpins("RGB")))
 
+setThreadCount(0)  # fill the graph tables using all CPUs
+
 app = QApplication([])
 app.setWindowIcon(QIcon("rgb2lab.png"))
 mainWindow = MainWindow()
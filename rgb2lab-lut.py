@@ -0,0 +1,50 @@
+#! /usr/bin/env python3
+
+# RGB2LAB lookup table tool
+# =========================
+#
+# Build or verify the precomputed tables which rgb2lab_int memory-maps and
+# uses automatically when present:
+#     rgb8:  integer Lab/LCH values for every 8-bit RGB input
+#     gamut: TinyRgb gamut volumes over the integer Lab and LCH grids
+#
+# Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
+#
+# Use, modification and distribution are permitted subject to the
+# "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
+
+import sys
+from time import perf_counter
+import rgb2lab_int
+
+tables = {
+    # name: description, default path, version, write function, check function
+    "rgb8" : ("RGB8 lookup table", rgb2lab_int.rgb8TablePath, rgb2lab_int.rgb8TableVersion,
+              rgb2lab_int.writeRgb8Table, rgb2lab_int.checkRgb8Table),
+    "gamut": ("gamut volumes", rgb2lab_int.gamutVolumesPath, rgb2lab_int.gamutVolumesVersion,
+              rgb2lab_int.writeGamutVolumes, rgb2lab_int.checkGamutVolumes),
+    }
+
+if len(sys.argv) not in (3, 4) or sys.argv[1] not in ("build", "check") or sys.argv[2] not in tables:
+    sys.exit("Usage: {} build|check rgb8|gamut [path]\nDefault paths: {}".format(
+        sys.argv[0], ", ".join("{} {}".format(name, t[1]) for name, t in tables.items())))
+
+command = sys.argv[1]
+description, path, version, writeFn, checkFn = tables[sys.argv[2]]
+path = sys.argv[3] if len(sys.argv) == 4 else path
+
+startTime = perf_counter()
+if command == "build":
+    writeFn(path)
+    print("Wrote version {} {} to {} in {:.3f} seconds".format(version, description, path, perf_counter() - startTime))
+else:
+    try:
+        mismatches = checkFn(path)
+    except (OSError, rgb2lab_int.Rgb2LabError) as e:
+        sys.exit("Could not check {}: {}".format(description, e))
+    print("Checked {} at {} in {:.3f} seconds".format(description, path, perf_counter() - startTime))
+    if mismatches:
+        for m in mismatches[:10]:
+            print("Mismatch at {}".format(m))
+        sys.exit("{} entries do not match the computed results".format(len(mismatches)))
+    print("All entries match the computed results")
@@ -0,0 +1,407 @@
+#! /usr/bin/env python3
+
+# RGB2LAB slice server
+# ====================
+#
+# Serve the gamut slice images drawn by the GUI graphs over HTTP without Qt,
+# and generate load against such a server:
+#
+#     rgb2lab-serve.py serve [--port 8642] [--cache-mb 64] [--workers N]
+#     rgb2lab-serve.py load [--url http://127.0.0.1:8642] [-c 32] [-n 5000]
+#
+# A slice is fetched as /slice/KIND.png or /slice/KIND.rgba with its fixed
+# values as query parameters named as in KIND, e.g. /slice/ABforL.png?L=50 or
+# /slice/CforHL.rgba?H=120&L=60&height=30. `hueOffset` rotates slices along H
+# as the GUI slider does and `height` sets the lines of 1D slices. Images are
+# opaque where in gamut and transparent elsewhere, with the first variable
+# along x and the second (of 2D slices) along y increasing upwards; .rgba is
+# raw 8-bit RGBA with the size in the X-Image-Width/Height headers.
+#
+# Encoded images are kept in an LRU within a byte budget and concurrent
+# requests for the same slice wait on one render. The ETag is derived from the
+# request so that revalidation is answered without rendering. / lists the
+# slice kinds and /stats gives the counters of the server as JSON.
+#
+# Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
+#
+# Use, modification and distribution are permitted subject to the
+# "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
+
+import argparse, asyncio, hashlib, json, random, struct, sys, zlib
+from collections import namedtuple, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from time import perf_counter
+from urllib.parse import parse_qsl, urlsplit
+
+# kind: (width, height) of its image; None for the height of 1D slices which is a parameter
+sliceSizes = {"LforAB": (101, None), "AforBL": (257, None), "BforAL": (257, None),
+              "LforHC": (101, None), "CforHL": (181, None), "HforCL": (360, None),
+              "ABforL": (257, 257), "BLforA": (257, 101), "ALforB": (257, 101),
+              "HCforL": (360, 181), "HLforC": (360, 101), "CLforH": (181, 101)}
+sliceFormats = {"png": "image/png", "rgba": "application/octet-stream"}
+# fixed value: range accepted by the fill functions (H = -1 being achromatic)
+fixedRanges = {"L": range(0, 101), "A": range(-128, 129), "B": range(-128, 129),
+               "C": range(0, 181), "H": range(-1, 360)}
+defaultHeight1D = 30 # as in the GUI
+maxHeight1D = 1024
+
+def fixedNames(kind): return tuple(kind[kind.index("for") + 3 : ])
+
+# Rendering
+# =========
+
+SliceKey = namedtuple("SliceKey", "kind fixed hueOffset height format")
+Slice = namedtuple("Slice", "body width height inGamutCount")
+
+def rgbaFromArgb32(bits):
+    '''Reorders native-endian 0xAARRGGBB pixels to R, G, B, A bytes'''
+    order = (2, 1, 0, 3) if sys.byteorder == "little" else (1, 2, 3, 0) # byte of R, G, B, A in a pixel
+    rgba = bytearray(len(bits))
+    for i, j in enumerate(order):
+        rgba[i::4] = bits[j::4]
+    return rgba
+
+def _pngChunk(tag, data):
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+def encodePng(rgba, width, height, level = 6):
+    '''Returns a PNG of 8-bit RGBA pixels, unfiltered as filtering in Python costs more than it saves'''
+    stride = 4 * width
+    raw = b"".join(b"\0" + rgba[y * stride : (y + 1) * stride] for y in range(height))
+    return b"".join((b"\x89PNG\r\n\x1a\n",
+                     _pngChunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)),
+                     _pngChunk(b"IDAT", zlib.compress(raw, level)),
+                     _pngChunk(b"IEND", b"")))
+
+def renderSlice(key, pngLevel = 6):
+    '''Draws the slice of `key` as the GUI does and returns it encoded as a Slice'''
+    import rgb2lab_int
+    width, height = sliceSizes[key.kind]
+    bits = bytearray(4 * width * (height or key.height))
+    fill = getattr(rgb2lab_int, "fillArgb32_" + key.kind)
+    xRotate = -key.hueOffset % 360 # display x of data x 0 as in HueOffsetInterface
+    if height is None:
+        height = key.height
+        inGamutCount = fill(bits, 4 * width, height, *key.fixed, xRotate = xRotate)
+    else:
+        inGamutCount = fill(bits, 4 * width, *key.fixed, xRotate = xRotate)
+    rgba = rgbaFromArgb32(bits)
+    body = encodePng(rgba, width, height, pngLevel) if key.format == "png" else bytes(rgba)
+    return Slice(body, width, height, inGamutCount)
+
+# Server
+# ======
+
+sliceVersion = 1 # NOTE: increment whenever rendering or encoding changes so that ETags change too
+
+def parseSliceRequest(path, query):
+    '''Returns the SliceKey of a /slice/KIND.FORMAT path and its query or raises ValueError'''
+    name, _, format = path[len("/slice/") : ].partition(".")
+    if name not in sliceSizes:
+        raise ValueError("Unknown slice kind {!r}; use one of {}.".format(name, ", ".join(sliceSizes)))
+    if format not in sliceFormats:
+        raise ValueError("Unknown format {!r}; use one of {}.".format(format, ", ".join(sliceFormats)))
+    params = dict(parse_qsl(query))
+    def intParam(param, default = None):
+        value = params.get(param, default)
+        if value is None:
+            raise ValueError("Missing parameter {} for slice {}.".format(param, name))
+        try:
+            return int(value)
+        except ValueError:
+            raise ValueError("Parameter {} should be an integer, not {!r}.".format(param, value)) from None
+    fixed = tuple(intParam(n) for n in fixedNames(name))
+    if not all(v in fixedRanges[n] for n, v in zip(fixedNames(name), fixed)): # before any ETag is derived
+        raise ValueError("Values {} are out of range for slice {}.".format(
+            ", ".join("{}={}".format(*nv) for nv in zip(fixedNames(name), fixed)), name))
+    hueOffset = intParam("hueOffset", 0) % 360 if name.startswith("H") else 0 # folded so that equal images share a key
+    height = 0
+    if sliceSizes[name][1] is None:
+        height = intParam("height", defaultHeight1D)
+        if not 1 <= height <= maxHeight1D:
+            raise ValueError("Parameter height should be in [1, {}], not {}.".format(maxHeight1D, height))
+    return SliceKey(name, fixed, hueOffset, height, format)
+
+class SliceServer:
+
+    '''
+    Serves slices rendered on a thread pool (the fill functions release the
+    GIL) from an LRU of encoded images within `cacheBudget` bytes
+    '''
+
+    counterNames = ("requests", "hits", "misses", "coalesced", "notModified", "renders", "badRequests", "evictions")
+
+    def __init__(self, cacheBudget, workers = None, maxAge = 86400, pngLevel = 6):
+        import rgb2lab_int
+        self.cacheBudget, self.maxAge, self.pngLevel = cacheBudget, maxAge, pngLevel
+        self.cache = OrderedDict() # SliceKey: Slice, least recently used first
+        self.cacheSize = 0
+        self.pending = {} # SliceKey: task rendering it
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix = "render")
+        self.counters = dict.fromkeys(self.counterNames, 0)
+        self.renderSeconds = 0.0
+        self.etagSeed = (sliceVersion, rgb2lab_int.gamutVolumesVersion, pngLevel)
+
+    def etag(self, key):
+        # depends only on the request and what may change its image, so needs no render
+        return '"{}"'.format(hashlib.blake2b(repr((self.etagSeed, tuple(key))).encode(), digest_size = 12).hexdigest())
+
+    async def getSlice(self, key):
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.cache.move_to_end(key)
+            self.counters["hits"] += 1
+            return entry
+        task = self.pending.get(key)
+        if task is None:
+            self.counters["misses"] += 1
+            task = self.pending[key] = asyncio.ensure_future(self._render(key))
+        else:
+            self.counters["coalesced"] += 1
+        return await asyncio.shield(task) # a client going away shouldn't cancel the render for the others
+
+    async def _render(self, key):
+        startTime = perf_counter()
+        try:
+            entry = await asyncio.get_running_loop().run_in_executor(self.executor, renderSlice, key, self.pngLevel)
+        finally:
+            del self.pending[key]
+        self.counters["renders"] += 1
+        self.renderSeconds += perf_counter() - startTime
+        if len(entry.body) <= self.cacheBudget:
+            self.cache[key] = entry
+            self.cacheSize += len(entry.body)
+            while self.cacheSize > self.cacheBudget:
+                _, evicted = self.cache.popitem(last = False)
+                self.cacheSize -= len(evicted.body)
+                self.counters["evictions"] += 1
+        return entry
+
+    def stats(self):
+        return dict(self.counters, cachedSlices = len(self.cache), cacheBytes = self.cacheSize, cacheBudget = self.cacheBudget,
+                    pendingRenders = len(self.pending), renderSeconds = round(self.renderSeconds, 6))
+
+    def index(self):
+        return {"slices": {kind: {"fixed": fixedNames(kind), "width": width, "height": height}
+                           for kind, (width, height) in sliceSizes.items()},
+                "formats": tuple(sliceFormats), "heightOf1D": defaultHeight1D}
+
+    @staticmethod
+    def _textResponse(status, text):
+        return status, [("Content-Type", "text/plain; charset=utf-8")], (text + "\n").encode()
+
+    @staticmethod
+    def _jsonResponse(obj):
+        return HTTPStatus.OK, [("Content-Type", "application/json"), ("Cache-Control", "no-cache")], json.dumps(obj).encode()
+
+    async def respond(self, method, target, headers):
+        '''Returns the status, headers and body for a request'''
+        self.counters["requests"] += 1
+        if method not in ("GET", "HEAD"):
+            status, respHeaders, body = self._textResponse(HTTPStatus.METHOD_NOT_ALLOWED, "Only GET and HEAD are supported.")
+            return status, respHeaders + [("Allow", "GET, HEAD")], body
+        url = urlsplit(target)
+        if url.path == "/":
+            return self._jsonResponse(self.index())
+        if url.path == "/stats":
+            return self._jsonResponse(self.stats())
+        if not url.path.startswith("/slice/"):
+            return self._textResponse(HTTPStatus.NOT_FOUND, "No such resource; see / for the slices served.")
+        try:
+            key = parseSliceRequest(url.path, url.query)
+        except ValueError as e:
+            self.counters["badRequests"] += 1
+            return self._textResponse(HTTPStatus.BAD_REQUEST, str(e))
+        etag = self.etag(key)
+        cacheHeaders = [("ETag", etag), ("Cache-Control", "public, max-age={}".format(self.maxAge))]
+        ifNoneMatch = headers.get("if-none-match")
+        if ifNoneMatch is not None and any(t.strip().lstrip("W/") in ("*", etag) for t in ifNoneMatch.split(",")):
+            self.counters["notModified"] += 1
+            return HTTPStatus.NOT_MODIFIED, cacheHeaders, b""
+        entry = await self.getSlice(key)
+        return HTTPStatus.OK, [("Content-Type", sliceFormats[key.format]), ("X-Image-Width", entry.width),
+                               ("X-Image-Height", entry.height), ("X-In-Gamut-Count", entry.inGamutCount)] + cacheHeaders, entry.body
+
+    async def handle(self, reader, writer):
+        '''Serves the HTTP/1.x requests of one connection, keeping it alive as asked'''
+        try:
+            while True:
+                requestLine = await reader.readline()
+                if not requestLine:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, version = requestLine.decode("latin-1").split()
+                except ValueError:
+                    status, respHeaders, body = self._textResponse(HTTPStatus.BAD_REQUEST, "Malformed request line.")
+                    method, keepAlive = "GET", False
+                else:
+                    connection = headers.get("connection", "").lower()
+                    keepAlive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+                    if "content-length" in headers or "transfer-encoding" in headers:
+                        keepAlive = False # request bodies aren't read
+                    status, respHeaders, body = await self.respond(method, target, headers)
+                lines = ["HTTP/1.1 {} {}".format(status.value, status.phrase)]
+                lines += ["{}: {}".format(name, value) for name, value in respHeaders]
+                if status != HTTPStatus.NOT_MODIFIED:
+                    lines.append("Content-Length: {}".format(len(body)))
+                lines.append("Connection: " + ("keep-alive" if keepAlive else "close"))
+                writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+                if method != "HEAD":
+                    writer.write(body)
+                await writer.drain()
+                if not keepAlive:
+                    break
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def run(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        print("Serving slices on {}".format(", ".join("http://{}:{}".format(*s.getsockname()[:2]) for s in server.sockets)), flush = True)
+        async with server:
+            await server.serve_forever()
+
+def serve(args):
+    import rgb2lab_common
+    if args.backend:
+        rgb2lab_common.setBackend(args.backend)
+    if args.threads is not None:
+        rgb2lab_common.setThreadCount(args.threads)
+    server = SliceServer(args.cache_mb * 1024 * 1024, args.workers, args.max_age, args.png_level)
+    try:
+        asyncio.run(server.run(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.executor.shutdown(cancel_futures = True)
+
+# Load generator
+# ==============
+
+def randomSlicePaths(count, format, seed = 2019):
+    '''Returns `count` distinct slice paths with random kinds and values'''
+    r = random.Random(seed)
+    paths = set()
+    while len(paths) < count:
+        kind = r.choice(tuple(sliceSizes))
+        params = ["{}={}".format(n, r.choice(fixedRanges[n])) for n in fixedNames(kind)]
+        if kind.startswith("H"):
+            params.append("hueOffset={}".format(r.randrange(0, 360, 30)))
+        paths.add("/slice/{}.{}?{}".format(kind, format, "&".join(params)))
+    return sorted(paths)
+
+async def _request(reader, writer, host, path, extraHeaders = ()):
+    '''Sends a keep-alive GET and returns the status, headers and body of its response'''
+    writer.write("GET {} HTTP/1.1\r\nHost: {}\r\n{}\r\n".format(path, host, "".join("{}: {}\r\n".format(*h) for h in extraHeaders)).encode("latin-1"))
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get("content-length", 0)))
+    return status, headers, body
+
+async def _loadWorker(host, port, paths, remaining, revalidate, r, results):
+    etags = {} # per connection, as a browser tab would have
+    connection = None
+    while remaining[0] > 0:
+        remaining[0] -= 1
+        path = r.choice(paths)
+        extraHeaders = (("If-None-Match", etags[path]), ) if path in etags and r.random() < revalidate else ()
+        startTime = perf_counter()
+        try:
+            if connection is None:
+                connection = await asyncio.open_connection(host, port)
+            status, headers, body = await _request(*connection, host, path, extraHeaders)
+        except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+            status, headers, body = None, {}, b""
+        results.append((perf_counter() - startTime, status, len(body)))
+        if "etag" in headers:
+            etags[path] = headers["etag"]
+        if status is None or headers.get("connection") == "close":
+            if connection is not None:
+                connection[1].close()
+            connection = None
+    if connection is not None:
+        connection[1].close()
+
+async def _generateLoad(args):
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    paths = randomSlicePaths(args.distinct, args.format)
+    remaining, results = [args.requests], []
+    startTime = perf_counter()
+    await asyncio.gather(*(_loadWorker(host, port, paths, remaining, args.revalidate, random.Random(i), results)
+                           for i in range(args.concurrency)))
+    elapsed = perf_counter() - startTime
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+        _, _, body = await _request(reader, writer, host, "/stats", (("Connection", "close"), ))
+        writer.close()
+        serverStats = json.loads(body)
+    except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+        serverStats = None
+    return results, elapsed, serverStats
+
+def load(args):
+    results, elapsed, serverStats = asyncio.run(_generateLoad(args))
+    latencies = sorted(t for t, _, _ in results)
+    def percentile(p): return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1e3
+    statuses = {}
+    for _, status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    failed = sum(n for status, n in statuses.items() if status not in (200, 304))
+    report = {"requests": len(results), "failed": failed, "seconds": elapsed,
+              "rps": len(results) / elapsed, "bytes": sum(size for _, _, size in results),
+              "p50_ms": percentile(50), "p90_ms": percentile(90), "p99_ms": percentile(99), "max_ms": latencies[-1] * 1e3,
+              "statuses": {str(status): n for status, n in sorted(statuses.items(), key = lambda item: str(item[0]))},
+              "concurrency": args.concurrency, "distinct": args.distinct, "format": args.format, "server": serverStats}
+    print("{requests} requests in {seconds:.3f} seconds: {rps:,.0f} requests/s, {failed} failed".format(**report))
+    print("latency p50 {p50_ms:.2f} ms   p90 {p90_ms:.2f} ms   p99 {p99_ms:.2f} ms   max {max_ms:.2f} ms".format(**report))
+    print("statuses: {}".format(", ".join("{} × {}".format(n, status) for status, n in report["statuses"].items())))
+    if serverStats is not None:
+        print("server: {}".format(", ".join("{} {}".format(name, value) for name, value in serverStats.items())))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent = 1)
+    if failed:
+        sys.exit(1)
+
+def main():
+    p = argparse.ArgumentParser(description = "Serve gamut slice images over HTTP or generate load against such a server")
+    sub = p.add_subparsers(dest = "command", required = True)
+    s = sub.add_parser("serve", help = "run the server")
+    s.add_argument("--host", default = "127.0.0.1")
+    s.add_argument("-p", "--port", type = int, default = 8642)
+    s.add_argument("--cache-mb", type = int, default = 64, help = "budget of the encoded image cache in MiB (default 64)")
+    s.add_argument("-w", "--workers", type = int, help = "render threads (default per CPU)")
+    s.add_argument("-t", "--threads", type = int, help = "library threads per render; 0 = one per CPU (default as set)")
+    s.add_argument("--max-age", type = int, default = 86400, help = "Cache-Control max-age of slices in seconds")
+    s.add_argument("--png-level", type = int, choices = range(10), default = 6, metavar = "0-9", help = "zlib level of PNGs (default 6)")
+    s.add_argument("-b", "--backend", choices = ("native", "numpy"), help = "backend of the fills (default as picked on first use)")
+    l = sub.add_parser("load", help = "generate load and report requests/s and latency percentiles")
+    l.add_argument("--url", default = "http://127.0.0.1:8642", help = "of the server")
+    l.add_argument("-c", "--concurrency", type = int, default = 32, help = "connections kept alive in parallel")
+    l.add_argument("-n", "--requests", type = int, default = 5000)
+    l.add_argument("-d", "--distinct", type = int, default = 200, help = "distinct slices requested at random")
+    l.add_argument("-f", "--format", choices = tuple(sliceFormats), default = "png")
+    l.add_argument("-r", "--revalidate", type = float, default = 0, help = "fraction of repeated requests sent with If-None-Match")
+    l.add_argument("-o", "--output", help = "write the JSON report to this file")
+    args = p.parse_args()
+    serve(args) if args.command == "serve" else load(args)
+
+if __name__ == "__main__":
+    main()
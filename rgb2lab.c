@@ -14,7 +14,13 @@
 // Bruce Justin Lindbloom's website http://www.brucelindbloom.com/
 
 #include "rgb2lab.h"
+#include "rgb2lab_threads.h"
+#include "rgb2lab_stats.h"
 #include <math.h>
+#include <stdbool.h>
+#include <stdint.h>
+#include <stdlib.h>
+#include <string.h>
 
 // NOTE: some curious problem with Python CTypes prevents more than 3 anonymous
 // structs so can't include members x, y, z as part of DoubleTriplet union
@@ -24,68 +30,156 @@
 
 static const double PI = 3.14159265358979323846; // acos(-1)
 
-// Convert RGB values of a color in the sRGB color space to CIE XYZ values
-// Nominal range of the components for both input and output values is [0, 1]
-static DoubleTriplet xyzFromRgb(DoubleTriplet rgb)
+// sRGB transfer functions: exact versions
+static double _linearFromGamma(double v) { return (v > 0.04045) ? pow(((v + 0.055) / 1.055), 2.4) : (v / 12.92); }
+static double _gammaFromLinear(double v) { return (v > 0.0031308) ? (1.055 * pow(v, (1 / 2.4)) - 0.055) : (v * 12.92); }
+
+// Fast math mode
+// ==============
+//
+// Opt-in replacement of the pow() calls in the transfer functions and the
+// Lab companding by cheaper equivalents:
+//     1) gamma → linear: exact table lookup for inputs which are multiples of
+//        1/255, else linear interpolation in a 4096-interval table
+//     2) linear → gamma: v^(1/2.4) computed as v^(1/4) × v^(1/6) using sqrt and cbrt
+//     3) cube root via cbrt and cube via multiplication
+// Over the whole 8-bit RGB cube and the integer Lab grid this gives (see rgb2lab-fastmath.py):
+//     max ΔE76 for labFromRgb: 3.1e-13
+//     max |ΔRGB| × 255 for rgbFromLab: 5.9e-12
+//     integer rounding disagreements: none
+// For other RGB inputs the interpolation adds at most 6.3e-8 to each linear component.
+
+static bool fastMathEnabled = false;
+
+enum { GAMMA_TABLE_INTERVALS = 4096 };
+static double linearFromGamma8[256], linearFromGammaTable[GAMMA_TABLE_INTERVALS + 1];
+
+static double _linearFromGammaFast(double v)
 {
-    for (int i = 0; i < 3; ++i)
+    if (v <= 0.04045 || v > 1) return _linearFromGamma(v); // outside the tables
+    int i = v * 255 + 0.5;
+    if (i / 255.0 == v) return linearFromGamma8[i]; // exactly as produced from 8-bit values
+    double s = v * GAMMA_TABLE_INTERVALS;
+    i = s;
+    if (i == GAMMA_TABLE_INTERVALS) return linearFromGammaTable[i];
+    return linearFromGammaTable[i] + (s - i) * (linearFromGammaTable[i + 1] - linearFromGammaTable[i]);
+}
+
+static double _gammaFromLinearFast(double v)
+{
+    if (v <= 0.0031308) return v * 12.92;
+    double s = sqrt(v);
+    return 1.055 * (sqrt(s) * cbrt(s)) - 0.055;
+}
+
+void setFastMath(int enabled)
+{
+    if (enabled) // tables must be ready before any thread sees the flag
+    {
+        for (int i = 0; i < 256; ++i) linearFromGamma8[i] = _linearFromGamma(i / 255.0);
+        for (int i = 0; i <= GAMMA_TABLE_INTERVALS; ++i)
+            linearFromGammaTable[i] = _linearFromGamma(i / (double) GAMMA_TABLE_INTERVALS);
+    }
+    fastMathEnabled = enabled;
+}
+
+int fastMath(void) { return fastMathEnabled; }
+
+// Color spaces
+// ============
+//
+// Everything that depends on the RGB space and the Lab reference white,
+// computed once by newColorSpace so that conversions only read it
+
+static const double ADOBE_RGB_GAMMA = 563 / 256.0; // ≈ 2.2 as in the Adobe RGB (1998) specification
+
+struct ColorSpace
+{
+    double toXyz[3][3], fromXyz[3][3]; // linear RGB ↔ XYZ, adapted to the Lab reference white
+    DoubleTriplet white; // XYZ of the Lab reference white
+    TransferCurve transfer;
+};
+
+// NOTE: coefficients only appropriate for sRGB primaries, D65 illuminant and 2° observer
+static const ColorSpace srgbD65 = {
+    {{0.4124564, 0.3575761, 0.1804375}, {0.2126729, 0.7151522, 0.0721750}, {0.0193339, 0.1191920, 0.9503041}},
+    {{3.2404542, -1.5371385, -0.4985314}, {-0.9692660, 1.8760108, 0.0415560}, {0.0556434, -0.2040259, 1.0572252}},
+    {{0.95047, 1.0, 1.08883}},
+    TRANSFER_SRGB
+};
+
+const ColorSpace * defaultColorSpace(void) { return &srgbD65; }
+
+// Pure power curve extended to negative values by symmetry
+static double _signedPow(double v, double p) { return v < 0 ? -pow(-v, p) : pow(v, p); }
+
+static double _linearFromEncoded(const ColorSpace * cs, double v)
+{
+    switch (cs->transfer)
+    {
+        case TRANSFER_SRGB: return fastMathEnabled ? _linearFromGammaFast(v) : _linearFromGamma(v);
+        case TRANSFER_ADOBE_RGB: return _signedPow(v, ADOBE_RGB_GAMMA);
+        case TRANSFER_LINEAR: break;
+    }
+    return v;
+}
+
+static double _encodedFromLinear(const ColorSpace * cs, double v)
+{
+    switch (cs->transfer)
     {
-        double v = rgb.data[i];
-        rgb.data[i] = (v > 0.04045) ? pow(((v + 0.055) / 1.055), 2.4) : (v / 12.92);
+        case TRANSFER_SRGB: return fastMathEnabled ? _gammaFromLinearFast(v) : _gammaFromLinear(v);
+        case TRANSFER_ADOBE_RGB: return _signedPow(v, 1 / ADOBE_RGB_GAMMA);
+        case TRANSFER_LINEAR: break;
     }
-    DoubleTriplet temp = {{
-        rgb.r * 0.4124564 + rgb.g * 0.3575761 + rgb.b * 0.1804375,
-        rgb.r * 0.2126729 + rgb.g * 0.7151522 + rgb.b * 0.0721750,
-        rgb.r * 0.0193339 + rgb.g * 0.1191920 + rgb.b * 0.9503041
-        }};
-        // NOTE: coefficients above only appropriate for D65 illuminant and sRGB color space
+    return v;
+}
+
+// Convert RGB values of a color in the RGB space of `cs` to CIE XYZ values
+// Nominal range of the components for both input and output values is [0, 1]
+static DoubleTriplet xyzFromRgb(const ColorSpace * cs, DoubleTriplet rgb)
+{
+    for (int i = 0; i < 3; ++i)
+        rgb.data[i] = _linearFromEncoded(cs, rgb.data[i]);
+    DoubleTriplet temp;
+    for (int i = 0; i < 3; ++i)
+        temp.data[i] = rgb.r * cs->toXyz[i][0] + rgb.g * cs->toXyz[i][1] + rgb.b * cs->toXyz[i][2];
     return temp;
 }
 
-// Convert CIE XYZ values of a color to RGB values in the sRGB color space
+// Convert CIE XYZ values of a color to RGB values in the RGB space of `cs`
 // Nominal range of the components for both input and output values is [0, 1]
-static DoubleTriplet rgbFromXyz(DoubleTriplet xyz)
-{
-    DoubleTriplet rgb = {{
-        X(xyz) *  3.2404542 + Y(xyz) * -1.5371385 + Z(xyz) * -0.4985314,
-        X(xyz) * -0.9692660 + Y(xyz) *  1.8760108 + Z(xyz) *  0.0415560,
-        X(xyz) *  0.0556434 + Y(xyz) * -0.2040259 + Z(xyz) *  1.0572252
-        }};
-        // NOTE: coefficients above only appropriate for D65 illuminant and sRGB color space
+static DoubleTriplet rgbFromXyz(const ColorSpace * cs, DoubleTriplet xyz)
+{
+    DoubleTriplet rgb;
     for (int i = 0; i < 3; ++i)
-    {
-        double v = rgb.data[i];
-        rgb.data[i] = (v > 0.0031308) ? (1.055 * pow(v, (1 / 2.4)) - 0.055) : (v * 12.92);
-    }
+        rgb.data[i] = _encodedFromLinear(cs, X(xyz) * cs->fromXyz[i][0] + Y(xyz) * cs->fromXyz[i][1] + Z(xyz) * cs->fromXyz[i][2]);
     return rgb;
 }
 
 static const double eps = (6 * 6 * 6) / (29.0 * 29.0 * 29.0), kap = (29 * 29 * 29) / (3.0 * 3.0 * 3.0);
 
-// NOTE: only appropriate for D65 illuminant and 2° observer
-static const DoubleTriplet xyzReferenceValues = {{0.95047, 1.0, 1.08883}};
-
-// Convert CIE XYZ values of a color to CIE Lab values assuming D65 illuminant and 2° observer
+// Convert CIE XYZ values of a color to CIE Lab values relative to the reference white of `cs`
 // The nominal ranges are as follows:
 //     1) Input: [0, 1] for each component
 //     2) Output: 0 to 100 for `L`; ±128 for `a` and `b`
-static DoubleTriplet labFromXyz(DoubleTriplet xyz)
+static DoubleTriplet labFromXyz(const ColorSpace * cs, DoubleTriplet xyz)
 {
     for (int i = 0; i < 3; ++i)
     {
-        xyz.data[i] /= xyzReferenceValues.data[i];
+        xyz.data[i] /= cs->white.data[i];
         double v = xyz.data[i];
-        xyz.data[i] = (v > eps) ? pow(v, (1 / 3.0)) : ((kap * v + 16) / 116.0);
+        xyz.data[i] = (v > eps) ? (fastMathEnabled ? cbrt(v) : pow(v, (1 / 3.0))) : ((kap * v + 16) / 116.0);
     }
     DoubleTriplet temp = {{(116 * Y(xyz)) - 16, 500 * (X(xyz) - Y(xyz)), 200 * (Y(xyz) - Z(xyz))}};
     return temp;
 }
 
-// Convert CIE Lab values of a color to CIE XYZ values assuming D65 illuminant and 2° observer
+// Convert CIE Lab values of a color relative to the reference white of `cs` to CIE XYZ values
 // The nominal ranges are as follows:
 //     1) Input: 0 to 100 for `L`; ±128 for `a` and `b`
 //     2) Output: [0, 1] for each component
-static DoubleTriplet xyzFromLab(DoubleTriplet lab)
+static DoubleTriplet xyzFromLab(const ColorSpace * cs, DoubleTriplet lab)
 {
     double y = (lab.L + 16) / 116.0,
            x = lab.A / 500.0 + y,
@@ -93,8 +187,8 @@ static DoubleTriplet xyzFromLab(DoubleTriplet lab)
     DoubleTriplet xyz = {{x, y, z}};
     for (int i = 0; i < 3; ++i)
     {
-        double v = xyz.data[i], v3 = pow(v, 3);
-        xyz.data[i] = ((v3 > eps) ? v3 : ((116 * v - 16) / kap)) * xyzReferenceValues.data[i];
+        double v = xyz.data[i], v3 = fastMathEnabled ? v * v * v : pow(v, 3);
+        xyz.data[i] = ((v3 > eps) ? v3 : ((116 * v - 16) / kap)) * cs->white.data[i];
     }
     return xyz;
 }
@@ -107,7 +201,7 @@ The nominal ranges are as follows:
     1) Input: [0, 1] for each component
     2) Output: 0 to 100 for `L`; ±128 for `a` and `b`
 */
-DoubleTriplet labFromRgb(DoubleTriplet rgb) { return labFromXyz(xyzFromRgb(rgb)); }
+DoubleTriplet labFromRgb(DoubleTriplet rgb) { STATS_COUNT(labFromRgb); return labFromXyz(&srgbD65, xyzFromRgb(&srgbD65, rgb)); }
 
 /**
 Convert CIE Lab values of a color to RGB values in the sRGB gamut
@@ -117,7 +211,7 @@ The nominal ranges are as follows:
     1) Input: 0 to 100 for `L`; ±128 for `a` and `b`
     2) Output: [0, 1] for each component
 */
-DoubleTriplet rgbFromLab(DoubleTriplet lab) { return rgbFromXyz(xyzFromLab(lab)); }
+DoubleTriplet rgbFromLab(DoubleTriplet lab) { STATS_COUNT(rgbFromLab); return rgbFromXyz(&srgbD65, xyzFromLab(&srgbD65, lab)); }
 
 /**
 Convert CIE Lab values of a color to CIE LCH(ab) values
@@ -129,6 +223,7 @@ Note: `L` is unchanged
 */
 DoubleTriplet lchFromLab(DoubleTriplet lab)
 {
+    STATS_COUNT(lchFromLab);
     DoubleTriplet temp = {{lab.L, 0, -1}};
     if (lab.A != 0 || lab.B != 0)
     {
@@ -149,6 +244,7 @@ Note: `L` is unchanged
 */
 DoubleTriplet labFromLch(DoubleTriplet lch)
 {
+    STATS_COUNT(labFromLch);
     DoubleTriplet temp = {{lch.l, 0, 0}};
     if (lch.h == -1)
     {
@@ -162,7 +258,248 @@ DoubleTriplet labFromLch(DoubleTriplet lch)
 }
 
 /// Convenience function; see lchFromLab and labFromRgb
-DoubleTriplet lchFromRgb(DoubleTriplet rgb) { return lchFromLab(labFromRgb(rgb)); }
+DoubleTriplet lchFromRgb(DoubleTriplet rgb) { STATS_COUNT(lchFromRgb); return lchFromLab(labFromRgb(rgb)); }
 
 /// Convenience function; see rgbFromLab and labFromLch
-DoubleTriplet rgbFromLch(DoubleTriplet lch) { return rgbFromLab(labFromLch(lch)); }
+DoubleTriplet rgbFromLch(DoubleTriplet lch) { STATS_COUNT(rgbFromLch); return rgbFromLab(labFromLch(lch)); }
+
+// Versions of the RGB conversions above in the color space `cs`; see rgb2lab.h
+DoubleTriplet labFromRgbCs(const ColorSpace * cs, DoubleTriplet rgb) { STATS_COUNT(labFromRgb); return labFromXyz(cs, xyzFromRgb(cs, rgb)); }
+DoubleTriplet rgbFromLabCs(const ColorSpace * cs, DoubleTriplet lab) { STATS_COUNT(rgbFromLab); return rgbFromXyz(cs, xyzFromLab(cs, lab)); }
+DoubleTriplet lchFromRgbCs(const ColorSpace * cs, DoubleTriplet rgb) { STATS_COUNT(lchFromRgb); return lchFromLab(labFromRgbCs(cs, rgb)); }
+DoubleTriplet rgbFromLchCs(const ColorSpace * cs, DoubleTriplet lch) { STATS_COUNT(rgbFromLch); return rgbFromLabCs(cs, labFromLch(lch)); }
+
+typedef struct { const DoubleTriplet * src; DoubleTriplet * dst; } ArrayJob;
+
+enum { ARRAY_MIN_CHUNK = 4096 }; // triplets; smaller batches aren't worth a thread
+
+#define DEFINE_ARRAY_FN(FN) \
+static long FN##Chunk(void * job_, size_t begin, size_t end) \
+{ \
+    const ArrayJob * job = job_; \
+    for (size_t i = begin; i < end; ++i) job->dst[i] = FN(job->src[i]); \
+    return 0; \
+} \
+void FN##Array(const DoubleTriplet * src, DoubleTriplet * dst, size_t n) \
+{ \
+    STATS_START(); \
+    ArrayJob job = {src, dst}; \
+    parallelFor(n, ARRAY_MIN_CHUNK, FN##Chunk, &job); \
+    STATS_STOP(STAT_##FN##Array, n, 0); \
+}
+
+DEFINE_ARRAY_FN(rgbFromLab)
+DEFINE_ARRAY_FN(labFromRgb)
+DEFINE_ARRAY_FN(lchFromLab)
+DEFINE_ARRAY_FN(labFromLch)
+DEFINE_ARRAY_FN(lchFromRgb)
+DEFINE_ARRAY_FN(rgbFromLch)
+
+typedef struct { const ColorSpace * cs; const DoubleTriplet * src; DoubleTriplet * dst; } ArrayCsJob;
+
+#define DEFINE_ARRAY_CS_FN(FN) \
+static long FN##CsChunk(void * job_, size_t begin, size_t end) \
+{ \
+    const ArrayCsJob * job = job_; \
+    for (size_t i = begin; i < end; ++i) job->dst[i] = FN##Cs(job->cs, job->src[i]); \
+    return 0; \
+} \
+void FN##ArrayCs(const ColorSpace * cs, const DoubleTriplet * src, DoubleTriplet * dst, size_t n) \
+{ \
+    STATS_START(); \
+    ArrayCsJob job = {cs, src, dst}; \
+    parallelFor(n, ARRAY_MIN_CHUNK, FN##CsChunk, &job); \
+    STATS_STOP(STAT_##FN##Array, n, 0); \
+}
+
+DEFINE_ARRAY_CS_FN(rgbFromLab)
+DEFINE_ARRAY_CS_FN(labFromRgb)
+DEFINE_ARRAY_CS_FN(lchFromRgb)
+DEFINE_ARRAY_CS_FN(rgbFromLch)
+
+// Creating color spaces
+// =====================
+
+static void _multiply(const double a[3][3], const double b[3][3], double out[3][3])
+{
+    double temp[3][3];
+    for (int i = 0; i < 3; ++i)
+        for (int j = 0; j < 3; ++j)
+            temp[i][j] = a[i][0] * b[0][j] + a[i][1] * b[1][j] + a[i][2] * b[2][j];
+    memcpy(out, temp, sizeof(temp));
+}
+
+static void _apply(const double m[3][3], const double v[3], double out[3])
+{
+    for (int i = 0; i < 3; ++i)
+        out[i] = m[i][0] * v[0] + m[i][1] * v[1] + m[i][2] * v[2];
+}
+
+static void _invert(const double m[3][3], double out[3][3])
+{
+    double det = m[0][0] * (m[1][1] * m[2][2] - m[1][2] * m[2][1]) -
+                 m[0][1] * (m[1][0] * m[2][2] - m[1][2] * m[2][0]) +
+                 m[0][2] * (m[1][0] * m[2][1] - m[1][1] * m[2][0]);
+    for (int i = 0; i < 3; ++i)
+        for (int j = 0; j < 3; ++j) // cofactor of the transposed position over the determinant
+        {
+            int r1 = (j + 1) % 3, r2 = (j + 2) % 3, c1 = (i + 1) % 3, c2 = (i + 2) % 3;
+            out[i][j] = (m[r1][c1] * m[r2][c2] - m[r1][c2] * m[r2][c1]) / det;
+        }
+}
+
+// Chromaticities (x, y) of the red, green and blue primaries, all with D65 white
+static const double primaryChromaticities[][3][2] = {
+    [PRIMARIES_SRGB]       = {{0.64, 0.33}, {0.30, 0.60}, {0.15, 0.06}},
+    [PRIMARIES_DISPLAY_P3] = {{0.680, 0.320}, {0.265, 0.690}, {0.150, 0.060}},
+    [PRIMARIES_ADOBE_RGB]  = {{0.64, 0.33}, {0.21, 0.71}, {0.15, 0.06}},
+};
+
+// NOTE: as Lindbloom's reference whites for the 2° observer
+static const DoubleTriplet whites[] = {
+    [WHITE_D65] = {{0.95047, 1.0, 1.08883}},
+    [WHITE_D50] = {{0.96422, 1.0, 0.82521}},
+};
+
+// Bradford cone response matrix for chromatic adaptation
+static const double bradford[3][3] = {{0.8951, 0.2664, -0.1614}, {-0.7502, 1.7135, 0.0367}, {0.0389, -0.0685, 1.0296}};
+
+// RGB → XYZ matrix scaling the primaries so that RGB (1, 1, 1) is the white
+static void _rgbToXyz(RgbPrimaries primaries, const DoubleTriplet * white, double out[3][3])
+{
+    double p[3][3], inverse[3][3], scale[3];
+    for (int j = 0; j < 3; ++j) // columns are the XYZ of the primaries with Y = 1
+    {
+        double x = primaryChromaticities[primaries][j][0], y = primaryChromaticities[primaries][j][1];
+        p[0][j] = x / y;
+        p[1][j] = 1;
+        p[2][j] = (1 - x - y) / y;
+    }
+    _invert(p, inverse);
+    _apply(inverse, white->data, scale);
+    for (int i = 0; i < 3; ++i)
+        for (int j = 0; j < 3; ++j)
+            out[i][j] = p[i][j] * scale[j];
+}
+
+// Bradford adaptation matrix of XYZ from white `from` to white `to`
+static void _bradfordAdaptation(const DoubleTriplet * from, const DoubleTriplet * to, double out[3][3])
+{
+    double coneFrom[3], coneTo[3], inverse[3][3], scaled[3][3];
+    _apply(bradford, from->data, coneFrom);
+    _apply(bradford, to->data, coneTo);
+    for (int i = 0; i < 3; ++i)
+        for (int j = 0; j < 3; ++j)
+            scaled[i][j] = bradford[i][j] * coneTo[i] / coneFrom[i];
+    _invert(bradford, inverse);
+    _multiply(inverse, scaled, out);
+}
+
+ColorSpace * newColorSpace(RgbPrimaries primaries, TransferCurve transfer, ReferenceWhite white)
+{
+    if (primaries < PRIMARIES_SRGB || primaries > PRIMARIES_ADOBE_RGB ||
+        transfer < TRANSFER_SRGB || transfer > TRANSFER_LINEAR || (white != WHITE_D65 && white != WHITE_D50))
+        return NULL;
+    ColorSpace * cs = malloc(sizeof(ColorSpace));
+    if (!cs) return NULL;
+    if (primaries == PRIMARIES_SRGB) // same coefficients as the default so that its results are the same
+        memcpy(cs->toXyz, srgbD65.toXyz, sizeof(cs->toXyz));
+    else
+        _rgbToXyz(primaries, &whites[WHITE_D65], cs->toXyz);
+    if (white != WHITE_D65)
+    {
+        double adaptation[3][3];
+        _bradfordAdaptation(&whites[WHITE_D65], &whites[white], adaptation);
+        _multiply(adaptation, cs->toXyz, cs->toXyz);
+    }
+    if (primaries == PRIMARIES_SRGB && white == WHITE_D65)
+        memcpy(cs->fromXyz, srgbD65.fromXyz, sizeof(cs->fromXyz));
+    else
+        _invert(cs->toXyz, cs->fromXyz);
+    cs->white = whites[white];
+    cs->transfer = transfer;
+    return cs;
+}
+
+void freeColorSpace(ColorSpace * cs) { free(cs); }
+
+void colorSpaceMatrices(const ColorSpace * cs, double toXyz[3][3], double fromXyz[3][3])
+{
+    memcpy(toXyz, cs->toXyz, sizeof(cs->toXyz));
+    memcpy(fromXyz, cs->fromXyz, sizeof(cs->fromXyz));
+}
+
+// NOTE: the conditions below are written so that NaN inputs are reported as invalid
+// and must stay in sync with the check* functions in rgb2lab_common.py
+
+static bool _validRgb01(DoubleTriplet rgb)
+{
+    for (int i = 0; i < 3; ++i)
+        if (!(0 <= rgb.data[i] && rgb.data[i] <= 1)) return false;
+    return true;
+}
+
+static bool _validLab(DoubleTriplet lab)
+{
+    return 0 <= lab.L && lab.L <= 100 && -128 <= lab.A && lab.A <= 128 && -128 <= lab.B && lab.B <= 128;
+}
+
+static bool _validLch(DoubleTriplet lch)
+{
+    return 0 <= lch.l && lch.l <= 100 &&
+           ((0 <= lch.c && lch.c <= 180 && 0 <= lch.h && lch.h < 360) || (lch.c == 0 && lch.h == -1));
+}
+
+#define DEFINE_FIND_INVALID_FN(KIND) \
+ptrdiff_t findInvalid##KIND(const DoubleTriplet * src, size_t n) \
+{ \
+    for (size_t i = 0; i < n; ++i) \
+        if (!_valid##KIND(src[i])) return i; \
+    return -1; \
+}
+
+DEFINE_FIND_INVALID_FN(Rgb01)
+DEFINE_FIND_INVALID_FN(Lab)
+DEFINE_FIND_INVALID_FN(Lch)
+
+// Running extrema
+// ================
+
+void resetTripletExtrema(TripletExtrema * e)
+{
+    for (int i = 0; i < 3; ++i)
+    {
+        e->min[i] = INFINITY; e->max[i] = -INFINITY;
+        e->minIndex[i] = e->maxIndex[i] = SIZE_MAX;
+    }
+}
+
+void updateTripletExtrema(TripletExtrema * e, const DoubleTriplet * src, size_t n, size_t indexOffset)
+{
+    for (size_t i = 0; i < n; ++i)
+        for (int j = 0; j < 3; ++j)
+        {
+            double v = src[i].data[j];
+            if (v < e->min[j]) { e->min[j] = v; e->minIndex[j] = indexOffset + i; }
+            if (v > e->max[j]) { e->max[j] = v; e->maxIndex[j] = indexOffset + i; }
+        }
+}
+
+void resetMaxChroma(MaxChroma * m)
+{
+    for (int h = 0; h < 360; ++h) { m->forH[h] = -INFINITY; m->indexForH[h] = SIZE_MAX; }
+    for (int l = 0; l <= 100; ++l) { m->forL[l] = -INFINITY; m->indexForL[l] = SIZE_MAX; }
+}
+
+void updateMaxChroma(MaxChroma * m, const DoubleTriplet * lch, size_t n, size_t indexOffset)
+{
+    for (size_t i = 0; i < n; ++i)
+    {
+        double c = lch[i].c;
+        int l = (int)lround(lch[i].l);
+        if (0 <= l && l <= 100 && c > m->forL[l]) { m->forL[l] = c; m->indexForL[l] = indexOffset + i; }
+        if (lch[i].h < 0) continue; // achromatic
+        int h = (int)lround(lch[i].h) % 360;
+        if (c > m->forH[h]) { m->forH[h] = c; m->indexForH[h] = indexOffset + i; }
+    }
+}
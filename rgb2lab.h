@@ -9,6 +9,8 @@
 // Use, modification and distribution are permitted subject to the
 // "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
 
+#include <stddef.h>
+
 typedef union
 {
     double data[3];
@@ -17,9 +19,88 @@ typedef union
     struct { double l, c, h; };
 } DoubleTriplet;
 
+typedef struct ColorSpace ColorSpace;
+
 DoubleTriplet rgbFromLab(DoubleTriplet lab);
 DoubleTriplet labFromRgb(DoubleTriplet rgb);
 DoubleTriplet lchFromLab(DoubleTriplet lab);
 DoubleTriplet labFromLch(DoubleTriplet lch);
 DoubleTriplet lchFromRgb(DoubleTriplet rgb);
 DoubleTriplet rgbFromLch(DoubleTriplet lch);
+
+// Batch versions of the above: convert `n` contiguous triplets from `src` into `dst`
+// `src` and `dst` may be the same array for in-place conversion
+void rgbFromLabArray(const DoubleTriplet * src, DoubleTriplet * dst, size_t n);
+void labFromRgbArray(const DoubleTriplet * src, DoubleTriplet * dst, size_t n);
+void lchFromLabArray(const DoubleTriplet * src, DoubleTriplet * dst, size_t n);
+void labFromLchArray(const DoubleTriplet * src, DoubleTriplet * dst, size_t n);
+void lchFromRgbArray(const DoubleTriplet * src, DoubleTriplet * dst, size_t n);
+void rgbFromLchArray(const DoubleTriplet * src, DoubleTriplet * dst, size_t n);
+
+// Color spaces
+// ============
+//
+// The functions above use sRGB with D65 Lab. A ColorSpace made once by
+// newColorSpace holds the matrices and curves of another RGB space and Lab
+// reference white for the *Cs versions of the conversions involving RGB
+// (also in rgb2lab_int.h) so that switching between spaces costs nothing.
+// Lab relative to D50 is computed from XYZ adapted by the Bradford method.
+// Display P3 uses the sRGB transfer curve; Adobe RGB (1998) a pure power of
+// 563/256. Pure power curves are extended to negative values by symmetry.
+// Returns NULL for unknown values or if allocation fails.
+
+typedef enum { PRIMARIES_SRGB, PRIMARIES_DISPLAY_P3, PRIMARIES_ADOBE_RGB } RgbPrimaries;
+typedef enum { TRANSFER_SRGB, TRANSFER_ADOBE_RGB, TRANSFER_LINEAR } TransferCurve;
+typedef enum { WHITE_D65, WHITE_D50 } ReferenceWhite;
+
+ColorSpace * newColorSpace(RgbPrimaries primaries, TransferCurve transfer, ReferenceWhite white);
+void freeColorSpace(ColorSpace * cs);
+
+// The space used by the functions without Cs; not to be freed
+const ColorSpace * defaultColorSpace(void);
+
+// Linear RGB → XYZ (adapted to the reference white) and the inverse
+void colorSpaceMatrices(const ColorSpace * cs, double toXyz[3][3], double fromXyz[3][3]);
+
+DoubleTriplet rgbFromLabCs(const ColorSpace * cs, DoubleTriplet lab);
+DoubleTriplet labFromRgbCs(const ColorSpace * cs, DoubleTriplet rgb);
+DoubleTriplet lchFromRgbCs(const ColorSpace * cs, DoubleTriplet rgb);
+DoubleTriplet rgbFromLchCs(const ColorSpace * cs, DoubleTriplet lch);
+
+void rgbFromLabArrayCs(const ColorSpace * cs, const DoubleTriplet * src, DoubleTriplet * dst, size_t n);
+void labFromRgbArrayCs(const ColorSpace * cs, const DoubleTriplet * src, DoubleTriplet * dst, size_t n);
+void lchFromRgbArrayCs(const ColorSpace * cs, const DoubleTriplet * src, DoubleTriplet * dst, size_t n);
+void rgbFromLchArrayCs(const ColorSpace * cs, const DoubleTriplet * src, DoubleTriplet * dst, size_t n);
+
+// Validate `n` contiguous triplets against the nominal input ranges
+// Return the index of the first invalid triplet or -1 if all are valid
+ptrdiff_t findInvalidRgb01(const DoubleTriplet * src, size_t n);
+ptrdiff_t findInvalidLab(const DoubleTriplet * src, size_t n);
+ptrdiff_t findInvalidLch(const DoubleTriplet * src, size_t n);
+
+// Switch between the exact (default) and fast transfer functions for all conversions
+// including those in rgb2lab_int.h; see rgb2lab.c for the error bounds of fast math
+void setFastMath(int enabled);
+int fastMath(void);
+
+// Running extrema of each component over batches of triplets
+// Indices are those of the triplets in the whole data set, i.e. offset by the
+// `indexOffset` given for each batch; ties keep the earliest index
+typedef struct
+{
+    double min[3], max[3];
+    size_t minIndex[3], maxIndex[3];
+} TripletExtrema;
+
+// Maximum chroma over batches of LCH triplets per hue and per lightness
+// rounded to integers; index is SIZE_MAX for a hue or lightness not seen yet
+typedef struct
+{
+    double forH[360], forL[101];
+    size_t indexForH[360], indexForL[101];
+} MaxChroma;
+
+void resetTripletExtrema(TripletExtrema * e);
+void updateTripletExtrema(TripletExtrema * e, const DoubleTriplet * src, size_t n, size_t indexOffset);
+void resetMaxChroma(MaxChroma * m);
+void updateMaxChroma(MaxChroma * m, const DoubleTriplet * lch, size_t n, size_t indexOffset);
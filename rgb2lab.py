@@ -11,15 +11,101 @@
 
 import rgb2lab_common
 from rgb2lab_common import *
-from ctypes import CDLL, c_double
+from ctypes import c_double, c_size_t, Structure, POINTER
 
 _makeRetOneFn, _ = rgb2lab_common._makeConversionFns(c_double) # discarding second return item
+_makeArrayFn = rgb2lab_common._makeArrayConversionFn(c_double)
 
-_lib = CDLL("librgb2lab.so")
+_lib = rgb2lab_common._lib
 
-labFromRgb = _makeRetOneFn(checkRgb01, _lib.labFromRgb)
-rgbFromLab = _makeRetOneFn(checkLab  , _lib.rgbFromLab)
-lchFromRgb = _makeRetOneFn(checkRgb01, _lib.lchFromRgb)
-rgbFromLch = _makeRetOneFn(checkLch  , _lib.rgbFromLch)
-lchFromLab = _makeRetOneFn(checkLab  , _lib.lchFromLab)
-labFromLch = _makeRetOneFn(checkLch  , _lib.labFromLch)
+try:
+    import _rgb2lab # optional native extension avoiding CTypes marshalling; see rgb2lab_ext.c
+except ImportError:
+    _rgb2lab = None
+
+def _nativeFns():
+    fns = {
+        "labFromRgb": _makeRetOneFn(checkRgb01, _lib.labFromRgb),
+        "rgbFromLab": _makeRetOneFn(checkLab  , _lib.rgbFromLab),
+        "lchFromRgb": _makeRetOneFn(checkRgb01, _lib.lchFromRgb),
+        "rgbFromLch": _makeRetOneFn(checkLch  , _lib.rgbFromLch),
+        "lchFromLab": _makeRetOneFn(checkLab  , _lib.lchFromLab),
+        "labFromLch": _makeRetOneFn(checkLch  , _lib.labFromLch),
+
+        "labFromRgbArray": _makeArrayFn(checkRgb01, _lib.findInvalidRgb01, _lib.labFromRgbArray),
+        "rgbFromLabArray": _makeArrayFn(checkLab  , _lib.findInvalidLab  , _lib.rgbFromLabArray),
+        "lchFromRgbArray": _makeArrayFn(checkRgb01, _lib.findInvalidRgb01, _lib.lchFromRgbArray),
+        "rgbFromLchArray": _makeArrayFn(checkLch  , _lib.findInvalidLch  , _lib.rgbFromLchArray),
+        "lchFromLabArray": _makeArrayFn(checkLab  , _lib.findInvalidLab  , _lib.lchFromLabArray),
+        "labFromLchArray": _makeArrayFn(checkLch  , _lib.findInvalidLch  , _lib.labFromLchArray),
+        }
+    if _rgb2lab is not None:
+        fns.update((name, getattr(_rgb2lab, name)) for name in ("labFromRgb", "rgbFromLab", "lchFromRgb", "rgbFromLch", "lchFromLab", "labFromLch"))
+    return fns
+
+# Conversions by the backend in use; see rgb2lab_common
+_dispatcher = rgb2lab_common._Dispatcher(globals(), _nativeFns)
+
+labFromRgb = _dispatcher.stub("labFromRgb")
+rgbFromLab = _dispatcher.stub("rgbFromLab")
+lchFromRgb = _dispatcher.stub("lchFromRgb")
+rgbFromLch = _dispatcher.stub("rgbFromLch")
+lchFromLab = _dispatcher.stub("lchFromLab")
+labFromLch = _dispatcher.stub("labFromLch")
+
+# Batch versions: take a contiguous buffer of N×3 doubles and convert it in one
+# call, writing into `out` (allocated if not given) which is returned
+
+labFromRgbArray = _dispatcher.stub("labFromRgbArray")
+rgbFromLabArray = _dispatcher.stub("rgbFromLabArray")
+lchFromRgbArray = _dispatcher.stub("lchFromRgbArray")
+rgbFromLchArray = _dispatcher.stub("rgbFromLchArray")
+lchFromLabArray = _dispatcher.stub("lchFromLabArray")
+labFromLchArray = _dispatcher.stub("labFromLchArray")
+
+# Versions of the RGB conversions above in the ColorSpace `space` given first
+
+labFromRgbCs = _makeRetOneFn(checkRgb01, _lib.labFromRgbCs, withColorSpace = True)
+rgbFromLabCs = _makeRetOneFn(checkLab  , _lib.rgbFromLabCs, withColorSpace = True)
+lchFromRgbCs = _makeRetOneFn(checkRgb01, _lib.lchFromRgbCs, withColorSpace = True)
+rgbFromLchCs = _makeRetOneFn(checkLch  , _lib.rgbFromLchCs, withColorSpace = True)
+
+labFromRgbArrayCs = _makeArrayFn(checkRgb01, _lib.findInvalidRgb01, _lib.labFromRgbArrayCs, withColorSpace = True)
+rgbFromLabArrayCs = _makeArrayFn(checkLab  , _lib.findInvalidLab  , _lib.rgbFromLabArrayCs, withColorSpace = True)
+lchFromRgbArrayCs = _makeArrayFn(checkRgb01, _lib.findInvalidRgb01, _lib.lchFromRgbArrayCs, withColorSpace = True)
+rgbFromLchArrayCs = _makeArrayFn(checkLch  , _lib.findInvalidLch  , _lib.rgbFromLchArrayCs, withColorSpace = True)
+
+# Running extrema over batches of triplets such as the outputs of the batch
+# functions above. `update*` take a buffer of N×3 doubles and `indexOffset`,
+# the index of its first triplet in the whole data set, and keep the earliest
+# index for equal values. Instances may be placed in shared memory with
+# `from_buffer` to collect results from several processes; as that doesn't
+# call `__init__`, call `reset` on them.
+
+class TripletExtrema(Structure):
+    _fields_ = (("min", c_double * 3), ("max", c_double * 3),
+                ("minIndex", c_size_t * 3), ("maxIndex", c_size_t * 3))
+    def __init__(self): self.reset()
+    def reset(self): _lib.resetTripletExtrema(self)
+
+class MaxChroma(Structure):
+    _fields_ = (("forH", c_double * 360), ("forL", c_double * 101),
+                ("indexForH", c_size_t * 360), ("indexForL", c_size_t * 101))
+    def __init__(self): self.reset()
+    def reset(self): _lib.resetMaxChroma(self)
+
+_lib.resetTripletExtrema.argtypes = [POINTER(TripletExtrema)]
+_lib.updateTripletExtrema.argtypes = [POINTER(TripletExtrema), POINTER(c_double), c_size_t, c_size_t]
+_lib.resetMaxChroma.argtypes = [POINTER(MaxChroma)]
+_lib.updateMaxChroma.argtypes = [POINTER(MaxChroma), POINTER(c_double), c_size_t, c_size_t]
+for _f in _lib.resetTripletExtrema, _lib.updateTripletExtrema, _lib.resetMaxChroma, _lib.updateMaxChroma:
+    _f.restype = None
+
+def updateTripletExtrema(extrema, src, indexOffset = 0):
+    srcPtr, n = rgb2lab_common._asBuffer(src, c_double, 3)
+    _lib.updateTripletExtrema(extrema, srcPtr, n, indexOffset)
+
+def updateMaxChroma(maxChroma, lch, indexOffset = 0):
+    '''`lch` gives LCH triplets; chroma is binned by hue and lightness rounded to integers'''
+    lchPtr, n = rgb2lab_common._asBuffer(lch, c_double, 3)
+    _lib.updateMaxChroma(maxChroma, lchPtr, n, indexOffset)
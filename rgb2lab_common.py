@@ -10,9 +10,270 @@
 # "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
 
 from ctypes import *
+from collections import namedtuple
+import os, sys
 
 class Rgb2LabError(RuntimeError): pass # separate class for identification
 
+class _MissingLib:
+
+    '''
+    Stands in for the library when it can't be loaded so that the modules still
+    import, with the NumPy backend below; calling any function raises
+    '''
+
+    def __init__(self, error):
+        self._error = error
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        def fn(*args):
+            raise Rgb2LabError("{} needs librgb2lab.so which could not be loaded: {}".format(name, self._error))
+        fn.__name__ = name
+        setattr(self, name, fn) # so that argtypes and restype set on it stay
+        return fn
+
+def _loadLib():
+    '''
+    Loads librgb2lab.so from the library path or else from beside this file (as
+    built by `make lib` without installing); returns a _MissingLib if neither
+    '''
+    for path in "librgb2lab.so", os.path.join(os.path.dirname(os.path.abspath(__file__)), "librgb2lab.so"):
+        try:
+            return CDLL(path)
+        except OSError as e:
+            error = e
+    return _MissingLib(error)
+
+_lib = _loadLib()
+
+def nativeAvailable():
+    '''Whether librgb2lab.so could be loaded'''
+    return not isinstance(_lib, _MissingLib)
+
+# Backends
+# ========
+#
+# The conversions of rgb2lab and rgb2lab_int and the tables of rgb2lab_int are
+# computed by one of:
+#     1) "native": librgb2lab.so (and the _rgb2lab extension if built)
+#     2) "numpy": rgb2lab_numpy, vectorized NumPy needing no compiler
+# picked on the first call of any of them rather than at import, so that
+# importing doesn't load NumPy: the one named by setBackend() or else
+# $RGB2LAB_BACKEND if set, or else native if the library could be loaded.
+# The other functions (fast math, threads, stats, color spaces, gamut
+# mapping, Delta E, planar, 3D LUTs) need the library.
+
+backends = ("native", "numpy")
+
+_backendChoice = os.environ.get("RGB2LAB_BACKEND") or None
+_backendInUse = None
+_dispatchers = []
+
+def backend():
+    '''Returns the name of the backend in use, picking it first if not yet done'''
+    global _backendInUse
+    if _backendInUse is None:
+        name = _backendChoice or ("native" if nativeAvailable() else "numpy")
+        if name not in backends:
+            raise Rgb2LabError("Unknown backend {!r}; use one of {}.".format(name, ", ".join(backends)))
+        if name == "native" and not nativeAvailable():
+            raise Rgb2LabError("Native backend needs librgb2lab.so which could not be loaded: {}".format(_lib._error))
+        _backendInUse = name
+    return _backendInUse
+
+def setBackend(name = None):
+    '''Uses the backend of the given name from the next call on, or picks one as by default if None'''
+    global _backendChoice, _backendInUse
+    if name is not None and name not in backends:
+        raise Rgb2LabError("Unknown backend {!r}; use one of {}.".format(name, ", ".join(backends)))
+    _backendChoice, _backendInUse = name, None
+    for d in _dispatchers:
+        d._reset()
+
+def _loadNumpyBackend():
+    try:
+        import rgb2lab_numpy
+    except ImportError as e:
+        raise Rgb2LabError("NumPy backend needs NumPy: {}".format(e)) from None
+    return vars(rgb2lab_numpy)
+
+class _Dispatcher:
+
+    '''
+    Makes stand-ins for functions of a module which call the implementation of
+    the backend in use. `namespace` is the globals() of the module and
+    `loadNative` returns a dict of name: native implementation; NumPy ones are
+    the same-named functions of rgb2lab_numpy. Each backend is loaded on first
+    use, whereupon module functions still bound to their stand-ins are rebound
+    to the implementations so that calling through the module costs nothing.
+    '''
+
+    def __init__(self, namespace, loadNative):
+        self._namespace = namespace
+        self._loaders = {"native": loadNative, "numpy": _loadNumpyBackend}
+        self._loaded = {} # backend name: implementations
+        self._current = None
+        self._stubs = {}
+        _dispatchers.append(self)
+
+    def stub(self, name):
+        def fn(*args, **kwargs):
+            return (self._current or self._resolve())[name](*args, **kwargs)
+        fn.__name__ = name
+        self._stubs[name] = fn
+        return fn
+
+    def _resolve(self):
+        name = backend()
+        if name not in self._loaded:
+            self._loaded[name] = self._loaders[name]()
+        impls = self._current = self._loaded[name]
+        for fnName, stub in self._stubs.items():
+            if self._namespace.get(fnName) is stub: # not wrapped by the module
+                self._namespace[fnName] = impls[fnName]
+        return impls
+
+    def _reset(self):
+        self._current = None
+        for fnName, stub in self._stubs.items():
+            if any(self._namespace.get(fnName) is impls[fnName] for impls in self._loaded.values()):
+                self._namespace[fnName] = stub
+
+_lib.setFastMath.argtypes = [c_int]
+_lib.setFastMath.restype = None
+_lib.fastMath.restype = c_int
+
+def setFastMath(enabled):
+    '''
+    Switches all conversions, float and integer, between the exact (default) and
+    fast transfer functions; see rgb2lab.c for the error bounds of fast math
+    '''
+    _lib.setFastMath(bool(enabled))
+
+def fastMath():
+    return bool(_lib.fastMath())
+
+_lib.setThreadCount.argtypes = [c_int]
+_lib.setThreadCount.restype = None
+_lib.threadCount.restype = c_int
+
+def setThreadCount(count):
+    '''
+    Sets the number of threads used by the batch and makeTable_* functions;
+    0 means one per CPU. Results don't depend on it. Default is 1.
+    '''
+    _lib.setThreadCount(count)
+
+def threadCount():
+    return _lib.threadCount()
+
+# Instrumentation counters; see rgb2lab_stats.h
+
+class _StatRecord(Structure):
+    _fields_ = tuple((f, c_uint64) for f in ("calls", "items", "inGamut", "nanoseconds"))
+
+_lib.statsCompiledIn.restype = c_int
+_lib.statCount.restype = c_int
+_lib.statName.argtypes = [c_int]
+_lib.statName.restype = c_char_p
+_lib.readStats.argtypes = [POINTER(_StatRecord)]
+_lib.readStats.restype = None
+_lib.resetStats.restype = None
+
+_statNames = tuple(_lib.statName(i).decode("ascii") for i in range(_lib.statCount())) if nativeAvailable() else ()
+
+class EntryPointStats(namedtuple("EntryPointStats", "calls items inGamut nanoseconds")):
+
+    __slots__ = ()
+
+    @property
+    def inGamutRatio(self): # of fill functions only
+        return self.inGamut / self.items if self.items and self.inGamut is not None else None
+
+    @property
+    def nanosecondsPerCall(self): # of timed entry points only
+        return self.nanoseconds / self.calls if self.nanoseconds else None
+
+def statsCompiledIn():
+    '''Whether the library was built with its counters (`make lib STATS=1`)'''
+    return bool(_lib.statsCompiledIn())
+
+def readStats(nonzero = True):
+    '''
+    Returns a dict of entry point name: EntryPointStats counted since loading
+    or the last resetStats(), by default only of entry points called since
+    '''
+    records = (_StatRecord * len(_statNames))()
+    _lib.readStats(records)
+    stats = {name: EntryPointStats(r.calls, r.items, r.inGamut if name.startswith("fill") else None, r.nanoseconds)
+             for name, r in zip(_statNames, records)}
+    return {name: s for name, s in stats.items() if s.calls} if nonzero else stats
+
+def resetStats():
+    _lib.resetStats()
+
+# Color spaces; see rgb2lab.h
+
+_lib.newColorSpace.argtypes = [c_int, c_int, c_int]
+_lib.newColorSpace.restype = c_void_p
+_lib.freeColorSpace.argtypes = [c_void_p]
+_lib.freeColorSpace.restype = None
+_lib.defaultColorSpace.restype = c_void_p
+_Matrix = c_double * 3 * 3
+_lib.colorSpaceMatrices.argtypes = [c_void_p, _Matrix, _Matrix]
+_lib.colorSpaceMatrices.restype = None
+
+# names as accepted by ColorSpace: RgbPrimaries, TransferCurve and ReferenceWhite values of rgb2lab.h
+colorSpacePrimaries = {"sRGB": 0, "Display-P3": 1, "AdobeRGB": 2}
+colorSpaceTransfers = {"sRGB": 0, "AdobeRGB": 1, "linear": 2}
+colorSpaceWhites = {"D65": 0, "D50": 1}
+
+class ColorSpace:
+
+    '''
+    RGB primaries, transfer curve (by default that of the primaries: sRGB for
+    Display-P3) and Lab reference white for the *Cs conversion functions.
+    Make one per space and reuse it: conversions with it allocate nothing.
+    '''
+
+    def __init__(self, primaries = "sRGB", transfer = None, white = "D65"):
+        if transfer is None:
+            transfer = "AdobeRGB" if primaries == "AdobeRGB" else "sRGB"
+        for name, names, what in (primaries, colorSpacePrimaries, "primaries"), (transfer, colorSpaceTransfers, "transfer curve"), (white, colorSpaceWhites, "reference white"):
+            if name not in names:
+                raise Rgb2LabError("Unknown {} {!r}; use one of {}.".format(what, name, ", ".join(names)))
+        self._handle = _lib.newColorSpace(colorSpacePrimaries[primaries], colorSpaceTransfers[transfer], colorSpaceWhites[white])
+        if not self._handle:
+            raise Rgb2LabError("Could not make color space.")
+        self._owned = True
+        self.primaries, self.transfer, self.white = primaries, transfer, white
+
+    def __del__(self):
+        if getattr(self, "_handle", None) and self._owned:
+            _lib.freeColorSpace(self._handle)
+            self._handle = None
+
+    def __repr__(self):
+        return "ColorSpace({!r}, {!r}, {!r})".format(self.primaries, self.transfer, self.white)
+
+    def matrices(self):
+        '''Returns the linear RGB → XYZ matrix and its inverse as tuples of rows'''
+        toXyz, fromXyz = _Matrix(), _Matrix()
+        _lib.colorSpaceMatrices(self._handle, toXyz, fromXyz)
+        return tuple(tuple(row) for row in toXyz), tuple(tuple(row) for row in fromXyz)
+
+def _defaultColorSpace():
+    space = ColorSpace.__new__(ColorSpace)
+    space._handle = _lib.defaultColorSpace() if nativeAvailable() else None
+    space._owned = False # static in the library
+    space.primaries, space.transfer, space.white = "sRGB", "sRGB", "D65"
+    return space
+
+# the space of the functions without Cs
+defaultColorSpace = _defaultColorSpace()
+
 def checkRgb01(rgb):
     for v in rgb:
         if not (0 <= v <= 1):
@@ -58,9 +319,15 @@ def _makeConversionFns(T):
 
     def toTriplet(ijk): return Triplet(Array3(*ijk))
 
-    def makeRetOneFn(checkFn, libFn):
-        libFn.argtypes = [Triplet]
+    def makeRetOneFn(checkFn, libFn, withColorSpace = False):
         libFn.restype = Triplet
+        if withColorSpace: # taking a ColorSpace first
+            libFn.argtypes = [c_void_p, Triplet]
+            def fn(space, ijk):
+                checkFn(ijk)
+                return tuple(libFn(space._handle, toTriplet(ijk)).data)
+            return fn
+        libFn.argtypes = [Triplet]
         def fn(ijk):
             checkFn(ijk)
             return tuple(libFn(toTriplet(ijk)).data)
@@ -76,3 +343,77 @@ def _makeConversionFns(T):
         return fn
 
     return makeRetOneFn, makeRetTwoFn
+
+def _asBuffer(obj, T, width, writable = False):
+
+    '''
+    Given `obj` supporting the buffer protocol (bytes, bytearray, array.array,
+    memoryview, NumPy array etc), returns a tuple of:
+    1. a CTypes pointer to its first element of type `T`
+    2. the number of rows of `width` elements of type `T` it holds
+
+    The buffer must be C-contiguous and either untyped (bytes) or of the item
+    type corresponding to `T`. Writable buffers are used in place; read-only
+    ones are copied unless `writable` is requested in which case it's an error.
+    '''
+
+    m = memoryview(obj)
+    if not m.c_contiguous:
+        raise Rgb2LabError("Buffer should be C-contiguous.")
+    fmt = m.format.lstrip("@=" + ("<" if sys.byteorder == "little" else ">"))
+    if fmt not in ("B", "b", "c", T._type_):
+        raise Rgb2LabError("Buffer should hold items of format '{}' but has '{}'.".format(T._type_, m.format))
+    rowSize = sizeof(T) * width
+    if m.nbytes % rowSize:
+        raise Rgb2LabError("Buffer size {} is not a multiple of {} bytes.".format(m.nbytes, rowSize))
+    if m.readonly:
+        if writable:
+            raise Rgb2LabError("Output buffer should be writable.")
+        if hasattr(obj, "__array_interface__"): # read-only NumPy array: use in place
+            return cast(c_void_p(obj.__array_interface__["data"][0]), POINTER(T)), m.nbytes // rowSize
+        data = (c_char * m.nbytes).from_buffer_copy(m)
+    else:
+        data = (c_char * m.nbytes).from_buffer(m)
+    return cast(data, POINTER(T)), m.nbytes // rowSize
+
+def _newBuffer(T, rows, width):
+    '''Allocates a zeroed `rows` × `width` memoryview of items of type `T`'''
+    m = memoryview(bytearray(sizeof(T) * rows * width))
+    return m.cast(T._type_, (rows, width)) if rows else m.cast(T._type_)
+
+def _makeArrayConversionFn(T, width = 3):
+
+    '''
+    Given `T` a CTypes numeric type, creates a function factory for a function
+    converting a whole buffer of `width`-wide rows in a single library call
+    '''
+
+    TPtr = POINTER(T)
+
+    def makeArrayFn(checkFn, findInvalidFn, libFn, withColorSpace = False):
+        findInvalidFn.argtypes = [TPtr, c_size_t]
+        findInvalidFn.restype = c_ssize_t
+        libFn.argtypes = ([c_void_p] if withColorSpace else []) + [TPtr, TPtr, c_size_t]
+        libFn.restype = None
+        def convert(src, out, *space):
+            srcPtr, n = _asBuffer(src, T, width)
+            i = findInvalidFn(srcPtr, n)
+            if i != -1:
+                try:
+                    checkFn(srcPtr[i * width : (i + 1) * width])
+                except Rgb2LabError as e:
+                    raise Rgb2LabError("Row {}: {}".format(i, e)) from None
+            if out is None:
+                out = _newBuffer(T, n, width)
+            outPtr, outN = _asBuffer(out, T, width, writable = True)
+            if outN != n:
+                raise Rgb2LabError("Output buffer holds {} rows but input has {}.".format(outN, n))
+            libFn(*space, srcPtr, outPtr, n)
+            return out
+        if withColorSpace: # taking a ColorSpace first
+            def fn(space, src, out = None): return convert(src, out, space._handle)
+        else:
+            def fn(src, out = None): return convert(src, out)
+        return fn
+
+    return makeArrayFn
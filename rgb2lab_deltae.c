@@ -0,0 +1,338 @@
+// librgb2lab
+// ==========
+//
+// Convert color values from RGB to/from CIE LAB/LCH
+// for sRGB gamut, D65 illuminant, 2° observer
+//
+// Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
+//
+// Use, modification and distribution are permitted subject to the
+// "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
+//
+// Credit:
+// The ΔE2000 formula and its implementation notes are from G. Sharma, W. Wu and
+// E. N. Dalal, "The CIEDE2000 color-difference formula", Color Research &
+// Application 30(1), 2005
+
+#include "rgb2lab_deltae.h"
+#include "rgb2lab_threads.h"
+#include <math.h>
+#include <stdbool.h>
+#include <stdlib.h>
+#include <string.h>
+
+static const double PI = 3.14159265358979323846; // acos(-1)
+static double _radians(double degrees) { return degrees * PI / 180; }
+static double _square(double v) { return v * v; }
+
+double deltaE76(DoubleTriplet lab1, DoubleTriplet lab2)
+{
+    return sqrt(_square(lab1.L - lab2.L) + _square(lab1.A - lab2.A) + _square(lab1.B - lab2.B));
+}
+
+double deltaE94(DoubleTriplet lab1, DoubleTriplet lab2)
+{
+    double c1 = hypot(lab1.A, lab1.B), c2 = hypot(lab2.A, lab2.B);
+    double dL = lab1.L - lab2.L, dC = c1 - c2;
+    double dH2 = _square(lab1.A - lab2.A) + _square(lab1.B - lab2.B) - _square(dC); // ΔH² = Δa² + Δb² - ΔC²
+    if (dH2 < 0) dH2 = 0; // by rounding
+    double sC = 1 + 0.045 * c1, sH = 1 + 0.015 * c1;
+    return sqrt(_square(dL) + _square(dC / sC) + dH2 / _square(sH));
+}
+
+static double _hueAngle(double b, double a)
+{
+    if (a == 0 && b == 0) return 0;
+    double h = atan2(b, a) * 180 / PI;
+    return h < 0 ? h + 360 : h;
+}
+
+double deltaE2000(DoubleTriplet lab1, DoubleTriplet lab2)
+{
+    static const double POW_25_7 = 6103515625.0; // 25^7
+    double cMean = (hypot(lab1.A, lab1.B) + hypot(lab2.A, lab2.B)) / 2;
+    double cMean7 = pow(cMean, 7);
+    double g = 0.5 * (1 - sqrt(cMean7 / (cMean7 + POW_25_7)));
+    double a1 = (1 + g) * lab1.A, a2 = (1 + g) * lab2.A;
+    double c1 = hypot(a1, lab1.B), c2 = hypot(a2, lab2.B);
+    double h1 = _hueAngle(lab1.B, a1), h2 = _hueAngle(lab2.B, a2);
+
+    double dL = lab2.L - lab1.L, dC = c2 - c1, dh = 0;
+    if (c1 * c2 != 0)
+    {
+        dh = h2 - h1;
+        if (dh > 180) dh -= 360; else if (dh < -180) dh += 360;
+    }
+    double dH = 2 * sqrt(c1 * c2) * sin(_radians(dh / 2));
+
+    double lMeanP = (lab1.L + lab2.L) / 2, cMeanP = (c1 + c2) / 2, hMeanP = h1 + h2;
+    if (c1 * c2 != 0)
+    {
+        if (fabs(h1 - h2) <= 180) hMeanP /= 2;
+        else hMeanP = (hMeanP < 360 ? hMeanP + 360 : hMeanP - 360) / 2;
+    }
+    double t = 1 - 0.17 * cos(_radians(hMeanP - 30)) + 0.24 * cos(_radians(2 * hMeanP)) +
+                   0.32 * cos(_radians(3 * hMeanP + 6)) - 0.20 * cos(_radians(4 * hMeanP - 63));
+    double dTheta = 30 * exp(-_square((hMeanP - 275) / 25));
+    double cMeanP7 = pow(cMeanP, 7);
+    double rC = 2 * sqrt(cMeanP7 / (cMeanP7 + POW_25_7));
+    double sL = 1 + 0.015 * _square(lMeanP - 50) / sqrt(20 + _square(lMeanP - 50));
+    double sC = 1 + 0.045 * cMeanP, sH = 1 + 0.015 * cMeanP * t;
+    double rT = -sin(_radians(2 * dTheta)) * rC;
+    return sqrt(_square(dL / sL) + _square(dC / sC) + _square(dH / sH) + rT * (dC / sC) * (dH / sH));
+}
+
+static double (* const deltaEFns[])(DoubleTriplet, DoubleTriplet) = {deltaE76, deltaE94, deltaE2000};
+
+typedef struct { const DoubleTriplet * lab1, * lab2; double * dst; double (* fn)(DoubleTriplet, DoubleTriplet); } DeltaEJob;
+
+enum { DELTA_E_MIN_CHUNK = 16384 }; // pairs
+
+static long _deltaEChunk(void * job_, size_t begin, size_t end)
+{
+    const DeltaEJob * job = job_;
+    for (size_t i = begin; i < end; ++i) job->dst[i] = job->fn(job->lab1[i], job->lab2[i]);
+    return 0;
+}
+
+static void _deltaEArray(DeltaEMetric metric, const DoubleTriplet * lab1, const DoubleTriplet * lab2, double * dst, size_t n)
+{
+    DeltaEJob job = {lab1, lab2, dst, deltaEFns[metric]};
+    parallelFor(n, DELTA_E_MIN_CHUNK, _deltaEChunk, &job);
+}
+
+void deltaE76Array(const DoubleTriplet * lab1, const DoubleTriplet * lab2, double * dst, size_t n)
+{
+    _deltaEArray(DELTA_E_76, lab1, lab2, dst, n);
+}
+
+void deltaE94Array(const DoubleTriplet * lab1, const DoubleTriplet * lab2, double * dst, size_t n)
+{
+    _deltaEArray(DELTA_E_94, lab1, lab2, dst, n);
+}
+
+void deltaE2000Array(const DoubleTriplet * lab1, const DoubleTriplet * lab2, double * dst, size_t n)
+{
+    _deltaEArray(DELTA_E_2000, lab1, lab2, dst, n);
+}
+
+// Palette index
+// =============
+
+enum { MAX_GRID_CELLS_PER_AXIS = 64 };
+static const double TARGET_COLORS_PER_CELL = 2;
+
+struct PaletteIndex
+{
+    size_t n;
+    DoubleTriplet * colors; // palette sorted by grid cell
+    uint32_t * indices;     // original palette index of each entry of `colors`
+    size_t * cellStart;     // colors of cell k are [cellStart[k], cellStart[k + 1])
+    double origin[3], cellSize;
+    int dims[3];
+};
+
+static int _cellCoordinate(const PaletteIndex * index, double v, int axis)
+{
+    double x = floor((v - index->origin[axis]) / index->cellSize);
+    return x < 0 ? 0 : x >= index->dims[axis] ? index->dims[axis] - 1 : (int)x; // clamped; NaN gives 0
+}
+
+static size_t _cellOf(const PaletteIndex * index, DoubleTriplet lab)
+{
+    size_t cell = 0;
+    for (int axis = 0; axis < 3; ++axis) cell = cell * index->dims[axis] + _cellCoordinate(index, lab.data[axis], axis);
+    return cell;
+}
+
+void freePaletteIndex(PaletteIndex * index)
+{
+    if (!index) return;
+    free(index->colors);
+    free(index->indices);
+    free(index->cellStart);
+    free(index);
+}
+
+PaletteIndex * newPaletteIndex(const DoubleTriplet * palette, size_t n)
+{
+    if (n == 0 || n > UINT32_MAX) return NULL;
+    PaletteIndex * index = calloc(1, sizeof(PaletteIndex));
+    if (!index) return NULL;
+    index->n = n;
+
+    double lo[3], hi[3];
+    for (int axis = 0; axis < 3; ++axis) lo[axis] = hi[axis] = palette[0].data[axis];
+    for (size_t i = 1; i < n; ++i)
+        for (int axis = 0; axis < 3; ++axis)
+        {
+            lo[axis] = fmin(lo[axis], palette[i].data[axis]);
+            hi[axis] = fmax(hi[axis], palette[i].data[axis]);
+        }
+    // cube cells sized for TARGET_COLORS_PER_CELL colors per cell if evenly spread
+    double volume = 1;
+    for (int axis = 0; axis < 3; ++axis) volume *= fmax(hi[axis] - lo[axis], 1);
+    index->cellSize = fmax(cbrt(volume * TARGET_COLORS_PER_CELL / n), 1e-3);
+    size_t cells = 1;
+    for (int axis = 0; axis < 3; ++axis)
+    {
+        index->origin[axis] = lo[axis];
+        double d = ceil((hi[axis] - lo[axis]) / index->cellSize);
+        index->dims[axis] = d < 1 ? 1 : d > MAX_GRID_CELLS_PER_AXIS ? MAX_GRID_CELLS_PER_AXIS : (int)d;
+        cells *= index->dims[axis];
+    }
+    // with dims capped, cells must be at least large enough to cover the box
+    for (int axis = 0; axis < 3; ++axis)
+        index->cellSize = fmax(index->cellSize, (hi[axis] - lo[axis]) / index->dims[axis] * (1 + 1e-9));
+
+    index->colors = malloc(sizeof(DoubleTriplet) * n);
+    index->indices = malloc(sizeof(uint32_t) * n);
+    index->cellStart = calloc(cells + 1, sizeof(size_t));
+    size_t * cellOfColor = malloc(sizeof(size_t) * n);
+    if (!index->colors || !index->indices || !index->cellStart || !cellOfColor)
+    {
+        free(cellOfColor);
+        freePaletteIndex(index);
+        return NULL;
+    }
+    // counting sort of the colors by cell
+    for (size_t i = 0; i < n; ++i) ++index->cellStart[(cellOfColor[i] = _cellOf(index, palette[i])) + 1];
+    for (size_t k = 0; k < cells; ++k) index->cellStart[k + 1] += index->cellStart[k];
+    for (size_t i = 0; i < n; ++i)
+    {
+        size_t pos = index->cellStart[cellOfColor[i]]++;
+        index->colors[pos] = palette[i];
+        index->indices[pos] = (uint32_t)i;
+    }
+    // the increments above shifted each start to the next cell's start
+    memmove(index->cellStart + 1, index->cellStart, sizeof(size_t) * cells);
+    index->cellStart[0] = 0;
+    free(cellOfColor);
+    return index;
+}
+
+typedef struct { double distance, distance76; uint32_t index; } Match;
+
+static void _searchCell(const PaletteIndex * index, int i, int j, int k, DoubleTriplet lab,
+                        double (* fn)(DoubleTriplet, DoubleTriplet), Match * best)
+{
+    size_t cell = ((size_t)i * index->dims[1] + j) * index->dims[2] + k;
+    for (size_t p = index->cellStart[cell]; p < index->cellStart[cell + 1]; ++p)
+    {
+        double d76 = deltaE76(lab, index->colors[p]);
+        if (d76 < best->distance76) best->distance76 = d76;
+        double d = fn == deltaE76 ? d76 : fn(lab, index->colors[p]);
+        if (d < best->distance || (d == best->distance && index->indices[p] < best->index))
+        {
+            best->distance = d;
+            best->index = index->indices[p];
+        }
+    }
+}
+
+// Lower bound of the ΔE76 of `lab` from any color outside the cells within
+// Chebyshev distance `r` of cell `c`, or INFINITY if there are no such cells
+static double _shellBound(const PaletteIndex * index, DoubleTriplet lab, const int c[3], int r)
+{
+    double bound = INFINITY;
+    for (int axis = 0; axis < 3; ++axis)
+    {
+        if (c[axis] - r > 0)
+            bound = fmin(bound, lab.data[axis] - (index->origin[axis] + (c[axis] - r) * index->cellSize));
+        if (c[axis] + r < index->dims[axis] - 1)
+            bound = fmin(bound, index->origin[axis] + (c[axis] + r + 1) * index->cellSize - lab.data[axis]);
+    }
+    return fmax(bound, 0);
+}
+
+static Match _nearest(const PaletteIndex * index, DoubleTriplet lab, DeltaEMetric metric, double searchFactor)
+{
+    Match best = {INFINITY, INFINITY, 0};
+    double (* fn)(DoubleTriplet, DoubleTriplet) = deltaEFns[metric];
+    double sC = 1 + 0.045 * hypot(lab.A, lab.B); // chroma weight of ΔE94
+    int c[3], lo[3], hi[3];
+    for (int axis = 0; axis < 3; ++axis) c[axis] = _cellCoordinate(index, lab.data[axis], axis);
+    for (int r = 0; ; ++r)
+    {
+        for (int axis = 0; axis < 3; ++axis)
+        {
+            lo[axis] = c[axis] - r < 0 ? 0 : c[axis] - r;
+            hi[axis] = c[axis] + r >= index->dims[axis] ? index->dims[axis] - 1 : c[axis] + r;
+        }
+        for (int i = lo[0]; i <= hi[0]; ++i)
+            for (int j = lo[1]; j <= hi[1]; ++j)
+            {
+                bool onShell = abs(i - c[0]) == r || abs(j - c[1]) == r;
+                int step = onShell ? 1 : 2 * r; // else only the two cells at distance r > 0 along the last axis
+                for (int k = c[2] - r; k <= c[2] + r; k += step)
+                    if (lo[2] <= k && k <= hi[2]) _searchCell(index, i, j, k, lab, fn, &best);
+            }
+        // stop when no unvisited color can be nearer or, for ΔE2000, be within
+        // searchFactor × the least ΔE76 so far
+        double bound = _shellBound(index, lab, c, r);
+        if (bound == INFINITY) break;
+        if (metric == DELTA_E_76 && bound >= best.distance) break;
+        if (metric == DELTA_E_94 && bound >= sC * best.distance) break;
+        if (metric == DELTA_E_2000 && bound >= searchFactor * best.distance76) break;
+    }
+    return best;
+}
+
+typedef struct
+{
+    const PaletteIndex * index;
+    const DoubleTriplet * lab;
+    uint32_t * dst;
+    double * distances;
+    DeltaEMetric metric;
+    double searchFactor;
+} NearestJob;
+
+enum { NEAREST_MIN_CHUNK = 4096 }; // queries
+
+// Direct-mapped cache of search results per chunk: images typically have far
+// fewer distinct colors than pixels, especially when converted from 8 bits
+enum { NEAREST_CACHE_BITS = 16 };
+typedef struct { DoubleTriplet lab; Match match; bool used; } NearestCacheEntry;
+
+static size_t _cacheSlot(DoubleTriplet lab)
+{
+    uint64_t words[3];
+    memcpy(words, &lab, sizeof(words));
+    uint64_t h = words[0] * 0x9E3779B97F4A7C15u ^ words[1] * 0xC2B2AE3D27D4EB4Fu ^ words[2] * 0x165667B19E3779F9u;
+    return h >> (64 - NEAREST_CACHE_BITS);
+}
+
+static long _nearestChunk(void * job_, size_t begin, size_t end)
+{
+    const NearestJob * job = job_;
+    size_t cacheSize = (size_t)1 << NEAREST_CACHE_BITS;
+    NearestCacheEntry * cache = end - begin >= cacheSize ? calloc(cacheSize, sizeof(NearestCacheEntry)) : NULL;
+    Match match = {0, 0, 0};
+    for (size_t i = begin; i < end; ++i)
+    {
+        DoubleTriplet lab = job->lab[i];
+        if (i == begin || memcmp(&lab, &job->lab[i - 1], sizeof(DoubleTriplet)) != 0) // not a run
+        {
+            NearestCacheEntry * entry = cache ? &cache[_cacheSlot(lab)] : NULL;
+            if (entry && entry->used && memcmp(&entry->lab, &lab, sizeof(DoubleTriplet)) == 0)
+                match = entry->match;
+            else
+            {
+                match = _nearest(job->index, lab, job->metric, job->searchFactor);
+                if (entry) { entry->lab = lab; entry->match = match; entry->used = true; }
+            }
+        }
+        job->dst[i] = match.index;
+        if (job->distances) job->distances[i] = match.distance;
+    }
+    free(cache);
+    return 0;
+}
+
+void nearestPaletteColorArray(const PaletteIndex * index, const DoubleTriplet * lab, uint32_t * dst, double * distances,
+                              size_t n, DeltaEMetric metric, double searchFactor)
+{
+    NearestJob job = {index, lab, dst, distances, metric, searchFactor};
+    parallelFor(n, NEAREST_MIN_CHUNK, _nearestChunk, &job);
+}
@@ -0,0 +1,51 @@
+// librgb2lab
+// ==========
+//
+// Convert color values from RGB to/from CIE LAB/LCH
+// for sRGB gamut, D65 illuminant, 2° observer
+//
+// Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
+//
+// Use, modification and distribution are permitted subject to the
+// "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
+
+#include "rgb2lab.h"
+#include <stdint.h>
+
+// Color differences between two Lab colors
+// ΔE94 uses the graphic arts weights and treats `lab1` as the reference
+// ΔE2000 follows Sharma, Wu and Dalal (2005) with kL = kC = kH = 1
+double deltaE76(DoubleTriplet lab1, DoubleTriplet lab2);
+double deltaE94(DoubleTriplet lab1, DoubleTriplet lab2);
+double deltaE2000(DoubleTriplet lab1, DoubleTriplet lab2);
+
+// Batch versions of the above: differences of `n` pairs of Lab triplets from
+// `lab1` and `lab2` written to `dst`
+void deltaE76Array(const DoubleTriplet * lab1, const DoubleTriplet * lab2, double * dst, size_t n);
+void deltaE94Array(const DoubleTriplet * lab1, const DoubleTriplet * lab2, double * dst, size_t n);
+void deltaE2000Array(const DoubleTriplet * lab1, const DoubleTriplet * lab2, double * dst, size_t n);
+
+typedef enum { DELTA_E_76, DELTA_E_94, DELTA_E_2000 } DeltaEMetric;
+
+// Palette index
+// =============
+//
+// Uniform grid over the bounding box of a palette of Lab colors for nearest
+// color searches. The palette is copied. Returns NULL for an empty palette or
+// if allocation fails.
+typedef struct PaletteIndex PaletteIndex;
+PaletteIndex * newPaletteIndex(const DoubleTriplet * palette, size_t n);
+void freePaletteIndex(PaletteIndex * index);
+
+// For each of `n` Lab colors, writes the index of the nearest palette color by
+// `metric` to `dst` and, if `distances` is not NULL, its difference from it.
+// The search visits grid cells in growing shells until no unvisited palette
+// color can be nearer, which is exact for ΔE76 and for ΔE94 as that is at
+// least ΔE76 divided by the chroma weight of the query color. ΔE2000 has no
+// such useful bound so it's the least ΔE2000 over the visited cells, which
+// cover all palette colors whose ΔE76 is within `searchFactor` times the
+// least ΔE76. With 2, random sRGB palettes and queries showed no misses and
+// palettes spread over the whole Lab box about 0.2%.
+// Repeated query colors, common in images, are mostly found in a cache.
+void nearestPaletteColorArray(const PaletteIndex * index, const DoubleTriplet * lab, uint32_t * dst, double * distances,
+                              size_t n, DeltaEMetric metric, double searchFactor);
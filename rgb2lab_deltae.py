@@ -0,0 +1,113 @@
+# librgb2lab
+# ==========
+#
+# Convert color values from RGB to/from CIE LAB/LCH
+# for sRGB gamut, D65 illuminant, 2° observer
+#
+# Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
+#
+# Use, modification and distribution are permitted subject to the
+# "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
+
+import rgb2lab_common
+from rgb2lab_common import *
+from ctypes import c_double, c_int, c_size_t, c_uint32, c_void_p, POINTER, Structure, sizeof
+
+_lib = rgb2lab_common._lib
+
+class _Triplet(Structure): _fields_ = ("data", c_double * 3), # same layout as the DoubleTriplet union
+
+_DoublePtr = POINTER(c_double)
+
+# metric names as accepted by the functions below: DeltaEMetric values of rgb2lab_deltae.h
+deltaEMetrics = {"76": 0, "94": 1, "2000": 2}
+
+def _metric(metric):
+    try:
+        return deltaEMetrics[str(metric)]
+    except KeyError:
+        raise Rgb2LabError("Unknown ΔE metric {!r}; use one of {}.".format(metric, ", ".join(deltaEMetrics))) from None
+
+def _output(out, T, n):
+    if out is None:
+        out = memoryview(bytearray(sizeof(T) * n)).cast(T._type_)
+    outPtr, outN = rgb2lab_common._asBuffer(out, T, 1, writable = True)
+    if outN != n:
+        raise Rgb2LabError("Output buffer holds {} items but input has {} triplets.".format(outN, n))
+    return out, outPtr
+
+def _makeDeltaEFns(name):
+    libFn, libArrayFn = getattr(_lib, name), getattr(_lib, name + "Array")
+    libFn.argtypes = [_Triplet, _Triplet]
+    libFn.restype = c_double
+    libArrayFn.argtypes = [_DoublePtr, _DoublePtr, _DoublePtr, c_size_t]
+    libArrayFn.restype = None
+    def fn(lab1, lab2):
+        return libFn(_Triplet((c_double * 3)(*lab1)), _Triplet((c_double * 3)(*lab2)))
+    def arrayFn(lab1, lab2, out = None):
+        lab1Ptr, n = rgb2lab_common._asBuffer(lab1, c_double, 3)
+        lab2Ptr, n2 = rgb2lab_common._asBuffer(lab2, c_double, 3)
+        if n2 != n:
+            raise Rgb2LabError("Inputs hold {} and {} triplets; they should be equal.".format(n, n2))
+        out, outPtr = _output(out, c_double, n)
+        libArrayFn(lab1Ptr, lab2Ptr, outPtr, n)
+        return out
+    return fn, arrayFn
+
+# Color differences of two Lab colors and batch versions taking two buffers
+# of N×3 doubles and writing N doubles into `out` (allocated if not given)
+# which is returned; ΔE94 treats the first color as the reference
+
+deltaE76  , deltaE76Array   = _makeDeltaEFns("deltaE76")
+deltaE94  , deltaE94Array   = _makeDeltaEFns("deltaE94")
+deltaE2000, deltaE2000Array = _makeDeltaEFns("deltaE2000")
+
+_lib.newPaletteIndex.argtypes = [_DoublePtr, c_size_t]
+_lib.newPaletteIndex.restype = c_void_p
+_lib.freePaletteIndex.argtypes = [c_void_p]
+_lib.freePaletteIndex.restype = None
+_lib.nearestPaletteColorArray.argtypes = [c_void_p, _DoublePtr, POINTER(c_uint32), _DoublePtr, c_size_t, c_int, c_double]
+_lib.nearestPaletteColorArray.restype = None
+
+class PaletteIndex:
+
+    '''
+    Nearest color search over a palette of Lab colors, given as a buffer of
+    N×3 doubles or a sequence of triplets, using a uniform grid; see
+    rgb2lab_deltae.h for the exactness of the search per metric
+    '''
+
+    def __init__(self, palette):
+        try:
+            memoryview(palette)
+        except TypeError: # sequence of triplets
+            palette = (c_double * (3 * len(palette)))(*(v for lab in palette for v in lab))
+        palettePtr, self.size = rgb2lab_common._asBuffer(palette, c_double, 3)
+        self._handle = _lib.newPaletteIndex(palettePtr, self.size)
+        if not self._handle:
+            raise Rgb2LabError("Could not index a palette of {} colors.".format(self.size))
+
+    def __del__(self):
+        if getattr(self, "_handle", None):
+            _lib.freePaletteIndex(self._handle)
+            self._handle = None
+
+    def __len__(self):
+        return self.size
+
+    def nearest(self, lab, out = None, distances = False, metric = "2000", searchFactor = 2):
+
+        '''
+        Given a buffer of N×3 Lab doubles, e.g. the output of labFromRgbArray
+        for a whole image, returns the indices (uint32) of the nearest palette
+        colors by ΔE `metric` ("76", "94" or "2000") written into `out`
+        (allocated if not given), or if `distances` is true a tuple of those
+        and their differences (doubles); `searchFactor` trades speed for
+        accuracy of ΔE2000 searches as described in rgb2lab_deltae.h
+        '''
+
+        labPtr, n = rgb2lab_common._asBuffer(lab, c_double, 3)
+        out, outPtr = _output(out, c_uint32, n)
+        distanceOut, distancePtr = _output(None, c_double, n) if distances else (None, None)
+        _lib.nearestPaletteColorArray(self._handle, labPtr, outPtr, distancePtr, n, _metric(metric), searchFactor)
+        return (out, distanceOut) if distances else out
@@ -0,0 +1,437 @@
+# librgb2lab
+# ==========
+#
+# Convert color values from RGB to/from CIE LAB/LCH
+# for sRGB gamut, D65 illuminant, 2° observer
+#
+# Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
+#
+# Use, modification and distribution are permitted subject to the
+# "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
+
+# Process-pool engine for whole domains
+# =====================================
+#
+# An Engine computes a whole domain across a pool of worker processes. The
+# domains are the 256³ 8-bit RGB cube to Lab/LCH, the 101×257×257 integer
+# Lab grid to RGB and every slice of a fillTable_* kind. Workers write into
+# multiprocessing.shared_memory blocks made by the parent, so results are
+# never pickled. A job is split into several contiguous shards per process
+# to balance load. Workers use one library thread each so that processes
+# don't oversubscribe the cores. Between blocks of work they count progress
+# in a shared control block and check its cancellation flag:
+#
+#     with Engine() as engine:
+#         job = engine.rgbCube(("lab", "lch"), precision = "int")
+#         with job.wait(progress = lambda done, total: print(done, "of", total)) as results:
+#             lab = results["lab"] # 256³ × 3 int8 indexed by r << 16 | g << 8 | b
+#             L = lab[99 << 16 | 129 << 8 | 39, 0]
+#
+# Results are multi-dimensional memoryviews which only take full indices as
+# above; for slicing use `results.numpy(name)`, an array over the same memory
+# which stays valid after the results are closed.
+
+import gc, multiprocessing, os, sys, time
+from array import array
+from ctypes import c_int64, sizeof
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+import rgb2lab_common
+from rgb2lab_common import Rgb2LabError
+
+class Cancelled(Rgb2LabError):
+    '''Raised by Job.wait for a cancelled job'''
+
+# Domains
+# =======
+#
+# Each domain is a sequence of work units, which are points for the cube and
+# grid and slices for fillTable_* kinds. Shard bounds are aligned to rows of
+# `rowUnits` units. The runner of a domain fills units [begin, end) of the
+# outputs in blocks, calling `step(units)` after each; it stops early when
+# `step` returns False.
+
+_rgbPlane = 256 * 256
+_labPlane = 257 * 257
+
+_planeTemplates = {} # per worker: (domain, type) → one plane of inputs with the first component 0
+
+def _planeTemplate(domain, typecode):
+    key = domain, typecode
+    if key not in _planeTemplates:
+        if domain == "rgbCube":
+            scale = 255.0 if typecode == "d" else 1
+            values = (v / scale if typecode == "d" else v for g in range(256) for b in range(256) for v in (0, g, b))
+        else:
+            values = (v for a in range(-128, 129) for b in range(-128, 129) for v in (0, a, b))
+        _planeTemplates[key] = array(typecode, values)
+    return _planeTemplates[key]
+
+def _planeBlocks(begin, end, planeSize):
+    '''Yields (plane, start, stop) covering [begin, end) without crossing planes'''
+    while begin < end:
+        plane = begin // planeSize
+        stop = min(end, (plane + 1) * planeSize)
+        yield plane, begin, stop
+        begin = stop
+
+def _runRgbCube(outputs, options, begin, end, step):
+    import rgb2lab, rgb2lab_int
+    precision, names = options
+    if precision == "float":
+        template = _planeTemplate("rgbCube", "d")
+        fns = {"lab": rgb2lab.labFromRgbArray, "lch": rgb2lab.lchFromRgbArray}
+        for r, start, stop in _planeBlocks(begin, end, _rgbPlane):
+            src = template[3 * (start - r * _rgbPlane) : 3 * (stop - r * _rgbPlane)]
+            src[0::3] = array("d", [r / 255.0]) * (stop - start)
+            for name in names:
+                fns[name](src, outputs[name][3 * start : 3 * stop])
+            if not step(stop - start): return
+    else:
+        template = _planeTemplate("rgbCube", "B")
+        for r, start, stop in _planeBlocks(begin, end, _rgbPlane):
+            src = template[3 * (start - r * _rgbPlane) : 3 * (stop - r * _rgbPlane)]
+            src[0::3] = array("B", [r]) * (stop - start)
+            lab, lch = (outputs[n][3 * start : 3 * stop] if n in names else None for n in ("lab", "lch"))
+            if lab is not None and lch is not None:
+                rgb2lab_int.labLchFromRgb8Array(src, lab, lch)
+            elif lab is not None:
+                rgb2lab_int.labFromRgb8Array(src, lab)
+            else:
+                rgb2lab_int.lchFromRgb8Array(src, lch)
+            if not step(stop - start): return
+
+def _runLabGrid(outputs, options, begin, end, step):
+    import rgb2lab
+    template = _planeTemplate("labGrid", "d")
+    for l, start, stop in _planeBlocks(begin, end, _labPlane):
+        src = template[3 * (start - l * _labPlane) : 3 * (stop - l * _labPlane)]
+        src[0::3] = array("d", [l]) * (stop - start)
+        rgb2lab.rgbFromLabArray(src, outputs["rgb"][3 * start : 3 * stop])
+        if not step(stop - start): return
+
+def _tableSlicesLayout(kind):
+    '''Returns the ranges of the fixed values and the shape of a table of `kind`'''
+    import rgb2lab_int
+    ranges = rgb2lab_int._gamutFixedRanges
+    varNames, fixedNames = kind.split("for")
+    return [ranges[n] for n in fixedNames], tuple(len(ranges[n]) for n in varNames)
+
+def _runTableSlices(outputs, kind, begin, end, step):
+    import rgb2lab_int
+    fixedRanges, tableShape = _tableSlicesLayout(kind)
+    TableType = rgb2lab_int.TinyRgb
+    for span in reversed(tableShape):
+        TableType = TableType * span
+    fill = rgb2lab_int._fillTableFns[kind]
+    tables, counts = outputs["tables"], outputs["inGamutCounts"]
+    for i in range(begin, end):
+        fixed, rest = [], i
+        for r in reversed(fixedRanges): # C order: the last fixed value varies fastest
+            rest, k = divmod(rest, len(r))
+            fixed.insert(0, r[k])
+        table = TableType.from_buffer(tables, i * sizeof(TableType))
+        counts[i] = fill(table, *fixed)
+        del table # releases the export of the shared block
+        if not step(1): return
+
+_domainRunners = {"rgbCube": _runRgbCube, "labGrid": _runLabGrid, "tableSlices": _runTableSlices}
+
+# Workers
+# =======
+
+_controlHeader = 8 # bytes: cancellation flag and padding, followed by an int64 count of done units per shard
+
+def _initWorker(backend):
+    rgb2lab_common.setBackend(backend)
+    if rgb2lab_common.nativeAvailable():
+        rgb2lab_common.setThreadCount(1) # the pool provides the parallelism
+    if sys.version_info < (3, 13):
+        # Before `track = False`, attaching registers the block with the resource
+        # tracker, which may be the parent's: unregistering it afterwards would
+        # undo the parent's registration. Workers create no blocks, so skip it.
+        register = resource_tracker.register
+        def registerOthers(name, rtype):
+            if rtype != "shared_memory":
+                register(name, rtype)
+        resource_tracker.register = registerOthers
+
+def _attach(name):
+    '''Attaches a block of the parent, which alone tracks and unlinks it'''
+    if sys.version_info < (3, 13):
+        return SharedMemory(name) # untracked as set up by _initWorker
+    return SharedMemory(name, track = False)
+
+def _runShard(task):
+    domain, options, controlName, outputSpecs, shard, begin, end = task
+    control = _attach(controlName)
+    blocks = {name: _attach(shmName) for name, (shmName, _) in outputSpecs.items()}
+    views = {name: blocks[name].buf.cast(format) for name, (_, format) in outputSpecs.items()}
+    done = c_int64.from_buffer(control.buf, _controlHeader + sizeof(c_int64) * shard)
+    def step(units):
+        done.value += units
+        return not control.buf[0]
+    try:
+        _domainRunners[domain](views, options, begin, end, step)
+    finally:
+        del done
+        gc.collect() # ctypes.cast leaves reference cycles holding exports of the blocks
+        for view in views.values():
+            view.release()
+        for block in blocks.values():
+            block.close()
+        control.close()
+
+# Jobs
+# ====
+
+_exportedBlocks = [] # blocks of closed results kept mapped for arrays still using them
+
+def _closeBlocks(blocks):
+    '''Closes the blocks and returns those which are still exported'''
+    exported = []
+    for block in blocks:
+        try:
+            block.close()
+        except BufferError:
+            exported.append(block)
+    return exported
+
+class JobResults(dict):
+
+    '''
+    The outputs of a job as shaped memoryviews into shared memory blocks,
+    which `close` (or leaving a `with` block) unlinks and releases. Blocks
+    still used by arrays from `numpy` or other views derived from the
+    memoryviews stay mapped until a later `close` finds them unused. The
+    memoryviews take only full indices such as `[i, k]`; `numpy` gives
+    sliceable arrays.
+    '''
+
+    def __init__(self, blocks, shapes):
+        # blocks may be rounded up to whole pages
+        dict.__init__(self, ((name, blocks[name].buf[ : size].cast(format, shape)) for name, (format, shape, size) in shapes.items()))
+        self._blocks = blocks
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        if getattr(self, "_blocks", None):
+            self.close()
+
+    def numpy(self, name):
+        '''Returns output `name` as a NumPy array sharing its memory'''
+        import numpy as np
+        return np.asarray(self[name])
+
+    def close(self):
+        if self._blocks is None:
+            return
+        try:
+            for block in self._blocks.values(): # first, so that no block outlives the process
+                block.unlink()
+            for view in self.values():
+                try:
+                    view.release()
+                except BufferError: # exported; its block stays mapped
+                    pass
+            _exportedBlocks[:] = _closeBlocks(_exportedBlocks + list(self._blocks.values()))
+        finally:
+            self._blocks = None
+
+_failurePoll = 0.05 # seconds between checks of all shards for a failure while waiting
+
+class Job:
+
+    '''
+    A domain being computed by an Engine; see `wait`. Its shared memory is
+    freed by `wait` or `close`, or else when it is garbage collected.
+    '''
+
+    def __init__(self, control, results, asyncResults, shardCount, total):
+        self._control, self._results, self._asyncResults = control, results, asyncResults
+        self._shardCount, self.total = shardCount, total
+        self._final = None # (units done, cancelled) once the control block is freed
+
+    def __del__(self):
+        if getattr(self, "_control", None) is not None:
+            self.cancel() # without waiting: shards yet to start fail to attach, which is ignored
+            self._cleanUp(False)
+
+    def progress(self):
+        '''Returns the number of units done and the total'''
+        if self._control is None:
+            return self._final[0], self.total
+        done = (c_int64 * self._shardCount).from_buffer_copy(self._control.buf, _controlHeader)
+        return sum(done), self.total
+
+    def done(self):
+        return all(r.ready() for r in self._asyncResults)
+
+    def cancel(self):
+        '''Asks the workers to stop after their current block of work; does nothing once the job is over'''
+        if self._control is not None:
+            self._control.buf[0] = 1
+
+    def cancelled(self):
+        return self._final[1] if self._control is None else bool(self._control.buf[0])
+
+    def close(self):
+        '''Cancels the job if still running, waits for its workers and frees its shared memory'''
+        if self._control is not None:
+            self.cancel()
+            for r in self._asyncResults:
+                r.wait()
+            self._cleanUp(False)
+
+    def _cleanUp(self, keepResults):
+        self._final = self.progress()[0], self.cancelled()
+        control, self._control = self._control, None
+        control.close()
+        control.unlink()
+        if not keepResults:
+            self._results.close()
+        self._results = None
+
+    def wait(self, timeout = None, progress = None, interval = 0.5):
+        '''
+        Waits for the job, calling `progress(done, total)` every `interval`
+        seconds if given, and returns its JobResults. Raises Cancelled if it
+        was cancelled, the error of a worker if one failed, or TimeoutError
+        after `timeout` seconds, leaving it running. Interrupting the wait
+        cancels the job. Once it has returned or raised other than on
+        timeout, the job is over and can't be waited for again.
+        '''
+        if self._control is None:
+            raise Rgb2LabError("Job is over; its results were returned by the first wait.")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            pending = self._asyncResults
+            while True:
+                if any(r.ready() and not r.successful() for r in pending): # stop the others rather than finish them
+                    self.cancel()
+                    for r in self._asyncResults:
+                        r.wait()
+                    break
+                pending = [r for r in pending if not r.ready()]
+                if not pending:
+                    break
+                if progress is not None:
+                    progress(*self.progress())
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TimeoutError("Job not done in {} seconds.".format(timeout))
+                pending[0].wait(min(interval, _failurePoll) if deadline is None else
+                                min(interval, _failurePoll, max(0, deadline - time.monotonic())))
+        except KeyboardInterrupt:
+            self.cancel()
+            for r in self._asyncResults:
+                r.wait()
+            self._cleanUp(False)
+            raise
+        if progress is not None:
+            progress(*self.progress())
+        try:
+            for r in self._asyncResults:
+                r.get() # raises the error of a failed shard
+            if self.cancelled():
+                raise Cancelled("Job cancelled after {} of {} units.".format(*self.progress()))
+        except BaseException:
+            self._cleanUp(False)
+            raise
+        results = self._results
+        self._cleanUp(True)
+        return results
+
+class Engine:
+
+    '''
+    A pool of `processes` worker processes (by default one per CPU) computing
+    whole domains; each job is split into `shardsPerProcess` shards per process
+    '''
+
+    def __init__(self, processes = None, shardsPerProcess = 4):
+        self.processes = processes or os.cpu_count()
+        self.shardsPerProcess = shardsPerProcess
+        self._pool = multiprocessing.Pool(self.processes, _initWorker, (rgb2lab_common.backend(), ))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        '''Waits for submitted jobs and stops the workers'''
+        self._pool.close()
+        self._pool.join()
+
+    def _submit(self, domain, options, units, rowUnits, outputs):
+        # outputs: name → (format, shape, item size)
+        blocks, shapes, specs = {}, {}, {}
+        try:
+            for name, (format, shape, itemSize) in outputs.items():
+                size = itemSize
+                for n in shape:
+                    size *= n
+                blocks[name] = SharedMemory(create = True, size = size)
+                shapes[name] = format, shape, size
+                specs[name] = blocks[name].name, format
+        except BaseException:
+            for block in blocks.values():
+                block.close()
+                block.unlink()
+            raise
+        results = JobResults(blocks, shapes)
+        rows = units // rowUnits
+        shardCount = max(1, min(rows, self.processes * self.shardsPerProcess))
+        bounds = [rows * i // shardCount * rowUnits for i in range(shardCount)] + [units]
+        control = SharedMemory(create = True, size = _controlHeader + sizeof(c_int64) * shardCount) # zeroed
+        asyncResults = [self._pool.apply_async(_runShard, ((domain, options, control.name, specs, shard, bounds[shard], bounds[shard + 1]), ))
+                        for shard in range(shardCount)]
+        return Job(control, results, asyncResults, shardCount, units)
+
+    def rgbCube(self, outputs = ("lab", "lch"), precision = "float"):
+        '''
+        Converts every 8-bit RGB value to Lab and/or LCH, as doubles of
+        labFromRgb/lchFromRgb (precision "float") or as int8 Lab and int16
+        LCH of labLchFromRgbInt (precision "int"). Outputs are 256³ × 3
+        indexed by r << 16 | g << 8 | b.
+        '''
+        if not outputs or set(outputs) - {"lab", "lch"}:
+            raise Rgb2LabError("Outputs should be some of lab, lch.")
+        if precision not in ("float", "int"):
+            raise Rgb2LabError("Unknown precision {!r}; use float or int.".format(precision))
+        types = {"lab": ("d", 8), "lch": ("d", 8)} if precision == "float" else {"lab": ("b", 1), "lch": ("h", 2)}
+        return self._submit("rgbCube", (precision, tuple(outputs)), 256 ** 3, 256,
+                            {name: (types[name][0], (256 ** 3, 3), types[name][1]) for name in outputs})
+
+    def labGrid(self):
+        '''
+        Converts every integer Lab value to RGB doubles with rgbFromLab:
+        output "rgb" is 101 × 257 × 257 × 3 indexed [l][a + 128][b + 128].
+        For the integer results use tableSlices("ABforL").
+        '''
+        return self._submit("labGrid", None, 101 * _labPlane, 257, {"rgb": ("d", (101, 257, 257, 3), 8)})
+
+    def tableSlices(self, kind):
+        '''
+        Fills the table of fillTable_`kind` for every combination of its
+        fixed values (H being 0 to 359) with the backend in use: output
+        "tables" is TinyRgb bytes shaped by the fixed values in order, then
+        the table shape, then 4; "inGamutCounts" is int32 shaped by the fixed
+        values
+        '''
+        import rgb2lab_int
+        if kind not in rgb2lab_int._tableKinds:
+            raise Rgb2LabError("Unknown table kind {!r}; use one of {}.".format(kind, ", ".join(rgb2lab_int._tableKinds)))
+        fixedRanges, tableShape = _tableSlicesLayout(kind)
+        fixedShape = tuple(len(r) for r in fixedRanges)
+        units = 1
+        for n in fixedShape:
+            units *= n
+        return self._submit("tableSlices", kind, units, 1, {"tables": ("B", fixedShape + tableShape + (4, ), 1),
+                                                            "inGamutCounts": ("i", fixedShape, 4)})
@@ -0,0 +1,173 @@
+// librgb2lab
+// ==========
+//
+// Convert color values from RGB to/from CIE LAB/LCH
+// for sRGB gamut, D65 illuminant, 2° observer
+//
+// Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
+//
+// Use, modification and distribution are permitted subject to the
+// "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
+//
+// Optional CPython extension module _rgb2lab providing the scalar conversion
+// functions of rgb2lab.py and rgb2lab_int.py without the CTypes marshalling.
+// It links to librgb2lab.so so that settings like fast math are shared with
+// the CTypes-based functions.
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include <stdbool.h>
+#include "rgb2lab.h"
+#include "rgb2lab_int.h"
+
+static PyObject * Rgb2LabError; // from rgb2lab_common
+
+// NOTE: the checks and messages below must stay in sync with rgb2lab_common.py
+
+typedef enum { RGB01, RGB256, LAB, LCH } InputKind;
+
+static const char * const invalidInputMessages[] = {
+    "RGB values should be in the range [0, 1].",
+    "RGB values should be in the range [0, 255].",
+    "L, A and B values should be in the ranges [0, 100], [-128, +128] and [-128, +128] respectively.",
+    "L, C and H values should be in the ranges [0, 100], [0, 180] and [0, 360) respectively. H may be -1 only if C is 0.",
+};
+
+static bool _valid(InputKind kind, const double v[3])
+{
+    switch (kind)
+    {
+        case RGB01:
+        case RGB256:
+        {
+            double max = kind == RGB01 ? 1 : 255;
+            for (int i = 0; i < 3; ++i)
+                if (!(0 <= v[i] && v[i] <= max)) return false;
+            return true;
+        }
+        case LAB:
+            return 0 <= v[0] && v[0] <= 100 && -128 <= v[1] && v[1] <= 128 && -128 <= v[2] && v[2] <= 128;
+        case LCH:
+            return 0 <= v[0] && v[0] <= 100 &&
+                   ((0 <= v[1] && v[1] <= 180 && 0 <= v[2] && v[2] < 360) || (v[1] == 0 && v[2] == -1));
+    }
+    return false;
+}
+
+// Read and check a sequence of three numbers; integers only if `ints` is given
+static bool _parseTriplet(const char * fnName, PyObject * const * args, Py_ssize_t nargs,
+                          InputKind kind, double v[3], int ints[3])
+{
+    if (nargs != 1)
+    {
+        PyErr_Format(PyExc_TypeError, "%s() takes exactly one argument (%zd given)", fnName, nargs);
+        return false;
+    }
+    PyObject * seq = PySequence_Fast(args[0], "argument should be a sequence of three numbers");
+    if (!seq) return false;
+    if (PySequence_Fast_GET_SIZE(seq) != 3)
+    {
+        Py_DECREF(seq);
+        PyErr_Format(PyExc_ValueError, "expected 3 values, got %zd", PySequence_Fast_GET_SIZE(seq));
+        return false;
+    }
+    PyObject ** items = PySequence_Fast_ITEMS(seq);
+    for (int i = 0; i < 3; ++i)
+    {
+        if (ints)
+        {
+            long l = PyLong_AsLong(items[i]);
+            v[i] = l;
+            ints[i] = l; // only used if in range as checked below
+        }
+        else
+            v[i] = PyFloat_AsDouble(items[i]);
+        if (PyErr_Occurred())
+        {
+            Py_DECREF(seq);
+            return false;
+        }
+    }
+    Py_DECREF(seq);
+    if (!_valid(kind, v))
+    {
+        PyErr_SetString(Rgb2LabError, invalidInputMessages[kind]);
+        return false;
+    }
+    return true;
+}
+
+#define DEFINE_RET_ONE_FN(FN, KIND) \
+static PyObject * py_##FN(PyObject * Py_UNUSED(module), PyObject * const * args, Py_ssize_t nargs) \
+{ \
+    DoubleTriplet in; \
+    if (!_parseTriplet(#FN, args, nargs, KIND, in.data, NULL)) return NULL; \
+    DoubleTriplet out = FN(in); \
+    return Py_BuildValue("(ddd)", out.data[0], out.data[1], out.data[2]); \
+}
+
+#define DEFINE_RET_ONE_INT_FN(FN, KIND) \
+static PyObject * py_##FN(PyObject * Py_UNUSED(module), PyObject * const * args, Py_ssize_t nargs) \
+{ \
+    double v[3]; \
+    IntTriplet in; \
+    if (!_parseTriplet(#FN, args, nargs, KIND, v, in.data)) return NULL; \
+    IntTriplet out = FN(in); \
+    return Py_BuildValue("(iii)", out.data[0], out.data[1], out.data[2]); \
+}
+
+#define DEFINE_RET_TWO_INT_FN(FN, KIND) \
+static PyObject * py_##FN(PyObject * Py_UNUSED(module), PyObject * const * args, Py_ssize_t nargs) \
+{ \
+    double v[3]; \
+    IntTriplet in, out1, out2; \
+    if (!_parseTriplet(#FN, args, nargs, KIND, v, in.data)) return NULL; \
+    FN(in, &out1, &out2); \
+    return Py_BuildValue("((iii)(iii))", out1.data[0], out1.data[1], out1.data[2], \
+                                         out2.data[0], out2.data[1], out2.data[2]); \
+}
+
+DEFINE_RET_ONE_FN(labFromRgb, RGB01)
+DEFINE_RET_ONE_FN(rgbFromLab, LAB)
+DEFINE_RET_ONE_FN(lchFromRgb, RGB01)
+DEFINE_RET_ONE_FN(rgbFromLch, LCH)
+DEFINE_RET_ONE_FN(lchFromLab, LAB)
+DEFINE_RET_ONE_FN(labFromLch, LCH)
+
+DEFINE_RET_ONE_INT_FN(labFromRgbInt, RGB256)
+DEFINE_RET_ONE_INT_FN(rgbFromLabInt, LAB)
+DEFINE_RET_ONE_INT_FN(lchFromRgbInt, RGB256)
+DEFINE_RET_ONE_INT_FN(rgbFromLchInt, LCH)
+DEFINE_RET_ONE_INT_FN(lchFromLabInt, LAB)
+DEFINE_RET_ONE_INT_FN(labFromLchInt, LCH)
+
+DEFINE_RET_TWO_INT_FN(labLchFromRgbInt, RGB256)
+DEFINE_RET_TWO_INT_FN(rgbLchFromLabInt, LAB)
+DEFINE_RET_TWO_INT_FN(rgbLabFromLchInt, LCH)
+
+#define METHOD(FN) {#FN, (PyCFunction)(void (*)(void)) py_##FN, METH_FASTCALL, NULL}
+
+static PyMethodDef methods[] = {
+    METHOD(labFromRgb), METHOD(rgbFromLab), METHOD(lchFromRgb),
+    METHOD(rgbFromLch), METHOD(lchFromLab), METHOD(labFromLch),
+    METHOD(labFromRgbInt), METHOD(rgbFromLabInt), METHOD(lchFromRgbInt),
+    METHOD(rgbFromLchInt), METHOD(lchFromLabInt), METHOD(labFromLchInt),
+    METHOD(labLchFromRgbInt), METHOD(rgbLchFromLabInt), METHOD(rgbLabFromLchInt),
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef module = {
+    PyModuleDef_HEAD_INIT, "_rgb2lab",
+    "Native scalar conversion functions used by rgb2lab and rgb2lab_int when available",
+    -1, methods, NULL, NULL, NULL, NULL
+};
+
+PyMODINIT_FUNC PyInit__rgb2lab(void)
+{
+    PyObject * common = PyImport_ImportModule("rgb2lab_common");
+    if (!common) return NULL;
+    Rgb2LabError = PyObject_GetAttrString(common, "Rgb2LabError");
+    Py_DECREF(common);
+    if (!Rgb2LabError) return NULL;
+    return PyModule_Create(&module);
+}
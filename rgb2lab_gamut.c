@@ -0,0 +1,515 @@
+// librgb2lab
+// ==========
+//
+// Convert color values from RGB to/from CIE LAB/LCH
+// for sRGB gamut, D65 illuminant, 2° observer
+//
+// Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
+//
+// Use, modification and distribution are permitted subject to the
+// "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
+
+#include "rgb2lab_gamut.h"
+#include "rgb2lab_threads.h"
+#include <math.h>
+#include <stdbool.h>
+#include <stdlib.h>
+#include <string.h>
+
+static bool _rgbInGamut(DoubleTriplet rgb)
+{
+    // written so that NaN is out of gamut
+    for (int i = 0; i < 3; ++i)
+        if (!(-GAMUT_TOLERANCE <= rgb.data[i] && rgb.data[i] <= 1 + GAMUT_TOLERANCE)) return false;
+    return true;
+}
+
+int isInGamutLab(DoubleTriplet lab) { return _rgbInGamut(rgbFromLab(lab)); }
+int isInGamutLch(DoubleTriplet lch) { return _rgbInGamut(rgbFromLch(lch)); }
+
+static const double PI = 3.14159265358979323846; // acos(-1)
+static const double CHROMA_PRECISION = 1e-6; // far below the 8-bit RGB quantization
+static const double CHROMA_SEARCH_LIMIT = 200; // above the sRGB maximum of about 134
+
+// How far the RGB of a color is outside [0, 1] beyond GAMUT_TOLERANCE: positive
+// if and only if the color is out of gamut
+static double _gamutExcess(double l, double c, double h)
+{
+    DoubleTriplet lch = {{l, c, h}};
+    DoubleTriplet rgb = rgbFromLch(lch);
+    double excess = -INFINITY;
+    for (int i = 0; i < 3; ++i)
+    {
+        if (isnan(rgb.data[i])) return INFINITY;
+        excess = fmax(excess, fmax(rgb.data[i] - 1, -rgb.data[i]) - GAMUT_TOLERANCE);
+    }
+    return excess;
+}
+
+enum { MAX_CHROMA_SEARCH_STEPS = 100 }; // safeguard; typically fewer than 10 are needed
+
+// Finds the maximum in-gamut chroma between `lo`, which must be in gamut, and
+// `hi` which must not, to within CHROMA_PRECISION by the Illinois variant of
+// regula falsi on the gamut excess, falling back to bisection when it stalls
+// NOTE: at any given L and h the in-gamut chromas mostly form a single interval
+// starting at 0, but near the yellow cusp a second one follows a gap (e.g. at
+// L = 96, h = 102: [0, 39.9] and about [89.6, 95.4]) and this finds the first;
+// see GamutBoundary.ceiling
+static double _solveMaxChroma(double l, double h, double lo, double hi)
+{
+    double fLo = _gamutExcess(l, lo, h), fHi = _gamutExcess(l, hi, h);
+    int side = 0;
+    for (int i = 0; i < MAX_CHROMA_SEARCH_STEPS && hi - lo > CHROMA_PRECISION; ++i)
+    {
+        double c = (lo * fHi - hi * fLo) / (fHi - fLo);
+        if (!(lo < c && c < hi) || isinf(fHi)) c = (lo + hi) / 2;
+        double f = _gamutExcess(l, c, h);
+        if (f <= 0)
+        {
+            lo = c; fLo = f;
+            if (side == -1) fHi /= 2;
+            side = -1;
+        }
+        else
+        {
+            hi = c; fHi = f;
+            if (side == 1) fLo /= 2;
+            side = 1;
+        }
+    }
+    return lo;
+}
+
+static double _exactMaxChroma(double l, double h)
+{
+    DoubleTriplet lch = {{l, 0, h}};
+    if (!isInGamutLch(lch)) return 0;
+    return _solveMaxChroma(l, h, 0, CHROMA_SEARCH_LIMIT);
+}
+
+struct GamutBoundary
+{
+    int lSteps, hSteps;
+    double * maxC;   // (lSteps + 1) × (hSteps + 1); last column repeats the first for wraparound
+    double * margin; // lSteps × hSteps; interpolation error bound per cell
+    double * ceiling; // lSteps × hSteps; bound on the chroma of in-gamut colors per cell
+};
+
+#define MAX_C(gb, i, j) (gb)->maxC[(i) * ((gb)->hSteps + 1) + (j)]
+
+// Interpolates at grid coordinates `x` ∈ [0, lSteps] and `y` ∈ [0, hSteps]
+// and gives the cell containing them via `cell`
+static double _interpolate(const GamutBoundary * gb, double x, double y, size_t * cell)
+{
+    int i = (int)x, j = (int)y;
+    if (i >= gb->lSteps) i = gb->lSteps - 1;
+    if (j >= gb->hSteps) j = gb->hSteps - 1;
+    double t = x - i, u = y - j;
+    *cell = (size_t)i * gb->hSteps + j;
+    return (1 - t) * ((1 - u) * MAX_C(gb, i    , j) + u * MAX_C(gb, i    , j + 1)) +
+                t  * ((1 - u) * MAX_C(gb, i + 1, j) + u * MAX_C(gb, i + 1, j + 1));
+}
+
+static double _lStep(const GamutBoundary * gb) { return 100.0 / gb->lSteps; }
+static double _hStep(const GamutBoundary * gb) { return 360.0 / gb->hSteps; }
+
+static long _fillMaxChromaRows(void * gb_, size_t begin, size_t end)
+{
+    GamutBoundary * gb = gb_;
+    for (size_t i = begin; i < end; ++i)
+    {
+        for (int j = 0; j < gb->hSteps; ++j)
+            MAX_C(gb, i, j) = _exactMaxChroma(i * _lStep(gb), j * _hStep(gb));
+        MAX_C(gb, i, gb->hSteps) = MAX_C(gb, i, 0);
+    }
+    return 0;
+}
+
+// The interpolation error of each cell is sampled at its centre and at the
+// midpoints of its lower edges (the others belong to neighbouring cells)
+static long _fillErrorRows(void * gb_, size_t begin, size_t end)
+{
+    GamutBoundary * gb = gb_;
+    static const double samples[3][2] = {{0.5, 0.5}, {0.5, 0}, {0, 0.5}};
+    for (size_t i = begin; i < end; ++i)
+        for (int j = 0; j < gb->hSteps; ++j)
+        {
+            double maxError = 0;
+            size_t cell;
+            for (int s = 0; s < 3; ++s)
+            {
+                double x = i + samples[s][0], y = j + samples[s][1];
+                double error = fabs(_exactMaxChroma(x * _lStep(gb), y * _hStep(gb)) - _interpolate(gb, x, y, &cell));
+                if (error > maxError) maxError = error;
+            }
+            gb->margin[i * gb->hSteps + j] = maxError;
+        }
+    return 0;
+}
+
+// Second difference of the table at node (i, j) along L or along h, whose
+// quarter bounds the interpolation error at a kink of the boundary next to it
+static double _secondDifference(const GamutBoundary * gb, int i, int j)
+{
+    int jPrev = (j + gb->hSteps - 1) % gb->hSteps, jNext = (j + 1) % gb->hSteps;
+    double d = fabs(MAX_C(gb, i, jPrev) - 2 * MAX_C(gb, i, j) + MAX_C(gb, i, jNext));
+    if (0 < i && i < gb->lSteps)
+        d = fmax(d, fabs(MAX_C(gb, i - 1, j) - 2 * MAX_C(gb, i, j) + MAX_C(gb, i + 1, j)));
+    return d;
+}
+
+// As the samples can miss the worst error near kinks of the boundary, the
+// error bound of a cell is twice the largest sampled error of it and its
+// neighbours (wrapping around in hue) or half the largest second difference
+// at their corners, whichever is more
+static void _dilateErrors(GamutBoundary * gb, const double * errors)
+{
+    for (int i = 0; i < gb->lSteps; ++i)
+        for (int j = 0; j < gb->hSteps; ++j)
+        {
+            double maxError = 0, maxDifference = 0;
+            for (int di = -1; di <= 1; ++di)
+            {
+                if (i + di < 0 || i + di >= gb->lSteps) continue;
+                for (int dj = -1; dj <= 1; ++dj)
+                {
+                    int jj = (j + dj + gb->hSteps) % gb->hSteps;
+                    maxError = fmax(maxError, errors[(i + di) * gb->hSteps + jj]);
+                    maxDifference = fmax(maxDifference, _secondDifference(gb, i + di, jj));
+                }
+            }
+            gb->margin[i * gb->hSteps + j] = fmax(2 * maxError, maxDifference / 2) + 1e-9;
+        }
+}
+
+// As the highest in-gamut chroma at any L and h, including that of a second
+// interval, is on the surface of the RGB cube, a cell's ceiling is the highest
+// chroma of the quads of a fine grid on the surface which reach it. A quad is
+// nearly flat in Lab, so its L, and its chroma (convex in a and b), stay within
+// their ranges at the corners, as do its hues unless it's near the achromatic
+// axis; CEILING_SLACK covers the slight curvature.
+enum { CEILING_GRID = 256 }; // grid points per cube edge
+static const double CEILING_SLACK = 0.01;
+
+typedef struct { int face; DoubleTriplet * lab, * lch; } FaceJob;
+
+static long _fillFaceRows(void * job_, size_t begin, size_t end)
+{
+    const FaceJob * job = job_;
+    int axis = job->face / 2;
+    for (size_t u = begin; u < end; ++u)
+        for (int v = 0; v < CEILING_GRID; ++v)
+        {
+            DoubleTriplet rgb;
+            rgb.data[axis] = job->face % 2;
+            rgb.data[(axis + 1) % 3] = u / (CEILING_GRID - 1.0);
+            rgb.data[(axis + 2) % 3] = v / (CEILING_GRID - 1.0);
+            job->lab[u * CEILING_GRID + v] = labFromRgb(rgb);
+            job->lch[u * CEILING_GRID + v] = lchFromLab(job->lab[u * CEILING_GRID + v]);
+        }
+    return 0;
+}
+
+static void _fillCeilings(GamutBoundary * gb, DoubleTriplet * lab, DoubleTriplet * lch)
+{
+    for (int i = 0; i < gb->lSteps * gb->hSteps; ++i) gb->ceiling[i] = 0;
+    for (int face = 0; face < 6; ++face)
+    {
+        FaceJob job = {face, lab, lch};
+        parallelFor(CEILING_GRID, 1, _fillFaceRows, &job);
+        for (int u = 0; u < CEILING_GRID - 1; ++u)
+            for (int v = 0; v < CEILING_GRID - 1; ++v)
+            {
+                size_t index[4] = {u * CEILING_GRID + v, u * CEILING_GRID + v + 1, (u + 1) * CEILING_GRID + v, (u + 1) * CEILING_GRID + v + 1};
+                const DoubleTriplet * corner[4] = {&lch[index[0]], &lch[index[1]], &lch[index[2]], &lch[index[3]]};
+                double lMin = 100, lMax = 0, cMin = INFINITY, cMax = 0, dMin = 0, dMax = 0, size = 0;
+                for (int k = 0; k < 4; ++k)
+                {
+                    const DoubleTriplet * a = &lab[index[k]];
+                    for (int m = 0; m < k; ++m)
+                    {
+                        const DoubleTriplet * b = &lab[index[m]];
+                        size = fmax(size, sqrt((a->L - b->L) * (a->L - b->L) + (a->A - b->A) * (a->A - b->A) + (a->B - b->B) * (a->B - b->B)));
+                    }
+                    double d = remainder(corner[k]->h - corner[0]->h, 360); // hue relative to the first corner
+                    lMin = fmin(lMin, corner[k]->l); lMax = fmax(lMax, corner[k]->l);
+                    cMin = fmin(cMin, corner[k]->c); cMax = fmax(cMax, corner[k]->c);
+                    dMin = fmin(dMin, d); dMax = fmax(dMax, d);
+                }
+                int iFirst = fmax(0, floor((lMin - CEILING_SLACK) / _lStep(gb)));
+                int iLast = fmin(gb->lSteps - 1, floor((lMax + CEILING_SLACK) / _lStep(gb)));
+                int jFirst = 0, jLast = gb->hSteps - 1;
+                if (cMin > size) // else it may contain the achromatic axis: all hues
+                {
+                    double hSlack = asin(CEILING_SLACK / cMin) * 180 / PI;
+                    jFirst = floor((corner[0]->h + dMin - hSlack) / _hStep(gb));
+                    jLast = floor((corner[0]->h + dMax + hSlack) / _hStep(gb));
+                }
+                for (int i = iFirst; i <= iLast; ++i)
+                    for (int j = jFirst; j <= jLast; ++j)
+                    {
+                        double * ceiling = &gb->ceiling[i * gb->hSteps + (j % gb->hSteps + gb->hSteps) % gb->hSteps];
+                        *ceiling = fmax(*ceiling, cMax + CEILING_SLACK);
+                    }
+            }
+    }
+}
+
+GamutBoundary * newGamutBoundary(int lSteps, int hSteps)
+{
+    if (lSteps < 1 || hSteps < 1) return NULL;
+    GamutBoundary * gb = malloc(sizeof(GamutBoundary));
+    if (!gb) return NULL;
+    gb->lSteps = lSteps; gb->hSteps = hSteps;
+    gb->maxC = malloc(sizeof(double) * (lSteps + 1) * (hSteps + 1));
+    gb->margin = malloc(sizeof(double) * lSteps * hSteps);
+    gb->ceiling = malloc(sizeof(double) * lSteps * hSteps);
+    if (!gb->maxC || !gb->margin || !gb->ceiling)
+    {
+        freeGamutBoundary(gb);
+        return NULL;
+    }
+    parallelFor(lSteps + 1, 1, _fillMaxChromaRows, gb);
+    parallelFor(lSteps, 1, _fillErrorRows, gb);
+    double * errors = malloc(sizeof(double) * lSteps * hSteps);
+    if (!errors)
+    {
+        freeGamutBoundary(gb);
+        return NULL;
+    }
+    memcpy(errors, gb->margin, sizeof(double) * lSteps * hSteps);
+    _dilateErrors(gb, errors);
+    free(errors);
+    DoubleTriplet * face = malloc(sizeof(DoubleTriplet) * 2 * CEILING_GRID * CEILING_GRID); // Lab and LCH of a face
+    if (!face)
+    {
+        freeGamutBoundary(gb);
+        return NULL;
+    }
+    _fillCeilings(gb, face, face + CEILING_GRID * CEILING_GRID);
+    free(face);
+    return gb;
+}
+
+void freeGamutBoundary(GamutBoundary * gb)
+{
+    if (!gb) return;
+    free(gb->maxC);
+    free(gb->margin);
+    free(gb->ceiling);
+    free(gb);
+}
+
+// Returns the interpolated maximum chroma for valid L and h else NaN
+static double _lookup(const GamutBoundary * gb, double l, double h, size_t * cell)
+{
+    if (!(0 <= l && l <= 100 && 0 <= h && h < 360)) return nan("");
+    return _interpolate(gb, l / _lStep(gb), h / _hStep(gb), cell);
+}
+
+static bool _isInGamutLch(const GamutBoundary * gb, DoubleTriplet lch)
+{
+    size_t cell;
+    double maxC = _lookup(gb, lch.l, lch.h, &cell);
+    if (!isnan(maxC))
+    {
+        if (0 <= lch.c && lch.c <= maxC - gb->margin[cell]) return true;
+        if (lch.c > fmax(maxC + gb->margin[cell], gb->ceiling[cell])) return false;
+    }
+    return isInGamutLch(lch); // near the boundary or unusual input
+}
+
+// Like lchFromLab but with h in [0, 360) even after rounding
+static DoubleTriplet _lchFromLab(DoubleTriplet lab)
+{
+    DoubleTriplet lch = lchFromLab(lab);
+    if (lch.h >= 360) lch.h = 0; // by rounding of tiny negative angles
+    return lch;
+}
+
+typedef struct { const GamutBoundary * gb; const DoubleTriplet * src; void * dst; } GamutJob;
+
+enum { GAMUT_MIN_CHUNK = 16384 }; // triplets
+
+static long _maxChromaChunk(void * job_, size_t begin, size_t end)
+{
+    const GamutJob * job = job_;
+    double * dst = job->dst;
+    size_t cell;
+    for (size_t i = begin; i < end; ++i) dst[i] = _lookup(job->gb, job->src[i].l, job->src[i].h, &cell);
+    return 0;
+}
+
+static long _isInGamutLchChunk(void * job_, size_t begin, size_t end)
+{
+    const GamutJob * job = job_;
+    unsigned char * dst = job->dst;
+    for (size_t i = begin; i < end; ++i) dst[i] = _isInGamutLch(job->gb, job->src[i]);
+    return 0;
+}
+
+static long _isInGamutLabChunk(void * job_, size_t begin, size_t end)
+{
+    const GamutJob * job = job_;
+    unsigned char * dst = job->dst;
+    for (size_t i = begin; i < end; ++i)
+    {
+        DoubleTriplet lab = job->src[i];
+        if (lab.A == 0 && lab.B == 0) { dst[i] = isInGamutLab(lab); continue; } // achromatic
+        dst[i] = _isInGamutLch(job->gb, _lchFromLab(lab));
+    }
+    return 0;
+}
+
+void gamutMaxChromaArray(const GamutBoundary * gb, const DoubleTriplet * lch, double * dst, size_t n)
+{
+    GamutJob job = {gb, lch, dst};
+    parallelFor(n, GAMUT_MIN_CHUNK, _maxChromaChunk, &job);
+}
+
+void isInGamutLabArray(const GamutBoundary * gb, const DoubleTriplet * lab, unsigned char * dst, size_t n)
+{
+    GamutJob job = {gb, lab, dst};
+    parallelFor(n, GAMUT_MIN_CHUNK, _isInGamutLabChunk, &job);
+}
+
+void isInGamutLchArray(const GamutBoundary * gb, const DoubleTriplet * lch, unsigned char * dst, size_t n)
+{
+    GamutJob job = {gb, lch, dst};
+    parallelFor(n, GAMUT_MIN_CHUNK, _isInGamutLchChunk, &job);
+}
+
+// Gamut mapping
+// =============
+
+// Exact maximum in-gamut chroma for L in [0, 100] and h in [0, 360) searched
+// for within the error bound around the table's estimate
+static double _maxChromaNear(const GamutBoundary * gb, double l, double h)
+{
+    size_t cell;
+    double estimate = _lookup(gb, l, h, &cell);
+    double lo = fmax(0, estimate - gb->margin[cell]), hi = fmin(CHROMA_SEARCH_LIMIT, estimate + gb->margin[cell]);
+    DoubleTriplet lch = {{l, lo, h}};
+    if (!isInGamutLch(lch))
+    {
+        lch.c = lo = 0;
+        if (!isInGamutLch(lch)) return 0; // only by rounding at L = 0 or 100
+    }
+    lch.c = hi;
+    if (isInGamutLch(lch)) { lo = hi; hi = CHROMA_SEARCH_LIMIT; } // estimate was off; search above it
+    return _solveMaxChroma(l, h, lo, hi);
+}
+
+// In-gamut point of the plane of hue `h` at lightness `l` nearest to `lch`
+// which is outside the gamut and its squared distance from it
+static double _nearestAtL(const GamutBoundary * gb, DoubleTriplet lch, double l, DoubleTriplet * nearest)
+{
+    *nearest = lch;
+    nearest->l = l;
+    nearest->c = fmin(lch.c, _maxChromaNear(gb, l, lch.h));
+    return (lch.l - l) * (lch.l - l) + (lch.c - nearest->c) * (lch.c - nearest->c);
+}
+
+// Nearest point to (l, c) of the segment from (l0, c0) to (l1, c1) as its L and squared distance
+static double _nearestOnSegment(double l, double c, double l0, double c0, double l1, double c1, double * nearestL)
+{
+    double dl = l1 - l0, dc = c1 - c0;
+    double t = fmin(1, fmax(0, ((l - l0) * dl + (c - c0) * dc) / (dl * dl + dc * dc)));
+    double pl = l0 + t * dl, pc = c0 + t * dc;
+    *nearestL = pl;
+    return (l - pl) * (l - pl) + (c - pc) * (c - pc);
+}
+
+// Hue-preserving mapping to the nearest point of the boundary in the plane of
+// constant hue (HPMINDE): the nearest point of the polyline through the
+// table's (L, interpolated C) nodes is found, then refined on the polyline
+// through the exact boundary at the table node nearest to it and its two
+// neighbours; the result of chroma clipping is taken instead if nearer
+static DoubleTriplet _nearestInHuePlane(const GamutBoundary * gb, DoubleTriplet lch)
+{
+    double lStep = _lStep(gb), bestL = 0, bestDistance = INFINITY, l;
+    size_t cell;
+    double l0 = 0, c0 = _lookup(gb, 0, lch.h, &cell);
+    for (int i = 1; i <= gb->lSteps; ++i)
+    {
+        double l1 = i == gb->lSteps ? 100 : i * lStep, c1 = _lookup(gb, l1, lch.h, &cell);
+        double distance = _nearestOnSegment(lch.l, lch.c, l0, c0, l1, c1, &l);
+        if (distance < bestDistance) { bestDistance = distance; bestL = l; }
+        l0 = l1; c0 = c1;
+    }
+
+    int k = (int)lround(bestL / lStep);
+    double nodeL[3], nodeC[3];
+    for (int i = 0; i < 3; ++i)
+    {
+        int node = k - 1 + i;
+        node = node < 0 ? 0 : node > gb->lSteps ? gb->lSteps : node;
+        nodeL[i] = node == gb->lSteps ? 100 : node * lStep;
+        nodeC[i] = _maxChromaNear(gb, nodeL[i], lch.h);
+    }
+    bestDistance = INFINITY;
+    for (int i = 0; i < 2; ++i)
+    {
+        if (nodeL[i] == nodeL[i + 1]) continue; // at either end of the L range
+        double distance = _nearestOnSegment(lch.l, lch.c, nodeL[i], nodeC[i], nodeL[i + 1], nodeC[i + 1], &l);
+        if (distance < bestDistance) { bestDistance = distance; bestL = l; }
+    }
+
+    DoubleTriplet best, clipped;
+    bestDistance = _nearestAtL(gb, lch, bestL, &best);
+    if (_nearestAtL(gb, lch, fmin(100, fmax(0, lch.l)), &clipped) < bestDistance) best = clipped;
+    return best;
+}
+
+static DoubleTriplet _mapLch(const GamutBoundary * gb, DoubleTriplet lch, GamutMapMethod method)
+{
+    if (isnan(lch.l) || isnan(lch.c) || isnan(lch.h)) return (DoubleTriplet){{nan(""), nan(""), nan("")}};
+    if (!_isInGamutLch(gb, lch))
+    {
+        if (!(lch.c > 0) || lch.h == -1) // achromatic or invalid
+            lch.c = 0, lch.h = -1, lch.l = fmin(100, fmax(0, lch.l));
+        else
+        {
+            lch.h = fmod(lch.h, 360);
+            if (lch.h < 0) lch.h += 360;
+            if (method == GAMUT_MAP_NEAREST)
+                lch = _nearestInHuePlane(gb, lch);
+            else
+            {
+                lch.l = fmin(100, fmax(0, lch.l));
+                lch.c = fmin(lch.c, _maxChromaNear(gb, lch.l, lch.h));
+            }
+        }
+    }
+    DoubleTriplet rgb = rgbFromLch(lch);
+    for (int i = 0; i < 3; ++i) rgb.data[i] = fmin(1, fmax(0, rgb.data[i])); // remove GAMUT_TOLERANCE
+    return rgb;
+}
+
+typedef struct { const GamutBoundary * gb; const DoubleTriplet * src; DoubleTriplet * dst; GamutMapMethod method; } GamutMapJob;
+
+static long _mapLchChunk(void * job_, size_t begin, size_t end)
+{
+    const GamutMapJob * job = job_;
+    for (size_t i = begin; i < end; ++i) job->dst[i] = _mapLch(job->gb, job->src[i], job->method);
+    return 0;
+}
+
+static long _mapLabChunk(void * job_, size_t begin, size_t end)
+{
+    const GamutMapJob * job = job_;
+    for (size_t i = begin; i < end; ++i) job->dst[i] = _mapLch(job->gb, _lchFromLab(job->src[i]), job->method);
+    return 0;
+}
+
+void rgbFromLabMappedArray(const GamutBoundary * gb, const DoubleTriplet * lab, DoubleTriplet * dst, size_t n, GamutMapMethod method)
+{
+    GamutMapJob job = {gb, lab, dst, method};
+    parallelFor(n, GAMUT_MIN_CHUNK, _mapLabChunk, &job);
+}
+
+void rgbFromLchMappedArray(const GamutBoundary * gb, const DoubleTriplet * lch, DoubleTriplet * dst, size_t n, GamutMapMethod method)
+{
+    GamutMapJob job = {gb, lch, dst, method};
+    parallelFor(n, GAMUT_MIN_CHUNK, _mapLchChunk, &job);
+}
@@ -0,0 +1,67 @@
+// librgb2lab
+// ==========
+//
+// Convert color values from RGB to/from CIE LAB/LCH
+// for sRGB gamut, D65 illuminant, 2° observer
+//
+// Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
+//
+// Use, modification and distribution are permitted subject to the
+// "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
+
+#include "rgb2lab.h"
+
+// A color is in gamut if its RGB components are in [0, 1] give or take this much
+// which absorbs the rounding error of the conversion matrices (about 1e-6)
+// NOTE: this is stricter than the integer functions of rgb2lab_int.h, which
+// accept any RGB that rounds to 8 bits in [0, 255], i.e. give or take 0.5 / 255.
+// So every in-gamut color is valid for rgbFromLchInt and the fillTable_*
+// functions but not conversely: 8,370 of the 6,581,160 integer LCH points
+// (L 0..100, C 0..180, h 0..359) are valid for those yet out of gamut here.
+#define GAMUT_TOLERANCE 1e-5
+
+// Exact in-gamut tests by conversion to RGB
+int isInGamutLab(DoubleTriplet lab);
+int isInGamutLch(DoubleTriplet lch);
+
+// Gamut boundary descriptor
+// =========================
+//
+// Table of the maximum in-gamut chroma at `lSteps` + 1 lightnesses evenly
+// spaced over [0, 100] and `hSteps` hues evenly spaced over [0, 360), found
+// by root finding, plus an estimated bound per table cell of the error of
+// interpolating in it. Returns NULL if either step count is less than 1 or
+// allocation fails.
+typedef struct GamutBoundary GamutBoundary;
+GamutBoundary * newGamutBoundary(int lSteps, int hSteps);
+void freeGamutBoundary(GamutBoundary * gb);
+
+// Approximate maximum in-gamut chroma for the L and h of each of `n` LCH
+// triplets (c is ignored) by bilinear interpolation in the table
+// NOTE: near the yellow cusp (L above about 95, h about 100 to 105) a few
+// colors beyond this chroma are in gamut again after a gap; the tests below
+// allow for that
+void gamutMaxChromaArray(const GamutBoundary * gb, const DoubleTriplet * lch, double * dst, size_t n);
+
+// In-gamut tests giving 1 or 0 for each of `n` triplets, meant to agree with
+// the exact tests above: colors whose chroma is within the cell's error bound
+// of the interpolated maximum are converted to RGB; others need only the lookup
+void isInGamutLabArray(const GamutBoundary * gb, const DoubleTriplet * lab, unsigned char * dst, size_t n);
+void isInGamutLchArray(const GamutBoundary * gb, const DoubleTriplet * lch, unsigned char * dst, size_t n);
+
+// Gamut mapping
+// =============
+//
+// Convert `n` Lab or LCH triplets to RGB in [0, 1], first mapping colors
+// outside the sRGB gamut onto its boundary by either of:
+//     GAMUT_MAP_CHROMA: reducing chroma keeping L (clipped to [0, 100]) and h
+//     GAMUT_MAP_NEAREST: moving to the nearest point of the boundary in the plane
+//         of constant h (HPMINDE, i.e. minimum ΔE76 keeping hue), searching
+//         near the nearest point of the table's boundary; never farther than
+//         GAMUT_MAP_CHROMA but a few times slower
+// In both, the final chroma is solved for within the table's error
+// bound. Colors already in gamut are only converted; NaN inputs give NaN.
+// `src` and `dst` may be the same array for in-place conversion.
+typedef enum { GAMUT_MAP_CHROMA, GAMUT_MAP_NEAREST } GamutMapMethod;
+void rgbFromLabMappedArray(const GamutBoundary * gb, const DoubleTriplet * lab, DoubleTriplet * dst, size_t n, GamutMapMethod method);
+void rgbFromLchMappedArray(const GamutBoundary * gb, const DoubleTriplet * lch, DoubleTriplet * dst, size_t n, GamutMapMethod method);
@@ -0,0 +1,132 @@
+# librgb2lab
+# ==========
+#
+# Convert color values from RGB to/from CIE LAB/LCH
+# for sRGB gamut, D65 illuminant, 2° observer
+#
+# Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
+#
+# Use, modification and distribution are permitted subject to the
+# "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
+
+import rgb2lab_common
+from rgb2lab_common import *
+from ctypes import c_double, c_int, c_size_t, c_ubyte, c_void_p, POINTER, Structure, sizeof
+
+_lib = rgb2lab_common._lib
+
+class _Triplet(Structure): _fields_ = ("data", c_double * 3), # same layout as the DoubleTriplet union
+
+_DoublePtr = POINTER(c_double)
+_lib.isInGamutLab.argtypes = [_Triplet]
+_lib.isInGamutLch.argtypes = [_Triplet]
+_lib.newGamutBoundary.argtypes = [c_int, c_int]
+_lib.newGamutBoundary.restype = c_void_p
+_lib.freeGamutBoundary.argtypes = [c_void_p]
+_lib.freeGamutBoundary.restype = None
+_lib.gamutMaxChromaArray.argtypes = [c_void_p, _DoublePtr, _DoublePtr, c_size_t]
+_lib.isInGamutLabArray.argtypes = [c_void_p, _DoublePtr, POINTER(c_ubyte), c_size_t]
+_lib.isInGamutLchArray.argtypes = [c_void_p, _DoublePtr, POINTER(c_ubyte), c_size_t]
+_lib.rgbFromLabMappedArray.argtypes = [c_void_p, _DoublePtr, _DoublePtr, c_size_t, c_int]
+_lib.rgbFromLchMappedArray.argtypes = [c_void_p, _DoublePtr, _DoublePtr, c_size_t, c_int]
+for _f in (_lib.gamutMaxChromaArray, _lib.isInGamutLabArray, _lib.isInGamutLchArray,
+           _lib.rgbFromLabMappedArray, _lib.rgbFromLchMappedArray):
+    _f.restype = None
+
+# Gamut mapping methods; see rgb2lab_gamut.h
+gamutMapMethods = {"chroma": 0, "nearest": 1}
+
+def _output(out, T, n):
+    if out is None:
+        out = memoryview(bytearray(sizeof(T) * n)).cast(T._type_)
+    outPtr, outN = rgb2lab_common._asBuffer(out, T, 1, writable = True)
+    if outN != n:
+        raise Rgb2LabError("Output buffer holds {} items but input has {} triplets.".format(outN, n))
+    return out, outPtr
+
+def _mapFn(libFn):
+    def fn(self, src, out = None, method = "chroma"):
+        try:
+            m = gamutMapMethods[method]
+        except KeyError:
+            raise Rgb2LabError("Unknown gamut mapping method {!r}; use one of {}.".format(method, ", ".join(gamutMapMethods))) from None
+        srcPtr, n = rgb2lab_common._asBuffer(src, c_double, 3)
+        if out is None:
+            out = rgb2lab_common._newBuffer(c_double, n, 3)
+        outPtr, outN = rgb2lab_common._asBuffer(out, c_double, 3, writable = True)
+        if outN != n:
+            raise Rgb2LabError("Output buffer holds {} rows but input has {}.".format(outN, n))
+        libFn(self._handle, srcPtr, outPtr, n, m)
+        return out
+    return fn
+
+class GamutBoundary:
+
+    '''
+    Gamut boundary descriptor: a table of the maximum in-gamut chroma at
+    `lSteps` + 1 lightnesses over [0, 100] and `hSteps` hues over [0, 360)
+    so that in-gamut tests of large batches of colors mostly need a table
+    lookup instead of a conversion to RGB; see rgb2lab_gamut.h
+
+    The batch methods take a buffer of N×3 doubles and write one item per
+    triplet into `out` (allocated if not given) which is returned.
+    '''
+
+    def __init__(self, lSteps = 100, hSteps = 360):
+        self.lSteps, self.hSteps = lSteps, hSteps
+        self._handle = _lib.newGamutBoundary(lSteps, hSteps)
+        if not self._handle:
+            raise Rgb2LabError("Could not create a gamut boundary with {} × {} steps.".format(lSteps, hSteps))
+
+    def __del__(self):
+        if getattr(self, "_handle", None):
+            _lib.freeGamutBoundary(self._handle)
+            self._handle = None
+
+    def maxChroma(self, lch, out = None):
+        '''Approximate maximum in-gamut chroma (doubles) for the L and h of each LCH triplet; NaN for invalid L or h'''
+        srcPtr, n = rgb2lab_common._asBuffer(lch, c_double, 3)
+        out, outPtr = _output(out, c_double, n)
+        _lib.gamutMaxChromaArray(self._handle, srcPtr, outPtr, n)
+        return out
+
+    def isInGamutLab(self, lab, out = None):
+        '''1 or 0 (bytes) for each Lab triplet according as it is in the sRGB gamut'''
+        srcPtr, n = rgb2lab_common._asBuffer(lab, c_double, 3)
+        out, outPtr = _output(out, c_ubyte, n)
+        _lib.isInGamutLabArray(self._handle, srcPtr, outPtr, n)
+        return out
+
+    def isInGamutLch(self, lch, out = None):
+        '''1 or 0 (bytes) for each LCH triplet according as it is in the sRGB gamut'''
+        srcPtr, n = rgb2lab_common._asBuffer(lch, c_double, 3)
+        out, outPtr = _output(out, c_ubyte, n)
+        _lib.isInGamutLchArray(self._handle, srcPtr, outPtr, n)
+        return out
+
+    # Gamut mapping: RGB triplets in [0, 1] (N×3 doubles) for Lab or LCH
+    # triplets, first mapping out-of-gamut colors onto the gamut boundary by
+    # `method` "chroma" (reduce chroma keeping L and h) or "nearest" (minimum
+    # ΔE76 in the plane of constant hue); `out` may be `src` itself
+    rgbFromLabMapped = _mapFn(_lib.rgbFromLabMappedArray)
+    rgbFromLchMapped = _mapFn(_lib.rgbFromLchMappedArray)
+
+_defaultGamutBoundary = None
+
+def defaultGamutBoundary():
+    '''The GamutBoundary with default steps used by the functions below, built on first use'''
+    global _defaultGamutBoundary
+    if _defaultGamutBoundary is None:
+        _defaultGamutBoundary = GamutBoundary()
+    return _defaultGamutBoundary
+
+def gamutMaxChroma(lch, out = None): return defaultGamutBoundary().maxChroma(lch, out)
+def isInGamutLabArray(lab, out = None): return defaultGamutBoundary().isInGamutLab(lab, out)
+def isInGamutLchArray(lch, out = None): return defaultGamutBoundary().isInGamutLch(lch, out)
+def rgbFromLabMappedArray(lab, out = None, method = "chroma"): return defaultGamutBoundary().rgbFromLabMapped(lab, out, method)
+def rgbFromLchMappedArray(lch, out = None, method = "chroma"): return defaultGamutBoundary().rgbFromLchMapped(lch, out, method)
+
+# Exact scalar tests
+
+def isInGamutLab(lab): return bool(_lib.isInGamutLab(_Triplet((c_double * 3)(*lab))))
+def isInGamutLch(lch): return bool(_lib.isInGamutLch(_Triplet((c_double * 3)(*lch))))
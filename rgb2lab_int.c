@@ -11,8 +11,13 @@
 
 #include "rgb2lab_int.h"
 #include "rgb2lab.h"
+#include "rgb2lab_threads.h"
+#include "rgb2lab_stats.h"
 #include <math.h>
 #include <stdbool.h>
+#include <stdint.h>
+#include <stdlib.h>
+#include <string.h>
 
 static DoubleTriplet _double(IntTriplet seq)
 {
@@ -54,36 +59,67 @@ static DoubleTriplet _scaleRgb(IntTriplet rgb)
 
 IntTriplet labFromRgbInt(IntTriplet rgb)
 {
+    STATS_COUNT(labFromRgbInt);
     return _round(labFromRgb(_scaleRgb(rgb)));
 }
 
 IntTriplet rgbFromLabInt(IntTriplet lab)
 {
+    STATS_COUNT(rgbFromLabInt);
     return _roundAndFixRgb(rgbFromLab(_double(lab)));
 }
 
 IntTriplet lchFromRgbInt(IntTriplet rgb)
 {
+    STATS_COUNT(lchFromRgbInt);
     return _fixLch(_round(lchFromRgb(_scaleRgb(rgb))));
 }
 
 IntTriplet rgbFromLchInt(IntTriplet lch)
 {
+    STATS_COUNT(rgbFromLchInt);
     return _roundAndFixRgb(rgbFromLch(_double(lch)));
 }
 
+IntTriplet labFromRgbIntCs(const ColorSpace * cs, IntTriplet rgb)
+{
+    STATS_COUNT(labFromRgbInt);
+    return _round(labFromRgbCs(cs, _scaleRgb(rgb)));
+}
+
+IntTriplet rgbFromLabIntCs(const ColorSpace * cs, IntTriplet lab)
+{
+    STATS_COUNT(rgbFromLabInt);
+    return _roundAndFixRgb(rgbFromLabCs(cs, _double(lab)));
+}
+
+IntTriplet lchFromRgbIntCs(const ColorSpace * cs, IntTriplet rgb)
+{
+    STATS_COUNT(lchFromRgbInt);
+    return _fixLch(_round(lchFromRgbCs(cs, _scaleRgb(rgb))));
+}
+
+IntTriplet rgbFromLchIntCs(const ColorSpace * cs, IntTriplet lch)
+{
+    STATS_COUNT(rgbFromLchInt);
+    return _roundAndFixRgb(rgbFromLchCs(cs, _double(lch)));
+}
+
 IntTriplet lchFromLabInt(IntTriplet lab)
 {
+    STATS_COUNT(lchFromLabInt);
     return _fixLch(_round(lchFromLab(_double(lab))));
 }
 
 IntTriplet labFromLchInt(IntTriplet lch)
 {
+    STATS_COUNT(labFromLchInt);
     return _round(labFromLch(_double(lch)));
 }
 
 void labLchFromRgbInt(IntTriplet rgb, IntTriplet * lab, IntTriplet * lch)
 {
+    STATS_COUNT(labLchFromRgbInt);
     DoubleTriplet lab_ = labFromRgb(_scaleRgb(rgb));
     *lab = _round(lab_);
     *lch = _fixLch(_round(lchFromLab(lab_)));
@@ -91,169 +127,881 @@ void labLchFromRgbInt(IntTriplet rgb, IntTriplet * lab, IntTriplet * lch)
 
 void rgbLchFromLabInt(IntTriplet lab, IntTriplet * rgb, IntTriplet * lch)
 {
+    STATS_COUNT(rgbLchFromLabInt);
     *rgb = _roundAndFixRgb(rgbFromLab(_double(lab)));
     *lch = _fixLch(_round(lchFromLab(_double(lab))));
 }
 
 void rgbLabFromLchInt(IntTriplet lch, IntTriplet * rgb, IntTriplet * lab)
 {
+    STATS_COUNT(rgbLabFromLchInt);
     DoubleTriplet lab_ = labFromLch(_double(lch));
     *rgb = _roundAndFixRgb(rgbFromLab(lab_));
     *lab = _round(lab_);
 }
 
+static IntTriplet _rgb8(const unsigned char * pixel, Rgb8Layout layout)
+{
+    IntTriplet temp = {{pixel[layout.r], pixel[layout.g], pixel[layout.b]}};
+    return temp;
+}
+
+void fillRgb8LabLchTable(Rgb8LabLch table[RGB8_TABLE_SIZE])
+{
+    for (int r = 0; r < 256; ++r)
+        for (int g = 0; g < 256; ++g)
+            for (int b = 0; b < 256; ++b)
+            {
+                IntTriplet rgb = {{r, g, b}}, lab, lch;
+                labLchFromRgbInt(rgb, &lab, &lch);
+                Rgb8LabLch * t = &table[r << 16 | g << 8 | b];
+                t->L = lab.L; t->A = lab.A; t->B = lab.B;
+                t->c = lch.c; t->h = lch.h;
+            }
+}
+
+static const Rgb8LabLch * rgb8Table = NULL;
+
+void setRgb8LabLchTable(const Rgb8LabLch * table) { rgb8Table = table; }
+
+static const Rgb8LabLch * _rgb8TableEntry(const Rgb8LabLch * table, const unsigned char * pixel, Rgb8Layout layout)
+{
+    return &table[pixel[layout.r] << 16 | pixel[layout.g] << 8 | pixel[layout.b]];
+}
+
+// NOTE: int8 suffices for Lab since the sRGB gamut spans at most 0 to 100 for `L`
+// and -86 to +98 for `a` and -108 to +94 for `b` after rounding; C and H need int16
+
+typedef struct
+{
+    const unsigned char * src;
+    Rgb8Layout layout;
+    const Rgb8LabLch * table;
+    signed char (*lab)[3]; // either of these may be NULL if not wanted
+    short (*lch)[3];
+} Rgb8ArrayJob;
+
+enum { ARRAY_MIN_CHUNK = 4096 }; // pixels; smaller batches aren't worth a thread
+
+static long _rgb8ArrayChunk(void * job_, size_t begin, size_t end)
+{
+    const Rgb8ArrayJob * job = job_;
+    const unsigned char * src = job->src + begin * job->layout.stride;
+    signed char (*lab)[3] = job->lab;
+    short (*lch)[3] = job->lch;
+    for (size_t i = begin; i < end; ++i, src += job->layout.stride)
+    {
+        IntTriplet lab_, lch_;
+        if (job->table)
+        {
+            const Rgb8LabLch * t = _rgb8TableEntry(job->table, src, job->layout);
+            lab_.L = lch_.l = t->L; lab_.A = t->A; lab_.B = t->B;
+            lch_.c = t->c; lch_.h = t->h;
+        }
+        else if (lab && lch)
+            labLchFromRgbInt(_rgb8(src, job->layout), &lab_, &lch_);
+        else if (lab)
+            lab_ = labFromRgbInt(_rgb8(src, job->layout));
+        else
+            lch_ = lchFromRgbInt(_rgb8(src, job->layout));
+        for (int j = 0; j < 3; ++j)
+        {
+            if (lab) lab[i][j] = lab_.data[j];
+            if (lch) lch[i][j] = lch_.data[j];
+        }
+    }
+    return 0;
+}
+
+void labFromRgb8Array(const unsigned char * src, Rgb8Layout layout, size_t n, signed char lab[][3])
+{
+    STATS_START();
+    Rgb8ArrayJob job = {src, layout, rgb8Table, lab, NULL};
+    parallelFor(n, ARRAY_MIN_CHUNK, _rgb8ArrayChunk, &job);
+    STATS_STOP(STAT_labFromRgb8Array, n, 0);
+}
+
+void lchFromRgb8Array(const unsigned char * src, Rgb8Layout layout, size_t n, short lch[][3])
+{
+    STATS_START();
+    Rgb8ArrayJob job = {src, layout, rgb8Table, NULL, lch};
+    parallelFor(n, ARRAY_MIN_CHUNK, _rgb8ArrayChunk, &job);
+    STATS_STOP(STAT_lchFromRgb8Array, n, 0);
+}
+
+void labLchFromRgb8Array(const unsigned char * src, Rgb8Layout layout, size_t n, signed char lab[][3], short lch[][3])
+{
+    STATS_START();
+    Rgb8ArrayJob job = {src, layout, rgb8Table, lab, lch};
+    parallelFor(n, ARRAY_MIN_CHUNK, _rgb8ArrayChunk, &job);
+    STATS_STOP(STAT_labLchFromRgb8Array, n, 0);
+}
+
+// NOTE: these must be in the same order as the fill entries in rgb2lab_stats.h
 typedef enum { LforAB, AforBL, BforAL, LforHC, CforHL, HforCL } TableType1D;
 
-static int fillTableWorker_fix2_var1(TableType1D tt, int fixed1, int fixed2,
-                                     int varMin, int varMax,
-                                     IntTriplet (*fn)(IntTriplet),
-                                     TinyRgb table[varMax - varMin + 1])
+static int _setTinyRgb(TinyRgb * t, IntTriplet rgb)
 {
+    if (rgb.r == -1 || rgb.g == -1 || rgb.b == -1)
+    {
+        t->valid = 0;
+        return 0;
+    }
+    t->valid = 1;
+    t->r = rgb.r;
+    t->g = rgb.g;
+    t->b = rgb.b;
+    return 1;
+}
+
+// Writes the pixel of an ARGB32 image for `rgb`: opaque if valid else transparent,
+// which is all zero so that the result is both premultiplied and not
+static int _setArgb32(unsigned char * pixel, IntTriplet rgb)
+{
+    bool valid = rgb.r != -1 && rgb.g != -1 && rgb.b != -1;
+    uint32_t v = valid ? 0xFF000000u | (uint32_t) rgb.r << 16 | rgb.g << 8 | rgb.b : 0;
+    memcpy(pixel, &v, sizeof(v)); // native byte order as in QImage
+    return valid;
+}
+
+// Column of the image for var index `i` of `span` when rotated by `xRotate`
+static int _rotated(int i, int xRotate, int span) { return (i + xRotate) % span; }
+
+// A packed table being filled: each row (var1 of 2D tables, the only one of
+// 1D tables) has its own stretch of RGB and bits so that rows can be filled
+// in parallel; they are compacted when done
+typedef struct
+{
+    int rows, cols, rowBytes;
+    unsigned char * rgb; // 3 × cols bytes per row with its in-gamut cells first
+    unsigned char * bits; // rowBytes per row
+    int * rowCounts;
+} PackedScratch;
+
+// Cells of a row must be set in increasing order of `col`
+static int _setPackedCell(PackedScratch * s, int row, int col, IntTriplet rgb)
+{
+    if (rgb.r == -1 || rgb.g == -1 || rgb.b == -1) return 0;
+    unsigned char * t = s->rgb + 3 * ((size_t) row * s->cols + s->rowCounts[row]++);
+    t[0] = rgb.r;
+    t[1] = rgb.g;
+    t[2] = rgb.b;
+    s->bits[(size_t) row * s->rowBytes + col / 8] |= 1 << col % 8;
+    return 1;
+}
+
+#define WRITEINPUT(F1, F2, F3) input.data[0] = F1; input.data[1] = F2, input.data[2] = F3
+
+typedef struct
+{
+    TableType1D tt;
+    int fixed1, fixed2, varMin;
+    IntTriplet (*fn)(const ColorSpace *, IntTriplet);
+    const ColorSpace * cs;
+    TinyRgb * table; // if NULL, fill `packed` if not NULL else the first line of `bits`
+    unsigned char * bits;
+    int xRotate, varSpan;
+    PackedScratch * packed; // needs the cells in order, so a single chunk
+} FillJob1D;
+
+static long _fillCells_fix2_var1(void * job_, size_t begin, size_t end)
+{
+    const FillJob1D * job = job_;
     int validRGBs = 0;
-    ++varMax; // to stop at max value plus one
-    for (int var = varMin; var != varMax; ++var)
+    for (int var = job->varMin + begin; var != job->varMin + (int) end; ++var)
     {
         IntTriplet input;
-#define WRITEINPUT(F1, F2, F3) input.data[0] = F1; input.data[1] = F2, input.data[2] = F3
-        switch (tt)
+        switch (job->tt)
         {
-            case LforAB: WRITEINPUT(var, fixed1, fixed2); break;
-            case LforHC: WRITEINPUT(var, fixed2, fixed1); break;
+            case LforAB: WRITEINPUT(var, job->fixed1, job->fixed2); break;
+            case LforHC: WRITEINPUT(var, job->fixed2, job->fixed1); break;
             case AforBL: // same as next case
-            case CforHL: WRITEINPUT(fixed2, var, fixed1); break;
+            case CforHL: WRITEINPUT(job->fixed2, var, job->fixed1); break;
             case BforAL: // same as next case
-            case HforCL: WRITEINPUT(fixed2, fixed1, var); break;
+            case HforCL: WRITEINPUT(job->fixed2, job->fixed1, var); break;
         }
-        IntTriplet rgb = fn(input);
-        TinyRgb * t = &table[var - varMin];
-        if (rgb.r == -1 || rgb.g == -1 || rgb.b == -1)
-            t->valid = 0;
+        if (job->table)
+            validRGBs += _setTinyRgb(&job->table[var - job->varMin], job->fn(job->cs, input));
+        else if (job->packed)
+            validRGBs += _setPackedCell(job->packed, 0, var - job->varMin, job->fn(job->cs, input));
         else
-        {
-            t->valid = 1;
-            t->r = rgb.r;
-            t->g = rgb.g;
-            t->b = rgb.b;
-            ++validRGBs;
-        }
+            validRGBs += _setArgb32(job->bits + 4 * _rotated(var - job->varMin, job->xRotate, job->varSpan), job->fn(job->cs, input));
     }
     return validRGBs;
 }
 
+static int fillTableWorker_fix2_var1(TableType1D tt, int fixed1, int fixed2,
+                                     int varMin, int varMax,
+                                     IntTriplet (*fn)(const ColorSpace *, IntTriplet), const ColorSpace * cs,
+                                     TinyRgb table[varMax - varMin + 1])
+{
+    STATS_START();
+    FillJob1D job = {tt, fixed1, fixed2, varMin, fn, cs, table, NULL, 0, 0, NULL};
+    int validRGBs = parallelFor(varMax - varMin + 1, /* cells */ 64, _fillCells_fix2_var1, &job);
+    STATS_STOP(STAT_fillTable_LforAB + tt, varMax - varMin + 1, validRGBs);
+    return validRGBs;
+}
+
+static int fillArgb32Worker_fix2_var1(TableType1D tt, int fixed1, int fixed2,
+                                      int varMin, int varMax,
+                                      IntTriplet (*fn)(const ColorSpace *, IntTriplet), const ColorSpace * cs,
+                                      unsigned char * bits, ptrdiff_t bytesPerLine, int height, int xRotate)
+{
+    if (height <= 0) return 0; // no lines to draw, not even the first
+    STATS_START();
+    int varSpan = varMax - varMin + 1;
+    FillJob1D job = {tt, fixed1, fixed2, varMin, fn, cs, NULL, bits, (xRotate % varSpan + varSpan) % varSpan, varSpan, NULL};
+    int validRGBs = parallelFor(varSpan, /* cells */ 64, _fillCells_fix2_var1, &job);
+    for (int y = 1; y < height; ++y) // all lines are the same
+        memcpy(bits + y * bytesPerLine, bits, 4 * varSpan);
+    STATS_STOP(STAT_fillArgb32_LforAB + tt, varSpan, validRGBs);
+    return validRGBs;
+}
+
 typedef enum { ABforL, BLforA, ALforB, HCforL, HLforC, CLforH } TableType2D;
 
-static int fillTableWorker_fix1_var2(TableType2D tt, int fixed,
-                                     int var1Min, int var1Max,
-                                     int var2Min, int var2Max,
-                                     IntTriplet (*fn)(IntTriplet),
-                                     TinyRgb table[var1Max - var1Min + 1][var2Max - var2Min + 1])
+typedef struct
 {
-    int validRGBs = 0;
-    ++var1Max; ++var2Max; // to stop at max value plus one
-    for (int var1 = var1Min; var1 != var1Max; ++var1)
-        for (int var2 = var2Min; var2 != var2Max; ++var2)
+    TableType2D tt;
+    int fixed, var1Min, var2Min, var2Max;
+    IntTriplet (*fn)(const ColorSpace *, IntTriplet);
+    const ColorSpace * cs;
+    TinyRgb * table; // if NULL, fill `packed` if not NULL else `bits` with var2 increasing upwards
+    unsigned char * bits;
+    ptrdiff_t bytesPerLine;
+    int xRotate, var1Span;
+    PackedScratch * packed;
+} FillJob2D;
+
+static long _fillRows_fix1_var2(void * job_, size_t begin, size_t end)
+{
+    const FillJob2D * job = job_;
+    int validRGBs = 0, var2Span = job->var2Max - job->var2Min + 1;
+    for (int var1 = job->var1Min + begin; var1 != job->var1Min + (int) end; ++var1)
+        for (int var2 = job->var2Min; var2 != job->var2Max + 1; ++var2)
         {
             IntTriplet input;
-#define WRITEINPUT(F1, F2, F3) input.data[0] = F1; input.data[1] = F2, input.data[2] = F3
-            switch (tt)
+            switch (job->tt)
             {
-                case ABforL: WRITEINPUT(fixed, var1, var2); break;
-                case HCforL: WRITEINPUT(fixed, var2, var1); break;
+                case ABforL: WRITEINPUT(job->fixed, var1, var2); break;
+                case HCforL: WRITEINPUT(job->fixed, var2, var1); break;
                 case BLforA: // same as next case
-                case HLforC: WRITEINPUT(var2, fixed, var1); break;
+                case HLforC: WRITEINPUT(var2, job->fixed, var1); break;
                 case ALforB: // same as next case
-                case CLforH: WRITEINPUT(var2, var1, fixed); break;
+                case CLforH: WRITEINPUT(var2, var1, job->fixed); break;
+            }
+            if (job->table)
+            {
+                TinyRgb * t = &job->table[(var1 - job->var1Min) * var2Span + (var2 - job->var2Min)];
+                validRGBs += _setTinyRgb(t, job->fn(job->cs, input));
             }
-            IntTriplet rgb = fn(input);
-            TinyRgb * t = &table[var1 - var1Min][var2 - var2Min];
-            if (rgb.r == -1 || rgb.g == -1 || rgb.b == -1)
-                t->valid = 0;
+            else if (job->packed)
+                validRGBs += _setPackedCell(job->packed, var1 - job->var1Min, var2 - job->var2Min, job->fn(job->cs, input));
             else
             {
-                t->valid = 1;
-                t->r = rgb.r;
-                t->g = rgb.g;
-                t->b = rgb.b;
-                ++validRGBs;
+                int x = _rotated(var1 - job->var1Min, job->xRotate, job->var1Span), y = job->var2Max - var2;
+                validRGBs += _setArgb32(job->bits + y * job->bytesPerLine + 4 * x, job->fn(job->cs, input));
             }
         }
     return validRGBs;
 }
 
+static int fillTableWorker_fix1_var2(TableType2D tt, int fixed,
+                                     int var1Min, int var1Max,
+                                     int var2Min, int var2Max,
+                                     IntTriplet (*fn)(const ColorSpace *, IntTriplet), const ColorSpace * cs,
+                                     TinyRgb table[var1Max - var1Min + 1][var2Max - var2Min + 1])
+{
+    STATS_START();
+    FillJob2D job = {tt, fixed, var1Min, var2Min, var2Max, fn, cs, &table[0][0], NULL, 0, 0, 0, NULL};
+    int validRGBs = parallelFor(var1Max - var1Min + 1, /* rows */ 8, _fillRows_fix1_var2, &job);
+    STATS_STOP(STAT_fillTable_ABforL + tt, (var1Max - var1Min + 1) * (var2Max - var2Min + 1), validRGBs);
+    return validRGBs;
+}
+
+static int fillArgb32Worker_fix1_var2(TableType2D tt, int fixed,
+                                      int var1Min, int var1Max,
+                                      int var2Min, int var2Max,
+                                      IntTriplet (*fn)(const ColorSpace *, IntTriplet), const ColorSpace * cs,
+                                      unsigned char * bits, ptrdiff_t bytesPerLine, int xRotate)
+{
+    STATS_START();
+    int var1Span = var1Max - var1Min + 1;
+    FillJob2D job = {tt, fixed, var1Min, var2Min, var2Max, fn, cs, NULL, bits, bytesPerLine,
+                     (xRotate % var1Span + var1Span) % var1Span, var1Span, NULL};
+    int validRGBs = parallelFor(var1Span, /* columns */ 8, _fillRows_fix1_var2, &job);
+    STATS_STOP(STAT_fillArgb32_ABforL + tt, var1Span * (var2Max - var2Min + 1), validRGBs);
+    return validRGBs;
+}
+
+struct PackedTable
+{
+    int var1Span, var2Span, cells, inGamutCount, spanCount;
+    PackedValidity validity;
+    unsigned char * rgb, * bitmap; // bitmap and spans are NULL unless chosen by validity
+    int * spans;
+    uint32_t * blockRanks; // in-gamut cells before each PACKED_RANK_BLOCK cells of the bitmap
+    int * spanRanks; // in-gamut cells before each span
+};
+
+enum { PACKED_RANK_BLOCK = 256 }; // cells; so 1/8 bit per cell for the rank directory
+
+static bool _initPackedScratch(PackedScratch * s, int rows, int cols)
+{
+    s->rows = rows;
+    s->cols = cols;
+    s->rowBytes = (cols + 7) / 8;
+    s->rgb = malloc(3 * (size_t) rows * cols);
+    s->bits = calloc((size_t) rows * s->rowBytes, 1);
+    s->rowCounts = calloc(rows, sizeof(int));
+    if (s->rgb && s->bits && s->rowCounts) return true;
+    free(s->rgb);
+    free(s->bits);
+    free(s->rowCounts);
+    return false;
+}
+
+static int _scratchBit(const PackedScratch * s, int i)
+{
+    int row = i / s->cols, col = i % s->cols;
+    return s->bits[(size_t) row * s->rowBytes + col / 8] >> col % 8 & 1;
+}
+
+static PackedTable * _newPackedTable(int var1Span, int var2Span, PackedValidity validity, int inGamutCount)
+{
+    PackedTable * t = calloc(1, sizeof(PackedTable));
+    if (!t) return NULL;
+    t->var1Span = var1Span;
+    t->var2Span = var2Span;
+    t->cells = var1Span * (var2Span ? var2Span : 1);
+    t->validity = validity;
+    t->inGamutCount = inGamutCount;
+    return t;
+}
+
+// Builds the lookup index of the bitmap or spans, checking them against the
+// in-gamut count (and each other) so that it also validates read tables
+static bool _indexPackedTable(PackedTable * t)
+{
+    int rank = 0;
+    if (t->validity == PACKED_BITMAP)
+    {
+        int bytes = (t->cells + 7) / 8;
+        if (t->cells % 8 && t->bitmap[bytes - 1] >> t->cells % 8) return false; // padding must be clear
+        t->blockRanks = malloc(sizeof(uint32_t) * ((t->cells + PACKED_RANK_BLOCK - 1) / PACKED_RANK_BLOCK + 1));
+        if (!t->blockRanks) return false;
+        for (int j = 0; j < bytes; ++j)
+        {
+            if (j % (PACKED_RANK_BLOCK / 8) == 0) t->blockRanks[j / (PACKED_RANK_BLOCK / 8)] = rank;
+            rank += __builtin_popcount(t->bitmap[j]);
+        }
+    }
+    else
+    {
+        t->spanRanks = malloc(sizeof(int) * t->spanCount + 1);
+        if (!t->spanRanks) return false;
+        for (int k = 0, prevEnd = -1; k < t->spanCount; ++k)
+        {
+            int begin = t->spans[2 * k], end = t->spans[2 * k + 1];
+            if (begin <= prevEnd || end <= begin || end > t->cells) return false; // spans are maximal
+            t->spanRanks[k] = rank;
+            rank += end - begin;
+            prevEnd = end;
+        }
+    }
+    return rank == t->inGamutCount;
+}
+
+// Makes the table of `validity` out of `s`, freeing it
+static PackedTable * _finishPacked(PackedScratch * s, int var1Span, int var2Span, PackedValidity validity, int inGamutCount)
+{
+    PackedTable * t = _newPackedTable(var1Span, var2Span, validity, inGamutCount);
+    bool ok = false;
+    if (t)
+    {
+        size_t offset = 0; // compact the rows; offsets only decrease so in place
+        for (int row = 0; row < s->rows; ++row)
+        {
+            memmove(s->rgb + 3 * offset, s->rgb + 3 * (size_t) row * s->cols, 3 * (size_t) s->rowCounts[row]);
+            offset += s->rowCounts[row];
+        }
+        unsigned char * rgb = realloc(s->rgb, 3 * offset + 1); // shrinking shouldn't fail but may
+        t->rgb = rgb ? rgb : s->rgb;
+        s->rgb = NULL;
+
+        if (validity == PACKED_BITMAP)
+        {
+            t->bitmap = calloc((t->cells + 7) / 8, 1);
+            if (t->bitmap)
+                for (int i = 0; i < t->cells; ++i)
+                    if (_scratchBit(s, i)) t->bitmap[i / 8] |= 1 << i % 8;
+        }
+        else
+        {
+            for (int i = 0; i < t->cells; ++i)
+                if (_scratchBit(s, i) && (i == 0 || !_scratchBit(s, i - 1))) ++t->spanCount;
+            t->spans = malloc(sizeof(int) * 2 * t->spanCount + 1);
+            if (t->spans)
+                for (int i = 0, k = 0; i < t->cells; ++i)
+                    if (_scratchBit(s, i))
+                    {
+                        if (i == 0 || !_scratchBit(s, i - 1)) t->spans[2 * k] = i;
+                        if (i == t->cells - 1 || !_scratchBit(s, i + 1)) t->spans[2 * k++ + 1] = i + 1;
+                    }
+        }
+        ok = (t->bitmap || t->spans) && _indexPackedTable(t);
+    }
+    free(s->rgb);
+    free(s->bits);
+    free(s->rowCounts);
+    if (ok) return t;
+    freePackedTable(t);
+    return NULL;
+}
+
+// Packed tables are counted in the stats as fills of the TinyRgb tables
+
+static PackedTable * newPackedWorker_fix2_var1(TableType1D tt, int fixed1, int fixed2,
+                                               int varMin, int varMax,
+                                               IntTriplet (*fn)(const ColorSpace *, IntTriplet), const ColorSpace * cs,
+                                               PackedValidity validity)
+{
+    if (validity != PACKED_BITMAP && validity != PACKED_SPANS) return NULL;
+    STATS_START();
+    int varSpan = varMax - varMin + 1;
+    PackedScratch scratch;
+    if (!_initPackedScratch(&scratch, 1, varSpan)) return NULL;
+    FillJob1D job = {tt, fixed1, fixed2, varMin, fn, cs, NULL, NULL, 0, 0, &scratch};
+    int validRGBs = parallelFor(varSpan, /* one chunk */ varSpan, _fillCells_fix2_var1, &job);
+    STATS_STOP(STAT_fillTable_LforAB + tt, varSpan, validRGBs);
+    return _finishPacked(&scratch, varSpan, 0, validity, validRGBs);
+}
+
+static PackedTable * newPackedWorker_fix1_var2(TableType2D tt, int fixed,
+                                               int var1Min, int var1Max,
+                                               int var2Min, int var2Max,
+                                               IntTriplet (*fn)(const ColorSpace *, IntTriplet), const ColorSpace * cs,
+                                               PackedValidity validity)
+{
+    if (validity != PACKED_BITMAP && validity != PACKED_SPANS) return NULL;
+    STATS_START();
+    int var1Span = var1Max - var1Min + 1, var2Span = var2Max - var2Min + 1;
+    PackedScratch scratch;
+    if (!_initPackedScratch(&scratch, var1Span, var2Span)) return NULL;
+    FillJob2D job = {tt, fixed, var1Min, var2Min, var2Max, fn, cs, NULL, NULL, 0, 0, 0, &scratch};
+    int validRGBs = parallelFor(var1Span, /* rows */ 8, _fillRows_fix1_var2, &job);
+    STATS_STOP(STAT_fillTable_ABforL + tt, var1Span * var2Span, validRGBs);
+    return _finishPacked(&scratch, var1Span, var2Span, validity, validRGBs);
+}
+
 // strictly speaking there are no limits to the LAB/LCH values but this is for GUI
 static bool _invalidL (int l) { return l <    0 || l > 100; }
 static bool _invalidAB(int a) { return a < -128 || a > 128; }
 static bool _invalidC (int c) { return c <    0 || c > 180; }
 static bool _invalidH (int h) { return h <   -1 || h > 359; }
 
-int fillTable_LforAB(TinyRgb table[101], int a, int b)
+int fillTableCs_LforAB(const ColorSpace * cs, TinyRgb table[101], int a, int b)
+{
+    if (_invalidAB(a) || _invalidAB(b)) return -1;
+    return fillTableWorker_fix2_var1(LforAB, a, b, /* l min max */ 0, 100, &rgbFromLabIntCs, cs, table);
+}
+
+int fillTableCs_AforBL(const ColorSpace * cs, TinyRgb table[257], int b, int l)
+{
+    if (_invalidAB(b) || _invalidL(l)) return -1;
+    return fillTableWorker_fix2_var1(AforBL, b, l, /* a min max */ -128, +128, &rgbFromLabIntCs, cs, table);
+}
+
+int fillTableCs_BforAL(const ColorSpace * cs, TinyRgb table[257], int a, int l)
+{
+    if (_invalidAB(a) || _invalidL(l)) return -1;
+    return fillTableWorker_fix2_var1(BforAL, a, l, /* b min max */ -128, +128, &rgbFromLabIntCs, cs, table);
+}
+
+int fillTableCs_LforHC(const ColorSpace * cs, TinyRgb table[101], int h, int c)
+{
+    if (_invalidH(h) || _invalidC(c)) return -1;
+    return fillTableWorker_fix2_var1(LforHC, h, c, /* l min max */ 0, 100, &rgbFromLchIntCs, cs, table);
+}
+
+int fillTableCs_CforHL(const ColorSpace * cs, TinyRgb table[181], int h, int l)
+{
+    if (_invalidH(h) || _invalidL(l)) return -1;
+    return fillTableWorker_fix2_var1(CforHL, h, l, /* c min max */ 0, 180, &rgbFromLchIntCs, cs, table);
+}
+
+int fillTableCs_HforCL(const ColorSpace * cs, TinyRgb table[360], int c, int l)
+{
+    if (_invalidC(c) || _invalidL(l)) return -1;
+    return fillTableWorker_fix2_var1(HforCL, c, l, /* h min max */ 0, 359, &rgbFromLchIntCs, cs, table);
+}
+
+int fillTableCs_ABforL(const ColorSpace * cs, TinyRgb table[257][257], int l)
+{
+    if (_invalidL(l)) return -1;
+    return fillTableWorker_fix1_var2(ABforL, l, /* a min max */ -128, +128, /* b min max */ -128, +128, &rgbFromLabIntCs, cs, table);
+}
+
+int fillTableCs_BLforA(const ColorSpace * cs, TinyRgb table[257][101], int a)
+{
+    if (_invalidAB(a)) return -1;
+    return fillTableWorker_fix1_var2(BLforA, a, /* b min max */ -128, +128, /* l min max */ 0, 100, &rgbFromLabIntCs, cs, table);
+}
+
+int fillTableCs_ALforB(const ColorSpace * cs, TinyRgb table[257][101], int b)
+{
+    if (_invalidAB(b)) return -1;
+    return fillTableWorker_fix1_var2(ALforB, b, /* a min max */ -128, +128, /* l min max */ 0, 100, &rgbFromLabIntCs, cs, table);
+}
+
+int fillTableCs_HCforL(const ColorSpace * cs, TinyRgb table[360][181], int l)
+{
+    if (_invalidL(l)) return -1;
+    return fillTableWorker_fix1_var2(HCforL, l, /* h min max */ 0, 359, /* c min max */ 0, 180, &rgbFromLchIntCs, cs, table);
+}
+
+int fillTableCs_HLforC(const ColorSpace * cs, TinyRgb table[360][101], int c)
+{
+    if (_invalidC(c)) return -1;
+    return fillTableWorker_fix1_var2(HLforC, c, /* h min max */ 0, 359, /* l min max */ 0, 100, &rgbFromLchIntCs, cs, table);
+}
+
+int fillTableCs_CLforH(const ColorSpace * cs, TinyRgb table[181][101], int h)
+{
+    if (_invalidH(h)) return -1;
+    return fillTableWorker_fix1_var2(CLforH, h, /* c min max */ 0, 180, /* l min max */ 0, 100, &rgbFromLchIntCs, cs, table);
+}
+
+int fillArgb32Cs_LforAB(const ColorSpace * cs, unsigned char * bits, ptrdiff_t bytesPerLine, int height, int xRotate, int a, int b)
 {
     if (_invalidAB(a) || _invalidAB(b)) return -1;
-    return fillTableWorker_fix2_var1(LforAB, a, b, /* l min max */ 0, 100, &rgbFromLabInt, table);
+    return fillArgb32Worker_fix2_var1(LforAB, a, b, /* l min max */ 0, 100, &rgbFromLabIntCs, cs, bits, bytesPerLine, height, xRotate);
 }
 
-int fillTable_AforBL(TinyRgb table[257], int b, int l)
+int fillArgb32Cs_AforBL(const ColorSpace * cs, unsigned char * bits, ptrdiff_t bytesPerLine, int height, int xRotate, int b, int l)
 {
     if (_invalidAB(b) || _invalidL(l)) return -1;
-    return fillTableWorker_fix2_var1(AforBL, b, l, /* a min max */ -128, +128, &rgbFromLabInt, table);
+    return fillArgb32Worker_fix2_var1(AforBL, b, l, /* a min max */ -128, +128, &rgbFromLabIntCs, cs, bits, bytesPerLine, height, xRotate);
 }
 
-int fillTable_BforAL(TinyRgb table[257], int a, int l)
+int fillArgb32Cs_BforAL(const ColorSpace * cs, unsigned char * bits, ptrdiff_t bytesPerLine, int height, int xRotate, int a, int l)
 {
     if (_invalidAB(a) || _invalidL(l)) return -1;
-    return fillTableWorker_fix2_var1(BforAL, a, l, /* b min max */ -128, +128, &rgbFromLabInt, table);
+    return fillArgb32Worker_fix2_var1(BforAL, a, l, /* b min max */ -128, +128, &rgbFromLabIntCs, cs, bits, bytesPerLine, height, xRotate);
 }
 
-int fillTable_LforHC(TinyRgb table[101], int h, int c)
+int fillArgb32Cs_LforHC(const ColorSpace * cs, unsigned char * bits, ptrdiff_t bytesPerLine, int height, int xRotate, int h, int c)
 {
     if (_invalidH(h) || _invalidC(c)) return -1;
-    return fillTableWorker_fix2_var1(LforHC, h, c, /* l min max */ 0, 100, &rgbFromLchInt, table);
+    return fillArgb32Worker_fix2_var1(LforHC, h, c, /* l min max */ 0, 100, &rgbFromLchIntCs, cs, bits, bytesPerLine, height, xRotate);
 }
 
-int fillTable_CforHL(TinyRgb table[181], int h, int l)
+int fillArgb32Cs_CforHL(const ColorSpace * cs, unsigned char * bits, ptrdiff_t bytesPerLine, int height, int xRotate, int h, int l)
 {
     if (_invalidH(h) || _invalidL(l)) return -1;
-    return fillTableWorker_fix2_var1(CforHL, h, l, /* c min max */ 0, 180, &rgbFromLchInt, table);
+    return fillArgb32Worker_fix2_var1(CforHL, h, l, /* c min max */ 0, 180, &rgbFromLchIntCs, cs, bits, bytesPerLine, height, xRotate);
 }
 
-int fillTable_HforCL(TinyRgb table[360], int c, int l)
+int fillArgb32Cs_HforCL(const ColorSpace * cs, unsigned char * bits, ptrdiff_t bytesPerLine, int height, int xRotate, int c, int l)
 {
     if (_invalidC(c) || _invalidL(l)) return -1;
-    return fillTableWorker_fix2_var1(HforCL, c, l, /* h min max */ 0, 359, &rgbFromLchInt, table);
+    return fillArgb32Worker_fix2_var1(HforCL, c, l, /* h min max */ 0, 359, &rgbFromLchIntCs, cs, bits, bytesPerLine, height, xRotate);
 }
 
-int fillTable_ABforL(TinyRgb table[257][257], int l)
+int fillArgb32Cs_ABforL(const ColorSpace * cs, unsigned char * bits, ptrdiff_t bytesPerLine, int xRotate, int l)
 {
     if (_invalidL(l)) return -1;
-    return fillTableWorker_fix1_var2(ABforL, l, /* a min max */ -128, +128, /* b min max */ -128, +128, &rgbFromLabInt, table);
+    return fillArgb32Worker_fix1_var2(ABforL, l, /* a min max */ -128, +128, /* b min max */ -128, +128, &rgbFromLabIntCs, cs, bits, bytesPerLine, xRotate);
 }
 
-int fillTable_BLforA(TinyRgb table[257][101], int a)
+int fillArgb32Cs_BLforA(const ColorSpace * cs, unsigned char * bits, ptrdiff_t bytesPerLine, int xRotate, int a)
 {
     if (_invalidAB(a)) return -1;
-    return fillTableWorker_fix1_var2(BLforA, a, /* b min max */ -128, +128, /* l min max */ 0, 100, &rgbFromLabInt, table);
+    return fillArgb32Worker_fix1_var2(BLforA, a, /* b min max */ -128, +128, /* l min max */ 0, 100, &rgbFromLabIntCs, cs, bits, bytesPerLine, xRotate);
 }
 
-int fillTable_ALforB(TinyRgb table[257][101], int b)
+int fillArgb32Cs_ALforB(const ColorSpace * cs, unsigned char * bits, ptrdiff_t bytesPerLine, int xRotate, int b)
 {
     if (_invalidAB(b)) return -1;
-    return fillTableWorker_fix1_var2(ALforB, b, /* a min max */ -128, +128, /* l min max */ 0, 100, &rgbFromLabInt, table);
+    return fillArgb32Worker_fix1_var2(ALforB, b, /* a min max */ -128, +128, /* l min max */ 0, 100, &rgbFromLabIntCs, cs, bits, bytesPerLine, xRotate);
 }
 
-int fillTable_HCforL(TinyRgb table[360][181], int l)
+int fillArgb32Cs_HCforL(const ColorSpace * cs, unsigned char * bits, ptrdiff_t bytesPerLine, int xRotate, int l)
 {
     if (_invalidL(l)) return -1;
-    return fillTableWorker_fix1_var2(HCforL, l, /* h min max */ 0, 359, /* c min max */ 0, 180, &rgbFromLchInt, table);
+    return fillArgb32Worker_fix1_var2(HCforL, l, /* h min max */ 0, 359, /* c min max */ 0, 180, &rgbFromLchIntCs, cs, bits, bytesPerLine, xRotate);
 }
 
-int fillTable_HLforC(TinyRgb table[360][101], int c)
+int fillArgb32Cs_HLforC(const ColorSpace * cs, unsigned char * bits, ptrdiff_t bytesPerLine, int xRotate, int c)
 {
     if (_invalidC(c)) return -1;
-    return fillTableWorker_fix1_var2(HLforC, c, /* h min max */ 0, 359, /* l min max */ 0, 100, &rgbFromLchInt, table);
+    return fillArgb32Worker_fix1_var2(HLforC, c, /* h min max */ 0, 359, /* l min max */ 0, 100, &rgbFromLchIntCs, cs, bits, bytesPerLine, xRotate);
 }
 
-int fillTable_CLforH(TinyRgb table[181][101], int h)
+int fillArgb32Cs_CLforH(const ColorSpace * cs, unsigned char * bits, ptrdiff_t bytesPerLine, int xRotate, int h)
 {
     if (_invalidH(h)) return -1;
-    return fillTableWorker_fix1_var2(CLforH, h, /* c min max */ 0, 180, /* l min max */ 0, 100, &rgbFromLchInt, table);
+    return fillArgb32Worker_fix1_var2(CLforH, h, /* c min max */ 0, 180, /* l min max */ 0, 100, &rgbFromLchIntCs, cs, bits, bytesPerLine, xRotate);
+}
+
+PackedTable * newPackedTableCs_LforAB(const ColorSpace * cs, int a, int b, PackedValidity validity)
+{
+    if (_invalidAB(a) || _invalidAB(b)) return NULL;
+    return newPackedWorker_fix2_var1(LforAB, a, b, /* l min max */ 0, 100, &rgbFromLabIntCs, cs, validity);
+}
+
+PackedTable * newPackedTableCs_AforBL(const ColorSpace * cs, int b, int l, PackedValidity validity)
+{
+    if (_invalidAB(b) || _invalidL(l)) return NULL;
+    return newPackedWorker_fix2_var1(AforBL, b, l, /* a min max */ -128, +128, &rgbFromLabIntCs, cs, validity);
+}
+
+PackedTable * newPackedTableCs_BforAL(const ColorSpace * cs, int a, int l, PackedValidity validity)
+{
+    if (_invalidAB(a) || _invalidL(l)) return NULL;
+    return newPackedWorker_fix2_var1(BforAL, a, l, /* b min max */ -128, +128, &rgbFromLabIntCs, cs, validity);
+}
+
+PackedTable * newPackedTableCs_LforHC(const ColorSpace * cs, int h, int c, PackedValidity validity)
+{
+    if (_invalidH(h) || _invalidC(c)) return NULL;
+    return newPackedWorker_fix2_var1(LforHC, h, c, /* l min max */ 0, 100, &rgbFromLchIntCs, cs, validity);
+}
+
+PackedTable * newPackedTableCs_CforHL(const ColorSpace * cs, int h, int l, PackedValidity validity)
+{
+    if (_invalidH(h) || _invalidL(l)) return NULL;
+    return newPackedWorker_fix2_var1(CforHL, h, l, /* c min max */ 0, 180, &rgbFromLchIntCs, cs, validity);
+}
+
+PackedTable * newPackedTableCs_HforCL(const ColorSpace * cs, int c, int l, PackedValidity validity)
+{
+    if (_invalidC(c) || _invalidL(l)) return NULL;
+    return newPackedWorker_fix2_var1(HforCL, c, l, /* h min max */ 0, 359, &rgbFromLchIntCs, cs, validity);
+}
+
+PackedTable * newPackedTableCs_ABforL(const ColorSpace * cs, int l, PackedValidity validity)
+{
+    if (_invalidL(l)) return NULL;
+    return newPackedWorker_fix1_var2(ABforL, l, /* a min max */ -128, +128, /* b min max */ -128, +128, &rgbFromLabIntCs, cs, validity);
+}
+
+PackedTable * newPackedTableCs_BLforA(const ColorSpace * cs, int a, PackedValidity validity)
+{
+    if (_invalidAB(a)) return NULL;
+    return newPackedWorker_fix1_var2(BLforA, a, /* b min max */ -128, +128, /* l min max */ 0, 100, &rgbFromLabIntCs, cs, validity);
+}
+
+PackedTable * newPackedTableCs_ALforB(const ColorSpace * cs, int b, PackedValidity validity)
+{
+    if (_invalidAB(b)) return NULL;
+    return newPackedWorker_fix1_var2(ALforB, b, /* a min max */ -128, +128, /* l min max */ 0, 100, &rgbFromLabIntCs, cs, validity);
+}
+
+PackedTable * newPackedTableCs_HCforL(const ColorSpace * cs, int l, PackedValidity validity)
+{
+    if (_invalidL(l)) return NULL;
+    return newPackedWorker_fix1_var2(HCforL, l, /* h min max */ 0, 359, /* c min max */ 0, 180, &rgbFromLchIntCs, cs, validity);
+}
+
+PackedTable * newPackedTableCs_HLforC(const ColorSpace * cs, int c, PackedValidity validity)
+{
+    if (_invalidC(c)) return NULL;
+    return newPackedWorker_fix1_var2(HLforC, c, /* h min max */ 0, 359, /* l min max */ 0, 100, &rgbFromLchIntCs, cs, validity);
+}
+
+PackedTable * newPackedTableCs_CLforH(const ColorSpace * cs, int h, PackedValidity validity)
+{
+    if (_invalidH(h)) return NULL;
+    return newPackedWorker_fix1_var2(CLforH, h, /* c min max */ 0, 180, /* l min max */ 0, 100, &rgbFromLchIntCs, cs, validity);
+}
+
+// As above in the default color space
+
+int fillTable_LforAB(TinyRgb table[101], int a, int b) { return fillTableCs_LforAB(defaultColorSpace(), table, a, b); }
+int fillTable_AforBL(TinyRgb table[257], int b, int l) { return fillTableCs_AforBL(defaultColorSpace(), table, b, l); }
+int fillTable_BforAL(TinyRgb table[257], int a, int l) { return fillTableCs_BforAL(defaultColorSpace(), table, a, l); }
+int fillTable_LforHC(TinyRgb table[101], int h, int c) { return fillTableCs_LforHC(defaultColorSpace(), table, h, c); }
+int fillTable_CforHL(TinyRgb table[181], int h, int l) { return fillTableCs_CforHL(defaultColorSpace(), table, h, l); }
+int fillTable_HforCL(TinyRgb table[360], int c, int l) { return fillTableCs_HforCL(defaultColorSpace(), table, c, l); }
+int fillTable_ABforL(TinyRgb table[257][257], int l) { return fillTableCs_ABforL(defaultColorSpace(), table, l); }
+int fillTable_BLforA(TinyRgb table[257][101], int a) { return fillTableCs_BLforA(defaultColorSpace(), table, a); }
+int fillTable_ALforB(TinyRgb table[257][101], int b) { return fillTableCs_ALforB(defaultColorSpace(), table, b); }
+int fillTable_HCforL(TinyRgb table[360][181], int l) { return fillTableCs_HCforL(defaultColorSpace(), table, l); }
+int fillTable_HLforC(TinyRgb table[360][101], int c) { return fillTableCs_HLforC(defaultColorSpace(), table, c); }
+int fillTable_CLforH(TinyRgb table[181][101], int h) { return fillTableCs_CLforH(defaultColorSpace(), table, h); }
+
+int fillArgb32_LforAB(unsigned char * bits, ptrdiff_t bytesPerLine, int height, int xRotate, int a, int b) { return fillArgb32Cs_LforAB(defaultColorSpace(), bits, bytesPerLine, height, xRotate, a, b); }
+int fillArgb32_AforBL(unsigned char * bits, ptrdiff_t bytesPerLine, int height, int xRotate, int b, int l) { return fillArgb32Cs_AforBL(defaultColorSpace(), bits, bytesPerLine, height, xRotate, b, l); }
+int fillArgb32_BforAL(unsigned char * bits, ptrdiff_t bytesPerLine, int height, int xRotate, int a, int l) { return fillArgb32Cs_BforAL(defaultColorSpace(), bits, bytesPerLine, height, xRotate, a, l); }
+int fillArgb32_LforHC(unsigned char * bits, ptrdiff_t bytesPerLine, int height, int xRotate, int h, int c) { return fillArgb32Cs_LforHC(defaultColorSpace(), bits, bytesPerLine, height, xRotate, h, c); }
+int fillArgb32_CforHL(unsigned char * bits, ptrdiff_t bytesPerLine, int height, int xRotate, int h, int l) { return fillArgb32Cs_CforHL(defaultColorSpace(), bits, bytesPerLine, height, xRotate, h, l); }
+int fillArgb32_HforCL(unsigned char * bits, ptrdiff_t bytesPerLine, int height, int xRotate, int c, int l) { return fillArgb32Cs_HforCL(defaultColorSpace(), bits, bytesPerLine, height, xRotate, c, l); }
+int fillArgb32_ABforL(unsigned char * bits, ptrdiff_t bytesPerLine, int xRotate, int l) { return fillArgb32Cs_ABforL(defaultColorSpace(), bits, bytesPerLine, xRotate, l); }
+int fillArgb32_BLforA(unsigned char * bits, ptrdiff_t bytesPerLine, int xRotate, int a) { return fillArgb32Cs_BLforA(defaultColorSpace(), bits, bytesPerLine, xRotate, a); }
+int fillArgb32_ALforB(unsigned char * bits, ptrdiff_t bytesPerLine, int xRotate, int b) { return fillArgb32Cs_ALforB(defaultColorSpace(), bits, bytesPerLine, xRotate, b); }
+int fillArgb32_HCforL(unsigned char * bits, ptrdiff_t bytesPerLine, int xRotate, int l) { return fillArgb32Cs_HCforL(defaultColorSpace(), bits, bytesPerLine, xRotate, l); }
+int fillArgb32_HLforC(unsigned char * bits, ptrdiff_t bytesPerLine, int xRotate, int c) { return fillArgb32Cs_HLforC(defaultColorSpace(), bits, bytesPerLine, xRotate, c); }
+int fillArgb32_CLforH(unsigned char * bits, ptrdiff_t bytesPerLine, int xRotate, int h) { return fillArgb32Cs_CLforH(defaultColorSpace(), bits, bytesPerLine, xRotate, h); }
+
+PackedTable * newPackedTable_LforAB(int a, int b, PackedValidity validity) { return newPackedTableCs_LforAB(defaultColorSpace(), a, b, validity); }
+PackedTable * newPackedTable_AforBL(int b, int l, PackedValidity validity) { return newPackedTableCs_AforBL(defaultColorSpace(), b, l, validity); }
+PackedTable * newPackedTable_BforAL(int a, int l, PackedValidity validity) { return newPackedTableCs_BforAL(defaultColorSpace(), a, l, validity); }
+PackedTable * newPackedTable_LforHC(int h, int c, PackedValidity validity) { return newPackedTableCs_LforHC(defaultColorSpace(), h, c, validity); }
+PackedTable * newPackedTable_CforHL(int h, int l, PackedValidity validity) { return newPackedTableCs_CforHL(defaultColorSpace(), h, l, validity); }
+PackedTable * newPackedTable_HforCL(int c, int l, PackedValidity validity) { return newPackedTableCs_HforCL(defaultColorSpace(), c, l, validity); }
+PackedTable * newPackedTable_ABforL(int l, PackedValidity validity) { return newPackedTableCs_ABforL(defaultColorSpace(), l, validity); }
+PackedTable * newPackedTable_BLforA(int a, PackedValidity validity) { return newPackedTableCs_BLforA(defaultColorSpace(), a, validity); }
+PackedTable * newPackedTable_ALforB(int b, PackedValidity validity) { return newPackedTableCs_ALforB(defaultColorSpace(), b, validity); }
+PackedTable * newPackedTable_HCforL(int l, PackedValidity validity) { return newPackedTableCs_HCforL(defaultColorSpace(), l, validity); }
+PackedTable * newPackedTable_HLforC(int c, PackedValidity validity) { return newPackedTableCs_HLforC(defaultColorSpace(), c, validity); }
+PackedTable * newPackedTable_CLforH(int h, PackedValidity validity) { return newPackedTableCs_CLforH(defaultColorSpace(), h, validity); }
+
+void freePackedTable(PackedTable * table)
+{
+    if (!table) return;
+    free(table->rgb);
+    free(table->bitmap);
+    free(table->spans);
+    free(table->blockRanks);
+    free(table->spanRanks);
+    free(table);
+}
+
+void packedTableShape(const PackedTable * table, int * var1Span, int * var2Span)
+{
+    *var1Span = table->var1Span;
+    *var2Span = table->var2Span;
+}
+
+PackedValidity packedTableValidity(const PackedTable * table) { return table->validity; }
+int packedTableInGamutCount(const PackedTable * table) { return table->inGamutCount; }
+const unsigned char * packedTableRgb(const PackedTable * table) { return table->rgb; }
+const unsigned char * packedTableBitmap(const PackedTable * table) { return table->bitmap; }
+
+const int * packedTableSpans(const PackedTable * table, int * spanCount)
+{
+    *spanCount = table->spanCount;
+    return table->spans;
+}
+
+size_t packedTableMemory(const PackedTable * table)
+{
+    size_t size = sizeof(PackedTable) + 3 * (size_t) table->inGamutCount;
+    if (table->validity == PACKED_BITMAP)
+        size += (table->cells + 7) / 8 + sizeof(uint32_t) * ((table->cells + PACKED_RANK_BLOCK - 1) / PACKED_RANK_BLOCK + 1);
+    else
+        size += 3 * sizeof(int) * (size_t) table->spanCount;
+    return size;
+}
+
+// Index of cell `i` in the RGB plane or -1 if it is out of gamut
+static int _packedRank(const PackedTable * t, int i)
+{
+    if (t->validity == PACKED_BITMAP)
+    {
+        if (!(t->bitmap[i / 8] >> i % 8 & 1)) return -1;
+        int rank = t->blockRanks[i / PACKED_RANK_BLOCK];
+        for (int j = i / PACKED_RANK_BLOCK * (PACKED_RANK_BLOCK / 8); j < i / 8; ++j)
+            rank += __builtin_popcount(t->bitmap[j]);
+        return rank + __builtin_popcount(t->bitmap[i / 8] & ((1u << i % 8) - 1));
+    }
+    int lo = 0, hi = t->spanCount; // find the first span beginning after `i`
+    while (lo < hi)
+    {
+        int mid = (lo + hi) / 2;
+        if (t->spans[2 * mid] <= i) lo = mid + 1; else hi = mid;
+    }
+    if (lo == 0 || i >= t->spans[2 * lo - 1]) return -1; // not within the span before it
+    return t->spanRanks[lo - 1] + i - t->spans[2 * lo - 2];
+}
+
+int packedTableCell(const PackedTable * table, int i, TinyRgb * cell)
+{
+    if (i < 0 || i >= table->cells) return -1;
+    int rank = _packedRank(table, i);
+    TinyRgb temp = {0, 0, 0, 0};
+    if (rank != -1)
+    {
+        const unsigned char * rgb = table->rgb + 3 * (size_t) rank;
+        temp.valid = 1;
+        temp.r = rgb[0];
+        temp.g = rgb[1];
+        temp.b = rgb[2];
+    }
+    *cell = temp;
+    return temp.valid;
+}
+
+static const unsigned char packedMagic[8] = "RGB2LABP";
+enum { PACKED_VERSION = 1, PACKED_HEADER_SIZE = 32, PACKED_MAX_SPAN = 4096 };
+
+static void _putU32(unsigned char * p, uint32_t v) { for (int i = 0; i < 4; ++i) p[i] = v >> 8 * i; }
+static uint32_t _getU32(const unsigned char * p) { return p[0] | p[1] << 8 | p[2] << 16 | (uint32_t) p[3] << 24; }
+
+static size_t _packedValiditySize(const PackedTable * t)
+{
+    return t->validity == PACKED_BITMAP ? (size_t) (t->cells + 7) / 8 : 8 * (size_t) t->spanCount;
+}
+
+size_t packedTableSerializedSize(const PackedTable * table)
+{
+    return PACKED_HEADER_SIZE + _packedValiditySize(table) + 3 * (size_t) table->inGamutCount;
+}
+
+void writePackedTable(const PackedTable * table, unsigned char * out)
+{
+    memcpy(out, packedMagic, 8);
+    uint32_t header[6] = {PACKED_VERSION, table->validity, table->var1Span, table->var2Span, table->inGamutCount, table->spanCount};
+    for (int i = 0; i < 6; ++i) _putU32(out + 8 + 4 * i, header[i]);
+    out += PACKED_HEADER_SIZE;
+    if (table->validity == PACKED_BITMAP)
+        memcpy(out, table->bitmap, _packedValiditySize(table));
+    else
+        for (int i = 0; i < 2 * table->spanCount; ++i) _putU32(out + 4 * i, table->spans[i]);
+    memcpy(out + _packedValiditySize(table), table->rgb, 3 * (size_t) table->inGamutCount);
+}
+
+PackedTable * readPackedTable(const unsigned char * data, size_t size)
+{
+    if (size < PACKED_HEADER_SIZE || memcmp(data, packedMagic, 8) != 0 || _getU32(data + 8) != PACKED_VERSION) return NULL;
+    uint32_t validity = _getU32(data + 12), var1Span = _getU32(data + 16), var2Span = _getU32(data + 20),
+             inGamutCount = _getU32(data + 24), spanCount = _getU32(data + 28);
+    if ((validity != PACKED_BITMAP && validity != PACKED_SPANS) ||
+        var1Span < 1 || var1Span > PACKED_MAX_SPAN || var2Span > PACKED_MAX_SPAN)
+        return NULL;
+    PackedTable * t = _newPackedTable(var1Span, var2Span, validity, inGamutCount);
+    if (!t) return NULL;
+    t->spanCount = validity == PACKED_SPANS ? spanCount : 0;
+    if (inGamutCount > (uint32_t) t->cells || spanCount > (uint32_t) t->cells ||
+        size != packedTableSerializedSize(t) || (validity == PACKED_BITMAP && spanCount != 0))
+    {
+        freePackedTable(t);
+        return NULL;
+    }
+    data += PACKED_HEADER_SIZE;
+    bool ok = (t->rgb = malloc(3 * (size_t) inGamutCount + 1)) != NULL;
+    if (ok && validity == PACKED_BITMAP)
+    {
+        ok = (t->bitmap = malloc(_packedValiditySize(t))) != NULL;
+        if (ok) memcpy(t->bitmap, data, _packedValiditySize(t));
+    }
+    else if (ok)
+    {
+        ok = (t->spans = malloc(sizeof(int) * 2 * spanCount + 1)) != NULL;
+        for (uint32_t i = 0; ok && i < 2 * spanCount; ++i)
+        {
+            uint32_t v = _getU32(data + 4 * i);
+            ok = v <= (uint32_t) t->cells;
+            t->spans[i] = v;
+        }
+    }
+    if (ok)
+    {
+        memcpy(t->rgb, data + _packedValiditySize(t), 3 * (size_t) inGamutCount);
+        ok = _indexPackedTable(t);
+    }
+    if (ok) return t;
+    freePackedTable(t);
+    return NULL;
 }
@@ -9,6 +9,8 @@
 // Use, modification and distribution are permitted subject to the
 // "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
 
+#include <stddef.h>
+
 typedef union
 {
     int data[3];
@@ -27,6 +29,33 @@ void labLchFromRgbInt(IntTriplet rgb, IntTriplet * lab, IntTriplet * lch);
 void rgbLchFromLabInt(IntTriplet lab, IntTriplet * rgb, IntTriplet * lch);
 void rgbLabFromLchInt(IntTriplet lch, IntTriplet * rgb, IntTriplet * lab);
 
+// Versions of the RGB conversions above in a color space made by newColorSpace
+// of rgb2lab.h; the fillTable* and fillArgb32* functions below also have
+// such versions named fillTableCs_* and fillArgb32Cs_* with `cs` first
+typedef struct ColorSpace ColorSpace;
+IntTriplet labFromRgbIntCs(const ColorSpace * cs, IntTriplet rgb);
+IntTriplet rgbFromLabIntCs(const ColorSpace * cs, IntTriplet lab);
+IntTriplet lchFromRgbIntCs(const ColorSpace * cs, IntTriplet rgb);
+IntTriplet rgbFromLchIntCs(const ColorSpace * cs, IntTriplet lch);
+
+// Layout of packed 8-bit pixels: bytes per pixel and byte offsets of the R, G and B channels
+typedef struct { int stride, r, g, b; } Rgb8Layout;
+
+// Batch versions of the RGB-input functions above reading `n` packed 8-bit pixels
+// and writing packed int8 Lab and/or int16 LCH triplets; results are identical
+// to those of the corresponding single-triplet functions
+void labFromRgb8Array(const unsigned char * src, Rgb8Layout layout, size_t n, signed char lab[][3]);
+void lchFromRgb8Array(const unsigned char * src, Rgb8Layout layout, size_t n, short lch[][3]);
+void labLchFromRgb8Array(const unsigned char * src, Rgb8Layout layout, size_t n, signed char lab[][3], short lch[][3]);
+
+// Results of labLchFromRgbInt for every 8-bit RGB input, indexed by r << 16 | g << 8 | b
+typedef struct { signed char L, A, B; unsigned char c; short h; } Rgb8LabLch;
+#define RGB8_TABLE_SIZE (256 * 256 * 256)
+
+void fillRgb8LabLchTable(Rgb8LabLch table[RGB8_TABLE_SIZE]);
+// Make the *Rgb8Array functions use a table filled as above, or compute again if NULL
+void setRgb8LabLchTable(const Rgb8LabLch * table);
+
 typedef struct { unsigned char valid, r, g, b; } TinyRgb;
 
 int fillTable_LforAB(TinyRgb table[101], int a, int b);
@@ -42,3 +71,126 @@ int fillTable_ALforB(TinyRgb table[257][101], int b);
 int fillTable_HCforL(TinyRgb table[360][181], int l);
 int fillTable_HLforC(TinyRgb table[360][101], int c);
 int fillTable_CLforH(TinyRgb table[181][101], int h);
+
+// Versions of the above writing the table directly as an image of 32-bit
+// pixels 0xAARRGGBB in native byte order (as QImage::Format_ARGB32 and
+// Format_ARGB32_Premultiplied) at `bits` with lines `bytesPerLine` apart:
+// opaque for in-gamut cells and transparent (all zero) otherwise. The first
+// variable is along x, moved right by `xRotate` columns with wraparound;
+// the second variable of 2D tables is along y increasing upwards and 1D
+// tables are repeated over `height` lines, with nothing written for a
+// `height` below 1. Returns as the above, or 0 if nothing was written.
+
+int fillArgb32_LforAB(unsigned char * bits, ptrdiff_t bytesPerLine, int height, int xRotate, int a, int b);
+int fillArgb32_AforBL(unsigned char * bits, ptrdiff_t bytesPerLine, int height, int xRotate, int b, int l);
+int fillArgb32_BforAL(unsigned char * bits, ptrdiff_t bytesPerLine, int height, int xRotate, int a, int l);
+int fillArgb32_LforHC(unsigned char * bits, ptrdiff_t bytesPerLine, int height, int xRotate, int h, int c);
+int fillArgb32_CforHL(unsigned char * bits, ptrdiff_t bytesPerLine, int height, int xRotate, int h, int l);
+int fillArgb32_HforCL(unsigned char * bits, ptrdiff_t bytesPerLine, int height, int xRotate, int c, int l);
+
+int fillArgb32_ABforL(unsigned char * bits, ptrdiff_t bytesPerLine, int xRotate, int l);
+int fillArgb32_BLforA(unsigned char * bits, ptrdiff_t bytesPerLine, int xRotate, int a);
+int fillArgb32_ALforB(unsigned char * bits, ptrdiff_t bytesPerLine, int xRotate, int b);
+int fillArgb32_HCforL(unsigned char * bits, ptrdiff_t bytesPerLine, int xRotate, int l);
+int fillArgb32_HLforC(unsigned char * bits, ptrdiff_t bytesPerLine, int xRotate, int c);
+int fillArgb32_CLforH(unsigned char * bits, ptrdiff_t bytesPerLine, int xRotate, int h);
+
+int fillTableCs_LforAB(const ColorSpace * cs, TinyRgb table[101], int a, int b);
+int fillTableCs_AforBL(const ColorSpace * cs, TinyRgb table[257], int b, int l);
+int fillTableCs_BforAL(const ColorSpace * cs, TinyRgb table[257], int a, int l);
+int fillTableCs_LforHC(const ColorSpace * cs, TinyRgb table[101], int h, int c);
+int fillTableCs_CforHL(const ColorSpace * cs, TinyRgb table[181], int h, int l);
+int fillTableCs_HforCL(const ColorSpace * cs, TinyRgb table[360], int c, int l);
+
+int fillTableCs_ABforL(const ColorSpace * cs, TinyRgb table[257][257], int l);
+int fillTableCs_BLforA(const ColorSpace * cs, TinyRgb table[257][101], int a);
+int fillTableCs_ALforB(const ColorSpace * cs, TinyRgb table[257][101], int b);
+int fillTableCs_HCforL(const ColorSpace * cs, TinyRgb table[360][181], int l);
+int fillTableCs_HLforC(const ColorSpace * cs, TinyRgb table[360][101], int c);
+int fillTableCs_CLforH(const ColorSpace * cs, TinyRgb table[181][101], int h);
+
+int fillArgb32Cs_LforAB(const ColorSpace * cs, unsigned char * bits, ptrdiff_t bytesPerLine, int height, int xRotate, int a, int b);
+int fillArgb32Cs_AforBL(const ColorSpace * cs, unsigned char * bits, ptrdiff_t bytesPerLine, int height, int xRotate, int b, int l);
+int fillArgb32Cs_BforAL(const ColorSpace * cs, unsigned char * bits, ptrdiff_t bytesPerLine, int height, int xRotate, int a, int l);
+int fillArgb32Cs_LforHC(const ColorSpace * cs, unsigned char * bits, ptrdiff_t bytesPerLine, int height, int xRotate, int h, int c);
+int fillArgb32Cs_CforHL(const ColorSpace * cs, unsigned char * bits, ptrdiff_t bytesPerLine, int height, int xRotate, int h, int l);
+int fillArgb32Cs_HforCL(const ColorSpace * cs, unsigned char * bits, ptrdiff_t bytesPerLine, int height, int xRotate, int c, int l);
+
+int fillArgb32Cs_ABforL(const ColorSpace * cs, unsigned char * bits, ptrdiff_t bytesPerLine, int xRotate, int l);
+int fillArgb32Cs_BLforA(const ColorSpace * cs, unsigned char * bits, ptrdiff_t bytesPerLine, int xRotate, int a);
+int fillArgb32Cs_ALforB(const ColorSpace * cs, unsigned char * bits, ptrdiff_t bytesPerLine, int xRotate, int b);
+int fillArgb32Cs_HCforL(const ColorSpace * cs, unsigned char * bits, ptrdiff_t bytesPerLine, int xRotate, int l);
+int fillArgb32Cs_HLforC(const ColorSpace * cs, unsigned char * bits, ptrdiff_t bytesPerLine, int xRotate, int c);
+int fillArgb32Cs_CLforH(const ColorSpace * cs, unsigned char * bits, ptrdiff_t bytesPerLine, int xRotate, int h);
+
+// Packed tables
+// =============
+//
+// The tables of the fillTable* functions in a fraction of the space: a plane
+// of the RGB bytes of only the in-gamut cells, in the order of the cells of
+// the TinyRgb tables flattened in C order, and which cells those are, either
+// as a bitmap of one bit per cell (least significant bit first) or, since
+// the out-of-gamut cells of every slice come in long runs, as the spans of
+// in-gamut cells [begin, end) in increasing order. Cells are looked up
+// without unpacking via a rank directory of the bitmap or by binary search of
+// the spans.
+
+typedef enum { PACKED_BITMAP, PACKED_SPANS } PackedValidity;
+
+typedef struct PackedTable PackedTable;
+
+// Return NULL for bad values or if allocation fails
+PackedTable * newPackedTable_LforAB(int a, int b, PackedValidity validity);
+PackedTable * newPackedTable_AforBL(int b, int l, PackedValidity validity);
+PackedTable * newPackedTable_BforAL(int a, int l, PackedValidity validity);
+PackedTable * newPackedTable_LforHC(int h, int c, PackedValidity validity);
+PackedTable * newPackedTable_CforHL(int h, int l, PackedValidity validity);
+PackedTable * newPackedTable_HforCL(int c, int l, PackedValidity validity);
+
+PackedTable * newPackedTable_ABforL(int l, PackedValidity validity);
+PackedTable * newPackedTable_BLforA(int a, PackedValidity validity);
+PackedTable * newPackedTable_ALforB(int b, PackedValidity validity);
+PackedTable * newPackedTable_HCforL(int l, PackedValidity validity);
+PackedTable * newPackedTable_HLforC(int c, PackedValidity validity);
+PackedTable * newPackedTable_CLforH(int h, PackedValidity validity);
+
+PackedTable * newPackedTableCs_LforAB(const ColorSpace * cs, int a, int b, PackedValidity validity);
+PackedTable * newPackedTableCs_AforBL(const ColorSpace * cs, int b, int l, PackedValidity validity);
+PackedTable * newPackedTableCs_BforAL(const ColorSpace * cs, int a, int l, PackedValidity validity);
+PackedTable * newPackedTableCs_LforHC(const ColorSpace * cs, int h, int c, PackedValidity validity);
+PackedTable * newPackedTableCs_CforHL(const ColorSpace * cs, int h, int l, PackedValidity validity);
+PackedTable * newPackedTableCs_HforCL(const ColorSpace * cs, int c, int l, PackedValidity validity);
+
+PackedTable * newPackedTableCs_ABforL(const ColorSpace * cs, int l, PackedValidity validity);
+PackedTable * newPackedTableCs_BLforA(const ColorSpace * cs, int a, PackedValidity validity);
+PackedTable * newPackedTableCs_ALforB(const ColorSpace * cs, int b, PackedValidity validity);
+PackedTable * newPackedTableCs_HCforL(const ColorSpace * cs, int l, PackedValidity validity);
+PackedTable * newPackedTableCs_HLforC(const ColorSpace * cs, int c, PackedValidity validity);
+PackedTable * newPackedTableCs_CLforH(const ColorSpace * cs, int h, PackedValidity validity);
+
+void freePackedTable(PackedTable * table);
+
+// Dimensions of the TinyRgb table; `var2Span` is 0 for 1D tables
+void packedTableShape(const PackedTable * table, int * var1Span, int * var2Span);
+PackedValidity packedTableValidity(const PackedTable * table);
+int packedTableInGamutCount(const PackedTable * table);
+// Bytes held by the table including its lookup index
+size_t packedTableMemory(const PackedTable * table);
+
+// 3 × inGamutCount bytes
+const unsigned char * packedTableRgb(const PackedTable * table);
+// (cells + 7) / 8 bytes with PACKED_BITMAP, else NULL
+const unsigned char * packedTableBitmap(const PackedTable * table);
+// 2 × `*spanCount` ints with PACKED_SPANS, else NULL
+const int * packedTableSpans(const PackedTable * table, int * spanCount);
+
+// Writes cell `i` of the flattened TinyRgb table to `cell` and returns its
+// validity, or returns -1 if `i` is out of range
+int packedTableCell(const PackedTable * table, int i, TinyRgb * cell);
+
+// A serialized form for archives and transfer: a 32 byte header and the
+// bitmap or spans and the RGB plane, all little endian. readPackedTable
+// returns NULL for malformed data or if allocation fails.
+size_t packedTableSerializedSize(const PackedTable * table);
+void writePackedTable(const PackedTable * table, unsigned char * out);
+PackedTable * readPackedTable(const unsigned char * data, size_t size);
@@ -13,35 +13,626 @@
 import rgb2lab_common
 from rgb2lab_common import *
 from ctypes import *
+import mmap, os, struct, threading, warnings
+from collections import OrderedDict, namedtuple
 
 _makeRetOneFn, _makeRetTwoFn = rgb2lab_common._makeConversionFns(c_int)
 
-_lib = CDLL("librgb2lab.so")
+_lib = rgb2lab_common._lib
 
-labFromRgbInt = _makeRetOneFn(checkRgb256, _lib.labFromRgbInt)
-rgbFromLabInt = _makeRetOneFn(checkLab   , _lib.rgbFromLabInt)
-lchFromRgbInt = _makeRetOneFn(checkRgb256, _lib.lchFromRgbInt)
-rgbFromLchInt = _makeRetOneFn(checkLch   , _lib.rgbFromLchInt)
-lchFromLabInt = _makeRetOneFn(checkLab   , _lib.lchFromLabInt)
-labFromLchInt = _makeRetOneFn(checkLch   , _lib.labFromLchInt)
+try:
+    import _rgb2lab # optional native extension avoiding CTypes marshalling; see rgb2lab_ext.c
+except ImportError:
+    _rgb2lab = None
 
-labLchFromRgbInt = _makeRetTwoFn(checkRgb256, _lib.labLchFromRgbInt)
-rgbLchFromLabInt = _makeRetTwoFn(checkLab   , _lib.rgbLchFromLabInt)
-rgbLabFromLchInt = _makeRetTwoFn(checkLch   , _lib.rgbLabFromLchInt)
+_tableKinds = ("LforAB", "AforBL", "BforAL", "LforHC", "CforHL", "HforCL",
+               "ABforL", "BLforA", "ALforB", "HCforL", "HLforC", "CLforH")
+
+def _nativeFns():
+    fns = {
+        "labFromRgbInt": _makeRetOneFn(checkRgb256, _lib.labFromRgbInt),
+        "rgbFromLabInt": _makeRetOneFn(checkLab   , _lib.rgbFromLabInt),
+        "lchFromRgbInt": _makeRetOneFn(checkRgb256, _lib.lchFromRgbInt),
+        "rgbFromLchInt": _makeRetOneFn(checkLch   , _lib.rgbFromLchInt),
+        "lchFromLabInt": _makeRetOneFn(checkLab   , _lib.lchFromLabInt),
+        "labFromLchInt": _makeRetOneFn(checkLch   , _lib.labFromLchInt),
+
+        "labLchFromRgbInt": _makeRetTwoFn(checkRgb256, _lib.labLchFromRgbInt),
+        "rgbLchFromLabInt": _makeRetTwoFn(checkLab   , _lib.rgbLchFromLabInt),
+        "rgbLabFromLchInt": _makeRetTwoFn(checkLch   , _lib.rgbLabFromLchInt),
+
+        "labFromRgb8Array": _nativeLabFromRgb8Array,
+        "lchFromRgb8Array": _nativeLchFromRgb8Array,
+        "labLchFromRgb8Array": _nativeLabLchFromRgb8Array,
+        }
+    if _rgb2lab is not None:
+        fns.update((name, getattr(_rgb2lab, name)) for name in ("labFromRgbInt", "rgbFromLabInt", "lchFromRgbInt", "rgbFromLchInt",
+                   "lchFromLabInt", "labFromLchInt", "labLchFromRgbInt", "rgbLchFromLabInt", "rgbLabFromLchInt"))
+    for kind in _tableKinds: # argtypes are set where these are wrapped below
+        for name in "fillTable_" + kind, "fillArgb32_" + kind:
+            fns[name] = getattr(_lib, name)
+    return fns
+
+# Conversions and table filling by the backend in use; see rgb2lab_common
+_dispatcher = rgb2lab_common._Dispatcher(globals(), _nativeFns)
+
+labFromRgbInt = _dispatcher.stub("labFromRgbInt")
+rgbFromLabInt = _dispatcher.stub("rgbFromLabInt")
+lchFromRgbInt = _dispatcher.stub("lchFromRgbInt")
+rgbFromLchInt = _dispatcher.stub("rgbFromLchInt")
+lchFromLabInt = _dispatcher.stub("lchFromLabInt")
+labFromLchInt = _dispatcher.stub("labFromLchInt")
+
+labLchFromRgbInt = _dispatcher.stub("labLchFromRgbInt")
+rgbLchFromLabInt = _dispatcher.stub("rgbLchFromLabInt")
+rgbLabFromLchInt = _dispatcher.stub("rgbLabFromLchInt")
+
+# The RGB8 lookup table and gamut volumes below, when present at their default
+# paths, are loaded on the first call of a function using them rather than at
+# import, as checking them against the computed results picks the backend
+
+_defaultTablesPending = True # until loaded, or any explicit load or unload
+_defaultTablesLock = threading.RLock()
+
+def _withDefaultTables(fn):
+    def wrapper(*args, **kwargs):
+        if _defaultTablesPending:
+            _loadDefaultTables()
+        return fn(*args, **kwargs)
+    wrapper.__name__ = fn.__name__
+    return wrapper
+
+# Versions of the RGB conversions above in the ColorSpace `space` given first
+
+labFromRgbIntCs = _makeRetOneFn(checkRgb256, _lib.labFromRgbIntCs, withColorSpace = True)
+rgbFromLabIntCs = _makeRetOneFn(checkLab   , _lib.rgbFromLabIntCs, withColorSpace = True)
+lchFromRgbIntCs = _makeRetOneFn(checkRgb256, _lib.lchFromRgbIntCs, withColorSpace = True)
+rgbFromLchIntCs = _makeRetOneFn(checkLch   , _lib.rgbFromLchIntCs, withColorSpace = True)
+
+class Rgb8Layout(Structure):
+    _fields_ = tuple((f, c_int) for f in ("stride", "r", "g", "b"))
+
+rgb8Layouts = {
+    "RGB" : Rgb8Layout(3, 0, 1, 2),
+    "BGR" : Rgb8Layout(3, 2, 1, 0),
+    "RGBA": Rgb8Layout(4, 0, 1, 2),
+    "BGRA": Rgb8Layout(4, 2, 1, 0),
+    "ARGB": Rgb8Layout(4, 1, 2, 3),
+    "ABGR": Rgb8Layout(4, 3, 2, 1),
+    }
+
+def _rgb8Source(src, layout):
+    if not isinstance(layout, Rgb8Layout):
+        try:
+            layout = rgb8Layouts[layout]
+        except KeyError:
+            raise Rgb2LabError("Unknown pixel layout {!r}; use one of {}.".format(layout, ", ".join(rgb8Layouts))) from None
+    srcPtr, n = rgb2lab_common._asBuffer(src, c_ubyte, layout.stride)
+    return srcPtr, layout, n
+
+def _rgb8Output(out, T, n):
+    if out is None:
+        out = rgb2lab_common._newBuffer(T, n, 3)
+    outPtr, outN = rgb2lab_common._asBuffer(out, T, 3, writable = True)
+    if outN != n:
+        raise Rgb2LabError("Output buffer holds {} triplets but input has {} pixels.".format(outN, n))
+    return out, outPtr
+
+_lib.labFromRgb8Array.argtypes = [POINTER(c_ubyte), Rgb8Layout, c_size_t, POINTER(c_byte)]
+_lib.lchFromRgb8Array.argtypes = [POINTER(c_ubyte), Rgb8Layout, c_size_t, POINTER(c_short)]
+_lib.labLchFromRgb8Array.argtypes = [POINTER(c_ubyte), Rgb8Layout, c_size_t, POINTER(c_byte), POINTER(c_short)]
+for _f in _lib.labFromRgb8Array, _lib.lchFromRgb8Array, _lib.labLchFromRgb8Array:
+    _f.restype = None
+
+# Batch versions of the RGB-input functions above: `src` is a buffer of packed
+# 8-bit pixels in the given `layout` (a key of `rgb8Layouts` or an Rgb8Layout)
+# such as a H×W×3 uint8 NumPy array or a memoryview of raw image data; output
+# is packed int8 Lab and/or int16 LCH triplets written into the given buffers
+# (allocated if not given) which are returned
+
+labFromRgb8Array = _withDefaultTables(_dispatcher.stub("labFromRgb8Array"))
+lchFromRgb8Array = _withDefaultTables(_dispatcher.stub("lchFromRgb8Array"))
+labLchFromRgb8Array = _withDefaultTables(_dispatcher.stub("labLchFromRgb8Array"))
+
+def _nativeLabFromRgb8Array(src, out = None, layout = "RGB"):
+    srcPtr, layout, n = _rgb8Source(src, layout)
+    out, outPtr = _rgb8Output(out, c_byte, n)
+    _lib.labFromRgb8Array(srcPtr, layout, n, outPtr)
+    return out
+
+def _nativeLchFromRgb8Array(src, out = None, layout = "RGB"):
+    srcPtr, layout, n = _rgb8Source(src, layout)
+    out, outPtr = _rgb8Output(out, c_short, n)
+    _lib.lchFromRgb8Array(srcPtr, layout, n, outPtr)
+    return out
+
+def _nativeLabLchFromRgb8Array(src, labOut = None, lchOut = None, layout = "RGB"):
+    srcPtr, layout, n = _rgb8Source(src, layout)
+    labOut, labPtr = _rgb8Output(labOut, c_byte, n)
+    lchOut, lchPtr = _rgb8Output(lchOut, c_short, n)
+    _lib.labLchFromRgb8Array(srcPtr, layout, n, labPtr, lchPtr)
+    return labOut, lchOut
+
+# Lookup table of labLchFromRgbInt results for every 8-bit RGB input
+# ===================================================================
+#
+# Built once by `rgb2lab-lut.py build` and memory-mapped when present so that
+# all processes share it through the page cache. When loaded, it is used by
+# the *Rgb8Array functions above and the integer-RGB-input functions below.
+
+class Rgb8LabLch(Structure):
+    _fields_ = (("L", c_byte), ("A", c_byte), ("B", c_byte), ("c", c_ubyte), ("h", c_short))
+Rgb8LabLchTable = Rgb8LabLch * (256 * 256 * 256)
+
+_lib.fillRgb8LabLchTable.argtypes = [POINTER(Rgb8LabLch)]
+_lib.fillRgb8LabLchTable.restype = None
+_lib.setRgb8LabLchTable.argtypes = [POINTER(Rgb8LabLch)]
+_lib.setRgb8LabLchTable.restype = None
+
+rgb8TableMagic = b"RGB2LAB\x08"
+rgb8TableVersion = 1 # NOTE: increment whenever the computed results may change
+_rgb8TableHeader = struct.Struct("<8sIII12x") # magic, version, entry size, entry count; 32 bytes
+_rgb8TableEntry = struct.Struct("=3bBh")
+assert _rgb8TableEntry.size == sizeof(Rgb8LabLch)
+
+rgb8TablePath = os.environ.get("RGB2LAB_LUT",
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), "rgb2lab-srgb8.lut"))
+
+_rgb8Table = None # (mmap, ctypes table over it) while loaded
+_rgb8TableLock = threading.Lock() # serializes loading and unloading
+
+def _computeRgb8Table():
+    table = Rgb8LabLchTable()
+    _lib.fillRgb8LabLchTable(table)
+    return table
+
+def writeRgb8Table(path = None):
+    '''Computes the lookup table and writes it to `path` (default `rgb8TablePath`)'''
+    path = path or rgb8TablePath
+    table = _computeRgb8Table()
+    tempPath = path + ".tmp"
+    with open(tempPath, "wb") as f:
+        f.write(_rgb8TableHeader.pack(rgb8TableMagic, rgb8TableVersion, sizeof(Rgb8LabLch), len(table)))
+        f.write(table)
+    os.replace(tempPath, path) # so that readers never see a partial file
+
+def _mapRgb8Table(path):
+    with open(path, "rb") as f:
+        m = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_COPY) # private mapping needed for ctypes but pages stay shared
+    try:
+        magic, version, entrySize, entryCount = _rgb8TableHeader.unpack_from(m)
+        if magic != rgb8TableMagic or version != rgb8TableVersion or \
+           entrySize != sizeof(Rgb8LabLch) or entryCount != Rgb8LabLchTable._length_ or \
+           len(m) != _rgb8TableHeader.size + sizeof(Rgb8LabLchTable):
+            raise Rgb2LabError("{} is not a version {} RGB8 lookup table.".format(path, rgb8TableVersion))
+    except (struct.error, Rgb2LabError):
+        m.close()
+        raise
+    return m, Rgb8LabLchTable.from_buffer(m, _rgb8TableHeader.size)
+
+def loadRgb8Table(path = None):
+    '''
+    Memory-maps the lookup table at `path` (default `rgb8TablePath`) and
+    starts using it in place of any loaded before, which is unloaded
+    '''
+    global _rgb8Table
+    _cancelDefaultTables()
+    m, table = _mapRgb8Table(path or rgb8TablePath)
+    for rgb in ((0, 0, 0), (255, 255, 255), (99, 129, 39), (255, 0, 0), (0, 0, 255), (1, 2, 3)):
+        if _rgb8TableLookup(table, rgb) != _labLchFromRgbIntComputed(rgb): # guard against stale tables
+            del table; m.close()
+            raise Rgb2LabError("{} does not match the computed results; please rebuild it.".format(path or rgb8TablePath))
+    with _rgb8TableLock:
+        _unloadRgb8Table()
+        if rgb2lab_common.nativeAvailable(): # the NumPy backend reads it from here
+            _lib.setRgb8LabLchTable(table)
+        _rgb8Table = m, table
+
+def unloadRgb8Table():
+    '''
+    Stops using the lookup table, if any, and unmaps it.
+    NOTE: not safe while other threads are converting integer RGB input, as
+    the batch kernels read the table without locking; unload only when idle.
+    '''
+    _cancelDefaultTables()
+    with _rgb8TableLock:
+        _unloadRgb8Table()
+
+def _unloadRgb8Table(): # _rgb8TableLock must be held
+    global _rgb8Table
+    if _rgb8Table is None:
+        return
+    m, table = _rgb8Table
+    _rgb8Table = None
+    if rgb2lab_common.nativeAvailable():
+        _lib.setRgb8LabLchTable(None)
+    del table # must release the buffer before closing the map
+    m.close()
+
+def checkRgb8Table(path = None):
+    '''
+    Verifies the lookup table at `path` (default `rgb8TablePath`) bit for bit
+    against the computed results; returns a list of mismatching RGB inputs
+    '''
+    m, table = _mapRgb8Table(path or rgb8TablePath)
+    data = bytes(table)
+    del table
+    m.close()
+    computed = bytes(_computeRgb8Table())
+    if data == computed:
+        return []
+    size = sizeof(Rgb8LabLch)
+    return [(i >> 16, i >> 8 & 255, i & 255) for i in range(len(data) // size)
+            if data[i * size : (i + 1) * size] != computed[i * size : (i + 1) * size]]
+
+def _rgb8TableLookup(table, rgb):
+    e = table[rgb[0] << 16 | rgb[1] << 8 | rgb[2]]
+    return (e.L, e.A, e.B), (e.L, e.c, e.h)
+
+def _makeRgb8TableFn(computedFn, pick):
+    def fn(rgb):
+        if _defaultTablesPending:
+            _loadDefaultTables()
+        loaded = _rgb8Table # read once as another thread may unload it
+        if loaded is not None and all(type(v) is int for v in rgb):
+            checkRgb256(rgb)
+            return pick(_rgb8TableLookup(loaded[1], rgb))
+        return computedFn(rgb)
+    return fn
+
+_labLchFromRgbIntComputed = labLchFromRgbInt
+labFromRgbInt    = _makeRgb8TableFn(labFromRgbInt   , lambda labLch: labLch[0])
+lchFromRgbInt    = _makeRgb8TableFn(lchFromRgbInt   , lambda labLch: labLch[1])
+labLchFromRgbInt = _makeRgb8TableFn(labLchFromRgbInt, lambda labLch: labLch)
+
+# Cache of tables made by the makeTable_* functions below
+# ======================================================
+#
+# Memory-bounded LRU cache keyed by (table kind, fixed values) with background
+# prefetch of the tables for the adjacent fixed values, so that scrubbing back
+# and forth over a fixed value mostly gets cached tables.
+# Callers get copies of the cached tables, which they are free to modify.
+
+TableCacheInfo = namedtuple("TableCacheInfo", "hits misses prefetched evictions tables size budget")
+
+class _TableCache:
+
+    def __init__(self, budget):
+        self.budget = budget # bytes
+        self.prefetch = True
+        self.tables = OrderedDict() # least recently used first
+        self.inFlight = {} # key: Future of prefetch under way
+        self.generation = 0 # incremented by clearing, so that tables made before aren't kept
+        self.size = self.hits = self.misses = self.prefetched = self.evictions = 0
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def _insert(self, key, table): # lock must be held
+        if key in self.tables or sizeof(table) > self.budget:
+            return
+        self.tables[key] = table
+        self.size += sizeof(table)
+        while self.size > self.budget:
+            _, evicted = self.tables.popitem(last = False)
+            self.size -= sizeof(evicted)
+            self.evictions += 1
+
+    def get(self, key, makeFn):
+        with self.lock:
+            table = self.tables.get(key)
+            if table is not None:
+                self.tables.move_to_end(key)
+                self.hits += 1
+                return table
+            future, generation = self.inFlight.get(key), self.generation
+        try:
+            table = future.result() if future is not None else None # wait rather than compute twice
+        except Exception: # make it below, raising the error to this caller
+            table = None
+        with self.lock:
+            if table is not None and generation == self.generation:
+                self.hits += 1
+                return table
+            self.misses += 1
+        table = makeFn(*key[1:])
+        with self.lock:
+            if generation == self.generation:
+                self._insert(key, table)
+        return table
+
+    def _prefetchOne(self, key, makeFn, generation):
+        table = None
+        try:
+            table = makeFn(*key[1:])
+        except ValueError: # neighbour out of range
+            pass
+        finally: # even on other errors, which get() then raises by making the table itself
+            with self.lock:
+                if generation == self.generation:
+                    del self.inFlight[key]
+                    if table is not None:
+                        self._insert(key, table)
+                        self.prefetched += 1
+        return table
+
+    def prefetchAround(self, key, makeFn):
+        if not self.prefetch or not self.budget:
+            return
+        kind, fixed = key[0], key[1:]
+        with self.lock:
+            if self.executor is None:
+                from concurrent.futures import ThreadPoolExecutor # not at import as it takes a while
+                self.executor = ThreadPoolExecutor(1, "rgb2lab-prefetch")
+            for i in range(len(fixed)):
+                for delta in -1, +1:
+                    neighbour = (kind, ) + fixed[:i] + (fixed[i] + delta, ) + fixed[i + 1:]
+                    if neighbour not in self.tables and neighbour not in self.inFlight:
+                        self.inFlight[neighbour] = self.executor.submit(self._prefetchOne, neighbour, makeFn, self.generation)
+
+    def wrap(self, kind, makeFn):
+        def fn(*fixed):
+            key = (kind, ) + fixed
+            table = self.get(key, makeFn)
+            self.prefetchAround(key, makeFn)
+            copy = type(table).from_buffer_copy(table)
+            copy.inGamutCount = table.inGamutCount
+            return copy
+        return fn
+
+_tableCache = _TableCache(64 * 1024 * 1024)
+
+def tableCacheInfo():
+    '''Returns the statistics of the cache of makeTable_* results as a TableCacheInfo'''
+    c = _tableCache
+    with c.lock:
+        return TableCacheInfo(c.hits, c.misses, c.prefetched, c.evictions, len(c.tables), c.size, c.budget)
+
+def setTableCacheBudget(budget, prefetch = True):
+    '''Sets the memory budget in bytes of the cache of makeTable_* results; 0 disables caching'''
+    c = _tableCache
+    with c.lock:
+        c.budget = budget
+        c.prefetch = prefetch
+        while c.size > c.budget:
+            _, evicted = c.tables.popitem(last = False)
+            c.size -= sizeof(evicted)
+            c.evictions += 1
+
+def clearTableCache():
+    '''
+    Empties the cache of makeTable_* results, dropping the results of any
+    prefetches under way, and resets its statistics
+    '''
+    c = _tableCache
+    with c.lock:
+        c.tables.clear()
+        c.inFlight.clear()
+        c.generation += 1
+        c.size = c.hits = c.misses = c.prefetched = c.evictions = 0
+
+class TinyRgb(Structure):
+    _fields_ = tuple((f, c_ubyte) for f in ("valid", "r", "g", "b"))
+
+# Precomputed gamut volumes
+# =========================
+#
+# Dense volumes of the TinyRgb results for every integer Lab point, indexed
+# [l][a + 128][b + 128], and every integer LCH point with h ≥ 0, indexed
+# [l][h][c], with the in-gamut counts of every slice of the 12 table kinds.
+# Built once by `rgb2lab-lut.py build gamut` and memory-mapped when present,
+# whereupon the makeTable_* functions copy their tables out of them.
+
+_labShape = (101, 257, 257)
+_lchShape = (101, 360, 181)
+_labVolumeSize = _labShape[0] * _labShape[1] * _labShape[2]
+_lchVolumeSize = _lchShape[0] * _lchShape[1] * _lchShape[2]
+
+# in-gamut count arrays stored after the volumes: kind, shape (indexed by fixed values in argument order)
+_gamutCountShapes = (
+    ("ABforL", (101, )), ("BLforA", (257, )), ("ALforB", (257, )),
+    ("HCforL", (101, )), ("HLforC", (181, )), ("CLforH", (360, )),
+    ("LforAB", (257, 257)), ("AforBL", (257, 101)), ("BforAL", (257, 101)),
+    ("LforHC", (360, 181)), ("CforHL", (360, 101)), ("HforCL", (181, 101)),
+    )
+
+gamutVolumesMagic = b"RGB2LABV"
+gamutVolumesVersion = 1 # NOTE: increment whenever the computed results may change
+_gamutVolumesHeader = struct.Struct("<8sII") # magic, version, padding; 16 bytes
+_gamutVolumesSize = _gamutVolumesHeader.size + sizeof(TinyRgb) * (_labVolumeSize + _lchVolumeSize) + \
+                    4 * sum(shape[0] * (shape[1] if len(shape) == 2 else 1) for _, shape in _gamutCountShapes)
+
+gamutVolumesPath = os.environ.get("RGB2LAB_GAMUT_VOLUMES",
+                                  os.path.join(os.path.dirname(os.path.abspath(__file__)), "rgb2lab-gamut.vol"))
+
+# kind: (space, fixed values → offset, strides, shape)
+_gamutSliceLayouts = {
+    "LforAB": ("lab", lambda a, b: ((a + 128) * 257 + b + 128, (66049, ), (101, ))),
+    "AforBL": ("lab", lambda b, l: (l * 66049 + b + 128, (257, ), (257, ))),
+    "BforAL": ("lab", lambda a, l: (l * 66049 + (a + 128) * 257, (1, ), (257, ))),
+    "ABforL": ("lab", lambda l: (l * 66049, (257, 1), (257, 257))),
+    "BLforA": ("lab", lambda a: ((a + 128) * 257, (1, 66049), (257, 101))),
+    "ALforB": ("lab", lambda b: (b + 128, (257, 66049), (257, 101))),
+    "LforHC": ("lch", lambda h, c: (h * 181 + c, (65160, ), (101, ))),
+    "CforHL": ("lch", lambda h, l: (l * 65160 + h * 181, (1, ), (181, ))),
+    "HforCL": ("lch", lambda c, l: (l * 65160 + c, (181, ), (360, ))),
+    "HCforL": ("lch", lambda l: (l * 65160, (181, 1), (360, 181))),
+    "HLforC": ("lch", lambda c: (c, (181, 65160), (360, 101))),
+    "CLforH": ("lch", lambda h: (h * 181, (1, 65160), (181, 101))),
+    }
+
+# valid range of each fixed value in the volumes; anything else is left to the computed path
+_gamutFixedRanges = {"L": range(0, 101), "A": range(-128, 129), "B": range(-128, 129),
+                     "C": range(0, 181), "H": range(0, 360)}
+
+_gamutVolumes = None # (mmap, {"lab": volume, "lch": volume}, {kind: counts}) while loaded
+
+def _gamutCountIndex(kind, fixed):
+    index = 0
+    for name, v in zip(kind[-len(fixed):], fixed):
+        index = index * len(_gamutFixedRanges[name]) + v - _gamutFixedRanges[name].start
+    return index
+
+def _gamutVolumeTable(kind, fixed, TableType):
+    '''Returns a TableType copied out of the loaded volumes, or None if not loaded or `fixed` isn't in them'''
+    loaded = _gamutVolumes # read once as another thread may unload it
+    if loaded is None:
+        return None
+    names = kind[-len(fixed):]
+    if not all(type(v) is int and v in _gamutFixedRanges[n] for n, v in zip(names, fixed)):
+        return None
+    _, volumes, counts = loaded
+    space, layout = _gamutSliceLayouts[kind]
+    offset, strides, shape = layout(*fixed)
+    rows = [offset + i * strides[0] for i in range(shape[0])] if len(shape) == 2 else [offset]
+    step, span = strides[-1], shape[-1]
+    with memoryview(volumes[space]).cast("B").cast("I") as cells: # a TinyRgb is 4 bytes
+        table = TableType.from_buffer_copy(b"".join(cells[row : row + step * (span - 1) + 1 : step].tobytes() for row in rows))
+    table.inGamutCount = counts[kind][_gamutCountIndex(kind, fixed)]
+    return table
+
+def _preferGamutVolume(kind, makeFn, TableType):
+    def fn(*fixed):
+        if _defaultTablesPending:
+            _loadDefaultTables()
+        table = _gamutVolumeTable(kind, fixed, TableType)
+        return makeFn(*fixed) if table is None else table
+    return fn
+
+def _computeGamutVolumes():
+    '''Returns the Lab and LCH volumes and the per-slice counts as a bytearray laid out as in the file'''
+    data = bytearray(_gamutVolumesSize - _gamutVolumesHeader.size)
+    labPlane, lchPlane = TinyRgb * 257 * 257, TinyRgb * 181 * 360
+    labBytes, lchBytes = sizeof(TinyRgb) * _labVolumeSize, sizeof(TinyRgb) * _lchVolumeSize
+    for l in range(101):
+        _fillTableFns["ABforL"](labPlane.from_buffer(data, l * sizeof(labPlane)), l)
+        _fillTableFns["HCforL"](lchPlane.from_buffer(data, labBytes + l * sizeof(lchPlane)), l)
+    labValid = bytes(data[0 : labBytes : 4])
+    lchValid = bytes(data[labBytes : labBytes + lchBytes : 4])
+    def countLab(start, stop, step): return labValid[start:stop:step].count(1)
+    def countLch(start, stop, step): return lchValid[start:stop:step].count(1)
+    counts = [
+        # 2D slices
+        [countLab(l * 66049, (l + 1) * 66049, 1) for l in range(101)],
+        [sum(countLab(l * 66049 + a * 257, l * 66049 + (a + 1) * 257, 1) for l in range(101)) for a in range(257)],
+        [countLab(b, None, 257) for b in range(257)],
+        [countLch(l * 65160, (l + 1) * 65160, 1) for l in range(101)],
+        [countLch(c, None, 181) for c in range(181)],
+        [sum(countLch(l * 65160 + h * 181, l * 65160 + (h + 1) * 181, 1) for l in range(101)) for h in range(360)],
+        # 1D slices
+        [countLab(a * 257 + b, None, 66049) for a in range(257) for b in range(257)],
+        [countLab(l * 66049 + b, (l + 1) * 66049, 257) for b in range(257) for l in range(101)],
+        [countLab(l * 66049 + a * 257, l * 66049 + (a + 1) * 257, 1) for a in range(257) for l in range(101)],
+        [countLch(h * 181 + c, None, 65160) for h in range(360) for c in range(181)],
+        [countLch(l * 65160 + h * 181, l * 65160 + (h + 1) * 181, 1) for h in range(360) for l in range(101)],
+        [countLch(l * 65160 + c, (l + 1) * 65160, 181) for c in range(181) for l in range(101)],
+        ]
+    countBytes = b"".join(struct.pack("<{}i".format(len(c)), *c) for c in counts)
+    data[labBytes + lchBytes : ] = countBytes
+    return data
+
+def writeGamutVolumes(path = None):
+    '''Computes the gamut volumes and writes them to `path` (default `gamutVolumesPath`)'''
+    path = path or gamutVolumesPath
+    data = _computeGamutVolumes()
+    tempPath = path + ".tmp"
+    with open(tempPath, "wb") as f:
+        f.write(_gamutVolumesHeader.pack(gamutVolumesMagic, gamutVolumesVersion, 0))
+        f.write(data)
+    os.replace(tempPath, path) # so that readers never see a partial file
+
+def _mapGamutVolumes(path):
+    with open(path, "rb") as f:
+        m = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_COPY) # private mapping needed for ctypes but pages stay shared
+    try:
+        magic, version, _ = _gamutVolumesHeader.unpack_from(m)
+        if magic != gamutVolumesMagic or version != gamutVolumesVersion or len(m) != _gamutVolumesSize:
+            raise Rgb2LabError("{} is not a version {} gamut volumes file.".format(path, gamutVolumesVersion))
+    except (struct.error, Rgb2LabError):
+        m.close()
+        raise
+    offset = _gamutVolumesHeader.size
+    volumes = {}
+    for space, size in ("lab", _labVolumeSize), ("lch", _lchVolumeSize):
+        volumes[space] = (TinyRgb * size).from_buffer(m, offset)
+        offset += sizeof(volumes[space])
+    counts = {}
+    for kind, shape in _gamutCountShapes:
+        counts[kind] = (c_int32 * (shape[0] * (shape[1] if len(shape) == 2 else 1))).from_buffer(m, offset)
+        offset += sizeof(counts[kind])
+    return m, volumes, counts
+
+def loadGamutVolumes(path = None):
+    '''Memory-maps the gamut volumes at `path` (default `gamutVolumesPath`) and starts using them'''
+    global _gamutVolumes
+    _cancelDefaultTables()
+    path = path or gamutVolumesPath
+    loaded = _mapGamutVolumes(path)
+    previous, _gamutVolumes = _gamutVolumes, loaded
+    for kind, fixed, makeFn in ("LforAB", (20, -30), _computedTableFns["LforAB"]), \
+                               ("CforHL", (200, 50), _computedTableFns["CforHL"]): # guard against stale files
+        table = makeFn(*fixed)
+        copied = _gamutVolumeTable(kind, fixed, type(table))
+        if copied.inGamutCount != table.inGamutCount or bytes(copied) != bytes(table):
+            _gamutVolumes = previous
+            _closeGamutVolumes(loaded)
+            raise Rgb2LabError("{} does not match the computed results; please rebuild it.".format(path))
+    if previous is not None:
+        _closeGamutVolumes(previous)
+
+def _closeGamutVolumes(loaded):
+    m, volumes, counts = loaded
+    volumes.clear(); counts.clear() # must release the buffers before closing the map
+    m.close()
+
+def unloadGamutVolumes():
+    '''Stops using the gamut volumes, if any, and unmaps them'''
+    global _gamutVolumes
+    _cancelDefaultTables()
+    if _gamutVolumes is not None:
+        loaded, _gamutVolumes = _gamutVolumes, None
+        _closeGamutVolumes(loaded)
+
+def checkGamutVolumes(path = None):
+    '''
+    Verifies the gamut volumes at `path` (default `gamutVolumesPath`) bit for bit
+    against the computed results; returns a list of descriptions of mismatches
+    '''
+    m, volumes, counts = _mapGamutVolumes(path or gamutVolumesPath)
+    data = bytes(memoryview(m)[_gamutVolumesHeader.size : ])
+    volumes.clear(); counts.clear()
+    m.close()
+    computed = _computeGamutVolumes()
+    if data == computed:
+        return []
+    mismatches = []
+    offset = 0
+    for space, shape in ("Lab", _labShape), ("LCH", _lchShape):
+        planeSize = sizeof(TinyRgb) * shape[1] * shape[2]
+        for l in range(shape[0]):
+            if data[offset : offset + planeSize] != computed[offset : offset + planeSize]:
+                mismatches.append("{} volume at L = {}".format(space, l))
+            offset += planeSize
+    if data[offset : ] != computed[offset : ]:
+        mismatches.append("in-gamut counts")
+    return mismatches
+
+_computedTableFns = {} # kind: makeTable function not using the volumes or cache
+_fillTableFns = {} # kind: fillTable function of the backend in use
 
 def _makeMake1DTableFn(fillTableFn, varSpan):
-    class TinyRgb(Structure):
-        _fields_ = tuple((f, c_ubyte) for f in ("valid", "r", "g", "b"))
     TinyRgbTable = TinyRgb * varSpan
     fillTableFn.argtypes = [TinyRgbTable, c_int, c_int]
     fillTableFn.restype = c_int # number of validRGBs found
+    kind = fillTableFn.__name__[len("fillTable_"):]
+    fill = _fillTableFns[kind] = _dispatcher.stub(fillTableFn.__name__)
     def fn(var1, var2):
         table = TinyRgbTable()
-        table.inGamutCount = fillTableFn(table, var1, var2)
+        table.inGamutCount = fill(table, var1, var2)
         if table.inGamutCount == -1:
             raise ValueError("Bad values {},{} provided for function {}".format(var1, var2, fillTableFn))
         return table
-    return fn
+    _computedTableFns[kind] = fn
+    return _preferGamutVolume(kind, _tableCache.wrap(kind, fn), TinyRgbTable)
 
 makeTable_LforAB = _makeMake1DTableFn(_lib.fillTable_LforAB, 101)
 makeTable_AforBL = _makeMake1DTableFn(_lib.fillTable_AforBL, 257)
@@ -51,19 +642,20 @@ makeTable_CforHL = _makeMake1DTableFn(_lib.fillTable_CforHL, 181)
 makeTable_HforCL = _makeMake1DTableFn(_lib.fillTable_HforCL, 360)
 
 def _makeMake2DTableFn(fillTableFn, var1Span, var2Span):
-    class TinyRgb(Structure):
-        _fields_ = tuple((f, c_ubyte) for f in ("valid", "r", "g", "b"))
     TinyRgbTable = TinyRgb * var2Span * var1Span
     # NOTE: order of multiplying type by dimension sizes above is opposite to declaring array in C
     fillTableFn.argtypes = [TinyRgbTable, c_int]
     fillTableFn.restype = c_int # number of validRGBs found
+    kind = fillTableFn.__name__[len("fillTable_"):]
+    fill = _fillTableFns[kind] = _dispatcher.stub(fillTableFn.__name__)
     def fn(var):
         table = TinyRgbTable()
-        table.inGamutCount = fillTableFn(table, var)
+        table.inGamutCount = fill(table, var)
         if table.inGamutCount == -1:
             raise ValueError("Bad value {} provided for function {}".format(var, fillTableFn))
         return table
-    return fn
+    _computedTableFns[kind] = fn
+    return _preferGamutVolume(kind, _tableCache.wrap(kind, fn), TinyRgbTable)
 
 makeTable_ABforL = _makeMake2DTableFn(_lib.fillTable_ABforL, 257, 257)
 makeTable_BLforA = _makeMake2DTableFn(_lib.fillTable_BLforA, 257, 101)
@@ -71,3 +663,315 @@ makeTable_ALforB = _makeMake2DTableFn(_lib.fillTable_ALforB, 257, 101)
 makeTable_HCforL = _makeMake2DTableFn(_lib.fillTable_HCforL, 360, 181)
 makeTable_HLforC = _makeMake2DTableFn(_lib.fillTable_HLforC, 360, 101)
 makeTable_CLforH = _makeMake2DTableFn(_lib.fillTable_CLforH, 181, 101)
+
+# makeTableCs_* versions of the above taking a ColorSpace first; their
+# results are neither cached nor taken from the gamut volumes (which are
+# of sRGB D65)
+
+def _makeMakeTableCsFn(fillTableFn, TinyRgbTable):
+    fillTableFn.argtypes = [c_void_p, TinyRgbTable] + [c_int] * (2 if TinyRgbTable._type_ is TinyRgb else 1)
+    fillTableFn.restype = c_int
+    def fn(space, *fixed):
+        table = TinyRgbTable()
+        table.inGamutCount = fillTableFn(space._handle, table, *fixed)
+        if table.inGamutCount == -1:
+            raise ValueError("Bad values {} provided for function {}".format(",".join(map(str, fixed)), fillTableFn))
+        return table
+    return fn
+
+makeTableCs_LforAB = _makeMakeTableCsFn(_lib.fillTableCs_LforAB, TinyRgb * 101)
+makeTableCs_AforBL = _makeMakeTableCsFn(_lib.fillTableCs_AforBL, TinyRgb * 257)
+makeTableCs_BforAL = _makeMakeTableCsFn(_lib.fillTableCs_BforAL, TinyRgb * 257)
+makeTableCs_LforHC = _makeMakeTableCsFn(_lib.fillTableCs_LforHC, TinyRgb * 101)
+makeTableCs_CforHL = _makeMakeTableCsFn(_lib.fillTableCs_CforHL, TinyRgb * 181)
+makeTableCs_HforCL = _makeMakeTableCsFn(_lib.fillTableCs_HforCL, TinyRgb * 360)
+
+makeTableCs_ABforL = _makeMakeTableCsFn(_lib.fillTableCs_ABforL, TinyRgb * 257 * 257)
+makeTableCs_BLforA = _makeMakeTableCsFn(_lib.fillTableCs_BLforA, TinyRgb * 101 * 257)
+makeTableCs_ALforB = _makeMakeTableCsFn(_lib.fillTableCs_ALforB, TinyRgb * 101 * 257)
+makeTableCs_HCforL = _makeMakeTableCsFn(_lib.fillTableCs_HCforL, TinyRgb * 181 * 360)
+makeTableCs_HLforC = _makeMakeTableCsFn(_lib.fillTableCs_HLforC, TinyRgb * 101 * 360)
+makeTableCs_CLforH = _makeMakeTableCsFn(_lib.fillTableCs_CLforH, TinyRgb * 101 * 181)
+
+# Packed tables
+# =============
+#
+# The makePackedTable_* functions return the tables of the corresponding
+# makeTable_* functions as a PackedTable: the RGB of only the in-gamut cells
+# and which cells those are, as a bitmap (validity "bitmap") or as spans of
+# in-gamut cells (validity "spans", smaller still as out-of-gamut cells come
+# in long runs); see rgb2lab_int.h. They're indexed the same way, each cell
+# being looked up in the packed form. Not cached, and native only.
+
+packedValidities = {"bitmap": 0, "spans": 1} # PackedValidity values of rgb2lab_int.h
+
+_lib.freePackedTable.argtypes = [c_void_p]
+_lib.freePackedTable.restype = None
+_lib.packedTableShape.argtypes = [c_void_p, POINTER(c_int), POINTER(c_int)]
+_lib.packedTableShape.restype = None
+_lib.packedTableValidity.argtypes = [c_void_p]
+_lib.packedTableValidity.restype = c_int
+_lib.packedTableInGamutCount.argtypes = [c_void_p]
+_lib.packedTableInGamutCount.restype = c_int
+_lib.packedTableMemory.argtypes = [c_void_p]
+_lib.packedTableMemory.restype = c_size_t
+_lib.packedTableRgb.argtypes = [c_void_p]
+_lib.packedTableRgb.restype = c_void_p
+_lib.packedTableBitmap.argtypes = [c_void_p]
+_lib.packedTableBitmap.restype = c_void_p
+_lib.packedTableSpans.argtypes = [c_void_p, POINTER(c_int)]
+_lib.packedTableSpans.restype = POINTER(c_int)
+_lib.packedTableCell.argtypes = [c_void_p, c_int, POINTER(TinyRgb)]
+_lib.packedTableCell.restype = c_int
+_lib.packedTableSerializedSize.argtypes = [c_void_p]
+_lib.packedTableSerializedSize.restype = c_size_t
+_lib.writePackedTable.argtypes = [c_void_p, c_char_p]
+_lib.writePackedTable.restype = None
+_lib.readPackedTable.argtypes = [POINTER(c_ubyte), c_size_t]
+_lib.readPackedTable.restype = c_void_p
+
+class PackedTable:
+
+    '''
+    A table in packed form, indexable like the tables returned by the
+    makeTable_* functions: `t[x]` or `t[x][y]` is a TinyRgb
+    '''
+
+    def __init__(self, handle):
+        self._handle = handle
+        var1Span, var2Span = c_int(), c_int()
+        _lib.packedTableShape(handle, byref(var1Span), byref(var2Span))
+        self.shape = (var1Span.value, var2Span.value) if var2Span.value else (var1Span.value, )
+        self.validity = ("bitmap", "spans")[_lib.packedTableValidity(handle)]
+        self.inGamutCount = _lib.packedTableInGamutCount(handle)
+
+    def __del__(self):
+        if getattr(self, "_handle", None):
+            _lib.freePackedTable(self._handle)
+            self._handle = None
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.shape[0]:
+            raise IndexError("packed table index out of range")
+        if len(self.shape) == 1:
+            return self.cell(i)
+        return _PackedTableRow(self, i * self.shape[1], self.shape[1])
+
+    def cell(self, i):
+        '''Returns cell `i` of the table flattened in C order as a TinyRgb'''
+        cell = TinyRgb()
+        if _lib.packedTableCell(self._handle, i, byref(cell)) == -1:
+            raise IndexError("packed table cell index out of range")
+        return cell
+
+    def memory(self):
+        '''Returns the bytes held by the table including its lookup index'''
+        return _lib.packedTableMemory(self._handle)
+
+    def rgb(self):
+        '''Returns a copy of the RGB plane: 3 bytes per in-gamut cell in order'''
+        return string_at(_lib.packedTableRgb(self._handle), 3 * self.inGamutCount)
+
+    def bitmap(self):
+        '''Returns a copy of the validity bitmap, or None with spans'''
+        ptr = _lib.packedTableBitmap(self._handle)
+        cells = self.shape[0] * (self.shape[1] if len(self.shape) == 2 else 1)
+        return string_at(ptr, (cells + 7) // 8) if ptr else None
+
+    def spans(self):
+        '''Returns the (begin, end) cell index ranges of in-gamut cells, or None with a bitmap'''
+        count = c_int()
+        ptr = _lib.packedTableSpans(self._handle, byref(count))
+        return list(zip(ptr[0 : 2 * count.value : 2], ptr[1 : 2 * count.value : 2])) if ptr else None
+
+    def toBytes(self):
+        '''Returns the serialized form for archives and transfer'''
+        out = create_string_buffer(_lib.packedTableSerializedSize(self._handle))
+        _lib.writePackedTable(self._handle, out)
+        return out.raw
+
+    @classmethod
+    def fromBytes(cls, data):
+        '''Makes a PackedTable from the result of toBytes'''
+        ptr, size = rgb2lab_common._asBuffer(data, c_ubyte, 1)
+        handle = _lib.readPackedTable(ptr, size)
+        if not handle:
+            raise Rgb2LabError("Malformed packed table data of {} bytes.".format(size))
+        return cls(handle)
+
+class _PackedTableRow:
+
+    __slots__ = ("table", "offset", "span")
+
+    def __init__(self, table, offset, span):
+        self.table, self.offset, self.span = table, offset, span
+
+    def __len__(self):
+        return self.span
+
+    def __getitem__(self, j):
+        if not 0 <= j < self.span:
+            raise IndexError("packed table index out of range")
+        return self.table.cell(self.offset + j)
+
+def _packedValidity(validity):
+    if validity not in packedValidities:
+        raise Rgb2LabError("Unknown packed table validity {!r}; use one of {}.".format(validity, ", ".join(packedValidities)))
+    return packedValidities[validity]
+
+def _makeMakePackedTableFn(newFn, withColorSpace = False):
+    fixedCount = len(newFn.__name__) - newFn.__name__.index("for") - 3
+    newFn.argtypes = [c_void_p] * withColorSpace + [c_int] * fixedCount + [c_int]
+    newFn.restype = c_void_p
+    def fn(*args, validity = "bitmap"):
+        if withColorSpace:
+            args = (args[0]._handle, ) + args[1 : ]
+        handle = newFn(*args, _packedValidity(validity))
+        if not handle:
+            raise ValueError("Bad values {} provided for function {}".format(",".join(map(str, args[withColorSpace : ])), newFn))
+        return PackedTable(handle)
+    return fn
+
+makePackedTable_LforAB = _makeMakePackedTableFn(_lib.newPackedTable_LforAB)
+makePackedTable_AforBL = _makeMakePackedTableFn(_lib.newPackedTable_AforBL)
+makePackedTable_BforAL = _makeMakePackedTableFn(_lib.newPackedTable_BforAL)
+makePackedTable_LforHC = _makeMakePackedTableFn(_lib.newPackedTable_LforHC)
+makePackedTable_CforHL = _makeMakePackedTableFn(_lib.newPackedTable_CforHL)
+makePackedTable_HforCL = _makeMakePackedTableFn(_lib.newPackedTable_HforCL)
+
+makePackedTable_ABforL = _makeMakePackedTableFn(_lib.newPackedTable_ABforL)
+makePackedTable_BLforA = _makeMakePackedTableFn(_lib.newPackedTable_BLforA)
+makePackedTable_ALforB = _makeMakePackedTableFn(_lib.newPackedTable_ALforB)
+makePackedTable_HCforL = _makeMakePackedTableFn(_lib.newPackedTable_HCforL)
+makePackedTable_HLforC = _makeMakePackedTableFn(_lib.newPackedTable_HLforC)
+makePackedTable_CLforH = _makeMakePackedTableFn(_lib.newPackedTable_CLforH)
+
+# makePackedTableCs_* versions of the above taking a ColorSpace first
+
+makePackedTableCs_LforAB = _makeMakePackedTableFn(_lib.newPackedTableCs_LforAB, withColorSpace = True)
+makePackedTableCs_AforBL = _makeMakePackedTableFn(_lib.newPackedTableCs_AforBL, withColorSpace = True)
+makePackedTableCs_BforAL = _makeMakePackedTableFn(_lib.newPackedTableCs_BforAL, withColorSpace = True)
+makePackedTableCs_LforHC = _makeMakePackedTableFn(_lib.newPackedTableCs_LforHC, withColorSpace = True)
+makePackedTableCs_CforHL = _makeMakePackedTableFn(_lib.newPackedTableCs_CforHL, withColorSpace = True)
+makePackedTableCs_HforCL = _makeMakePackedTableFn(_lib.newPackedTableCs_HforCL, withColorSpace = True)
+
+makePackedTableCs_ABforL = _makeMakePackedTableFn(_lib.newPackedTableCs_ABforL, withColorSpace = True)
+makePackedTableCs_BLforA = _makeMakePackedTableFn(_lib.newPackedTableCs_BLforA, withColorSpace = True)
+makePackedTableCs_ALforB = _makeMakePackedTableFn(_lib.newPackedTableCs_ALforB, withColorSpace = True)
+makePackedTableCs_HCforL = _makeMakePackedTableFn(_lib.newPackedTableCs_HCforL, withColorSpace = True)
+makePackedTableCs_HLforC = _makeMakePackedTableFn(_lib.newPackedTableCs_HLforC, withColorSpace = True)
+makePackedTableCs_CLforH = _makeMakePackedTableFn(_lib.newPackedTableCs_CLforH, withColorSpace = True)
+
+# Tables drawn directly into ARGB32 images
+# ========================================
+#
+# The fillArgb32_* functions write the table of the corresponding makeTable_*
+# function into `bits`, a writable buffer of 32-bit pixels 0xAARRGGBB such as
+# that of a QImage of Format_ARGB32(_Premultiplied) (`image.bits()` after
+# `setsize(image.byteCount())`) with lines `bytesPerLine` apart: opaque for
+# in-gamut cells and transparent otherwise. The first variable is along x
+# moved right by `xRotate` columns with wraparound; the second variable of 2D
+# tables is along y increasing upwards and 1D tables are repeated over
+# `height` lines. Returns the in-gamut count.
+
+def _checkArgb32Image(bits, bytesPerLine, width, height):
+    ptr, size = rgb2lab_common._asBuffer(bits, c_ubyte, 1, writable = True)
+    if width < 1 or height < 1:
+        raise Rgb2LabError("Image of {}×{} pixels has nothing to draw.".format(width, height))
+    if bytesPerLine < 4 * width or size < bytesPerLine * (height - 1) + 4 * width:
+        raise Rgb2LabError("Image buffer of {} bytes with {} bytes per line cannot hold {}×{} pixels.".format(size, bytesPerLine, width, height))
+    return ptr
+
+def _makeFill1DArgb32Fn(fillFn, varSpan):
+    fillFn.argtypes = [POINTER(c_ubyte), c_ssize_t, c_int, c_int, c_int, c_int]
+    fillFn.restype = c_int
+    fill = _dispatcher.stub(fillFn.__name__)
+    def fn(bits, bytesPerLine, height, var1, var2, xRotate = 0):
+        ptr = _checkArgb32Image(bits, bytesPerLine, varSpan, height)
+        inGamutCount = fill(ptr, bytesPerLine, height, xRotate, var1, var2)
+        if inGamutCount == -1:
+            raise ValueError("Bad values {},{} provided for function {}".format(var1, var2, fillFn))
+        return inGamutCount
+    return fn
+
+fillArgb32_LforAB = _makeFill1DArgb32Fn(_lib.fillArgb32_LforAB, 101)
+fillArgb32_AforBL = _makeFill1DArgb32Fn(_lib.fillArgb32_AforBL, 257)
+fillArgb32_BforAL = _makeFill1DArgb32Fn(_lib.fillArgb32_BforAL, 257)
+fillArgb32_LforHC = _makeFill1DArgb32Fn(_lib.fillArgb32_LforHC, 101)
+fillArgb32_CforHL = _makeFill1DArgb32Fn(_lib.fillArgb32_CforHL, 181)
+fillArgb32_HforCL = _makeFill1DArgb32Fn(_lib.fillArgb32_HforCL, 360)
+
+def _makeFill2DArgb32Fn(fillFn, var1Span, var2Span):
+    fillFn.argtypes = [POINTER(c_ubyte), c_ssize_t, c_int, c_int]
+    fillFn.restype = c_int
+    fill = _dispatcher.stub(fillFn.__name__)
+    def fn(bits, bytesPerLine, var, xRotate = 0):
+        ptr = _checkArgb32Image(bits, bytesPerLine, var1Span, var2Span)
+        inGamutCount = fill(ptr, bytesPerLine, xRotate, var)
+        if inGamutCount == -1:
+            raise ValueError("Bad value {} provided for function {}".format(var, fillFn))
+        return inGamutCount
+    return fn
+
+fillArgb32_ABforL = _makeFill2DArgb32Fn(_lib.fillArgb32_ABforL, 257, 257)
+fillArgb32_BLforA = _makeFill2DArgb32Fn(_lib.fillArgb32_BLforA, 257, 101)
+fillArgb32_ALforB = _makeFill2DArgb32Fn(_lib.fillArgb32_ALforB, 257, 101)
+fillArgb32_HCforL = _makeFill2DArgb32Fn(_lib.fillArgb32_HCforL, 360, 181)
+fillArgb32_HLforC = _makeFill2DArgb32Fn(_lib.fillArgb32_HLforC, 360, 101)
+fillArgb32_CLforH = _makeFill2DArgb32Fn(_lib.fillArgb32_CLforH, 181, 101)
+
+# fillArgb32Cs_* versions of the above taking a ColorSpace first
+
+def _makeFillArgb32CsFn(fillFn, var1Span, var2Span = None):
+    fillFn.argtypes = [c_void_p, POINTER(c_ubyte), c_ssize_t] + [c_int] * (4 if var2Span is None else 2)
+    fillFn.restype = c_int
+    def fn(space, bits, bytesPerLine, *args, xRotate = 0):
+        if var2Span is None: # 1D: height, var1, var2
+            height, *fixed = args
+            ptr = _checkArgb32Image(bits, bytesPerLine, var1Span, height)
+            inGamutCount = fillFn(space._handle, ptr, bytesPerLine, height, xRotate, *fixed)
+        else:
+            fixed = args
+            ptr = _checkArgb32Image(bits, bytesPerLine, var1Span, var2Span)
+            inGamutCount = fillFn(space._handle, ptr, bytesPerLine, xRotate, *fixed)
+        if inGamutCount == -1:
+            raise ValueError("Bad values {} provided for function {}".format(",".join(map(str, fixed)), fillFn))
+        return inGamutCount
+    return fn
+
+fillArgb32Cs_LforAB = _makeFillArgb32CsFn(_lib.fillArgb32Cs_LforAB, 101)
+fillArgb32Cs_AforBL = _makeFillArgb32CsFn(_lib.fillArgb32Cs_AforBL, 257)
+fillArgb32Cs_BforAL = _makeFillArgb32CsFn(_lib.fillArgb32Cs_BforAL, 257)
+fillArgb32Cs_LforHC = _makeFillArgb32CsFn(_lib.fillArgb32Cs_LforHC, 101)
+fillArgb32Cs_CforHL = _makeFillArgb32CsFn(_lib.fillArgb32Cs_CforHL, 181)
+fillArgb32Cs_HforCL = _makeFillArgb32CsFn(_lib.fillArgb32Cs_HforCL, 360)
+
+fillArgb32Cs_ABforL = _makeFillArgb32CsFn(_lib.fillArgb32Cs_ABforL, 257, 257)
+fillArgb32Cs_BLforA = _makeFillArgb32CsFn(_lib.fillArgb32Cs_BLforA, 257, 101)
+fillArgb32Cs_ALforB = _makeFillArgb32CsFn(_lib.fillArgb32Cs_ALforB, 257, 101)
+fillArgb32Cs_HCforL = _makeFillArgb32CsFn(_lib.fillArgb32Cs_HCforL, 360, 181)
+fillArgb32Cs_HLforC = _makeFillArgb32CsFn(_lib.fillArgb32Cs_HLforC, 360, 101)
+fillArgb32Cs_CLforH = _makeFillArgb32CsFn(_lib.fillArgb32Cs_CLforH, 181, 101)
+
+def _loadDefaultTables():
+    global _defaultTablesPending
+    with _defaultTablesLock: # other threads wait till loaded
+        if not _defaultTablesPending:
+            return
+        _defaultTablesPending = False
+        for path, load, description in (rgb8TablePath, loadRgb8Table, "RGB8 lookup table"), \
+                                       (gamutVolumesPath, loadGamutVolumes, "gamut volumes"):
+            if os.path.exists(path):
+                try:
+                    load()
+                except (OSError, struct.error, Rgb2LabError) as e:
+                    warnings.warn("Not using {}: {}".format(description, e))
+
+def _cancelDefaultTables():
+    '''Called on explicit loading or unloading of either, which then stands'''
+    global _defaultTablesPending
+    with _defaultTablesLock:
+        _defaultTablesPending = False
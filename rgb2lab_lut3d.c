@@ -0,0 +1,234 @@
+// librgb2lab
+// ==========
+//
+// Convert color values from RGB to/from CIE LAB/LCH
+// for sRGB gamut, D65 illuminant, 2° observer
+//
+// Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
+//
+// Use, modification and distribution are permitted subject to the
+// "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
+
+#include "rgb2lab_lut3d.h"
+#include "rgb2lab_threads.h"
+#include <math.h>
+#include <stdlib.h>
+
+struct Lut3D
+{
+    Lut3DInput input;
+    int size;
+    DoubleTriplet min, max;
+    DoubleTriplet (*convert)(DoubleTriplet);
+    float * data;
+};
+
+static const DoubleTriplet domainMin[2] = {{{0, -128, -128}}, {{0, 0, 0}}},
+                           domainMax[2] = {{{100, 128, 128}}, {{100, 180, 360}}};
+
+static long _sampleChunk(void * lut_, size_t begin, size_t end)
+{
+    Lut3D * lut = lut_;
+    int size = lut->size;
+    for (size_t k = begin; k < end; ++k) // slices of the last input
+        for (int j = 0; j < size; ++j)
+            for (int i = 0; i < size; ++i)
+            {
+                int ijk[3] = {i, j, k};
+                DoubleTriplet v;
+                for (int d = 0; d < 3; ++d)
+                    v.data[d] = lut->min.data[d] + (lut->max.data[d] - lut->min.data[d]) * ijk[d] / (size - 1);
+                DoubleTriplet rgb = lut->convert(v);
+                float * cell = lut->data + 3 * ((k * size + j) * size + i);
+                for (int c = 0; c < 3; ++c) cell[c] = rgb.data[c];
+            }
+    return 0;
+}
+
+Lut3D * newLut3D(Lut3DInput input, int size)
+{
+    if ((input != LUT3D_FROM_LAB && input != LUT3D_FROM_LCH) || size < LUT3D_MIN_SIZE || size > LUT3D_MAX_SIZE)
+        return NULL;
+    Lut3D * lut = malloc(sizeof(Lut3D));
+    if (!lut) return NULL;
+    lut->data = malloc(sizeof(float) * 3 * size * size * size);
+    if (!lut->data)
+    {
+        free(lut);
+        return NULL;
+    }
+    lut->input = input;
+    lut->size = size;
+    lut->min = domainMin[input];
+    lut->max = domainMax[input];
+    lut->convert = input == LUT3D_FROM_LAB ? rgbFromLab : rgbFromLch;
+    parallelFor(size, 1, _sampleChunk, lut);
+    return lut;
+}
+
+void freeLut3D(Lut3D * lut)
+{
+    if (!lut) return;
+    free(lut->data);
+    free(lut);
+}
+
+const float * lut3DData(const Lut3D * lut) { return lut->data; }
+int lut3DSize(const Lut3D * lut) { return lut->size; }
+Lut3DInput lut3DInput(const Lut3D * lut) { return lut->input; }
+
+void lut3DDomain(const Lut3D * lut, DoubleTriplet * min, DoubleTriplet * max)
+{
+    *min = lut->min;
+    *max = lut->max;
+}
+
+// Tetrahedral interpolation: the cell containing `v` is split into six
+// tetrahedra along its main diagonal and `v` is interpolated from the four
+// corners of the one containing it, chosen by the order of its fractional
+// coordinates. Unlike trilinear this uses 4 samples rather than 8 and keeps
+// neutral (diagonal) inputs exactly on the diagonal of the cell.
+static DoubleTriplet _interpolate(const Lut3D * lut, DoubleTriplet v)
+{
+    int size = lut->size;
+    double f[3];
+    size_t offset = 0, stride[3] = {3, 3 * (size_t) size, 3 * (size_t) size * size};
+    for (int d = 0; d < 3; ++d)
+    {
+        double t = (v.data[d] - lut->min.data[d]) / (lut->max.data[d] - lut->min.data[d]) * (size - 1);
+        if (!(t > 0)) t = 0; // also NaN and H = -1
+        if (t > size - 1) t = size - 1;
+        int i = t;
+        if (i == size - 1) --i; // top edge: in the last cell with f = 1
+        f[d] = t - i;
+        offset += i * stride[d];
+    }
+
+    // sort the axes by descending fraction carrying their strides
+    int a = 0, b = 1, c = 2, swap;
+    if (f[a] < f[b]) { swap = a; a = b; b = swap; }
+    if (f[b] < f[c]) { swap = b; b = c; c = swap; }
+    if (f[a] < f[b]) { swap = a; a = b; b = swap; }
+
+    const float * c0 = lut->data + offset, * c1 = c0 + stride[a], * c2 = c1 + stride[b], * c3 = c2 + stride[c];
+    double w0 = 1 - f[a], w1 = f[a] - f[b], w2 = f[b] - f[c], w3 = f[c];
+    DoubleTriplet rgb;
+    for (int i = 0; i < 3; ++i)
+        rgb.data[i] = w0 * c0[i] + w1 * c1[i] + w2 * c2[i] + w3 * c3[i];
+    return rgb;
+}
+
+typedef struct { const Lut3D * lut; const DoubleTriplet * src; DoubleTriplet * dst; } ApplyJob;
+
+static long _applyChunk(void * job_, size_t begin, size_t end)
+{
+    const ApplyJob * job = job_;
+    for (size_t i = begin; i < end; ++i)
+        job->dst[i] = _interpolate(job->lut, job->src[i]);
+    return 0;
+}
+
+enum { LUT3D_MIN_CHUNK = 16384 }; // triplets
+
+void applyLut3DArray(const Lut3D * lut, const DoubleTriplet * src, DoubleTriplet * dst, size_t n)
+{
+    ApplyJob job = {lut, src, dst};
+    parallelFor(n, LUT3D_MIN_CHUNK, _applyChunk, &job);
+}
+
+typedef struct
+{
+    const Lut3D * lut;
+    int samples, inGamutOnly, clip;
+    double * sliceError, * sliceSum; // per slice of the last input so that results don't depend on threads
+    size_t * sliceCount;
+    DoubleTriplet * sliceWorst;
+} ErrorJob;
+
+static int _inGamut(DoubleTriplet rgb)
+{
+    for (int i = 0; i < 3; ++i)
+        if (!(0 <= rgb.data[i] && rgb.data[i] <= 1)) return 0;
+    return 1;
+}
+
+static long _errorChunk(void * job_, size_t begin, size_t end)
+{
+    const ErrorJob * job = job_;
+    const Lut3D * lut = job->lut;
+    int samples = job->samples;
+    for (size_t k = begin; k < end; ++k)
+    {
+        double maxError = 0, sum = 0;
+        size_t count = 0;
+        DoubleTriplet worst = {{NAN, NAN, NAN}};
+        for (int j = 0; j < samples; ++j)
+            for (int i = 0; i < samples; ++i)
+            {
+                int ijk[3] = {i, j, k};
+                DoubleTriplet v;
+                for (int d = 0; d < 3; ++d)
+                    v.data[d] = lut->min.data[d] + (lut->max.data[d] - lut->min.data[d]) * (ijk[d] + 0.5) / samples;
+                DoubleTriplet exact = lut->convert(v);
+                if (job->inGamutOnly && !_inGamut(exact)) continue;
+                if (job->clip)
+                    for (int c = 0; c < 3; ++c) exact.data[c] = fmin(fmax(exact.data[c], 0), 1);
+                DoubleTriplet approx = _interpolate(lut, v);
+                ++count;
+                for (int c = 0; c < 3; ++c)
+                {
+                    double error = fabs(approx.data[c] - exact.data[c]);
+                    sum += error;
+                    if (error > maxError)
+                    {
+                        maxError = error;
+                        worst = v;
+                    }
+                }
+            }
+        job->sliceError[k] = maxError;
+        job->sliceSum[k] = sum;
+        job->sliceCount[k] = count;
+        job->sliceWorst[k] = worst;
+    }
+    return 0;
+}
+
+double lut3DMaxError(const Lut3D * lut, int samplesPerAxis, int inGamutOnly, int clip, DoubleTriplet * worst, double * meanError)
+{
+    if (samplesPerAxis < 1) return NAN;
+    Lut3D clipped = *lut; // interpolating the clipped samples as written to .cube files
+    if (clip)
+    {
+        size_t n = 3 * (size_t) lut->size * lut->size * lut->size;
+        if (!(clipped.data = malloc(sizeof(float) * n))) return NAN;
+        for (size_t i = 0; i < n; ++i)
+            clipped.data[i] = fminf(fmaxf(lut->data[i], 0), 1);
+        lut = &clipped;
+    }
+    ErrorJob job = {lut, samplesPerAxis, inGamutOnly, clip, malloc(sizeof(double) * samplesPerAxis), malloc(sizeof(double) * samplesPerAxis),
+                    malloc(sizeof(size_t) * samplesPerAxis), malloc(sizeof(DoubleTriplet) * samplesPerAxis)};
+    double maxError = NAN;
+    if (job.sliceError && job.sliceSum && job.sliceCount && job.sliceWorst)
+    {
+        parallelFor(samplesPerAxis, 1, _errorChunk, &job);
+        int k = 0;
+        double sum = 0;
+        size_t count = 0;
+        for (int i = 0; i < samplesPerAxis; ++i)
+        {
+            if (job.sliceError[i] > job.sliceError[k]) k = i;
+            sum += job.sliceSum[i];
+            count += job.sliceCount[i];
+        }
+        maxError = job.sliceError[k];
+        if (worst) *worst = job.sliceWorst[k];
+        if (meanError) *meanError = count ? sum / (3 * count) : NAN;
+    }
+    free(job.sliceError);
+    free(job.sliceSum);
+    free(job.sliceCount);
+    free(job.sliceWorst);
+    if (clip) free(clipped.data);
+    return maxError;
+}
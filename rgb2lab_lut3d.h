@@ -0,0 +1,54 @@
+// librgb2lab
+// ==========
+//
+// Convert color values from RGB to/from CIE LAB/LCH
+// for sRGB gamut, D65 illuminant, 2° observer
+//
+// Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
+//
+// Use, modification and distribution are permitted subject to the
+// "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
+
+#include "rgb2lab.h"
+
+// 3D lookup tables
+// ================
+//
+// rgbFromLab or rgbFromLch sampled at `size` evenly spaced points per axis
+// over the whole input box (L [0, 100] and A, B [-128, +128], or L [0, 100],
+// C [0, 180] and H [0, 360]) for fast approximate conversion by tetrahedral
+// interpolation. Results aren't clipped so out-of-gamut inputs give values
+// outside [0, 1] as rgbFromLab does.
+
+typedef enum { LUT3D_FROM_LAB, LUT3D_FROM_LCH } Lut3DInput;
+
+enum { LUT3D_MIN_SIZE = 2, LUT3D_MAX_SIZE = 256 }; // as allowed by the .cube format
+
+// Returns NULL for a size outside the above limits or if allocation fails
+typedef struct Lut3D Lut3D;
+Lut3D * newLut3D(Lut3DInput input, int size);
+void freeLut3D(Lut3D * lut);
+
+// The samples as size³ RGB float triplets with the first input (L) varying
+// fastest and the last slowest, the order of .cube files
+const float * lut3DData(const Lut3D * lut);
+int lut3DSize(const Lut3D * lut);
+Lut3DInput lut3DInput(const Lut3D * lut);
+void lut3DDomain(const Lut3D * lut, DoubleTriplet * min, DoubleTriplet * max);
+
+// Interpolates RGB for `n` input triplets from `src` to `dst`. Inputs are
+// clamped to the box; H = -1 (with C = 0) is taken as 0.
+void applyLut3DArray(const Lut3D * lut, const DoubleTriplet * src, DoubleTriplet * dst, size_t n);
+
+// Returns the largest difference of any RGB component between interpolation
+// and exact conversion over `samplesPerAxis`³ inputs at the centers of an even
+// grid over the box, so mostly between LUT samples, optionally counting only
+// in-gamut inputs. With `clip` both the samples and the exact results are
+// clipped to [0, 1], measuring the LUT as written to .cube files by default.
+// Writes the input with that difference to `worst` and the mean difference
+// to `meanError` if not NULL.
+// The largest errors are at the gamut boundary where a component nears 0 as
+// the sRGB curve is steep there, and much larger than the mean: e.g. for Lab
+// 33³ gives a max of 0.33 and a mean of 0.0035 over in-gamut inputs, or
+// 0.18 and 0.0021 clipped.
+double lut3DMaxError(const Lut3D * lut, int samplesPerAxis, int inGamutOnly, int clip, DoubleTriplet * worst, double * meanError);
@@ -0,0 +1,115 @@
+# librgb2lab
+# ==========
+#
+# Convert color values from RGB to/from CIE LAB/LCH
+# for sRGB gamut, D65 illuminant, 2° observer
+#
+# Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
+#
+# Use, modification and distribution are permitted subject to the
+# "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
+
+import rgb2lab_common
+from rgb2lab_common import *
+from ctypes import byref, c_double, c_float, c_int, c_size_t, c_void_p, memmove, sizeof, POINTER, Structure
+
+_lib = rgb2lab_common._lib
+
+class _Triplet(Structure): _fields_ = ("data", c_double * 3), # same layout as the DoubleTriplet union
+
+_DoublePtr = POINTER(c_double)
+
+# input names as accepted by Lut3D: Lut3DInput values of rgb2lab_lut3d.h
+lut3DInputs = {"lab": 0, "lch": 1}
+
+_lib.newLut3D.argtypes = [c_int, c_int]
+_lib.newLut3D.restype = c_void_p
+_lib.freeLut3D.argtypes = [c_void_p]
+_lib.freeLut3D.restype = None
+_lib.lut3DData.argtypes = [c_void_p]
+_lib.lut3DData.restype = POINTER(c_float)
+_lib.lut3DDomain.argtypes = [c_void_p, POINTER(_Triplet), POINTER(_Triplet)]
+_lib.lut3DDomain.restype = None
+_lib.applyLut3DArray.argtypes = [c_void_p, _DoublePtr, _DoublePtr, c_size_t]
+_lib.applyLut3DArray.restype = None
+_lib.lut3DMaxError.argtypes = [c_void_p, c_int, c_int, c_int, POINTER(_Triplet), POINTER(c_double)]
+_lib.lut3DMaxError.restype = c_double
+
+class Lut3D:
+
+    '''
+    rgbFromLab (input "lab") or rgbFromLch (input "lch") sampled on a
+    `size`³ grid over the whole input box for fast approximate conversion by
+    tetrahedral interpolation; see rgb2lab_lut3d.h
+    '''
+
+    def __init__(self, size = 33, input = "lab"):
+        if input not in lut3DInputs:
+            raise Rgb2LabError("Unknown LUT input {!r}; use one of {}.".format(input, ", ".join(lut3DInputs)))
+        self._handle = _lib.newLut3D(lut3DInputs[input], size)
+        if not self._handle:
+            raise Rgb2LabError("Could not make a 3D LUT of size {}; it should be in [2, 256].".format(size))
+        self.size = size
+        self.input = input
+        domainMin, domainMax = _Triplet(), _Triplet()
+        _lib.lut3DDomain(self._handle, byref(domainMin), byref(domainMax))
+        self.domain = tuple(domainMin.data), tuple(domainMax.data)
+
+    def __del__(self):
+        if getattr(self, "_handle", None):
+            _lib.freeLut3D(self._handle)
+            self._handle = None
+
+    def data(self):
+        '''Returns a copy of the samples as a size³ × 3 memoryview of floats, first input varying fastest'''
+        out = rgb2lab_common._newBuffer(c_float, self.size ** 3, 3)
+        memmove((c_float * (3 * self.size ** 3)).from_buffer(out), _lib.lut3DData(self._handle), sizeof(c_float) * 3 * self.size ** 3)
+        return out
+
+    def apply(self, src, out = None):
+        '''
+        Given a buffer of N×3 input doubles, writes the interpolated N×3 RGB
+        doubles into `out` (allocated if not given) and returns it. Inputs are
+        clamped to the box rather than checked.
+        '''
+        srcPtr, n = rgb2lab_common._asBuffer(src, c_double, 3)
+        if out is None:
+            out = rgb2lab_common._newBuffer(c_double, n, 3)
+        outPtr, outN = rgb2lab_common._asBuffer(out, c_double, 3, writable = True)
+        if outN != n:
+            raise Rgb2LabError("Output buffer holds {} rows but input has {}.".format(outN, n))
+        _lib.applyLut3DArray(self._handle, srcPtr, outPtr, n)
+        return out
+
+    def maxError(self, samplesPerAxis = None, inGamutOnly = True, clip = True):
+        '''
+        Returns a tuple of the largest difference of any RGB component between
+        interpolation and exact conversion, the input where it occurs and the
+        mean difference, over `samplesPerAxis`³ inputs (by default 2 per LUT
+        cell along each axis) optionally counting only in-gamut ones. `clip`
+        is as for writeCube, measuring the LUT as written; without it the
+        error is that of `apply`.
+        '''
+        if samplesPerAxis is None:
+            samplesPerAxis = 2 * (self.size - 1)
+        worst, mean = _Triplet(), c_double()
+        error = _lib.lut3DMaxError(self._handle, samplesPerAxis, bool(inGamutOnly), bool(clip), byref(worst), byref(mean))
+        return error, tuple(worst.data), mean.value
+
+    def writeCube(self, path, title = None, clip = True):
+        '''
+        Writes the LUT as an Adobe/Resolve .cube file with the input box as
+        DOMAIN_MIN/DOMAIN_MAX, clipping RGB to [0, 1] unless `clip` is false
+        '''
+        with open(path, "w") as f:
+            f.write("# Generated by librgb2lab: sRGB from CIE {} (D65, 2°)\n".format(self.input.upper()))
+            if title is not None:
+                f.write('TITLE "{}"\n'.format(title.replace('"', "'")))
+            f.write("LUT_3D_SIZE {}\n".format(self.size))
+            f.write("DOMAIN_MIN {:g} {:g} {:g}\n".format(*self.domain[0]))
+            f.write("DOMAIN_MAX {:g} {:g} {:g}\n".format(*self.domain[1]))
+            line = "{:.6f} {:.6f} {:.6f}\n".format
+            for r, g, b in self.data().tolist():
+                if clip:
+                    r, g, b = (min(max(v, 0.0), 1.0) for v in (r, g, b))
+                f.write(line(r, g, b))
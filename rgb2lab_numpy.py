@@ -0,0 +1,328 @@
+# librgb2lab
+# ==========
+#
+# Convert color values from RGB to/from CIE LAB/LCH
+# for sRGB gamut, D65 illuminant, 2° observer
+#
+# Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
+#
+# Use, modification and distribution are permitted subject to the
+# "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
+
+# NumPy backend
+# =============
+#
+# Vectorized versions of the conversions of rgb2lab and rgb2lab_int and of the
+# fillTable_* and fillArgb32_* library functions for use without librgb2lab.so;
+# see the backends in rgb2lab_common. They follow the exact (not fast math)
+# formulas of rgb2lab.c in the same order of operations and round as
+# rgb2lab_int.c does, so results agree with the library's to the last bit of
+# pow() and integer results and tables are the same but for exact ties.
+# Buffers are checked by the same functions as for the library and converted
+# in chunks of rows so that the temporaries stay in cache.
+
+import numpy as np
+import operator
+import rgb2lab_common
+from rgb2lab_common import Rgb2LabError, checkRgb01, checkRgb256, checkLab, checkLch
+from ctypes import c_byte, c_double, c_short
+
+_CHUNK = 65536 # rows
+
+_PI = 3.14159265358979323846
+_eps, _kap = (6 * 6 * 6) / (29.0 * 29.0 * 29.0), (29 * 29 * 29) / (3.0 * 3.0 * 3.0)
+_toXyz = ((0.4124564, 0.3575761, 0.1804375), (0.2126729, 0.7151522, 0.0721750), (0.0193339, 0.1191920, 0.9503041))
+_fromXyz = ((3.2404542, -1.5371385, -0.4985314), (-0.9692660, 1.8760108, 0.0415560), (0.0556434, -0.2040259, 1.0572252))
+_white = (0.95047, 1.0, 1.08883)
+
+# Float conversions of N×3 arrays
+# ===============================
+
+def _multiply(m, t): # each output column summed left to right as in rgb2lab.c
+    return [t[:, 0] * row[0] + t[:, 1] * row[1] + t[:, 2] * row[2] for row in m]
+
+def _labFromRgb(rgb):
+    linear = np.where(rgb > 0.04045, ((rgb + 0.055) / 1.055) ** 2.4, rgb / 12.92)
+    f = []
+    for v, white in zip(_multiply(_toXyz, linear), _white):
+        v = v / white
+        f.append(np.where(v > _eps, v ** (1 / 3.0), (_kap * v + 16) / 116.0))
+    fx, fy, fz = f
+    return np.stack(((116 * fy) - 16, 500 * (fx - fy), 200 * (fy - fz)), axis = 1)
+
+def _rgbFromLab(lab):
+    y = (lab[:, 0] + 16) / 116.0
+    x = lab[:, 1] / 500.0 + y
+    z = y - lab[:, 2] / 200.0
+    xyz = np.empty_like(lab)
+    for i, (v, white) in enumerate(zip((x, y, z), _white)):
+        v3 = v ** 3.0
+        xyz[:, i] = np.where(v3 > _eps, v3, (116 * v - 16) / _kap) * white
+    linear = np.stack(_multiply(_fromXyz, xyz), axis = 1)
+    return np.where(linear > 0.0031308, 1.055 * linear ** (1 / 2.4) - 0.055, linear * 12.92)
+
+def _lchFromLab(lab):
+    a, b = lab[:, 1], lab[:, 2]
+    h = np.arctan2(b, a) * 180 / _PI
+    h = np.where(h < 0, h + 360, h)
+    achromatic = (a == 0) & (b == 0)
+    return np.stack((lab[:, 0], np.where(achromatic, 0.0, np.hypot(a, b)), np.where(achromatic, -1.0, h)), axis = 1)
+
+def _labFromLch(lch):
+    l, c, h = lch[:, 0], lch[:, 1], lch[:, 2] * (_PI / 180)
+    noHue = lch[:, 2] == -1
+    return np.stack((np.where(noHue & (c != 0), np.nan, l), # illegal input gives illegal output as in rgb2lab.c
+                     np.where(noHue, 0.0, c * np.cos(h)), np.where(noHue, 0.0, c * np.sin(h))), axis = 1)
+
+def _lchFromRgb(rgb): return _lchFromLab(_labFromRgb(rgb))
+def _rgbFromLch(lch): return _rgbFromLab(_labFromLch(lch))
+
+# Input checks as the findInvalid* functions of rgb2lab.c
+def _validRgb01(t): return ((0 <= t) & (t <= 1)).all(axis = 1)
+def _validRgb256(t): return ((0 <= t) & (t <= 255)).all(axis = 1)
+
+def _validLab(t):
+    l, a, b = t[:, 0], t[:, 1], t[:, 2]
+    return (0 <= l) & (l <= 100) & (-128 <= a) & (a <= 128) & (-128 <= b) & (b <= 128)
+
+def _validLch(t):
+    l, c, h = t[:, 0], t[:, 1], t[:, 2]
+    return (0 <= l) & (l <= 100) & (((0 <= c) & (c <= 180) & (0 <= h) & (h < 360)) | ((c == 0) & (h == -1)))
+
+def _view(ptr, rows, width):
+    return np.ctypeslib.as_array(ptr, (rows, width))
+
+def _makeArrayFn(checkFn, validFn, convertFn):
+    def fn(src, out = None):
+        srcPtr, n = rgb2lab_common._asBuffer(src, c_double, 3)
+        if out is None:
+            out = rgb2lab_common._newBuffer(c_double, n, 3)
+        outPtr, outN = rgb2lab_common._asBuffer(out, c_double, 3, writable = True)
+        if outN != n:
+            raise Rgb2LabError("Output buffer holds {} rows but input has {}.".format(outN, n))
+        if not n:
+            return out
+        srcRows, outRows = _view(srcPtr, n, 3), _view(outPtr, n, 3) # srcPtr keeps a copied input alive meanwhile
+        with np.errstate(all = "ignore"):
+            for start in range(0, n, _CHUNK):
+                chunk = srcRows[start : start + _CHUNK]
+                invalid = np.flatnonzero(~validFn(chunk))
+                if len(invalid):
+                    i = start + invalid[0]
+                    try:
+                        checkFn(tuple(srcRows[i].tolist()))
+                    except Rgb2LabError as e:
+                        raise Rgb2LabError("Row {}: {}".format(i, e)) from None
+                outRows[start : start + _CHUNK] = convertFn(chunk)
+        return out
+    return fn
+
+labFromRgbArray = _makeArrayFn(checkRgb01, _validRgb01, _labFromRgb)
+rgbFromLabArray = _makeArrayFn(checkLab  , _validLab  , _rgbFromLab)
+lchFromRgbArray = _makeArrayFn(checkRgb01, _validRgb01, _lchFromRgb)
+rgbFromLchArray = _makeArrayFn(checkLch  , _validLch  , _rgbFromLch)
+lchFromLabArray = _makeArrayFn(checkLab  , _validLab  , _lchFromLab)
+labFromLchArray = _makeArrayFn(checkLch  , _validLch  , _labFromLch)
+
+def _makeRetOneFn(checkFn, convertFn):
+    def fn(ijk):
+        checkFn(ijk)
+        with np.errstate(all = "ignore"):
+            return tuple(convertFn(np.array((ijk, ), dtype = np.float64))[0].tolist())
+    return fn
+
+labFromRgb = _makeRetOneFn(checkRgb01, _labFromRgb)
+rgbFromLab = _makeRetOneFn(checkLab  , _rgbFromLab)
+lchFromRgb = _makeRetOneFn(checkRgb01, _lchFromRgb)
+rgbFromLch = _makeRetOneFn(checkLch  , _rgbFromLch)
+lchFromLab = _makeRetOneFn(checkLab  , _lchFromLab)
+labFromLch = _makeRetOneFn(checkLch  , _labFromLch)
+
+# Integer conversions
+# ===================
+
+def _round(t): # as C round(): halfway cases away from zero
+    whole = np.trunc(t)
+    return np.where(np.abs(t - whole) >= 0.5, whole + np.sign(t), whole).astype(np.int32)
+
+def _roundAndFixRgb(rgb):
+    v = _round(rgb * 255)
+    return np.where((v < 0) | (v > 255), -1, v) # NaN too as it gives the most negative int
+
+def _fixLch(lch):
+    c, h = lch[:, 1], lch[:, 2]
+    h = np.where(c == 0, -1, h) # sometimes c may become 0 by rounding, so need to do this again here
+    h = np.where(h == 360, 0, h) # again can happen by rounding
+    return np.stack((lch[:, 0], c, h), axis = 1)
+
+def _labFromRgbInt(rgb): return _round(_labFromRgb(rgb / 255.0))
+def _rgbFromLabInt(lab): return _roundAndFixRgb(_rgbFromLab(lab))
+def _lchFromRgbInt(rgb): return _fixLch(_round(_lchFromRgb(rgb / 255.0)))
+def _rgbFromLchInt(lch): return _roundAndFixRgb(_rgbFromLch(lch))
+def _lchFromLabInt(lab): return _fixLch(_round(_lchFromLab(lab)))
+def _labFromLchInt(lch): return _round(_labFromLch(lch))
+
+def _labLchFromRgbInt(rgb):
+    lab = _labFromRgb(rgb / 255.0)
+    return _round(lab), _fixLch(_round(_lchFromLab(lab)))
+
+def _rgbLchFromLabInt(lab):
+    return _roundAndFixRgb(_rgbFromLab(lab)), _fixLch(_round(_lchFromLab(lab)))
+
+def _rgbLabFromLchInt(lch):
+    lab = _labFromLch(lch)
+    return _roundAndFixRgb(_rgbFromLab(lab)), _round(lab)
+
+def _intInput(ijk): # integers only, as for the c_int arguments of the library
+    return np.array(([operator.index(v) for v in ijk], ), dtype = np.float64)
+
+def _makeRetOneIntFn(checkFn, convertFn):
+    def fn(ijk):
+        checkFn(ijk)
+        with np.errstate(all = "ignore"):
+            return tuple(convertFn(_intInput(ijk))[0].tolist())
+    return fn
+
+def _makeRetTwoIntFn(checkFn, convertFn):
+    def fn(ijk):
+        checkFn(ijk)
+        with np.errstate(all = "ignore"):
+            t1, t2 = convertFn(_intInput(ijk))
+        return tuple(t1[0].tolist()), tuple(t2[0].tolist())
+    return fn
+
+labFromRgbInt = _makeRetOneIntFn(checkRgb256, _labFromRgbInt)
+rgbFromLabInt = _makeRetOneIntFn(checkLab   , _rgbFromLabInt)
+lchFromRgbInt = _makeRetOneIntFn(checkRgb256, _lchFromRgbInt)
+rgbFromLchInt = _makeRetOneIntFn(checkLch   , _rgbFromLchInt)
+lchFromLabInt = _makeRetOneIntFn(checkLab   , _lchFromLabInt)
+labFromLchInt = _makeRetOneIntFn(checkLch   , _labFromLchInt)
+
+labLchFromRgbInt = _makeRetTwoIntFn(checkRgb256, _labLchFromRgbInt)
+rgbLchFromLabInt = _makeRetTwoIntFn(checkLab   , _rgbLchFromLabInt)
+rgbLabFromLchInt = _makeRetTwoIntFn(checkLch   , _rgbLabFromLchInt)
+
+# Batch conversion of 8-bit pixels, using the RGB8 lookup table if loaded as
+# the library does
+# ==========================================================================
+
+_rgb8TableDtype = np.dtype([("L", "i1"), ("A", "i1"), ("B", "i1"), ("c", "u1"), ("h", "i2")])
+
+def _rgb8Convert(src, layout, labOut, lchOut):
+    import rgb2lab_int # only for its buffer checks; already imported when these are used from it
+    srcPtr, layout, n = rgb2lab_int._rgb8Source(src, layout)
+    outs = []
+    for out, T in (labOut, c_byte), (lchOut, c_short):
+        if out is not False:
+            out, outPtr = rgb2lab_int._rgb8Output(out, T, n)
+            outs.append((out, _view(outPtr, n, 3) if n else None))
+        else:
+            outs.append((None, None))
+    (labOut, labRows), (lchOut, lchRows) = outs
+    if n:
+        pixels = np.ctypeslib.as_array(srcPtr, (n, layout.stride))
+        loaded = rgb2lab_int._rgb8Table
+        table = np.frombuffer(loaded[1], dtype = _rgb8TableDtype) if loaded is not None else None
+        for start in range(0, n, _CHUNK):
+            rgb = pixels[start : start + _CHUNK][:, (layout.r, layout.g, layout.b)].astype(np.int32)
+            stop = start + len(rgb)
+            if table is not None:
+                e = table[rgb[:, 0] << 16 | rgb[:, 1] << 8 | rgb[:, 2]]
+                lab, lch = np.stack((e["L"], e["A"], e["B"]), axis = 1), np.stack((e["L"], e["c"], e["h"]), axis = 1)
+            else:
+                with np.errstate(all = "ignore"):
+                    lab, lch = _labLchFromRgbInt(rgb.astype(np.float64))
+            if labRows is not None: labRows[start : stop] = lab
+            if lchRows is not None: lchRows[start : stop] = lch
+    return labOut, lchOut
+
+def labFromRgb8Array(src, out = None, layout = "RGB"): return _rgb8Convert(src, layout, out, False)[0]
+def lchFromRgb8Array(src, out = None, layout = "RGB"): return _rgb8Convert(src, layout, False, out)[1]
+def labLchFromRgb8Array(src, labOut = None, lchOut = None, layout = "RGB"): return _rgb8Convert(src, layout, labOut, lchOut)
+
+# Tables
+# ======
+#
+# fillTable_* and fillArgb32_* with the signatures of the library functions
+# (as declared in rgb2lab_int.h) taking the table or image as a ctypes
+# object or pointer, so that the wrappers in rgb2lab_int serve both backends
+
+_ranges = {"L": (0, 100), "A": (-128, 128), "B": (-128, 128), "C": (0, 180), "H": (0, 359)}
+_fixedRanges = dict(_ranges, H = (-1, 359))
+
+def _tableInputs(kind, fixed):
+    '''
+    Returns the input triplets of the table of `kind` (e.g. "ABforL") for the
+    `fixed` values as an array of shape (var1Span, var2Span, 3) or for 1D
+    tables (varSpan, 1, 3), and the conversion, or None for bad fixed values
+    '''
+    variables, fixedNames = kind.split("for")
+    for name, v in zip(fixedNames, fixed):
+        low, high = _fixedRanges[name]
+        if not low <= v <= high:
+            return None
+    values = dict(zip(fixedNames, fixed))
+    axes = [np.arange(_ranges[name][0], _ranges[name][1] + 1, dtype = np.float64) for name in variables]
+    grid = np.meshgrid(*axes, indexing = "ij")
+    shape = grid[0].shape if len(grid) == 2 else grid[0].shape + (1, )
+    isLab = "A" in kind or "B" in kind
+    inputs = np.empty(shape + (3, ))
+    for i, name in enumerate("LAB" if isLab else "LCH"):
+        inputs[..., i] = grid[variables.index(name)].reshape(shape) if name in variables else values[name]
+    return inputs, _rgbFromLabInt if isLab else _rgbFromLchInt
+
+def _tableRgb(kind, fixed):
+    '''Returns the RGB of the table cells as an int array shaped as the inputs, -1 where out of gamut'''
+    found = _tableInputs(kind, fixed)
+    if found is None:
+        return None
+    inputs, convertFn = found
+    with np.errstate(all = "ignore"):
+        rgb = convertFn(inputs.reshape(-1, 3))
+    return rgb.reshape(inputs.shape)
+
+def _makeFillTableFn(kind):
+    def fn(table, *fixed):
+        rgb = _tableRgb(kind, fixed)
+        if rgb is None:
+            return -1
+        cells = np.frombuffer(table, dtype = np.uint8).reshape(-1, 4)
+        valid = (rgb != -1).all(axis = -1).reshape(-1)
+        cells[:] = 0
+        cells[valid, 0] = 1
+        cells[valid, 1:] = rgb.reshape(-1, 3)[valid]
+        return int(valid.sum())
+    fn.__name__ = "fillTable_" + kind
+    return fn
+
+def _makeFillArgb32Fn(kind):
+    def fn(bits, bytesPerLine, *args):
+        if len(kind.split("for")[0]) == 1: # 1D: height, xRotate, var1, var2
+            height, xRotate, *fixed = args
+        else:
+            xRotate, *fixed = args
+            height = None
+        rgb = _tableRgb(kind, fixed)
+        if rgb is None:
+            return -1
+        if height is not None and height <= 0: # as the library: nothing to draw
+            return 0
+        valid = (rgb != -1).all(axis = -1)
+        pixels = np.where(valid, np.uint32(0xFF000000) | (rgb[..., 0] << 16 | rgb[..., 1] << 8 | rgb[..., 2]).astype(np.uint32), np.uint32(0))
+        span = len(pixels)
+        lines = np.roll(pixels, xRotate % span, axis = 0).T[::-1] # var2 increasing upwards, var1 rotated right
+        if height is not None:
+            lines = np.broadcast_to(lines, (height, span))
+        image = np.ctypeslib.as_array(bits, (bytesPerLine * (len(lines) - 1) + 4 * span, ))
+        for y, line in enumerate(lines):
+            image[y * bytesPerLine : y * bytesPerLine + 4 * span] = np.ascontiguousarray(line).view(np.uint8) # native byte order as in QImage
+        return int(valid.sum())
+    fn.__name__ = "fillArgb32_" + kind
+    return fn
+
+_tableKinds = ("LforAB", "AforBL", "BforAL", "LforHC", "CforHL", "HforCL",
+               "ABforL", "BLforA", "ALforB", "HCforL", "HLforC", "CLforH")
+
+for _kind in _tableKinds:
+    globals()["fillTable_" + _kind] = _makeFillTableFn(_kind)
+    globals()["fillArgb32_" + _kind] = _makeFillArgb32Fn(_kind)
@@ -0,0 +1,219 @@
+// librgb2lab
+// ==========
+//
+// Convert color values from RGB to/from CIE LAB/LCH
+// for sRGB gamut, D65 illuminant, 2° observer
+//
+// Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
+//
+// Use, modification and distribution are permitted subject to the
+// "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
+
+#include "rgb2lab_planar.h"
+#include "rgb2lab_threads.h"
+#include <math.h>
+#include <stdint.h>
+#include <string.h>
+
+// NOTE: everything below is written for the loop vectorizer: per-color code is
+// inlined into loops over blocks copied to local arrays so that there is no
+// aliasing to check, and conditions are selects between values computed anyway,
+// which needs -fno-trapping-math (see the Makefile) to be if-converted.
+// Coefficients are as in rgb2lab.c, to which changes must be mirrored.
+
+typedef struct { float v[3]; } Float3;
+
+static inline uint32_t _bits(float v) { uint32_t u; memcpy(&u, &v, sizeof(u)); return u; }
+static inline float _float(uint32_t u) { float v; memcpy(&v, &u, sizeof(v)); return v; }
+static inline float _min(float a, float b) { return a < b ? a : b; }
+static inline float _max(float a, float b) { return a > b ? a : b; }
+
+// log2 for positive normal `x`: exponent plus atanh series of the mantissa
+// moved into [√½, √2); error < 5e-8
+static inline float _log2(float x)
+{
+    uint32_t u = _bits(x);
+    int e = (int) (u >> 23) - 127;
+    float m = _float((u & 0x007FFFFF) | 0x3F800000);
+    int big = m > 1.41421356f;
+    m = big ? m * 0.5f : m;
+    e = big ? e + 1 : e;
+    float t = (m - 1) / (m + 1), t2 = t * t;
+    return e + t * (2.88539008f + t2 * (0.96179669f + t2 * (0.57707802f + t2 * 0.41219858f)));
+}
+
+// 2^y for y clamped to [-126, 127]: exponent plus Taylor series over [-½, ½];
+// relative error < 2e-7
+static inline float _exp2(float y)
+{
+    y = _min(_max(y, -126), 127);
+    int i = (int) (y + 128.5f) - 128; // nearest integer, truncating a positive value
+    float f = y - i;
+    float p = 1 + f * (0.69314718f + f * (0.24022651f + f * (0.05550411f + f * (0.00961813f + f * (0.00133336f + f * 0.00015404f)))));
+    return p * _float((uint32_t) (i + 127) << 23);
+}
+
+static inline float _pow(float x, float p) { return _exp2(p * _log2(x)); } // x > 0
+
+// sRGB transfer functions
+static inline float _linearFromGamma(float v)
+{
+    float big = _pow((_max(v, 0.04045f) + 0.055f) / 1.055f, 2.4f);
+    return v > 0.04045f ? big : v / 12.92f;
+}
+
+static inline float _gammaFromLinear(float v)
+{
+    float big = 1.055f * _pow(_max(v, 0.0031308f), 1 / 2.4f) - 0.055f;
+    return v > 0.0031308f ? big : v * 12.92f;
+}
+
+static const float eps = (6 * 6 * 6) / (29.0f * 29.0f * 29.0f), kap = (29 * 29 * 29) / (3.0f * 3.0f * 3.0f);
+static const float xyzReferenceValues[3] = {0.95047f, 1.0f, 1.08883f};
+
+static inline float _labCompand(float v)
+{
+    float big = _pow(_max(v, eps), 1 / 3.0f);
+    return v > eps ? big : (kap * v + 16) / 116.0f;
+}
+
+static inline float _labExpand(float v)
+{
+    float v3 = v * v * v;
+    return v3 > eps ? v3 : (116 * v - 16) / kap;
+}
+
+static inline Float3 _xyzFromRgb(Float3 rgb)
+{
+    float r = _linearFromGamma(rgb.v[0]), g = _linearFromGamma(rgb.v[1]), b = _linearFromGamma(rgb.v[2]);
+    Float3 temp = {{
+        r * 0.4124564f + g * 0.3575761f + b * 0.1804375f,
+        r * 0.2126729f + g * 0.7151522f + b * 0.0721750f,
+        r * 0.0193339f + g * 0.1191920f + b * 0.9503041f
+        }};
+    return temp;
+}
+
+static inline Float3 _rgbFromXyz(Float3 xyz)
+{
+    float x = xyz.v[0], y = xyz.v[1], z = xyz.v[2];
+    Float3 temp = {{
+        _gammaFromLinear(x *  3.2404542f + y * -1.5371385f + z * -0.4985314f),
+        _gammaFromLinear(x * -0.9692660f + y *  1.8760108f + z *  0.0415560f),
+        _gammaFromLinear(x *  0.0556434f + y * -0.2040259f + z *  1.0572252f)
+        }};
+    return temp;
+}
+
+static inline Float3 _labFromXyz(Float3 xyz)
+{
+    float x = _labCompand(xyz.v[0] / xyzReferenceValues[0]),
+          y = _labCompand(xyz.v[1] / xyzReferenceValues[1]),
+          z = _labCompand(xyz.v[2] / xyzReferenceValues[2]);
+    Float3 temp = {{116 * y - 16, 500 * (x - y), 200 * (y - z)}};
+    return temp;
+}
+
+static inline Float3 _xyzFromLab(Float3 lab)
+{
+    float y = (lab.v[0] + 16) / 116.0f, x = lab.v[1] / 500.0f + y, z = y - lab.v[2] / 200.0f;
+    Float3 temp = {{_labExpand(x) * xyzReferenceValues[0], _labExpand(y) * xyzReferenceValues[1], _labExpand(z) * xyzReferenceValues[2]}};
+    return temp;
+}
+
+static const float DEGREES = 57.29577951f; // per radian
+
+// atan2 in degrees in [0, 360) for (y, x) ≠ (0, 0): octant reduction, then
+// reduction by 30° above tan 15° and an odd series; error < 1e-5 degrees
+static inline float _atan2Degrees(float y, float x)
+{
+    float ax = fabsf(x), ay = fabsf(y);
+    float t = _min(ax, ay) / _max(ax, ay);
+    int reduce = t > 0.26794919f; // tan 15°
+    t = reduce ? (t * 1.73205081f - 1) / (t + 1.73205081f) : t;
+    float t2 = t * t;
+    float a = t * (1 + t2 * (-0.33333333f + t2 * (0.2f + t2 * (-0.14285714f + t2 * 0.11111111f)))) * DEGREES;
+    a = reduce ? a + 30 : a;
+    a = ay > ax ? 90 - a : a;
+    a = x < 0 ? 180 - a : a;
+    return y < 0 ? 360 - a : a;
+}
+
+// sine and cosine of `h` degrees: reduction to [-45°, 45°] and Taylor series
+static inline void _sinCosDegrees(float h, float * s, float * c)
+{
+    int k = (int) (h / 90 + 64.5f) - 64; // nearest quadrant for h ≥ -5760
+    float x = (h - 90 * k) / DEGREES, x2 = x * x;
+    float sx = x * (1 + x2 * (-1 / 6.0f + x2 * (1 / 120.0f + x2 * (-1 / 5040.0f + x2 * (1 / 362880.0f)))));
+    float cx = 1 + x2 * (-0.5f + x2 * (1 / 24.0f + x2 * (-1 / 720.0f + x2 * (1 / 40320.0f + x2 * (-1 / 3628800.0f)))));
+    int q = k & 3;
+    *s = q == 0 ? sx : q == 1 ? cx : q == 2 ? -sx : -cx;
+    *c = q == 0 ? cx : q == 1 ? -sx : q == 2 ? -cx : sx;
+}
+
+static inline Float3 _lchFromLab(Float3 lab)
+{
+    float a = lab.v[1], b = lab.v[2];
+    int none = a == 0 && b == 0;
+    float h = _atan2Degrees(b, none ? 1 : a); // avoid 0/0
+    Float3 temp = {{lab.v[0], sqrtf(a * a + b * b), none ? -1 : h}};
+    return temp;
+}
+
+static inline Float3 _labFromLch(Float3 lch)
+{
+    float s, c;
+    _sinCosDegrees(lch.v[2], &s, &c);
+    int none = lch.v[2] == -1;
+    Float3 temp = {{none && lch.v[1] != 0 ? NAN : lch.v[0], none ? 0 : lch.v[1] * c, none ? 0 : lch.v[1] * s}};
+    return temp;
+}
+
+static inline Float3 _labFromRgb(Float3 rgb) { return _labFromXyz(_xyzFromRgb(rgb)); }
+static inline Float3 _rgbFromLab(Float3 lab) { return _rgbFromXyz(_xyzFromLab(lab)); }
+static inline Float3 _lchFromRgb(Float3 rgb) { return _lchFromLab(_labFromRgb(rgb)); }
+static inline Float3 _rgbFromLch(Float3 lch) { return _rgbFromLab(_labFromLch(lch)); }
+
+typedef struct { const float * in[3]; float * out[3]; } PlanarJob;
+
+enum { PLANAR_BLOCK = 256, PLANAR_MIN_CHUNK = 16384 }; // colors
+
+#define DEFINE_PLANAR_FN(FN) \
+static void FN##Block(float * restrict p0, float * restrict p1, float * restrict p2, size_t n) \
+{ \
+    for (size_t i = 0; i < n; ++i) \
+    { \
+        Float3 v = {{p0[i], p1[i], p2[i]}}; \
+        v = _##FN(v); \
+        p0[i] = v.v[0]; p1[i] = v.v[1]; p2[i] = v.v[2]; \
+    } \
+} \
+static long FN##Chunk(void * job_, size_t begin, size_t end) \
+{ \
+    const PlanarJob * job = job_; \
+    float block[3][PLANAR_BLOCK]; \
+    for (size_t start = begin; start < end; start += PLANAR_BLOCK) \
+    { \
+        size_t m = end - start < PLANAR_BLOCK ? end - start : PLANAR_BLOCK; \
+        for (int j = 0; j < 3; ++j) memcpy(block[j], job->in[j] + start, m * sizeof(float)); \
+        FN##Block(block[0], block[1], block[2], m); \
+        for (int j = 0; j < 3; ++j) memcpy(job->out[j] + start, block[j], m * sizeof(float)); \
+    } \
+    return 0; \
+} \
+void FN##Planar(const float * in0, const float * in1, const float * in2, float * out0, float * out1, float * out2, size_t n) \
+{ \
+    PlanarJob job = {{in0, in1, in2}, {out0, out1, out2}}; \
+    parallelFor(n, PLANAR_MIN_CHUNK, FN##Chunk, &job); \
+}
+
+DEFINE_PLANAR_FN(xyzFromRgb)
+DEFINE_PLANAR_FN(rgbFromXyz)
+DEFINE_PLANAR_FN(labFromXyz)
+DEFINE_PLANAR_FN(xyzFromLab)
+DEFINE_PLANAR_FN(lchFromLab)
+DEFINE_PLANAR_FN(labFromLch)
+DEFINE_PLANAR_FN(labFromRgb)
+DEFINE_PLANAR_FN(rgbFromLab)
+DEFINE_PLANAR_FN(lchFromRgb)
+DEFINE_PLANAR_FN(rgbFromLch)
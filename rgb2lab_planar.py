@@ -0,0 +1,76 @@
+# librgb2lab
+# ==========
+#
+# Convert color values from RGB to/from CIE LAB/LCH
+# for sRGB gamut, D65 illuminant, 2° observer
+#
+# Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
+#
+# Use, modification and distribution are permitted subject to the
+# "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
+
+import rgb2lab_common
+from rgb2lab_common import *
+from ctypes import addressof, c_float, c_size_t, c_void_p, sizeof
+
+_lib = rgb2lab_common._lib
+
+def _planes(obj, writable = False):
+
+    '''
+    Given either one buffer of 3 × N floats (the planes one after another, as
+    a C-contiguous NumPy array of shape (3, N)) or a sequence of three buffers
+    of N floats each, returns a tuple of:
+    1. the addresses of the 3 planes
+    2. N
+    3. the CTypes pointers, to be kept alive while the addresses are used
+    '''
+
+    if isinstance(obj, (list, tuple)):
+        if len(obj) != 3:
+            raise Rgb2LabError("Expected 3 planes but got {}.".format(len(obj)))
+        ptrs, ns = zip(*(rgb2lab_common._asBuffer(p, c_float, 1, writable) for p in obj))
+        if ns[0] != ns[1] or ns[0] != ns[2]:
+            raise Rgb2LabError("Planes hold {}, {} and {} floats; they should be equal.".format(*ns))
+        return tuple(addressof(p.contents) for p in ptrs), ns[0], ptrs
+    ptr, total = rgb2lab_common._asBuffer(obj, c_float, 1, writable)
+    if total % 3:
+        raise Rgb2LabError("Buffer holds {} floats which is not 3 planes.".format(total))
+    n = total // 3
+    base = addressof(ptr.contents)
+    return (base, base + n * sizeof(c_float), base + 2 * n * sizeof(c_float)), n, ptr
+
+def _makePlanarFn(name):
+    libFn = getattr(_lib, name)
+    libFn.argtypes = [c_void_p] * 6 + [c_size_t]
+    libFn.restype = None
+    def fn(src, out = None):
+        srcPlanes, n, srcKeep = _planes(src)
+        if out is None:
+            out = rgb2lab_common._newBuffer(c_float, 3, n) if n else rgb2lab_common._newBuffer(c_float, 0, 0)
+        outPlanes, outN, outKeep = _planes(out, writable = True)
+        if outN != n:
+            raise Rgb2LabError("Output planes hold {} floats but input planes {}.".format(outN, n))
+        libFn(*srcPlanes, *outPlanes, n)
+        return out
+    fn.__name__ = name
+    return fn
+
+# Float32 conversions of planar data; see rgb2lab_planar.h for the ranges
+# and accuracy. `src` and `out` are each either one buffer of 3 × N floats
+# or a sequence of three buffers of N floats; `out` may be `src` itself for
+# converting in place and is allocated as a 3 × N memoryview if not given.
+# It is returned. Inputs aren't checked: out-of-range values give
+# out-of-range or NaN results rather than an error.
+
+xyzFromRgbPlanar = _makePlanarFn("xyzFromRgbPlanar")
+rgbFromXyzPlanar = _makePlanarFn("rgbFromXyzPlanar")
+labFromXyzPlanar = _makePlanarFn("labFromXyzPlanar")
+xyzFromLabPlanar = _makePlanarFn("xyzFromLabPlanar")
+lchFromLabPlanar = _makePlanarFn("lchFromLabPlanar")
+labFromLchPlanar = _makePlanarFn("labFromLchPlanar")
+
+labFromRgbPlanar = _makePlanarFn("labFromRgbPlanar")
+rgbFromLabPlanar = _makePlanarFn("rgbFromLabPlanar")
+lchFromRgbPlanar = _makePlanarFn("lchFromRgbPlanar")
+rgbFromLchPlanar = _makePlanarFn("rgbFromLchPlanar")
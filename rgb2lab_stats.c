@@ -0,0 +1,75 @@
+// librgb2lab
+// ==========
+//
+// Convert color values from RGB to/from CIE LAB/LCH
+// for sRGB gamut, D65 illuminant, 2° observer
+//
+// Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
+//
+// Use, modification and distribution are permitted subject to the
+// "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
+
+#include "rgb2lab_stats.h"
+#include <stdatomic.h>
+#include <time.h>
+
+typedef struct { atomic_uint_least64_t calls, items, inGamut, nanoseconds; } AtomicStatRecord;
+
+static AtomicStatRecord stats[STAT_COUNT];
+
+#define RGB2LAB_STAT_NAME(NAME) #NAME,
+static const char * const statNames[STAT_COUNT] = { RGB2LAB_STAT_IDS(RGB2LAB_STAT_NAME) };
+
+int statsCompiledIn(void)
+{
+#ifdef RGB2LAB_STATS
+    return 1;
+#else
+    return 0;
+#endif
+}
+
+int statCount(void) { return STAT_COUNT; }
+
+const char * statName(int id) { return id >= 0 && id < STAT_COUNT ? statNames[id] : NULL; }
+
+// NOTE: relaxed ordering suffices for counters; a snapshot taken while other
+// threads are recording may mix values from before and after a call
+
+void readStats(StatRecord dst[])
+{
+    for (int i = 0; i < STAT_COUNT; ++i)
+    {
+        dst[i].calls = atomic_load_explicit(&stats[i].calls, memory_order_relaxed);
+        dst[i].items = atomic_load_explicit(&stats[i].items, memory_order_relaxed);
+        dst[i].inGamut = atomic_load_explicit(&stats[i].inGamut, memory_order_relaxed);
+        dst[i].nanoseconds = atomic_load_explicit(&stats[i].nanoseconds, memory_order_relaxed);
+    }
+}
+
+void resetStats(void)
+{
+    for (int i = 0; i < STAT_COUNT; ++i)
+    {
+        atomic_store_explicit(&stats[i].calls, 0, memory_order_relaxed);
+        atomic_store_explicit(&stats[i].items, 0, memory_order_relaxed);
+        atomic_store_explicit(&stats[i].inGamut, 0, memory_order_relaxed);
+        atomic_store_explicit(&stats[i].nanoseconds, 0, memory_order_relaxed);
+    }
+}
+
+void statsRecord(StatId id, uint64_t items, uint64_t inGamut, uint64_t nanoseconds)
+{
+    AtomicStatRecord * s = &stats[id];
+    atomic_fetch_add_explicit(&s->calls, 1, memory_order_relaxed);
+    atomic_fetch_add_explicit(&s->items, items, memory_order_relaxed);
+    if (inGamut) atomic_fetch_add_explicit(&s->inGamut, inGamut, memory_order_relaxed);
+    if (nanoseconds) atomic_fetch_add_explicit(&s->nanoseconds, nanoseconds, memory_order_relaxed);
+}
+
+uint64_t statsNow(void)
+{
+    struct timespec t;
+    clock_gettime(CLOCK_MONOTONIC, &t);
+    return (uint64_t) t.tv_sec * 1000000000u + t.tv_nsec;
+}
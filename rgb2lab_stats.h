@@ -0,0 +1,61 @@
+// librgb2lab
+// ==========
+//
+// Convert color values from RGB to/from CIE LAB/LCH
+// for sRGB gamut, D65 illuminant, 2° observer
+//
+// Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
+//
+// Use, modification and distribution are permitted subject to the
+// "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
+
+#include <stdint.h>
+
+// Opt-in instrumentation of the entry points of rgb2lab.c and rgb2lab_int.c
+// =========================================================================
+//
+// Counters are compiled in only when building with RGB2LAB_STATS defined
+// (`make lib STATS=1`); otherwise the functions below are still available
+// but statsCompiledIn() is 0 and all counters stay 0. Counts of the scalar
+// float functions include calls made by the library itself, e.g. the integer
+// functions calling them. `items` is the triplets of batch functions and the
+// cells of fill functions, of which `inGamut` are in gamut; only batch and
+// fill functions are timed, scalar ones being too short for that.
+
+#define RGB2LAB_STAT_IDS(X) \
+    X(rgbFromLab) X(labFromRgb) X(lchFromLab) X(labFromLch) X(lchFromRgb) X(rgbFromLch) \
+    X(rgbFromLabArray) X(labFromRgbArray) X(lchFromLabArray) X(labFromLchArray) X(lchFromRgbArray) X(rgbFromLchArray) \
+    X(labFromRgbInt) X(rgbFromLabInt) X(lchFromRgbInt) X(rgbFromLchInt) X(lchFromLabInt) X(labFromLchInt) \
+    X(labLchFromRgbInt) X(rgbLchFromLabInt) X(rgbLabFromLchInt) \
+    X(labFromRgb8Array) X(lchFromRgb8Array) X(labLchFromRgb8Array) \
+    X(fillTable_LforAB) X(fillTable_AforBL) X(fillTable_BforAL) X(fillTable_LforHC) X(fillTable_CforHL) X(fillTable_HforCL) \
+    X(fillTable_ABforL) X(fillTable_BLforA) X(fillTable_ALforB) X(fillTable_HCforL) X(fillTable_HLforC) X(fillTable_CLforH) \
+    X(fillArgb32_LforAB) X(fillArgb32_AforBL) X(fillArgb32_BforAL) X(fillArgb32_LforHC) X(fillArgb32_CforHL) X(fillArgb32_HforCL) \
+    X(fillArgb32_ABforL) X(fillArgb32_BLforA) X(fillArgb32_ALforB) X(fillArgb32_HCforL) X(fillArgb32_HLforC) X(fillArgb32_CLforH)
+
+#define RGB2LAB_STAT_ID(NAME) STAT_##NAME,
+typedef enum { RGB2LAB_STAT_IDS(RGB2LAB_STAT_ID) STAT_COUNT } StatId;
+#undef RGB2LAB_STAT_ID
+
+typedef struct { uint64_t calls, items, inGamut, nanoseconds; } StatRecord;
+
+int statsCompiledIn(void);
+int statCount(void); // STAT_COUNT
+const char * statName(int id); // entry point name, or NULL if `id` is out of range
+void readStats(StatRecord dst[]); // snapshot of all STAT_COUNT records
+void resetStats(void);
+
+// For library use
+
+void statsRecord(StatId id, uint64_t items, uint64_t inGamut, uint64_t nanoseconds);
+uint64_t statsNow(void); // monotonic nanoseconds
+
+#ifdef RGB2LAB_STATS
+#define STATS_COUNT(ID) statsRecord(STAT_##ID, 0, 0, 0)
+#define STATS_START() uint64_t statsStart_ = statsNow()
+#define STATS_STOP(ID, ITEMS, IN_GAMUT) statsRecord(ID, ITEMS, IN_GAMUT, statsNow() - statsStart_)
+#else
+#define STATS_COUNT(ID) ((void) 0)
+#define STATS_START() ((void) 0)
+#define STATS_STOP(ID, ITEMS, IN_GAMUT) ((void) 0)
+#endif
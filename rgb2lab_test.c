@@ -1,5 +1,226 @@
+#include "rgb2lab_gamut.h" // includes rgb2lab.h
 #include "rgb2lab_int.h"
+#include "rgb2lab_planar.h"
+#include <math.h>
 #include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+// largest difference of the float planes from the double triplets, with hues
+// compared as the arc length around the circle of the chroma as in ΔH
+static double maxError(const float * planes[3], const DoubleTriplet * ref, size_t n, int hue)
+{
+    double maxErr = 0;
+    for (size_t i = 0; i < n; ++i)
+        for (int j = 0; j < 3; ++j)
+        {
+            double err = fabs(planes[j][i] - ref[i].data[j]);
+            if (hue && j == 2)
+                err = fmin(err, 360 - err) * ref[i].c * 3.14159265358979 / 180;
+            if (!(err <= maxErr)) maxErr = err; // catches NaN
+        }
+    return maxErr;
+}
+
+typedef void (*PlanarFn)(const float *, const float *, const float *, float *, float *, float *, size_t);
+typedef DoubleTriplet (*DoubleFn)(DoubleTriplet);
+
+// converts `src` with both paths and checks the results agree within `tolerance`
+static int checkPlanar(const char * name, PlanarFn planarFn, DoubleFn doubleFn, const DoubleTriplet * src, size_t n, int hue, double tolerance)
+{
+    float * planes = malloc(3 * n * sizeof(float));
+    DoubleTriplet * ref = malloc(n * sizeof(DoubleTriplet));
+    for (size_t i = 0; i < n; ++i)
+    {
+        for (int j = 0; j < 3; ++j)
+            planes[j * n + i] = src[i].data[j];
+        DoubleTriplet rounded = {{planes[i], planes[n + i], planes[2 * n + i]}}; // compare like with like
+        ref[i] = doubleFn(rounded);
+    }
+    planarFn(planes, planes + n, planes + 2 * n, planes, planes + n, planes + 2 * n, n); // in place
+    const float * out[3] = {planes, planes + n, planes + 2 * n};
+    double err = maxError(out, ref, n, hue);
+    int ok = err <= tolerance;
+    printf("%s: max error %g over %zu colors%s\n", name, err, n, ok ? "" : " FAILED");
+    free(planes);
+    free(ref);
+    return ok;
+}
+
+static int testPlanar(void)
+{
+    size_t n = 0;
+    DoubleTriplet * src = malloc(256 * 256 * 256 / 8 * sizeof(DoubleTriplet));
+
+    for (int r = 0; r < 256; r += 2) // every other 8-bit RGB value
+        for (int g = 0; g < 256; g += 2)
+            for (int b = 1; b < 256; b += 2)
+            {
+                DoubleTriplet rgb = {{r / 255.0, g / 255.0, b / 255.0}};
+                src[n++] = rgb;
+            }
+    int ok = checkPlanar("labFromRgbPlanar", labFromRgbPlanar, labFromRgb, src, n, 0, 2e-3)
+           & checkPlanar("lchFromRgbPlanar", lchFromRgbPlanar, lchFromRgb, src, n, 1, 2e-3);
+
+    n = 0; // in-gamut integer Lab values
+    for (int l = 0; l <= 100; ++l)
+        for (int a = -128; a <= 128; ++a)
+            for (int b = -128; b <= 128; ++b)
+            {
+                DoubleTriplet lab = {{l, a, b}}, rgb = rgbFromLab(lab);
+                if (0 <= rgb.r && rgb.r <= 1 && 0 <= rgb.g && rgb.g <= 1 && 0 <= rgb.b && rgb.b <= 1)
+                    src[n++] = lab;
+            }
+    ok &= checkPlanar("rgbFromLabPlanar", rgbFromLabPlanar, rgbFromLab, src, n, 0, 1e-4)
+        & checkPlanar("lchFromLabPlanar", lchFromLabPlanar, lchFromLab, src, n, 1, 2e-3);
+    for (size_t i = 0; i < n; ++i)
+        src[i] = lchFromLab(src[i]);
+    ok &= checkPlanar("rgbFromLchPlanar", rgbFromLchPlanar, rgbFromLch, src, n, 0, 1e-4)
+        & checkPlanar("labFromLchPlanar", labFromLchPlanar, labFromLch, src, n, 0, 2e-3);
+
+    free(src);
+    return ok;
+}
+
+// checks that each color space gives the expected Lab for RGB white and round-trips RGB
+static int testColorSpaces(void)
+{
+    int ok = 1;
+    ColorSpace * srgb = newColorSpace(PRIMARIES_SRGB, TRANSFER_SRGB, WHITE_D65);
+    for (int i = 0; i < 4096; ++i) // the default space should give exactly the same results
+    {
+        DoubleTriplet rgb = {{(i & 15) / 15.0, (i >> 4 & 15) / 15.0, (i >> 8) / 15.0}};
+        DoubleTriplet lab = labFromRgb(rgb), labCs = labFromRgbCs(srgb, rgb);
+        DoubleTriplet back = rgbFromLab(lab), backCs = rgbFromLabCs(srgb, lab);
+        for (int j = 0; j < 3; ++j)
+            if (lab.data[j] != labCs.data[j] || back.data[j] != backCs.data[j]) ok = 0;
+    }
+    printf("sRGB D65 color space: %s default\n", ok ? "same as" : "FAILED: differs from");
+    freeColorSpace(srgb);
+
+    static const struct { const char * name; RgbPrimaries primaries; TransferCurve transfer; ReferenceWhite white; } spaces[] = {
+        {"sRGB D50", PRIMARIES_SRGB, TRANSFER_SRGB, WHITE_D50},
+        {"Display P3", PRIMARIES_DISPLAY_P3, TRANSFER_SRGB, WHITE_D65},
+        {"Adobe RGB", PRIMARIES_ADOBE_RGB, TRANSFER_ADOBE_RGB, WHITE_D65},
+        {"Adobe RGB D50", PRIMARIES_ADOBE_RGB, TRANSFER_ADOBE_RGB, WHITE_D50},
+        {"linear Display P3", PRIMARIES_DISPLAY_P3, TRANSFER_LINEAR, WHITE_D65},
+    };
+    for (size_t s = 0; s < sizeof(spaces) / sizeof(spaces[0]); ++s)
+    {
+        ColorSpace * cs = newColorSpace(spaces[s].primaries, spaces[s].transfer, spaces[s].white);
+        DoubleTriplet white = {{1, 1, 1}}, lab = labFromRgbCs(cs, white);
+        double whiteErr = fmax(fabs(lab.L - 100), fmax(fabs(lab.A), fabs(lab.B))), roundTripErr = 0;
+        for (int i = 0; i < 4096; ++i)
+        {
+            DoubleTriplet rgb = {{(i & 15) / 15.0, (i >> 4 & 15) / 15.0, (i >> 8) / 15.0}};
+            DoubleTriplet back = rgbFromLchCs(cs, lchFromRgbCs(cs, rgb));
+            for (int j = 0; j < 3; ++j)
+                roundTripErr = fmax(roundTripErr, fabs(back.data[j] - rgb.data[j]));
+        }
+        // a pure power curve turns rounding errors of ~1e-16 near black into ~1e-7
+        int spaceOk = whiteErr < 1e-4 && roundTripErr < 1e-6;
+        printf("%s color space: white error %g, round trip error %g%s\n", spaces[s].name, whiteErr, roundTripErr, spaceOk ? "" : " FAILED");
+        ok &= spaceOk;
+        freeColorSpace(cs);
+    }
+    return ok;
+}
+
+// compares the cells of a packed table with those of the TinyRgb table and
+// checks that it survives serialization; frees `packed`
+static int checkPacked(const char * name, PackedTable * packed, const TinyRgb * table, int cells, int inGamutCount,
+                       size_t * memory, size_t * serialized)
+{
+    int ok = packed && packedTableInGamutCount(packed) == inGamutCount;
+    for (int i = 0; ok && i < cells; ++i)
+    {
+        TinyRgb cell;
+        int valid = packedTableCell(packed, i, &cell);
+        ok = valid == table[i].valid && (!valid || (cell.r == table[i].r && cell.g == table[i].g && cell.b == table[i].b));
+    }
+    if (ok)
+    {
+        size_t size = packedTableSerializedSize(packed);
+        unsigned char * data = malloc(size), * again = malloc(size);
+        writePackedTable(packed, data);
+        PackedTable * read = readPackedTable(data, size);
+        ok = read && packedTableSerializedSize(read) == size && readPackedTable(data, size - 1) == NULL;
+        if (ok)
+        {
+            writePackedTable(read, again);
+            ok = memcmp(data, again, size) == 0;
+        }
+        freePackedTable(read);
+        free(data);
+        free(again);
+        *memory += packedTableMemory(packed);
+        *serialized += size;
+    }
+    if (!ok) printf("packed %s (%s): FAILED\n", name, packedTableValidity(packed) == PACKED_BITMAP ? "bitmap" : "spans");
+    freePackedTable(packed);
+    return ok;
+}
+
+static int testPackedTables(void)
+{
+    int ok = newPackedTable_ABforL(101, PACKED_BITMAP) == NULL && newPackedTable_ABforL(50, 2) == NULL;
+    static TinyRgb table[257 * 257]; // largest table
+    for (PackedValidity v = PACKED_BITMAP; v <= PACKED_SPANS; ++v)
+    {
+        size_t tinyRgb = 0, memory = 0, serialized = 0;
+#define CHECK_1D(KIND, SPAN, F1, F2) { \
+            int n = fillTable_##KIND(table, F1, F2); \
+            ok &= checkPacked(#KIND, newPackedTable_##KIND(F1, F2, v), table, SPAN, n, &memory, &serialized); \
+            tinyRgb += sizeof(TinyRgb) * SPAN; }
+#define CHECK_2D(KIND, SPAN1, SPAN2, F) { \
+            int n = fillTable_##KIND((TinyRgb (*)[SPAN2]) table, F); \
+            ok &= checkPacked(#KIND, newPackedTable_##KIND(F, v), table, SPAN1 * SPAN2, n, &memory, &serialized); \
+            tinyRgb += sizeof(TinyRgb) * SPAN1 * SPAN2; }
+        for (int f = 0; f <= 100; f += 25)
+        {
+            CHECK_1D(LforAB, 101, f - 50, 2 * f - 100) CHECK_1D(AforBL, 257, f - 50, f) CHECK_1D(BforAL, 257, 50 - f, f)
+            CHECK_1D(LforHC, 101, 3 * f, f) CHECK_1D(CforHL, 181, 3 * f, f) CHECK_1D(HforCL, 360, f / 2, f)
+            CHECK_2D(ABforL, 257, 257, f) CHECK_2D(BLforA, 257, 101, 2 * f - 100) CHECK_2D(ALforB, 257, 101, 100 - 2 * f)
+            CHECK_2D(HCforL, 360, 181, f) CHECK_2D(HLforC, 360, 101, f) CHECK_2D(CLforH, 181, 101, 3 * f)
+        }
+#undef CHECK_1D
+#undef CHECK_2D
+        printf("Packed tables (%s): %zu bytes in memory and %zu serialized for %zu bytes of TinyRgb tables\n",
+               v == PACKED_BITMAP ? "bitmap" : "spans", memory, serialized, tinyRgb);
+    }
+    return ok;
+}
+
+// The in-gamut tests are stricter than the 8-bit rounding of rgbFromLchInt
+// (see GAMUT_TOLERANCE): over the integer LCH grid the batch test must agree
+// with the exact one, every in-gamut point must give valid RGB and the points
+// valid only after rounding must stay the known few
+static int testGamutVsInt(void)
+{
+    GamutBoundary * gb = newGamutBoundary(100, 360);
+    static DoubleTriplet lch[181];
+    static unsigned char inGamut[181];
+    int disagreements = 0, roundedOnly = 0;
+    for (int l = 0; l <= 100; ++l)
+        for (int h = 0; h < 360; ++h)
+        {
+            for (int c = 0; c <= 180; ++c)
+                lch[c] = (DoubleTriplet) {{l, c, h}};
+            isInGamutLchArray(gb, lch, inGamut, 181);
+            for (int c = 0; c <= 180; ++c)
+            {
+                IntTriplet rgb = rgbFromLchInt((IntTriplet) {{l, c, h}});
+                int valid = rgb.r != -1 && rgb.g != -1 && rgb.b != -1;
+                if (inGamut[c] != isInGamutLch(lch[c]) || (inGamut[c] && !valid)) ++disagreements;
+                else if (!inGamut[c] && valid) ++roundedOnly;
+            }
+        }
+    freeGamutBoundary(gb);
+    int ok = disagreements == 0 && roundedOnly == 8370;
+    printf("Gamut tests vs rgbFromLchInt: %d disagreements, %d points valid only after rounding%s\n",
+           disagreements, roundedOnly, ok ? "" : " FAILED");
+    return ok;
+}
 
 int main()
 {
@@ -7,7 +228,9 @@ int main()
     IntTriplet tt = labFromRgbInt(t);
     printf("(%d, %d, %d)\n", tt.L, tt.A, tt.B);
 
-    TinyRgb table[257][257];
-    int validRGBs = fillTableL_AB(table, 70);
+    static TinyRgb table[257][257];
+    int validRGBs = fillTable_ABforL(table, 70);
     printf("At L = 70, we have %d valid RGB values out of %d possible.\n", validRGBs, 257 * 257);
+
+    return testPlanar() & testColorSpaces() & testPackedTables() & testGamutVsInt() ? 0 : 1;
 }
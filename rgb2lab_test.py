@@ -0,0 +1,215 @@
+#! /usr/bin/env python3
+
+# Tests of the Python modules run by `make test` after rgb2lab_test
+#
+# Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
+#
+# Use, modification and distribution are permitted subject to the
+# "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
+
+import sys
+import rgb2lab, rgb2lab_int
+
+def check(name, ok, detail = ""):
+    print("{}: {}{}".format(name, "ok" if ok else "FAILED", " (" + detail + ")" if detail else ""))
+    return ok
+
+def checkTablesUnshared(name):
+    '''Changes returned tables and checks that the same calls still match the computed ones'''
+    ok = True
+    for kind, fixed, index in ("LforAB", (10, 20), (5, )), ("ABforL", (70, ), (0, 0)), \
+                              ("HCforL", (50, ), (10, 20)), ("CforHL", (10, 50), (20, )):
+        make, computed = getattr(rgb2lab_int, "makeTable_" + kind), rgb2lab_int._computedTableFns[kind](*fixed)
+        cell = make(*fixed)
+        for i in index:
+            cell = cell[i]
+        cell.r = (cell.r + 100) % 256
+        again = make(*fixed)
+        ok &= type(again) is type(computed) and bytes(again) == bytes(computed) and again.inGamutCount == computed.inGamutCount
+    return check(name, ok)
+
+def testTableCache():
+    rgb2lab_int.clearTableCache()
+    return checkTablesUnshared("Tables are unaffected by changes to returned ones")
+
+def testGamutVolumes():
+    import os, tempfile
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "gamut.vol")
+        rgb2lab_int.writeGamutVolumes(path)
+        rgb2lab_int.loadGamutVolumes(path)
+        budget = rgb2lab_int.tableCacheInfo().budget
+        try:
+            rgb2lab_int.setTableCacheBudget(0) # so that the tables come from the volumes
+            ok = checkTablesUnshared("Tables from gamut volumes are unaffected by changes to returned ones")
+            for kind in rgb2lab_int._tableKinds:
+                ranges = [rgb2lab_int._gamutFixedRanges[n] for n in kind.split("for")[1]]
+                for fixed in zip(*(r[::37] for r in ranges)):
+                    table, computed = getattr(rgb2lab_int, "makeTable_" + kind)(*fixed), rgb2lab_int._computedTableFns[kind](*fixed)
+                    ok &= bytes(table) == bytes(computed) and table.inGamutCount == computed.inGamutCount
+            return check("Tables from gamut volumes match the computed ones", ok)
+        finally:
+            rgb2lab_int.unloadGamutVolumes()
+            rgb2lab_int.setTableCacheBudget(budget)
+
+def testTablePrefetchErrors():
+    from ctypes import c_int
+    failing = {2}
+    def make(x):
+        if x in failing:
+            raise RuntimeError("failed to make {}".format(x))
+        return (c_int * 1)(x)
+    cache = rgb2lab_int._TableCache(1024)
+    cache.get(("k", 1), make)
+    cache.prefetchAround(("k", 1), make) # of 0 and 2, the latter failing
+    future = cache.inFlight.get(("k", 2))
+    if future is not None:
+        future.exception() # waits for it
+    ok = ("k", 2) not in cache.inFlight
+    failing.clear()
+    ok &= cache.get(("k", 2), make)[0] == 2
+    return check("Failed prefetches don't stay in flight", ok)
+
+def testArgb32Size():
+    ok = True
+    for height in 0, -1:
+        try:
+            rgb2lab_int.fillArgb32_LforAB(bytearray(0), 404, height, 0, 0)
+            ok = False
+        except rgb2lab_int.Rgb2LabError:
+            pass
+    ok &= rgb2lab_int._lib.fillArgb32_LforAB(None, 404, 0, 0, 0, 0) == 0
+    return check("Empty ARGB32 images are rejected without writing", ok)
+
+def testEngine():
+    from array import array
+    from multiprocessing.shared_memory import SharedMemory
+    import rgb2lab_engine
+    from rgb2lab_engine import Engine
+    ok = True
+    with Engine(2, shardsPerProcess = 3) as engine:
+        with engine.rgbCube(("lab", "lch"), precision = "int").wait() as results:
+            rgb = bytearray(3 * 256 ** 3) # all pixels in order of r << 16 | g << 8 | b
+            rgb[0::3] = b"".join(bytes([r]) * 65536 for r in range(256))
+            rgb[1::3] = b"".join(bytes([g]) * 256 for g in range(256)) * 256
+            rgb[2::3] = bytes(range(256)) * 65536
+            lab, lch = rgb2lab_int.labLchFromRgb8Array(rgb)
+            ok &= check("Engine RGB cube matches labLchFromRgb8Array",
+                        results["lab"].tobytes() == bytes(lab) and results["lch"].tobytes() == bytes(lch))
+        with engine.labGrid().wait() as results:
+            planeSize = 257 * 257 * 3 * 8
+            def plane(l): return array("d", (v for a in range(-128, 129) for b in range(-128, 129) for v in (l, a, b)))
+            with results["rgb"].cast("B") as grid: # released before the results
+                ok &= check("Engine Lab grid matches rgbFromLabArray", all(
+                    grid[l * planeSize : (l + 1) * planeSize] == bytes(rgb2lab.rgbFromLabArray(plane(l))) for l in range(0, 101, 10)))
+        for kind in "HLforC", "CforHL":
+            with engine.tableSlices(kind).wait() as results:
+                tables, counts = results["tables"].cast("B").tobytes(), results["inGamutCounts"].cast("B").cast("i").tolist()
+                computed = rgb2lab_int._computedTableFns[kind]
+                fixed = [(c, ) for c in range(181)] if kind == "HLforC" else [(h, l) for h in range(360) for l in range(101)]
+                size = len(tables) // len(fixed)
+                ok &= check("Engine {} tables match makeTable_{}".format(kind, kind), all(
+                    tables[i * size : (i + 1) * size] == bytes(t) and counts[i] == t.inGamutCount
+                    for i, t in enumerate(computed(*f) for f in fixed)))
+        try:
+            import numpy
+        except ImportError:
+            return ok
+        with engine.tableSlices("CforHL").wait() as results:
+            counts = results.numpy("inGamutCounts") # kept past the with block
+            expected, names = counts.tolist(), [block.name for block in results._blocks.values()]
+        def unlinked(name):
+            try:
+                SharedMemory(name).close()
+            except FileNotFoundError:
+                return True
+            return False
+        ok &= check("Engine results close while an array still uses them",
+                    counts.tolist() == expected and all(map(unlinked, names)) and len(rgb2lab_engine._exportedBlocks) == 1)
+        del counts
+        engine.tableSlices("CforHL").wait().close()
+        ok &= check("Engine results blocks are closed once unused", not rgb2lab_engine._exportedBlocks)
+    return ok
+
+def testBackendParity():
+    '''Compares the results of the native and NumPy backends byte for byte'''
+    import itertools, rgb2lab_common
+    try:
+        import numpy
+    except ImportError:
+        return check("Native and NumPy backends agree", True, "NumPy unavailable; skipped")
+    if not rgb2lab_common.nativeAvailable():
+        return check("Native and NumPy backends agree", True, "native backend unavailable; skipped")
+    rgb2lab_int.unloadRgb8Table() # else the RGB input functions look up its results for both
+    fixedValues = {"L": (0, 50, 100), "A": (-128, 0, 128), "B": (-128, 0, 128), "C": (0, 90, 180), "H": (-1, 0, 180, 359)}
+    rgbs = list(itertools.product((0, 1, 128, 254, 255), repeat = 3))
+    labs = list(itertools.product((0, 1, 50, 99, 100), (-128, -1, 0, 1, 128), (-128, -1, 0, 1, 128)))
+    lchs = [(l, 0, -1) for l in (0, 50, 100)] + list(itertools.product((0, 50, 100), (0, 1, 50, 134, 180), (0, 90, 180, 359)))
+    intInputs = {"labFromRgbInt": rgbs, "lchFromRgbInt": rgbs, "labLchFromRgbInt": rgbs,
+                 "rgbFromLabInt": labs, "lchFromLabInt": labs, "rgbLchFromLabInt": labs,
+                 "rgbFromLchInt": lchs, "labFromLchInt": lchs, "rgbLabFromLchInt": lchs}
+
+    def results():
+        found = {}
+        for kind in rgb2lab_int._tableKinds:
+            is1D = len(kind.split("for")[0]) == 1
+            for fixed in itertools.product(*(fixedValues[name] for name in kind.split("for")[1])):
+                table = rgb2lab_int._computedTableFns[kind](*fixed)
+                found["makeTable_{}{}".format(kind, fixed)] = (bytes(table), table.inGamutCount)
+                width, height = (len(table), 2) if is1D else (len(table), len(table[0]))
+                bits = bytearray(b"\xab" * ((4 * width + 8) * height)) # padded lines whose padding must stay
+                args = (height, ) + fixed if is1D else fixed
+                count = getattr(rgb2lab_int, "fillArgb32_" + kind)(bits, 4 * width + 8, *args, xRotate = 7)
+                found["fillArgb32_{}{}".format(kind, fixed)] = (bytes(bits), count)
+        for name, inputs in intInputs.items():
+            for v in inputs:
+                found["{}{}".format(name, v)] = getattr(rgb2lab_int, name)(v)
+        return found
+
+    saved = rgb2lab_common._backendChoice
+    try:
+        rgb2lab_common.setBackend("native")
+        native = results()
+        rgb2lab_common.setBackend("numpy")
+        numpyResults = results()
+    finally:
+        rgb2lab_common.setBackend(saved)
+    ok = True
+    for group in "makeTable_", "fillArgb32_", "Int":
+        names = [name for name in native if name.startswith(group) or group == "Int" and "Int(" in name]
+        differing = [name for name in names if native[name] != numpyResults[name]]
+        ok &= check("Native and NumPy backends agree on {} {}".format(len(names), "*Int conversions" if group == "Int" else group + "* calls"),
+                    not differing, ", ".join(differing[:5]))
+    return ok
+
+def testConvertHeaders():
+    import importlib.util, os, tempfile, threading
+    spec = importlib.util.spec_from_file_location("rgb2lab_convert", "rgb2lab-convert.py")
+    convert = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(convert)
+    ok = True
+    with tempfile.TemporaryDirectory() as directory:
+        for name, header in ("Truncated PAM header", b"P7\nWIDTH 2\nHEIGHT 2\n"), \
+                            ("PAM header without MAXVAL", b"P7\nWIDTH 1\nHEIGHT 1\nDEPTH 3\nENDHDR\n\0\0\0"):
+            path, errors = os.path.join(directory, "bad.pam"), []
+            with open(path, "wb") as f:
+                f.write(header)
+            def parse():
+                try:
+                    convert.ImageInput(path, None).close()
+                except convert.ConversionError as e:
+                    errors.append(e)
+            thread = threading.Thread(target = parse, daemon = True) # a parser that loops must not hang the tests
+            thread.start()
+            thread.join(5)
+            ok &= check(name + " raises ConversionError", not thread.is_alive() and len(errors) == 1,
+                        str(errors[0]) if errors else "")
+    return ok
+
+def main():
+    results = [testTableCache(), testGamutVolumes(), testTablePrefetchErrors(), testArgb32Size(), testEngine(),
+               testConvertHeaders(), testBackendParity()]
+    return 0 if all(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+// librgb2lab
+// ==========
+//
+// Convert color values from RGB to/from CIE LAB/LCH
+// for sRGB gamut, D65 illuminant, 2° observer
+//
+// Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
+//
+// Use, modification and distribution are permitted subject to the
+// "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
+
+#include "rgb2lab_threads.h"
+#include <pthread.h>
+#include <stdbool.h>
+#include <unistd.h>
+
+enum { MAX_THREADS = 256 };
+
+static int threads = 1;
+
+void setThreadCount(int count)
+{
+    if (count <= 0) count = sysconf(_SC_NPROCESSORS_ONLN);
+    threads = count < 1 ? 1 : count > MAX_THREADS ? MAX_THREADS : count;
+}
+
+int threadCount(void) { return threads; }
+
+typedef struct
+{
+    long (*fn)(void * context, size_t begin, size_t end);
+    void * context;
+    size_t begin, end;
+    long result;
+} Chunk;
+
+static void * _runChunk(void * chunk_)
+{
+    Chunk * chunk = chunk_;
+    chunk->result = chunk->fn(chunk->context, chunk->begin, chunk->end);
+    return NULL;
+}
+
+long parallelFor(size_t n, size_t minChunk, long (*fn)(void * context, size_t begin, size_t end), void * context)
+{
+    size_t count = threads;
+    if (minChunk && count > n / minChunk) count = n / minChunk;
+    if (count <= 1) return fn(context, 0, n);
+
+    Chunk chunks[MAX_THREADS];
+    pthread_t handles[MAX_THREADS];
+    bool started[MAX_THREADS];
+    for (size_t i = 0; i < count; ++i)
+    {
+        Chunk temp = {fn, context, n * i / count, n * (i + 1) / count, 0};
+        chunks[i] = temp;
+    }
+    for (size_t i = 1; i < count; ++i) // first chunk is run in the calling thread
+        started[i] = pthread_create(&handles[i], NULL, _runChunk, &chunks[i]) == 0;
+    _runChunk(&chunks[0]);
+    long result = chunks[0].result;
+    for (size_t i = 1; i < count; ++i)
+    {
+        if (started[i])
+            pthread_join(handles[i], NULL);
+        else
+            _runChunk(&chunks[i]); // couldn't start a thread so do it here
+        result += chunks[i].result;
+    }
+    return result;
+}
@@ -0,0 +1,22 @@
+// librgb2lab
+// ==========
+//
+// Convert color values from RGB to/from CIE LAB/LCH
+// for sRGB gamut, D65 illuminant, 2° observer
+//
+// Copyright (C) 2019, Shriramana Sharma, samjnaa-at-gmail-dot-com
+//
+// Use, modification and distribution are permitted subject to the
+// "BSD-2-Clause"-type license stated in the accompanying file LICENSE.txt
+
+#include <stddef.h>
+
+// Number of threads used by the batch and fillTable_* functions
+// Default is 1; 0 or less means one per online CPU
+void setThreadCount(int count);
+int threadCount(void);
+
+// For library use: call `fn(context, begin, end)` for consecutive disjoint
+// subranges covering [0, n), in parallel if n is at least twice `minChunk`
+// and return the sum of the results which is thus independent of the thread count
+long parallelFor(size_t n, size_t minChunk, long (*fn)(void * context, size_t begin, size_t end), void * context);